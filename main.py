@@ -28,6 +28,20 @@ def exit_handler():
     """
     logger.info("程序正在退出...")
 
+    # 关闭共享的Vheer浏览器池（池在多个引擎实例间共享，不随单个引擎关闭）
+    try:
+        from src.models.video_engines.engines.vheer_browser_pool import shutdown_vheer_browser_pools
+        shutdown_vheer_browser_pools()
+    except Exception as e:
+        logger.warning(f"关闭Vheer浏览器池失败: {e}")
+
+    # 内容寻址存储（TTS缓存、生成图像存储）的索引按时间间隔合并落盘，退出前写入尚未保存的条目
+    try:
+        from src.utils.content_store import flush_content_stores
+        flush_content_stores()
+    except Exception as e:
+        logger.warning(f"保存缓存索引失败: {e}")
+
 if __name__ == "__main__":
     # 注册退出处理函数
     atexit.register(exit_handler)
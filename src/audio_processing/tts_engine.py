@@ -22,6 +22,10 @@ except ImportError:
 
 from src.utils.logger import logger
 from src.utils.config_manager import ConfigManager
+from src.utils.tts_cache import tts_cache
+from src.utils.tts_capability_cache import get_edge_voices
+from src.utils.tts_timing import remove_timing, save_timing
+from src.utils.ass_subtitles import word_boundaries_from_cues
 
 
 class TTSEngine:
@@ -38,7 +42,8 @@ class TTSEngine:
         voice_rate: float = 1.0,
         voice_volume: float = 1.0,
         voice_pitch: float = 0.0,
-        output_file: str = None
+        output_file: str = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         生成语音
@@ -50,6 +55,7 @@ class TTSEngine:
             voice_volume: 音量 (0.6-5.0)
             voice_pitch: 音调 (-50 到 +50)
             output_file: 输出文件路径
+            use_cache: 是否复用相同文本与参数的历史合成结果
             
         Returns:
             包含生成结果的字典
@@ -69,15 +75,36 @@ class TTSEngine:
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir, exist_ok=True)
             
+            engine_name = 'siliconflow' if self._is_siliconflow_voice(voice_name) else 'edge_tts'
+            cache_key = None
+            if use_cache:
+                cache_key = tts_cache.make_key(engine_name, text, voice_name, voice_rate, voice_pitch, voice_volume,
+                                               {'format': os.path.splitext(output_file)[1].lower()})
+                cached = tts_cache.lookup(cache_key)
+                if cached:
+                    tts_cache.materialize(cached['path'], output_file)
+                    if cached['metadata'].get('word_boundaries'):
+                        save_timing(output_file, cached['metadata']['word_boundaries'], engine=engine_name)
+                    logger.info(f"TTS缓存命中: {os.path.basename(output_file)}")
+                    return {**cached['metadata'], 'success': True, 'audio_file': output_file,
+                            'engine': engine_name, 'cached': True}
+
+            remove_timing(output_file)
+
             # 判断语音类型并调用相应的TTS引擎
-            if self._is_siliconflow_voice(voice_name):
-                return self._siliconflow_tts(
+            if engine_name == 'siliconflow':
+                result = self._siliconflow_tts(
                     text, voice_name, voice_rate, voice_volume, voice_pitch, output_file
                 )
             else:
-                return self._edge_tts(
+                result = self._edge_tts(
                     text, voice_name, voice_rate, voice_volume, voice_pitch, output_file
                 )
+
+            if cache_key and result.get('success') and os.path.exists(output_file):
+                tts_cache.put(cache_key, output_file, {'subtitle_data': result.get('subtitle_data', ''),
+                                                       'word_boundaries': result.get('word_boundaries', [])})
+            return result
                 
         except Exception as e:
             logger.error(f"语音生成失败: {e}")
@@ -123,10 +150,15 @@ class TTSEngine:
             # 生成字幕数据
             subtitle_data = self._generate_subtitle_from_submaker(sub_maker)
             
+            # 逐词时间写在音频旁边，供字幕与合成直接使用
+            word_boundaries = word_boundaries_from_cues(sub_maker.cues)
+            save_timing(output_file, word_boundaries, engine='edge_tts')
+            
             return {
                 'success': True,
                 'audio_file': output_file,
                 'subtitle_data': subtitle_data,
+                'word_boundaries': word_boundaries,
                 'engine': 'edge_tts'
             }
             
@@ -348,32 +380,9 @@ class TTSEngine:
             return []
     
     def _get_edge_voices(self) -> list:
-        """获取Edge TTS语音列表"""
-        # 常用中文语音列表
-        return [
-            "zh-CN-XiaoxiaoNeural-Female",
-            "zh-CN-YunxiNeural-Male", 
-            "zh-CN-YunyangNeural-Male",
-            "zh-CN-XiaoyiNeural-Female",
-            "zh-CN-YunjianNeural-Male",
-            "zh-CN-XiaochenNeural-Female",
-            "zh-CN-XiaohanNeural-Female",
-            "zh-CN-XiaomengNeural-Female",
-            "zh-CN-XiaomoNeural-Female",
-            "zh-CN-XiaoqiuNeural-Female",
-            "zh-CN-XiaoruiNeural-Female",
-            "zh-CN-XiaoshuangNeural-Female",
-            "zh-CN-XiaoxuanNeural-Female",
-            "zh-CN-XiaoyanNeural-Female",
-            "zh-CN-XiaoyouNeural-Female",
-            "zh-CN-XiaozhenNeural-Female",
-            "zh-CN-YunfengNeural-Male",
-            "zh-CN-YunhaoNeural-Male",
-            "zh-CN-YunjieNeural-Male",
-            "zh-CN-YunxiaNeural-Male",
-            "zh-CN-YunyeNeural-Male",
-            "zh-CN-YunzeNeural-Male"
-        ]
+        """获取Edge TTS中文语音列表（读取持久化的音色缓存，过期时后台刷新）"""
+        return [f"{voice['id']}-{voice['gender']}" for voice in get_edge_voices()
+                if voice.get('language') == 'zh-CN' and voice.get('gender')]
     
     def _get_siliconflow_voices(self) -> list:
         """获取SiliconFlow语音列表"""
@@ -14,6 +14,7 @@ from concurrent.futures import ThreadPoolExecutor
 
 from src.utils.logger import logger
 from src.utils.config_manager import ConfigManager
+from src.utils.admission_controller import RateLimiter
 
 class APIType(Enum):
     """API类型枚举"""
@@ -50,6 +51,7 @@ class APIManager:
         self.config_manager = config_manager or ConfigManager()
         self.apis: Dict[APIType, List[APIConfig]] = {api_type: [] for api_type in APIType}
         self.request_counts: Dict[str, List[float]] = {}  # API请求计数
+        self.rate_limiters: Dict[str, RateLimiter] = {}  # 按API的请求限速器
         self.executor = ThreadPoolExecutor(max_workers=10)
         
         # 加载配置
@@ -164,6 +166,25 @@ class APIManager:
         
         self.request_counts[api_key].append(current_time)
     
+    def get_rate_limiter(self, api_config: APIConfig,
+                         requests_per_second: Optional[float] = None) -> RateLimiter:
+        """获取指定API的限速器
+
+        限速优先取 requests_per_second 参数，其次取 extra_params['requests_per_second']，
+        最后按 max_requests_per_minute 换算
+        """
+        api_key = f"{api_config.api_type.value}_{api_config.name}"
+        rate = (requests_per_second
+                or api_config.extra_params.get('requests_per_second')
+                or api_config.max_requests_per_minute / 60.0)
+        limiter = self.rate_limiters.get(api_key)
+        if limiter is None:
+            limiter = RateLimiter(rate, burst=max(1, int(rate)), name=api_key)
+            self.rate_limiters[api_key] = limiter
+        elif limiter.rate != rate:
+            limiter.set_rate(rate, burst=max(1, int(rate)))
+        return limiter
+
     def add_api_config(self, api_config: APIConfig):
         """添加API配置"""
         self.apis[api_config.api_type].append(api_config)
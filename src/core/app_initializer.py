@@ -61,6 +61,13 @@ class InitializationRunnable(QRunnable):
         """
         try:
             logger.info("后台线程：开始执行异步初始化...")
+            # 后台检测ffmpeg可用的视频编码器，供编码档位选择
+            try:
+                from src.utils.encoder_profiles import warm_up_encoder_detection
+                warm_up_encoder_detection()
+            except Exception as e:
+                logger.warning(f"启动编码器检测失败: {e}")
+
             # 创建并设置此线程的事件循环
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
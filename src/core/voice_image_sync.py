@@ -10,6 +10,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.utils.tts_timing import load_timing
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -64,7 +66,11 @@ class VoiceImageSyncManager:
             current_time = 0.0
             
             for voice_idx, voice_segment in enumerate(voice_segments):
-                voice_duration = voice_segment.get('duration', 3.0)
+                # 时长与逐词时间优先取合成时记录在音频旁边的数据
+                timing = load_timing(voice_segment.get('audio_path', '')) or {}
+                voice_duration = voice_segment.get('duration') or timing.get('duration') or 3.0
+                if timing.get('words') and not voice_segment.get('word_boundaries'):
+                    voice_segment = {**voice_segment, 'word_boundaries': timing['words']}
                 images = voice_to_images.get(voice_idx, [])
                 
                 if not images:
@@ -133,12 +139,20 @@ class VoiceImageSyncManager:
                 transition_type="cut"
             ))
         else:
-            # 多张图像平均分配时间
+            # 多张图像平均分配时间；有逐词时间时，切换点对齐到最近的词开始处，避免在词中间换图
             time_per_image = total_duration / image_count
+            cut_points = [i * time_per_image for i in range(image_count + 1)]
+            word_starts = [w['start'] for w in voice_segment.get('word_boundaries') or []
+                           if 0 < w.get('start', 0) < total_duration]
+            if word_starts:
+                for i in range(1, image_count):
+                    nearest = min(word_starts, key=lambda t: abs(t - cut_points[i]))
+                    if cut_points[i - 1] < nearest < cut_points[i + 1]:
+                        cut_points[i] = nearest
             
             for i, image in enumerate(images):
-                segment_start = start_time + i * time_per_image
-                segment_end = start_time + (i + 1) * time_per_image
+                segment_start = start_time + cut_points[i]
+                segment_end = start_time + cut_points[i + 1]
                 
                 # 确保图像显示时间在合理范围内
                 actual_duration = segment_end - segment_start
@@ -235,6 +235,10 @@ class AIVoiceSettingsWidget(QWidget):
         status_layout = QHBoxLayout(status_frame)
         status_label = QLabel("连接状态:")
         self.status_indicator = QLabel("🔴 未连接")
+        # 显示上次的连接测试结果，打开界面时不发起测试
+        cached_health = self.engine_manager.get_cached_health(engine_id)
+        if cached_health:
+            self.status_indicator.setText("🟢 连接正常" if cached_health.get('success') else "🔴 连接失败")
         test_btn = QPushButton("测试连接")
         test_btn.clicked.connect(lambda: self.test_engine_connection(engine_id))
         
@@ -279,16 +283,12 @@ class AIVoiceSettingsWidget(QWidget):
         voice_layout = QFormLayout(voice_group)
         
         self.edge_voice_combo = QComboBox()
-        voices = [
-            ('zh-CN-YunxiNeural', '云希-男声'),
-            ('zh-CN-XiaoxiaoNeural', '晓晓-女声'),
-            ('zh-CN-YunyangNeural', '云扬-男声'),
-            ('zh-CN-XiaoyiNeural', '晓伊-女声'),
-            ('en-US-AriaNeural', 'Aria-Female'),
-            ('en-US-GuyNeural', 'Guy-Male'),
-        ]
-        for voice_id, voice_name in voices:
-            self.edge_voice_combo.addItem(voice_name, voice_id)
+        # 音色列表来自持久化缓存（过期时后台刷新），只列出中英文音色
+        edge_engine = self.engine_manager.get_engine('edge_tts')
+        voices = edge_engine.get_available_voices() if edge_engine else []
+        for voice in voices:
+            if voice.get('language', '').startswith(('zh-CN', 'en-US')):
+                self.edge_voice_combo.addItem(voice['name'], voice['id'])
         voice_layout.addRow("音色:", self.edge_voice_combo)
         
         # 语速设置
@@ -472,7 +472,8 @@ class AIVoiceSettingsWidget(QWidget):
         try:
             engine = self.engine_manager.get_engine(engine_id)
             if engine:
-                result = engine.test_connection()
+                # 手动测试总是重新检测，并更新缓存的测试结果
+                result = self.engine_manager.get_engine_health(engine_id, force=True)
                 if result.get('success'):
                     self.status_indicator.setText("🟢 连接正常")
                     QMessageBox.information(self, "连接测试", result.get('message', '连接成功'))
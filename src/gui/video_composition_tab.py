@@ -24,6 +24,7 @@ from PyQt5.QtGui import QFont, QPixmap, QIcon
 from src.utils.logger import logger
 from src.processors.video_composer import VideoComposer
 from src.processors.video_processor import VideoProcessor
+from src.processors.still_clip_renderer import StillClipJob, StillClipRenderer
 from src.core.service_manager import ServiceManager
 
 @dataclass
@@ -41,28 +42,58 @@ class VideoCompositionWorker(QThread):
     """视频合成工作线程"""
     progress_updated = pyqtSignal(int, str)
     composition_completed = pyqtSignal(str, bool, str)
+    voice_generated = pyqtSignal(str, str, float)  # 片段ID, 生成的配音路径, 配音时长（未知为0）
     
-    def __init__(self, segments: List[VideoSegment], output_path: str, config: Dict):
+    def __init__(self, segments: List[VideoSegment], output_path: str, config: Dict,
+                 voice_generation: Optional[Dict] = None):
+        """
+        Args:
+            voice_generation: 缺少配音的片段边生成配音边合成，
+                {'provider': 引擎, 'settings': 配音设置, 'output_dir': 音频目录}；为空时按已有配音合成
+        """
         super().__init__()
         self.segments = segments
         self.output_path = output_path
         self.config = config
+        self.voice_generation = voice_generation
         self.is_cancelled = False
-    
+        self.composer = None
+        self.pipeline = None
+
     def cancel(self):
-        """取消合成"""
+        """取消合成（同时结束正在运行的 ffmpeg 进程）"""
         self.is_cancelled = True
-    
+        if self.pipeline:
+            self.pipeline.cancel()
+        elif self.composer:
+            self.composer.cancel()
+
+    def _on_composer_progress(self, fraction: float, message: str):
+        """将合成器的0~1进度映射到30%~95%"""
+        self.progress_updated.emit(30 + int(fraction * 65), message)
+
     def run(self):
         """执行视频合成"""
         composer = None
         try:
             self.progress_updated.emit(5, "初始化视频合成器...")
-            composer = VideoComposer()
+            composer = VideoComposer(progress_callback=self._on_composer_progress)
+            self.composer = composer
 
             if self.is_cancelled:
                 return
 
+            if self.voice_generation:
+                success = self._compose_streaming(composer)
+                if self.is_cancelled:
+                    return
+                if success:
+                    self.progress_updated.emit(100, "合成完成！")
+                    self.composition_completed.emit(self.output_path, True, "视频合成成功")
+                else:
+                    self.composition_completed.emit("", False, "视频合成失败，请检查日志")
+                return
+
             self.progress_updated.emit(10, "准备视频片段...")
 
             # 准备视频片段数据
@@ -136,6 +167,69 @@ class VideoCompositionWorker(QThread):
             if composer:
                 composer.cleanup()
 
+    def _compose_streaming(self, composer: VideoComposer) -> bool:
+        """流水线合成：已有配音的片段立即同步，缺少配音的片段生成一段就同步一段"""
+        import asyncio
+        from src.processors.streaming_composition import StreamingComposition
+        from src.services.tts_engine_service import TTSEngineManager
+        from src.utils.config_manager import ConfigManager
+
+        segments = [seg for seg in self.segments if os.path.exists(seg.video_path)]
+        video_segments = [{
+            'video_path': seg.video_path,
+            'duration': seg.duration,
+            'subtitle_text': seg.subtitle_text
+        } for seg in segments]
+
+        self.progress_updated.emit(10, "准备视频片段...")
+        self.pipeline = StreamingComposition(composer, video_segments, self.config.get('background_music', ''),
+                                             self.output_path, self.config)
+        if self.is_cancelled:
+            self.pipeline.cancel()
+            return False
+
+        provider = self.voice_generation['provider']
+        output_dir = self.voice_generation['output_dir']
+        jobs = []
+        for i, segment in enumerate(segments):
+            if segment.audio_path and os.path.exists(segment.audio_path):
+                self.pipeline.submit_audio(i, segment.audio_path)
+            elif segment.subtitle_text.strip():
+                audio_path = os.path.join(output_dir, f"segment_{i+1:03d}_{segment.id}.mp3")
+                jobs.append({'index': i, 'segment_id': segment.id, 'text': segment.subtitle_text,
+                             'output_path': audio_path})
+            else:
+                logger.warning(f"片段 {i+1} 没有配音也没有文本，跳过")
+                self.pipeline.mark_failed(i)
+
+        logger.info(f"流水线合成: {len(segments)} 个片段，其中 {len(jobs)} 段边生成配音边合成")
+
+        def on_result(job, result):
+            # 每段配音完成后立即提交该片段的画面同步
+            if result.get('success') and os.path.exists(job['output_path']):
+                # 片段数据归界面线程所有，生成结果通过信号交给界面更新并写入项目
+                self.voice_generated.emit(job['segment_id'], job['output_path'], float(result.get('duration') or 0.0))
+                self.pipeline.submit_audio(job['index'], job['output_path'], result.get('word_boundaries'))
+            else:
+                if not result.get('cancelled'):
+                    logger.error(f"片段 {job['index']+1} 配音生成失败: {result.get('error', '生成失败')}")
+                self.pipeline.mark_failed(job['index'])
+
+        if jobs:
+            os.makedirs(output_dir, exist_ok=True)
+            engine_manager = TTSEngineManager(ConfigManager())
+            asyncio.run(engine_manager.generate_speech_batch(
+                provider,
+                jobs,
+                on_result=on_result,
+                should_stop=lambda: self.is_cancelled,
+                **self.voice_generation.get('settings', {})
+            ))
+
+        if self.is_cancelled:
+            return False
+        return self.pipeline.finish()
+
 class VideoCompositionTab(QWidget):
     """视频合成标签页"""
     
@@ -274,6 +368,11 @@ class VideoCompositionTab(QWidget):
         ])
         self.resolution_combo.setCurrentText("1280x720 (720p)")
         settings_layout.addRow("分辨率:", self.resolution_combo)
+
+        # 缺少配音时是否在合成过程中调用配音引擎（会消耗付费配音额度，默认关闭）
+        self.generate_missing_voice_checkbox = QCheckBox("为缺少配音的片段生成配音（消耗配音额度）")
+        self.generate_missing_voice_checkbox.setChecked(False)
+        settings_layout.addRow("配音:", self.generate_missing_voice_checkbox)
         
         settings_group.setLayout(settings_layout)
         layout.addWidget(settings_group, 0)  # 不拉伸
@@ -326,6 +425,13 @@ class VideoCompositionTab(QWidget):
         self.subtitle_position_combo.setCurrentText("底部")
         position_layout.addWidget(self.subtitle_position_combo)
 
+        # 字幕方式：烧录到画面，或作为独立字幕轨（播放器/平台可开关，不需要重新编码）
+        position_layout.addWidget(QLabel("字幕方式:"))
+        self.subtitle_mode_combo = QComboBox()
+        self.subtitle_mode_combo.addItem("烧录字幕", "burn")
+        self.subtitle_mode_combo.addItem("软字幕", "soft")
+        position_layout.addWidget(self.subtitle_mode_combo)
+
         subtitle_layout.addLayout(position_layout)
 
         subtitle_group.setLayout(subtitle_layout)
@@ -614,6 +720,14 @@ class VideoCompositionTab(QWidget):
             # 使用视频列表创建视频片段对象，并按镜头顺序排序
             video_segments_dict = {}
 
+            # 缺失视频的镜头先统一收集，再用图像批量并行渲染替代片段
+            missing_shot_ids = [
+                video_data.get('shot_id', '') for video_data in videos_list
+                if isinstance(video_data, dict)
+                and not (video_data.get('video_path') and os.path.exists(video_data.get('video_path')))
+            ]
+            fallback_videos = self._create_fallback_videos(missing_shot_ids, project_dir) if missing_shot_ids else {}
+
             for i, video_data in enumerate(videos_list):
                 if not isinstance(video_data, dict):
                     logger.warning(f"跳过非字典类型的视频数据: {type(video_data)}")
@@ -629,7 +743,7 @@ class VideoCompositionTab(QWidget):
                     logger.warning(f"视频文件不存在: {video_path}")
 
                     # 尝试查找对应的图像文件作为替代
-                    fallback_video_path = self._create_fallback_video_for_segment(shot_id, project_dir)
+                    fallback_video_path = fallback_videos.get(shot_id)
                     if fallback_video_path:
                         video_path = fallback_video_path
                         logger.info(f"使用图像替代视频: {shot_id} -> {video_path}")
@@ -806,10 +920,30 @@ class VideoCompositionTab(QWidget):
         except Exception as e:
             logger.error(f"加载视频片段失败: {e}")
 
-    def _create_fallback_video_for_segment(self, shot_id, project_dir):
-        """为缺失的视频片段创建图像替代视频"""
+    def _create_fallback_videos(self, shot_ids, project_dir):
+        """为缺失的视频片段批量创建图像替代视频，返回 {shot_id: 视频路径}"""
+        jobs = {}
+        for shot_id in shot_ids:
+            job = self._prepare_fallback_job(shot_id, project_dir)
+            if job:
+                jobs[shot_id] = job
+        if not jobs:
+            return {}
+
+        results = StillClipRenderer().render_batch(list(jobs.values()))
+        fallback_videos = {}
+        for (shot_id, job), success in zip(jobs.items(), results):
+            if success and os.path.exists(job.output_path):
+                logger.info(f"图像替代视频创建成功: {job.output_path}")
+                fallback_videos[shot_id] = job.output_path
+            else:
+                logger.error(f"图像替代视频创建失败: {job.output_path}")
+        return fallback_videos
+
+    def _prepare_fallback_job(self, shot_id, project_dir):
+        """为缺失的视频片段准备图像替代视频的渲染任务"""
         try:
-            logger.info(f"为镜头 {shot_id} 创建图像替代视频")
+            logger.info(f"为镜头 {shot_id} 准备图像替代视频")
 
             # 获取项目数据
             if not self.project_manager or not self.project_manager.current_project:
@@ -866,18 +1000,18 @@ class VideoCompositionTab(QWidget):
             os.makedirs(fallback_dir, exist_ok=True)
             output_path = os.path.join(fallback_dir, output_filename)
 
-            # 使用FFmpeg创建静态视频
-            success = self._create_static_video_with_ffmpeg(image_path, output_path, audio_duration)
-
-            if success and os.path.exists(output_path):
-                logger.info(f"图像替代视频创建成功: {output_path}")
-                return output_path
-            else:
-                logger.error(f"图像替代视频创建失败: {output_path}")
-                return None
+            # 轻微的推拉平移，避免长时间完全静止的画面
+            return StillClipJob(
+                image_path=image_path,
+                output_path=output_path,
+                duration=audio_duration,
+                effects=[{"type": "ken_burns", "zoom_factor": 1.1, "pan_direction": "random"}],
+                resolution=(1024, 1024),
+                fps=30
+            )
 
         except Exception as e:
-            logger.error(f"创建图像替代视频失败: {e}")
+            logger.error(f"准备图像替代视频失败: {e}")
             return None
 
     def _get_audio_duration_for_shot(self, shot_id, project_dir):
@@ -921,43 +1055,6 @@ class VideoCompositionTab(QWidget):
             logger.error(f"获取音频时长失败: {e}")
             return 5.0
 
-    def _create_static_video_with_ffmpeg(self, image_path, output_path, duration):
-        """使用FFmpeg创建静态视频"""
-        try:
-            import subprocess
-
-            cmd = [
-                'ffmpeg/bin/ffmpeg.exe',
-                '-y',  # 覆盖输出文件
-                '-loop', '1',  # 循环输入图像
-                '-i', image_path,  # 输入图像
-                '-t', str(duration),  # 视频时长
-                '-r', '30',  # 帧率
-                '-vf', 'scale=1024:1024:force_original_aspect_ratio=decrease,pad=1024:1024:(ow-iw)/2:(oh-ih)/2',  # 缩放和填充
-                '-c:v', 'libx264',  # 视频编码器
-                '-pix_fmt', 'yuv420p',  # 像素格式
-                '-preset', 'medium',  # 编码预设
-                output_path
-            ]
-
-            logger.info(f"执行FFmpeg命令: {' '.join(cmd)}")
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-
-            if result.returncode == 0:
-                logger.info(f"静态视频创建成功: {output_path}")
-                return True
-            else:
-                logger.error(f"FFmpeg执行失败: {result.stderr}")
-                return False
-
-        except subprocess.TimeoutExpired:
-            logger.error("FFmpeg执行超时")
-            return False
-        except Exception as e:
-            logger.error(f"FFmpeg执行异常: {e}")
-            return False
-
     def get_video_duration(self, video_path: str) -> float:
         """获取视频时长（秒）"""
         try:
@@ -1012,19 +1109,7 @@ class VideoCompositionTab(QWidget):
             except Exception as e:
                 logger.debug(f"mutagen获取音频时长失败: {e}")
 
-            # 方法3：使用pydub（如果可用）
-            try:
-                from pydub import AudioSegment
-                audio = AudioSegment.from_file(audio_path)
-                duration = len(audio) / 1000.0  # 转换为秒
-                logger.debug(f"✅ pydub获取音频时长成功: {os.path.basename(audio_path)} -> {duration:.2f}s")
-                return duration
-            except ImportError:
-                logger.debug("pydub未安装，尝试其他方法")
-            except Exception as e:
-                logger.debug(f"pydub获取音频时长失败: {e}")
-
-            # 方法4：使用文件大小估算（最后的备用方案）
+            # 方法3：使用文件大小估算（最后的备用方案）
             try:
                 file_size = os.path.getsize(audio_path)
                 # 根据文件扩展名调整比特率估算
@@ -1333,7 +1418,8 @@ class VideoCompositionTab(QWidget):
                     'font_color': self.font_color,
                     'outline_color': self.outline_color,
                     'outline_size': self.outline_size_spinbox.value(),
-                    'position': self.subtitle_position_combo.currentText()
+                    'position': self.subtitle_position_combo.currentText(),
+                    'mode': self.subtitle_mode_combo.currentData()
                 },
                 'transition_config': {
                     'mode': self.transition_mode_combo.currentText(),
@@ -1343,15 +1429,17 @@ class VideoCompositionTab(QWidget):
                 }
             }
 
-            # 启动合成工作线程
+            # 启动合成工作线程（有片段缺少配音时边生成配音边合成）
             self.composition_worker = VideoCompositionWorker(
                 self.current_segments,
                 output_path,
-                config
+                config,
+                voice_generation=self._get_streaming_voice_generation()
             )
 
             self.composition_worker.progress_updated.connect(self.on_progress_updated)
             self.composition_worker.composition_completed.connect(self.on_composition_completed)
+            self.composition_worker.voice_generated.connect(self.on_voice_generated)
 
             # 更新UI状态
             self.compose_btn.setVisible(False)
@@ -1369,6 +1457,65 @@ class VideoCompositionTab(QWidget):
             logger.error(f"启动视频合成失败: {e}")
             QMessageBox.critical(self, "错误", f"启动合成失败: {str(e)}")
 
+    def _get_streaming_voice_generation(self) -> Optional[Dict]:
+        """缺少配音的片段使用项目保存的配音引擎与设置，在合成过程中逐段生成
+
+        只有勾选了生成配音选项时才启用，否则缺少配音的片段按原流程跳过
+        """
+        missing_audio = [seg for seg in self.current_segments
+                         if not seg.audio_path or not os.path.exists(seg.audio_path)]
+        if not missing_audio or not self.project_manager or not self.project_manager.current_project:
+            return None
+        if not self.generate_missing_voice_checkbox.isChecked():
+            logger.info(f"{len(missing_audio)} 个片段缺少配音，未启用合成时生成配音，合成时跳过这些片段")
+            return None
+
+        project_data = self.project_manager.current_project
+        voice_data = project_data.get('voice_generation', {})
+        provider = voice_data.get('provider') or voice_data.get('settings', {}).get('provider')
+        project_dir = project_data.get('project_dir', '')
+        if not provider or not project_dir:
+            logger.warning(f"{len(missing_audio)} 个片段缺少配音，且项目没有保存配音引擎，合成时跳过这些片段的配音")
+            return None
+
+        from src.utils.audio_file_manager import AudioFileManager
+        output_dir = str(AudioFileManager(project_dir).get_engine_audio_dir(provider))
+        logger.info(f"{len(missing_audio)} 个片段缺少配音，将使用 {provider} 边生成配音边合成")
+        return {
+            'provider': provider,
+            'settings': {k: v for k, v in voice_data.get('settings', {}).items() if k != 'provider'},
+            'output_dir': output_dir
+        }
+
+    def on_voice_generated(self, segment_id: str, audio_path: str, duration: float):
+        """合成过程中生成了一段配音：更新片段并写入项目配音数据，下次合成直接使用"""
+        try:
+            for segment in self.current_segments:
+                if segment.id == segment_id:
+                    segment.audio_path = audio_path
+                    if duration > 0:
+                        segment.duration = duration
+                    break
+
+            if not self.project_manager or not self.project_manager.current_project:
+                return
+            voice_data = self.project_manager.current_project.setdefault('voice_generation', {})
+            segment_number = segment_id.split('_')[-1] if segment_id.startswith('shot_') else ''
+            text_segment_id = f"text_segment_{int(segment_number):03d}" if segment_number.isdigit() else ''
+            for voice_seg in voice_data.get('voice_segments', []):
+                if voice_seg.get('shot_id') == segment_id or (text_segment_id and voice_seg.get('segment_id') == text_segment_id):
+                    voice_seg['audio_path'] = audio_path
+                    voice_seg['status'] = '已生成'
+                    if duration > 0:
+                        voice_seg['duration'] = duration
+                    break
+            else:
+                logger.warning(f"项目配音数据中没有片段 {segment_id}，生成的配音只用于本次合成")
+                return
+            self.project_manager.save_project()
+        except Exception as e:
+            logger.error(f"保存合成时生成的配音失败: {e}")
+
     def cancel_composition(self):
         """取消视频合成"""
         try:
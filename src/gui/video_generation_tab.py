@@ -222,7 +222,9 @@ class VideoGenerationWorker(QThread):
                 project_manager=self.project_manager,
                 current_project_name=self.project_name,
                 max_concurrent_tasks=self.generation_config.get('max_concurrent_tasks', 3),  # 使用用户设置的并发数
-                audio_hint=self.generation_config.get('audio_hint')  # 传递音效提示
+                audio_hint=self.generation_config.get('audio_hint'),  # 传递音效提示
+                shot_id=shot_id or None,  # 按镜头记录作业，重启后可恢复
+                regenerate=self.generation_config.get('regenerate', False)  # 重新生成时忽略已有结果
             )
 
             self.progress_updated.emit(100, "视频生成完成!")
@@ -303,6 +305,52 @@ class VideoGenerationWorker(QThread):
         self.is_cancelled = True
 
 
+class VideoJobResumeWorker(QThread):
+    """恢复上次运行中未完成的视频生成作业（继续轮询远程任务并下载结果）"""
+
+    job_resumed = pyqtSignal(str, str, bool, str)  # 镜头ID, 视频路径, 成功状态, 错误信息
+    resume_finished = pyqtSignal(int, int)  # 成功数, 总数
+
+    def __init__(self, project_manager, project_name):
+        super().__init__()
+        self.project_manager = project_manager
+        self.project_name = project_name
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            from src.processors.video_processor import VideoProcessor
+            from src.core.service_manager import ServiceManager
+
+            processor = VideoProcessor(ServiceManager())
+            service = processor.video_generation_service
+            if not service:
+                return
+
+            outcomes = loop.run_until_complete(service.resume_pending_jobs(
+                self.project_name, project_manager=self.project_manager))
+
+            succeeded = 0
+            for outcome in outcomes:
+                result = outcome['result']
+                if result.success:
+                    succeeded += 1
+                # 多片段镜头的单个片段只记录在作业日志中，下次生成该镜头时直接复用
+                if outcome.get('segment_index') is None:
+                    self.job_resumed.emit(outcome['shot_id'], result.video_path,
+                                          result.success, result.error_message)
+            self.resume_finished.emit(succeeded, len(outcomes))
+
+        except Exception as e:
+            logger.error(f"恢复未完成的视频生成作业失败: {e}")
+        finally:
+            try:
+                loop.close()
+            finally:
+                asyncio.set_event_loop(None)
+
+
 class VideoGenerationTab(QWidget):
     """图转视频标签页 - 将图片转换为视频片段"""
     
@@ -320,6 +368,7 @@ class VideoGenerationTab(QWidget):
 
         # 并发生成管理
         self.active_workers = {}  # {scene_id: worker}
+        self._regenerate_shot_ids = set()  # 用户点击“重新生成”的镜头，生成时跳过作业日志
         self.max_concurrent_videos = 3  # 默认并发数，会根据用户设置动态调整
 
         # 批量图像处理管理
@@ -331,6 +380,9 @@ class VideoGenerationTab(QWidget):
 
         # 🔧 新增：统一镜头ID管理器
         self.shot_id_manager = ShotIDManager()
+
+        # 重启后恢复未完成的远程视频任务
+        self.resume_worker = None
         
         self.init_ui()
         self.load_project_data()
@@ -933,6 +985,9 @@ class VideoGenerationTab(QWidget):
             scene_count = len(self.current_scenes)
             self.status_label.setText(f"已加载 {scene_count} 个镜头")
 
+            # 恢复上次运行中已提交但未下载的视频任务
+            self._resume_pending_video_jobs()
+
         except Exception as e:
             logger.error(f"加载项目数据失败: {e}")
             self.status_label.setText(f"加载失败: {e}")
@@ -1689,7 +1744,13 @@ class VideoGenerationTab(QWidget):
             if not audio_path or not os.path.exists(audio_path):
                 return 0.0
 
-            # 方法1：使用mutagen（最稳定，优先使用）
+            # 方法1：解析文件头（不解码音频）
+            from src.utils.audio_header_duration import read_audio_duration
+            duration = read_audio_duration(audio_path)
+            if duration > 0:
+                return duration
+
+            # 方法2：使用mutagen
             try:
                 from mutagen._file import File
                 audio_file = File(audio_path)
@@ -1703,16 +1764,6 @@ class VideoGenerationTab(QWidget):
             except Exception as e:
                 logger.warning(f"mutagen获取音频时长失败: {e}")
 
-            # 方法2：使用pydub
-            try:
-                from pydub import AudioSegment
-                audio = AudioSegment.from_file(audio_path)
-                duration = len(audio) / 1000.0  # 转换为秒
-                logger.debug(f"pydub获取音频时长成功: {audio_path} -> {duration:.1f}s")
-                return float(duration)
-            except Exception as e:
-                logger.warning(f"pydub获取音频时长失败: {e}")
-
             # 方法3：使用wave模块（仅支持wav文件）
             try:
                 import wave
@@ -1786,6 +1837,45 @@ class VideoGenerationTab(QWidget):
         scene_images.sort(key=lambda x: not x['is_main'])
         return scene_images
 
+    def _resume_pending_video_jobs(self):
+        """后台恢复当前项目在上次运行中已提交、但尚未下载结果的视频任务"""
+        try:
+            if self.resume_worker and self.resume_worker.isRunning():
+                return
+
+            project_name = self.project_manager.current_project_name if self.project_manager else None
+            from src.models.video_engines.video_job_journal import get_video_job_journal
+            pending_jobs = get_video_job_journal().get_pending_jobs(project_name)
+            if not pending_jobs:
+                return
+
+            logger.info(f"发现 {len(pending_jobs)} 个未完成的视频生成任务，后台恢复中")
+            self.status_label.setText(f"正在恢复 {len(pending_jobs)} 个未完成的视频生成任务...")
+
+            self.resume_worker = VideoJobResumeWorker(self.project_manager, project_name)
+            self.resume_worker.job_resumed.connect(self.on_video_job_resumed)
+            self.resume_worker.resume_finished.connect(self.on_video_jobs_resume_finished)
+            self.resume_worker.start()
+
+        except Exception as e:
+            logger.warning(f"恢复未完成的视频生成任务失败: {e}")
+
+    def on_video_job_resumed(self, shot_id, video_path, success, error_message):
+        """单个恢复的作业完成"""
+        scene = next((s for s in self.current_scenes if s.get('shot_id') == shot_id), None)
+        if not scene:
+            return
+        if success:
+            self.save_video_to_project(video_path, scene)
+            self.update_scene_status(scene, '已生成')
+            logger.info(f"已恢复镜头 {shot_id} 的视频: {video_path}")
+        else:
+            logger.warning(f"镜头 {shot_id} 的视频任务恢复失败: {error_message}")
+
+    def on_video_jobs_resume_finished(self, succeeded, total):
+        """所有恢复的作业处理完成"""
+        self.status_label.setText(f"已恢复 {succeeded}/{total} 个未完成的视频生成任务")
+
     def update_scene_table(self):
         """更新场景表格"""
         try:
@@ -2032,6 +2122,11 @@ class VideoGenerationTab(QWidget):
                 QMessageBox.warning(self, "警告", "该场景缺少图像文件")
                 return
 
+            # 已生成的镜头点击“重新生成”：跳过作业日志，强制重新提交
+            has_video = scene_data.get('video_path') and os.path.exists(scene_data.get('video_path', ''))
+            if scene_data.get('status') == '已生成' or has_video:
+                self._regenerate_shot_ids.add(scene_data.get('shot_id', ''))
+
             # 开始生成
             self.start_generation([scene_data])
 
@@ -2422,9 +2517,9 @@ class VideoGenerationTab(QWidget):
                 def create_video(self):
                     """在后台线程中创建带动画效果的视频"""
                     try:
-                        import subprocess
                         from PIL import Image
                         import hashlib
+                        from src.utils.ffmpeg_runner import run_ffmpeg_sync
 
                         shot_id = self.scene_data.get('shot_id', 'unknown')
 
@@ -2503,13 +2598,13 @@ class VideoGenerationTab(QWidget):
                         logger.info(f"执行FFmpeg命令: {' '.join(cmd)}")
 
                         # 执行FFmpeg命令（增加超时时间）
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+                        result = run_ffmpeg_sync(cmd, timeout=120)
 
-                        if result.returncode == 0 and os.path.exists(output_path):
+                        if result.success and os.path.exists(output_path):
                             logger.info(f"带动画效果的视频创建成功: {output_path}")
                             self.finished.emit(True, output_path, "", self.scene_data)
                         else:
-                            error_msg = result.stderr if result.stderr else "FFmpeg执行失败"
+                            error_msg = result.error_message or "FFmpeg执行失败"
                             logger.error(f"FFmpeg执行失败: {error_msg}")
                             self.finished.emit(False, "", f"视频创建失败: {error_msg}", self.scene_data)
 
@@ -2737,15 +2832,19 @@ class VideoGenerationTab(QWidget):
             required_images, segment_durations = self._check_voice_duration_match(scene)
             scene_images = self._get_scene_images(scene)
 
+            regenerate = shot_id in self._regenerate_shot_ids
+            self._regenerate_shot_ids.discard(shot_id)
+
             if voice_duration > 10.0 and len(scene_images) >= required_images:
                 # 多片段生成模式
-                self._generate_multi_segment_video(scene, scene_images, segment_durations)
+                self._generate_multi_segment_video(scene, scene_images, segment_durations, regenerate)
                 return
             else:
                 # 单片段生成模式
                 audio_hint = scene.get('audio_hint')
                 # 不传递voice_duration，让用户界面设置优先
                 generation_config = self.get_generation_config(image_path, None, audio_hint)
+                generation_config['regenerate'] = regenerate
 
                 # 调试日志：检查生成配置
                 logger.info(f"生成配置 - 分辨率: {generation_config.get('width')}x{generation_config.get('height')}, 引擎: {generation_config.get('engine')}")
@@ -2825,13 +2924,17 @@ class VideoGenerationTab(QWidget):
             # 获取生成配置
             image_path = current_scene.get('image_path', '')
 
+            regenerate = shot_id in self._regenerate_shot_ids
+            self._regenerate_shot_ids.discard(shot_id)
+
             if voice_duration > 10.0 and len(scene_images) >= required_images:
                 # 多片段生成模式
-                self._generate_multi_segment_video(current_scene, scene_images, segment_durations)
+                self._generate_multi_segment_video(current_scene, scene_images, segment_durations, regenerate)
             else:
                 # 单片段生成模式
                 audio_hint = current_scene.get('audio_hint')
                 generation_config = self.get_generation_config(image_path, voice_duration if voice_duration > 0 else None, audio_hint)
+                generation_config['regenerate'] = regenerate
 
             # 创建工作线程
             self.current_worker = VideoGenerationWorker(
@@ -3379,7 +3482,7 @@ class VideoGenerationTab(QWidget):
             logger.warning(f"从prompt.json获取音效提示失败: {e}")
             return None
 
-    def _generate_multi_segment_video(self, scene_data, scene_images, segment_durations):
+    def _generate_multi_segment_video(self, scene_data, scene_images, segment_durations, regenerate=False):
         """生成多片段视频"""
         try:
             # 创建多片段生成工作线程
@@ -3388,7 +3491,8 @@ class VideoGenerationTab(QWidget):
                 scene_images,
                 segment_durations,
                 self.project_manager,
-                self.project_manager.current_project_name if self.project_manager else None
+                self.project_manager.current_project_name if self.project_manager else None,
+                regenerate
             )
 
             # 连接信号
@@ -4125,8 +4229,8 @@ class VideoGenerationTab(QWidget):
     def _create_static_video_from_image(self, scene_data, image_path, duration, original_error):
         """从图像创建静态视频"""
         try:
-            import subprocess
             import tempfile
+            from src.utils.ffmpeg_runner import run_ffmpeg_sync
 
             shot_id = scene_data.get('shot_id', 'unknown')
             logger.info(f"为镜头 {shot_id} 创建静态视频，时长: {duration}秒")
@@ -4172,9 +4276,12 @@ class VideoGenerationTab(QWidget):
             logger.info(f"执行FFmpeg命令: {' '.join(cmd)}")
 
             # 执行FFmpeg命令
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+            result = run_ffmpeg_sync(cmd, timeout=60)
 
-            if result.returncode == 0 and os.path.exists(output_path):
+            if result.timed_out:
+                logger.error("静态视频创建超时")
+                self._handle_fallback_failure(scene_data, "视频创建超时")
+            elif result.success and os.path.exists(output_path):
                 logger.info(f"静态视频创建成功: {output_path}")
 
                 # 记录降级信息到项目数据
@@ -4212,13 +4319,10 @@ class VideoGenerationTab(QWidget):
                     QTimer.singleShot(1000, self.process_next_generation)
 
             else:
-                error_msg = result.stderr if result.stderr else "FFmpeg执行失败"
+                error_msg = result.error_message or "FFmpeg执行失败"
                 logger.error(f"静态视频创建失败: {error_msg}")
                 self._handle_fallback_failure(scene_data, f"FFmpeg错误: {error_msg}")
 
-        except subprocess.TimeoutExpired:
-            logger.error("静态视频创建超时")
-            self._handle_fallback_failure(scene_data, "视频创建超时")
         except Exception as e:
             logger.error(f"创建静态视频异常: {e}")
             self._handle_fallback_failure(scene_data, f"创建异常: {e}")
@@ -4375,13 +4479,14 @@ class MultiSegmentVideoWorker(QThread):
     progress_updated = pyqtSignal(int, str)
     video_generated = pyqtSignal(bool, str, str)
 
-    def __init__(self, scene_data, scene_images, segment_durations, project_manager, project_name):
+    def __init__(self, scene_data, scene_images, segment_durations, project_manager, project_name, regenerate=False):
         super().__init__()
         self.scene_data = scene_data
         self.scene_images = scene_images
         self.segment_durations = segment_durations
         self.project_manager = project_manager
         self.project_name = project_name
+        self.regenerate = regenerate  # 重新生成时忽略作业日志中的已有结果
 
     def run(self):
         """运行多片段视频生成（修复Event loop问题）"""
@@ -4455,7 +4560,10 @@ class MultiSegmentVideoWorker(QThread):
                     motion_intensity=0.5,
                     preferred_engines=["cogvideox_flash"],
                     project_manager=self.project_manager,
-                    current_project_name=self.project_name
+                    current_project_name=self.project_name,
+                    shot_id=self.scene_data.get('shot_id') or None,
+                    segment_index=i,
+                    regenerate=self.regenerate
                 )
 
                 if result.success:
@@ -4481,8 +4589,8 @@ class MultiSegmentVideoWorker(QThread):
                 return video_paths[0]
 
             # 使用ffmpeg合并视频
-            import subprocess
             import tempfile
+            from src.utils.ffmpeg_runner import run_ffmpeg_sync
 
             # 创建输出文件路径
             output_dir = os.path.dirname(video_paths[0])
@@ -4501,7 +4609,9 @@ class MultiSegmentVideoWorker(QThread):
                     'ffmpeg', '-f', 'concat', '-safe', '0',
                     '-i', list_file, '-c', 'copy', output_path, '-y'
                 ]
-                subprocess.run(cmd, check=True, capture_output=True)
+                result = run_ffmpeg_sync(cmd)
+                if not result.success:
+                    raise RuntimeError(result.error_message)
 
                 # 删除临时文件
                 os.unlink(list_file)
@@ -4515,7 +4625,7 @@ class MultiSegmentVideoWorker(QThread):
 
                 return output_path
 
-            except subprocess.CalledProcessError as e:
+            except RuntimeError as e:
                 logger.error(f"ffmpeg合并失败: {e}")
                 # 如果合并失败，返回第一个片段
                 return video_paths[0]
@@ -50,19 +50,13 @@ class VoiceGenerationThread(QThread):
     def run(self):
         try:
             total_segments = len(self.text_segments)
-            
+            jobs = []
+
             for i, segment in enumerate(self.text_segments):
-                if self.isInterruptionRequested():
-                    break
-                
-                # 更新进度
-                progress = int((i / total_segments) * 100)
-                self.progress_updated.emit(progress, f"正在生成第 {i+1}/{total_segments} 段配音...")
-                
                 # 生成音频文件名
                 audio_filename = f"segment_{i+1:03d}_{segment.get('shot_id', 'unknown')}.mp3"
                 audio_path = os.path.join(self.output_dir, audio_filename)
-                
+
                 # 🔧 修复：生成配音（优先使用原文，如果没有则使用台词）
                 text_to_generate = segment.get('original_text', segment.get('dialogue_text', segment.get('text', '')))
 
@@ -73,34 +67,52 @@ class VoiceGenerationThread(QThread):
                     self.error_occurred.emit(error_msg)
                     continue
 
-                result = asyncio.run(self.engine_manager.generate_speech(
-                    self.engine_name,
-                    text_to_generate,
-                    audio_path,
-                    **self.settings
-                ))
+                jobs.append({'index': i, 'segment': segment, 'text': text_to_generate, 'output_path': audio_path})
 
+            if not jobs:
+                self.progress_updated.emit(100, "配音生成完成")
+                return
+
+            completed = 0
+            self.progress_updated.emit(0, f"正在生成配音 0/{total_segments}...")
+
+            def on_result(job, result):
+                # 各段并发生成，按完成顺序逐段发出结果
+                nonlocal completed
+                completed += 1
+                i, segment = job['index'], job['segment']
                 if result.get('success'):
                     segment_result = {
                         'segment_index': i,
                         'shot_id': segment.get('shot_id'),
                         'scene_id': segment.get('scene_id'),  # 🔧 修复：添加scene_id信息
-                        'text': text_to_generate,  # 🔧 修复：使用实际生成的文本
-                        'audio_path': audio_path,
-                        'duration': 0,  # 可以后续添加音频时长检测
+                        'text': job['text'],  # 🔧 修复：使用实际生成的文本
+                        'audio_path': job['output_path'],
+                        'duration': result.get('duration', 0),  # 引擎记录的时长，逐词时间保存在音频旁的 .timing.json
                         'status': 'success'
                     }
                     self.results.append(segment_result)
                     self.voice_generated.emit(segment_result)
-                else:
+                elif not result.get('cancelled'):
                     error_msg = result.get('error', '生成失败')
                     full_error_msg = f"第 {i+1} 段生成失败: {error_msg}"
                     logger.error(f"配音生成错误: {full_error_msg}")
                     self.error_occurred.emit(full_error_msg)
-            
+                progress = int(completed / len(jobs) * 100)
+                self.progress_updated.emit(progress, f"正在生成配音 {completed}/{len(jobs)}...")
+
+            # 整批使用同一个事件循环，按引擎并发上限同时合成
+            asyncio.run(self.engine_manager.generate_speech_batch(
+                self.engine_name,
+                jobs,
+                on_result=on_result,
+                should_stop=self.isInterruptionRequested,
+                **self.settings
+            ))
+
             # 完成
             self.progress_updated.emit(100, "配音生成完成")
-            
+
         except Exception as e:
             self.error_occurred.emit(f"配音生成过程中发生错误: {str(e)}")
 
@@ -124,15 +136,9 @@ class SoundEffectGenerationThread(QThread):
             self.downloader = PixabaySoundDownloader(self.output_dir)
 
             total_segments = len(self.sound_segments)
+            cues = []
 
             for i, segment in enumerate(self.sound_segments):
-                if self.isInterruptionRequested():
-                    break
-
-                # 更新进度
-                progress = int((i / total_segments) * 100)
-                self.progress_updated.emit(progress, f"正在生成第 {i+1}/{total_segments} 个音效...")
-
                 # 获取音效描述
                 sound_effect_text = segment.get('sound_effect', '').strip()
                 if not sound_effect_text:
@@ -142,38 +148,48 @@ class SoundEffectGenerationThread(QThread):
                 # 生成音效文件名
                 shot_id = segment.get('shot_id', f'shot_{i+1}')
                 filename = f"{shot_id}_sound_effect.mp3"
+                cues.append({'index': i, 'segment': segment, 'shot_id': shot_id,
+                             'query': sound_effect_text, 'filename': filename})
 
-                try:
-                    # 搜索并下载音效
-                    logger.info(f"开始为镜头 {shot_id} 搜索音效: {sound_effect_text}")
-                    audio_path = self.downloader.search_and_download_shortest(
-                        sound_effect_text,
-                        filename
-                    )
-
-                    if audio_path:
-                        # 🔧 修复：使用original_index而不是循环索引i
-                        original_index = segment.get('original_index', i)
-                        segment_result = {
-                            'segment_index': original_index,  # 使用原始索引
-                            'shot_id': shot_id,
-                            'scene_id': segment.get('scene_id'),  # 🔧 修复：添加scene_id信息
-                            'sound_effect_text': sound_effect_text,
-                            'audio_path': audio_path,
-                            'status': 'success'
-                        }
-                        self.results.append(segment_result)
-                        self.sound_effect_generated.emit(segment_result)
-                        logger.info(f"音效生成成功: scene_id='{segment.get('scene_id')}', shot_id='{shot_id}' (原始索引{original_index}) -> {audio_path}")
-                    else:
-                        error_msg = f"未找到合适的音效: {sound_effect_text}"
-                        logger.error(error_msg)
-                        self.error_occurred.emit(f"第 {i+1} 段音效生成失败: {error_msg}")
+            if not cues:
+                self.progress_updated.emit(100, "音效生成完成")
+                return
 
-                except Exception as e:
-                    error_msg = f"音效生成异常: {str(e)}"
-                    logger.error(f"第 {i+1} 段音效生成失败: {error_msg}")
+            completed = 0
+            self.progress_updated.emit(0, f"正在获取音效 0/{len(cues)}...")
+
+            def on_result(_, cue, audio_path):
+                # 相同描述只获取一次，其余音效并发下载，按完成顺序逐条发出结果
+                nonlocal completed
+                completed += 1
+                i, segment, shot_id = cue['index'], cue['segment'], cue['shot_id']
+                if audio_path:
+                    # 🔧 修复：使用original_index而不是循环索引i
+                    original_index = segment.get('original_index', i)
+                    segment_result = {
+                        'segment_index': original_index,  # 使用原始索引
+                        'shot_id': shot_id,
+                        'scene_id': segment.get('scene_id'),  # 🔧 修复：添加scene_id信息
+                        'sound_effect_text': cue['query'],
+                        'audio_path': audio_path,
+                        'status': 'success'
+                    }
+                    self.results.append(segment_result)
+                    self.sound_effect_generated.emit(segment_result)
+                    logger.info(f"音效生成成功: scene_id='{segment.get('scene_id')}', shot_id='{shot_id}' (原始索引{original_index}) -> {audio_path}")
+                elif not self.isInterruptionRequested():
+                    error_msg = f"未找到合适的音效: {cue['query']}"
+                    logger.error(error_msg)
                     self.error_occurred.emit(f"第 {i+1} 段音效生成失败: {error_msg}")
+                progress = int(completed / len(cues) * 100)
+                self.progress_updated.emit(progress, f"正在获取音效 {completed}/{len(cues)}...")
+
+            logger.info(f"开始批量获取音效: {len(cues)}/{total_segments} 个镜头")
+            self.downloader.search_and_download_batch(
+                cues,
+                on_result=on_result,
+                should_stop=self.isInterruptionRequested
+            )
 
             # 完成
             self.progress_updated.emit(100, "音效生成完成")
@@ -3417,6 +3433,8 @@ class VoiceGenerationTab(QWidget):
             # 更新段落状态
             self.voice_segments[target_segment_index]['status'] = '已生成'
             self.voice_segments[target_segment_index]['audio_path'] = audio_path
+            if result.get('duration'):
+                self.voice_segments[target_segment_index]['duration'] = result['duration']
 
             # 更新表格显示（状态列现在是第4列，索引为4）
             status_item = QTableWidgetItem('已生成')
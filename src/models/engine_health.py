@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+引擎健康监控
+为图像/视频生成引擎维护滚动的延迟与错误率窗口，并提供熔断器（关闭/打开/半开），
+供引擎管理器在选择引擎时做 O(1) 查询和立即故障转移
+"""
+
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Optional, Any, List
+
+from src.utils.logger import logger
+
+
+class CircuitState(Enum):
+    """熔断器状态"""
+    CLOSED = "closed"  # 正常
+    OPEN = "open"  # 熔断中，拒绝请求
+    HALF_OPEN = "half_open"  # 冷却结束，允许少量探测请求
+
+
+@dataclass
+class HealthConfig:
+    """健康监控配置"""
+    window_size: int = 50  # 滚动窗口样本数
+    window_seconds: float = 600.0  # 样本有效期（秒）
+    failure_threshold: int = 3  # 连续失败次数达到后熔断
+    error_rate_threshold: float = 0.5  # 窗口错误率达到后熔断
+    min_samples: int = 6  # 计算错误率所需的最少样本数
+    open_timeout: float = 60.0  # 熔断持续时间（秒）
+    max_open_timeout: float = 600.0  # 多次熔断后的最大冷却时间
+    half_open_max_calls: int = 1  # 半开状态允许的并发探测数
+
+
+class EngineHealth:
+    """单个引擎的健康状态"""
+
+    def __init__(self, name: str, config: HealthConfig):
+        self.name = name
+        self.config = config
+        self.samples = deque(maxlen=config.window_size)  # (timestamp, success, latency)
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_timeout = config.open_timeout
+        self.in_flight = 0
+        self.half_open_calls = 0
+        self.last_error = ""
+
+        # 缓存的统计值，由后台线程或记录时刷新，选择引擎时直接读取
+        self.p50 = 0.0
+        self.p95 = 0.0
+        self.error_rate = 0.0
+
+    def refresh(self, now: float):
+        """刷新窗口统计并处理熔断器超时"""
+        cutoff = now - self.config.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+        latencies = sorted(s[2] for s in self.samples if s[1])
+        if latencies:
+            self.p50 = latencies[int(0.5 * (len(latencies) - 1))]
+            self.p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        else:
+            self.p50 = self.p95 = 0.0
+
+        if self.samples:
+            failures = sum(1 for s in self.samples if not s[1])
+            self.error_rate = failures / len(self.samples)
+        else:
+            self.error_rate = 0.0
+
+        if self.state == CircuitState.OPEN and now - self.opened_at >= self.open_timeout:
+            self.state = CircuitState.HALF_OPEN
+            self.half_open_calls = 0
+            logger.info(f"引擎 {self.name} 熔断冷却结束，进入半开状态")
+
+    def is_available(self) -> bool:
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.HALF_OPEN:
+            return self.half_open_calls < self.config.half_open_max_calls
+        return time.time() - self.opened_at >= self.open_timeout
+
+    def trip(self, now: float):
+        """打开熔断器，重复熔断时冷却时间翻倍"""
+        if self.state == CircuitState.HALF_OPEN:
+            self.open_timeout = min(self.open_timeout * 2, self.config.max_open_timeout)
+        self.state = CircuitState.OPEN
+        self.opened_at = now
+        self.half_open_calls = 0
+        logger.warning(f"引擎 {self.name} 熔断器打开，{self.open_timeout:.0f} 秒内不再使用。最后错误: {self.last_error}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'state': self.state.value,
+            'p50_latency': round(self.p50, 2),
+            'p95_latency': round(self.p95, 2),
+            'error_rate': round(self.error_rate, 3),
+            'samples': len(self.samples),
+            'in_flight': self.in_flight,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'open_timeout': self.open_timeout
+        }
+
+
+class EngineHealthMonitor:
+    """引擎健康监控器（线程安全，可在多个事件循环中共享）"""
+
+    def __init__(self, config: Optional[HealthConfig] = None, refresh_interval: float = 5.0):
+        self.config = config or HealthConfig()
+        self.refresh_interval = refresh_interval
+        self._engines: Dict[str, EngineHealth] = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._monitor_thread: Optional[threading.Thread] = None
+
+    def _get(self, name: str) -> EngineHealth:
+        health = self._engines.get(name)
+        if health is None:
+            health = EngineHealth(name, self.config)
+            self._engines[name] = health
+        return health
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._monitor_thread and self._monitor_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True,
+                                                name="EngineHealthMonitor")
+        self._monitor_thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop_event.set()
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                now = time.time()
+                with self._lock:
+                    for health in self._engines.values():
+                        health.refresh(now)
+            except Exception as e:
+                logger.error(f"引擎健康监控刷新失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 查询（O(1)）
+    # ------------------------------------------------------------------
+
+    def is_available(self, name: str) -> bool:
+        """熔断器是否允许向该引擎发送请求（不占用探测名额）"""
+        with self._lock:
+            return self._get(name).is_available()
+
+    def get_state(self, name: str) -> CircuitState:
+        with self._lock:
+            health = self._get(name)
+            health.refresh(time.time())
+            return health.state
+
+    def get_latency(self, name: str, percentile: int = 50) -> Optional[float]:
+        """获取p50/p95延迟，无样本时返回None"""
+        with self._lock:
+            health = self._engines.get(name)
+            if not health or not health.samples:
+                return None
+            return health.p95 if percentile >= 95 else health.p50
+
+    def get_in_flight(self, name: str) -> int:
+        with self._lock:
+            health = self._engines.get(name)
+            return health.in_flight if health else 0
+
+    def get_retry_after(self, name: str) -> float:
+        """距离熔断器允许下一次（探测）请求还需等待的秒数，0 表示现在即可发送"""
+        with self._lock:
+            health = self._get(name)
+            health.refresh(time.time())
+            if health.state == CircuitState.OPEN:
+                return max(0.0, health.opened_at + health.open_timeout - time.time())
+            if health.state == CircuitState.HALF_OPEN and not health.is_available():
+                # 探测请求进行中，结果出来前短暂轮询
+                return 1.0
+            return 0.0
+
+    def filter_available(self, names: List[str]) -> List[str]:
+        """过滤出熔断器允许的引擎，保持原有顺序"""
+        with self._lock:
+            return [name for name in names if self._get(name).is_available()]
+
+    # ------------------------------------------------------------------
+    # 请求生命周期
+    # ------------------------------------------------------------------
+
+    def acquire(self, name: str) -> bool:
+        """开始一次请求；熔断器打开或半开探测名额已满时返回False"""
+        with self._lock:
+            health = self._get(name)
+            health.refresh(time.time())
+            if health.state == CircuitState.OPEN:
+                return False
+            if health.state == CircuitState.HALF_OPEN:
+                if health.half_open_calls >= self.config.half_open_max_calls:
+                    return False
+                health.half_open_calls += 1
+            health.in_flight += 1
+            return True
+
+    def record_success(self, name: str, latency: float):
+        """记录一次成功请求"""
+        with self._lock:
+            now = time.time()
+            health = self._get(name)
+            health.in_flight = max(0, health.in_flight - 1)
+            health.samples.append((now, True, latency))
+            health.consecutive_failures = 0
+            if health.state != CircuitState.CLOSED:
+                logger.info(f"引擎 {name} 探测成功，熔断器关闭")
+                health.state = CircuitState.CLOSED
+                health.open_timeout = self.config.open_timeout
+                health.half_open_calls = 0
+            health.refresh(now)
+
+    def record_failure(self, name: str, latency: float = 0.0, error: str = ""):
+        """记录一次失败请求，必要时打开熔断器"""
+        with self._lock:
+            now = time.time()
+            health = self._get(name)
+            health.in_flight = max(0, health.in_flight - 1)
+            health.samples.append((now, False, latency))
+            health.consecutive_failures += 1
+            health.last_error = error
+            health.refresh(now)
+
+            if health.state == CircuitState.HALF_OPEN:
+                health.trip(now)
+            elif health.state == CircuitState.CLOSED and (
+                    health.consecutive_failures >= self.config.failure_threshold or
+                    (len(health.samples) >= self.config.min_samples and
+                     health.error_rate >= self.config.error_rate_threshold)):
+                health.trip(now)
+
+    def open_circuit(self, name: str, error: str = ""):
+        """直接打开熔断器（如引擎初始化失败）"""
+        with self._lock:
+            now = time.time()
+            health = self._get(name)
+            health.samples.append((now, False, 0.0))
+            health.consecutive_failures += 1
+            health.last_error = error
+            health.refresh(now)
+            health.trip(now)
+
+    def release(self, name: str):
+        """请求被取消时释放占用，不计入统计"""
+        with self._lock:
+            health = self._get(name)
+            health.in_flight = max(0, health.in_flight - 1)
+            if health.state == CircuitState.HALF_OPEN:
+                health.half_open_calls = max(0, health.half_open_calls - 1)
+
+    def reset(self, name: Optional[str] = None):
+        """重置熔断器（例如用户修改了API密钥）"""
+        with self._lock:
+            if name:
+                self._engines.pop(name, None)
+            else:
+                self._engines.clear()
+
+    def get_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有引擎的健康快照"""
+        with self._lock:
+            return {name: health.to_dict() for name, health in self._engines.items()}
+
+
+# 图像与视频引擎各自的全局监控器
+image_engine_health = EngineHealthMonitor()
+video_engine_health = EngineHealthMonitor(HealthConfig(failure_threshold=2, open_timeout=120.0))
+
+
+def get_engine_health_monitor(kind: str = 'image') -> EngineHealthMonitor:
+    """获取引擎健康监控器（kind: 'image' 或 'video'），并确保后台线程已启动"""
+    monitor = video_engine_health if kind == 'video' else image_engine_health
+    monitor.start()
+    return monitor
@@ -5,6 +5,7 @@
 """
 
 import asyncio
+import os
 import time
 from typing import List, Dict, Optional, Callable, Tuple
 from dataclasses import dataclass
@@ -14,7 +15,9 @@ from .image_engine_base import (
     GenerationConfig, GenerationResult
 )
 from .image_engine_factory import get_engine_factory
+from .engine_health import CircuitState, get_engine_health_monitor
 from src.utils.logger import logger
+from src.utils.generated_image_store import generated_image_store
 
 
 class RoutingStrategy(Enum):
@@ -57,6 +60,12 @@ class ImageEngineManager:
         # 性能统计
         self.performance_stats: Dict[EngineType, Dict] = {}
         
+        # 引擎健康监控（滚动延迟/错误率窗口与熔断器）
+        self.health_monitor = get_engine_health_monitor('image')
+        
+        # 生成图像内容寻址存储（相同配置直接复用，不再调用引擎）
+        self.image_store = generated_image_store
+        
         # 设置默认引擎偏好
         self._setup_default_preferences()
     
@@ -108,44 +117,122 @@ class ImageEngineManager:
         self._active_tasks += 1
         
         try:
-            # 选择最佳引擎
-            engine = await self._select_best_engine(config, preferred_engines)
-            if not engine:
+            # 按路由策略排序候选引擎（已熔断的引擎不参与）
+            engines = self._rank_engines(config, preferred_engines)
+            if not engines:
                 return GenerationResult(
                     success=False, 
                     error_message="没有可用的图像生成引擎"
                 )
             
-            # 执行生成（带重试机制）
-            result = await self._generate_with_retry(engine, config, progress_callback, project_manager, current_project_name)
+            # 先在图像存储中精确查找，命中则不调用引擎
+            # 随机种子的生成每次都应得到新图像，不读写存储
+            force_regenerate = config.custom_params.get('force_regenerate', False)
+            cacheable = self.image_store.is_cacheable(config)
+            if cacheable and not force_regenerate:
+                # 结果按实际生成的引擎写入存储，故障切换或负载均衡重排后不一定是首选引擎，逐个候选引擎查找
+                for engine in engines:
+                    store_key = self.image_store.make_key(engine.engine_type.value, config)
+                    cached_result = self._load_from_image_store(engine, config, store_key,
+                                                                project_manager, current_project_name)
+                    if cached_result:
+                        if progress_callback:
+                            progress_callback("命中图像存储，复用已生成图像")
+                        return cached_result
             
-            # 更新性能统计
-            generation_time = time.time() - start_time
-            self._update_performance_stats(engine.engine_type, result.success, generation_time)
+            # 依次尝试候选引擎，某个引擎熔断或重试耗尽后立即切换到下一个
+            last_error = ""
+            for engine in engines:
+                engine_start = time.time()
+                result = await self._generate_with_retry(engine, config, progress_callback, project_manager, current_project_name)
+                
+                # 更新性能统计
+                self._update_performance_stats(engine.engine_type, result.success, time.time() - engine_start)
+                
+                if result.success:
+                    # 写入图像存储
+                    if cacheable and result.image_paths:
+                        store_key = self.image_store.make_key(engine.engine_type.value, config)
+                        self.image_store.put(store_key, result.image_paths, {
+                            'engine': engine.engine_type.value,
+                            'prompt': config.prompt[:200]
+                        })
+                    return result
+                
+                last_error = result.error_message
+                logger.warning(f"引擎 {engine.engine_type.value} 不可用，切换到下一个引擎")
             
-            return result
+            return GenerationResult(
+                success=False,
+                error_message=f"所有可用引擎均生成失败，耗时 {time.time() - start_time:.1f} 秒。最后错误: {last_error}"
+            )
             
         finally:
             self._active_tasks -= 1
     
+    def _load_from_image_store(self, engine: ImageGenerationEngine, config: GenerationConfig, store_key: str,
+                               project_manager=None, current_project_name=None) -> Optional[GenerationResult]:
+        """从图像存储中加载结果并链接到引擎的输出目录"""
+        try:
+            store_paths = self.image_store.lookup(store_key)
+            if not store_paths:
+                return None
+            
+            if hasattr(engine, '_get_output_dir'):
+                output_dir = engine._get_output_dir(project_manager, current_project_name)
+            else:
+                output_dir = getattr(engine, 'output_dir', None) or 'temp/image_cache'
+            
+            # 与引擎保持一致的命名方式：{引擎}_{workflow_id}
+            workflow_id = config.custom_params.get('workflow_id')
+            filenames = None
+            if workflow_id:
+                safe_workflow_id = str(workflow_id).replace('-', '_').replace(':', '_')
+                filenames = []
+                for i, store_path in enumerate(store_paths):
+                    ext = os.path.splitext(store_path)[1]
+                    suffix = f"_{i}" if i > 0 else ""
+                    filenames.append(f"{engine.engine_type.value}_{safe_workflow_id}{suffix}{ext}")
+            
+            image_paths = self.image_store.materialize(store_paths, output_dir, filenames)
+            logger.info(f"图像存储命中 ({engine.engine_type.value}): {image_paths}")
+            
+            return GenerationResult(
+                success=True,
+                image_paths=image_paths,
+                generation_time=0.0,
+                cost=0.0,
+                engine_type=engine.engine_type,
+                metadata={'cached': True, 'store_key': store_key}
+            )
+        except Exception as e:
+            logger.warning(f"读取图像存储失败，回退到引擎生成: {e}")
+            return None
+    
     async def _select_best_engine(self, config: GenerationConfig, 
                                  preferred_engines: Optional[List[EngineType]] = None) -> Optional[ImageGenerationEngine]:
         """选择最佳引擎"""
+        engines = self._rank_engines(config, preferred_engines)
+        return engines[0] if engines else None
+    
+    def _rank_engines(self, config: GenerationConfig,
+                      preferred_engines: Optional[List[EngineType]] = None) -> List[ImageGenerationEngine]:
+        """按路由策略对可用引擎排序，作为故障转移顺序"""
         available_engines = self._get_available_engines(preferred_engines)
         
         if not available_engines:
-            return None
+            return []
         
         if self.routing_strategy == RoutingStrategy.PRIORITY:
-            return self._select_by_priority(available_engines)
+            return self._sort_by_priority(available_engines)
         elif self.routing_strategy == RoutingStrategy.FASTEST:
-            return self._select_fastest(available_engines)
+            return self._sort_fastest(available_engines)
         elif self.routing_strategy == RoutingStrategy.CHEAPEST:
-            return self._select_cheapest(available_engines, config)
+            return self._sort_cheapest(available_engines, config)
         elif self.routing_strategy == RoutingStrategy.LOAD_BALANCE:
-            return self._select_load_balanced(available_engines)
+            return self._sort_load_balanced(available_engines)
         else:
-            return available_engines[0] if available_engines else None
+            return available_engines
     
     def _get_available_engines(self, preferred_engines: Optional[List[EngineType]] = None) -> List[ImageGenerationEngine]:
         """获取可用引擎列表"""
@@ -156,60 +243,66 @@ class ImageEngineManager:
         
         for engine_type in engine_types:
             engine = self.factory.get_engine(engine_type)
-            if engine and engine.status in [EngineStatus.IDLE, EngineStatus.BUSY]:
-                available.append(engine)
+            if not engine or engine.status not in [EngineStatus.IDLE, EngineStatus.BUSY]:
+                continue
+            # 熔断器打开的引擎直接跳过
+            if not self.health_monitor.is_available(engine_type.value):
+                logger.debug(f"引擎 {engine_type.value} 熔断中，跳过")
+                continue
+            available.append(engine)
         
         return available
     
+    def _sort_by_priority(self, engines: List[ImageGenerationEngine]) -> List[ImageGenerationEngine]:
+        """按优先级排序"""
+        priority_map = {pref.engine_type: pref.priority for pref in self.engine_preferences}
+        return sorted(engines, key=lambda e: priority_map.get(e.engine_type, 999))
+    
+    def _sort_fastest(self, engines: List[ImageGenerationEngine]) -> List[ImageGenerationEngine]:
+        """按实测p50延迟排序，没有样本的引擎退回到平均生成时间"""
+        def latency(engine: ImageGenerationEngine) -> float:
+            p50 = self.health_monitor.get_latency(engine.engine_type.value, 50)
+            if p50 is not None:
+                return p50
+            stats = self.performance_stats.get(engine.engine_type, {})
+            return stats.get('avg_generation_time') or float('inf')
+        
+        return sorted(engines, key=latency)
+    
+    def _sort_cheapest(self, engines: List[ImageGenerationEngine], config: GenerationConfig) -> List[ImageGenerationEngine]:
+        """按估算成本排序"""
+        return sorted(engines, key=lambda e: e.get_engine_info().cost_per_image * config.batch_size)
+    
+    def _sort_load_balanced(self, engines: List[ImageGenerationEngine]) -> List[ImageGenerationEngine]:
+        """负载均衡：按 (进行中请求数+1) × p95延迟 估算排队时间，再按最近使用时间排序"""
+        def load(engine: ImageGenerationEngine) -> Tuple[float, float]:
+            name = engine.engine_type.value
+            p95 = self.health_monitor.get_latency(name, 95) or 0.0
+            in_flight = self.health_monitor.get_in_flight(name)
+            last_used = self.performance_stats.get(engine.engine_type, {}).get('last_used', 0)
+            return ((in_flight + 1) * p95, last_used)
+        
+        return sorted(engines, key=load)
+    
     def _select_by_priority(self, engines: List[ImageGenerationEngine]) -> Optional[ImageGenerationEngine]:
         """按优先级选择引擎"""
-        # 按优先级排序
-        priority_map = {pref.engine_type: pref.priority for pref in self.engine_preferences}
-        engines.sort(key=lambda e: priority_map.get(e.engine_type, 999))
+        engines = self._sort_by_priority(engines)
         return engines[0] if engines else None
     
     def _select_fastest(self, engines: List[ImageGenerationEngine]) -> Optional[ImageGenerationEngine]:
         """选择最快的引擎"""
-        fastest_engine = None
-        fastest_time = float('inf')
-        
-        for engine in engines:
-            stats = self.performance_stats.get(engine.engine_type, {})
-            avg_time = stats.get('avg_generation_time', float('inf'))
-            if avg_time < fastest_time:
-                fastest_time = avg_time
-                fastest_engine = engine
-        
-        return fastest_engine or engines[0]
+        engines = self._sort_fastest(engines)
+        return engines[0] if engines else None
     
     def _select_cheapest(self, engines: List[ImageGenerationEngine], config: GenerationConfig) -> Optional[ImageGenerationEngine]:
         """选择最便宜的引擎"""
-        cheapest_engine = None
-        lowest_cost = float('inf')
-        
-        for engine in engines:
-            engine_info = engine.get_engine_info()
-            estimated_cost = engine_info.cost_per_image * config.batch_size
-            if estimated_cost < lowest_cost:
-                lowest_cost = estimated_cost
-                cheapest_engine = engine
-        
-        return cheapest_engine or engines[0]
+        engines = self._sort_cheapest(engines, config)
+        return engines[0] if engines else None
     
     def _select_load_balanced(self, engines: List[ImageGenerationEngine]) -> Optional[ImageGenerationEngine]:
         """负载均衡选择"""
-        # 选择最近使用最少的引擎
-        least_used_engine = None
-        earliest_time = float('inf')
-        
-        for engine in engines:
-            stats = self.performance_stats.get(engine.engine_type, {})
-            last_used = stats.get('last_used', 0)
-            if last_used < earliest_time:
-                earliest_time = last_used
-                least_used_engine = engine
-        
-        return least_used_engine or engines[0]
+        engines = self._sort_load_balanced(engines)
+        return engines[0] if engines else None
     
     async def _generate_with_retry(self, engine: ImageGenerationEngine, 
                                   config: GenerationConfig,
@@ -222,29 +315,51 @@ class ImageEngineManager:
         
         last_error = ""
         
+        engine_name = engine.engine_type.value
+        
+        # 熔断器按逻辑请求计数：同一请求的多次重试只记一次成功或失败，
+        # 避免一个有问题的提示词连续重试就让整个批次的引擎熔断
+        if not self.health_monitor.acquire(engine_name):
+            logger.warning(f"引擎 {engine_name} 熔断器已打开，跳过")
+            return GenerationResult(
+                success=False,
+                error_message=f"引擎 {engine_name} 熔断中"
+            )
+
+        request_start = time.time()
         for attempt in range(max_retries + 1):
+            # 其他请求已让熔断器打开时不再重试，交给调用方立即切换
+            if attempt > 0 and self.health_monitor.get_state(engine_name) == CircuitState.OPEN:
+                logger.warning(f"引擎 {engine_name} 熔断器已打开，停止重试")
+                break
+
             try:
                 if progress_callback:
                     progress_callback(f"尝试生成图像 (第 {attempt + 1} 次)...")
                 
-                # 传递项目信息给引擎的generate方法
+                # 传递项目信息给引擎的生成方法
                 result = await engine.generate(config, progress_callback, project_manager, current_project_name)
                 
                 if result.success:
+                    self.health_monitor.record_success(engine_name, time.time() - request_start)
                     return result
                 else:
                     last_error = result.error_message
-                    logger.warning(f"引擎 {engine.engine_type.value} 生成失败 (第 {attempt + 1} 次): {last_error}")
+                    logger.warning(f"引擎 {engine_name} 生成失败 (第 {attempt + 1} 次): {last_error}")
                     
+            except asyncio.CancelledError:
+                self.health_monitor.release(engine_name)
+                raise
             except Exception as e:
                 last_error = str(e)
-                logger.error(f"引擎 {engine.engine_type.value} 生成异常 (第 {attempt + 1} 次): {e}")
+                logger.error(f"引擎 {engine_name} 生成异常 (第 {attempt + 1} 次): {e}")
             
             # 如果不是最后一次尝试，等待后重试
             if attempt < max_retries:
                 await asyncio.sleep(retry_delay)
                 retry_delay *= backoff_factor
         
+        self.health_monitor.record_failure(engine_name, time.time() - request_start, last_error)
         return GenerationResult(
             success=False,
             error_message=f"生成失败，已重试 {max_retries} 次。最后错误: {last_error}"
@@ -318,6 +433,7 @@ class ImageEngineManager:
             'concurrent_limit': self.concurrent_limit,
             'available_engines': len(self._get_available_engines()),
             'performance_stats': self.performance_stats,
+            'engine_health': self.health_monitor.get_snapshot(),
             'engine_preferences': [
                 {
                     'engine_type': pref.engine_type.value,
@@ -14,11 +14,32 @@ from ..video_engine_base import (
     VideoGenerationEngine, VideoEngineType, VideoEngineStatus, 
     VideoGenerationConfig, VideoGenerationResult, VideoEngineInfo, ConfigConverter
 )
+from ..task_status_poller import (
+    get_task_status_poller, PollingProvider, RemoteTaskStatus, TaskQueryError,
+    TASK_PENDING, TASK_SUCCEEDED, TASK_FAILED
+)
+from ..image_payload_cache import (
+    get_image_payload_cache, find_closest_resolution, ImagePayloadSpec
+)
 from src.utils.logger import logger
 
 
 class CogVideoXEngine(VideoGenerationEngine):
     """CogVideoX-Flash 引擎实现"""
+
+    POLLING_PROVIDER = "zhipu_cogvideox"
+
+    # 官方支持的完整分辨率列表
+    SUPPORTED_RESOLUTIONS = [
+        (720, 480),     # 标准清晰度
+        (1024, 1024),   # 正方形
+        (1280, 960),    # 4:3 横屏
+        (960, 1280),    # 3:4 竖屏
+        (1920, 1080),   # Full HD 横屏
+        (1080, 1920),   # Full HD 竖屏
+        (2048, 1080),   # 超宽屏
+        (3840, 2160),   # 4K
+    ]
     
     def __init__(self, config: Optional[Dict] = None):
         super().__init__(VideoEngineType.COGVIDEOX_FLASH)
@@ -121,6 +142,7 @@ class CogVideoXEngine(VideoGenerationEngine):
             # 测试连接
             if await self.test_connection():
                 self.status = VideoEngineStatus.IDLE
+                self._register_polling_provider()
                 logger.info("CogVideoX-Flash引擎初始化成功")
                 return True
             else:
@@ -347,14 +369,19 @@ class CogVideoXEngine(VideoGenerationEngine):
             if progress_callback:
                 progress_callback("开始CogVideoX-Flash视频生成...")
 
-            # 准备请求数据
-            request_data = self._prepare_request_data(config)
+            # 准备请求数据（输入图像在进程池中缩放编码，并按内容缓存，重试时直接复用）
+            image_url = None
+            if config.input_image_path and os.path.exists(config.input_image_path):
+                image_url = await get_image_payload_cache().prepare(
+                    config.input_image_path, self._get_image_payload_spec(config))
+            request_data = self._prepare_request_data(config, image_url)
             
             if progress_callback:
                 progress_callback("发送视频生成请求...")
             
             # 发送异步生成请求
             task_id = await self._submit_generation_task(request_data)
+            self._record_remote_task(config, self.POLLING_PROVIDER, task_id)
             
             if progress_callback:
                 progress_callback("等待视频生成完成...")
@@ -367,6 +394,7 @@ class CogVideoXEngine(VideoGenerationEngine):
             
             # 下载视频文件
             video_path = await self._download_video(video_url, config)
+            get_task_status_poller().forget_task(self.POLLING_PROVIDER, task_id)
             
             # 获取视频信息
             video_info = await self._get_video_info(video_path)
@@ -394,6 +422,7 @@ class CogVideoXEngine(VideoGenerationEngine):
                 resolution=video_info.get('resolution', (config.width, config.height)),
                 file_size=video_info.get('file_size', 0),
                 metadata={
+                    'task_id': task_id,
                     'model': self.model,
                     'prompt': config.input_prompt,
                     'input_image': config.input_image_path,
@@ -449,7 +478,61 @@ class CogVideoXEngine(VideoGenerationEngine):
                 engine_type=self.engine_type
             )
 
-    def _prepare_request_data(self, config: VideoGenerationConfig) -> Dict:
+    async def resume_task(self, task_id: str, config: VideoGenerationConfig,
+                          progress_callback: Optional[Callable] = None,
+                          project_manager=None, current_project_name=None) -> VideoGenerationResult:
+        """恢复重启前提交的任务：继续轮询并下载结果"""
+        if project_manager and current_project_name:
+            self.project_manager = project_manager
+            self.current_project_name = current_project_name
+            self.output_dir = self._get_output_dir()
+
+        start_time = time.time()
+        try:
+            await self._ensure_session_valid()
+            if progress_callback:
+                progress_callback(f"恢复CogVideoX-Flash任务 {task_id}...")
+
+            video_url = await self._poll_task_status(task_id, progress_callback)
+            video_path = await self._download_video(video_url, config)
+            get_task_status_poller().forget_task(self.POLLING_PROVIDER, task_id)
+            video_info = await self._get_video_info(video_path)
+            self.success_count += 1
+
+            return VideoGenerationResult(
+                success=True,
+                video_path=video_path,
+                generation_time=time.time() - start_time,
+                engine_type=self.engine_type,
+                duration=video_info.get('duration', config.duration),
+                fps=video_info.get('fps', config.fps),
+                resolution=video_info.get('resolution', (config.width, config.height)),
+                file_size=video_info.get('file_size', 0),
+                metadata={'task_id': task_id, 'model': self.model, 'resumed': True}
+            )
+
+        except Exception as e:
+            logger.error(f"恢复CogVideoX-Flash任务 {task_id} 失败: {e}")
+            return VideoGenerationResult(
+                success=False,
+                error_message=f"恢复CogVideoX-Flash任务失败: {e}",
+                generation_time=time.time() - start_time,
+                engine_type=self.engine_type
+            )
+
+    def _resolve_size(self, config: VideoGenerationConfig) -> tuple:
+        """将请求的分辨率映射为API支持的分辨率"""
+        resolution = (config.width, config.height)
+        if resolution in self.SUPPORTED_RESOLUTIONS:
+            return resolution
+        return self._find_closest_resolution(config.width, config.height, self.SUPPORTED_RESOLUTIONS)
+
+    def _get_image_payload_spec(self, config: VideoGenerationConfig) -> ImagePayloadSpec:
+        """输入图像缩放到不超过输出分辨率即可，更大的图像只会增加上传体积"""
+        target_size = self._resolve_size(config) if config.width and config.height else None
+        return ImagePayloadSpec(engine=self.engine_type.value, target_size=target_size, quality=92)
+
+    def _prepare_request_data(self, config: VideoGenerationConfig, image_url: Optional[str] = None) -> Dict:
         """准备请求数据"""
         # 构建完整的prompt，包含音效提示
         full_prompt = config.input_prompt
@@ -469,7 +552,7 @@ class CogVideoXEngine(VideoGenerationEngine):
 
         if is_image_to_video:
             # 图生视频模式 - 将图像转换为base64格式
-            image_base64 = self._encode_image_to_base64(config.input_image_path)
+            image_base64 = image_url or self._encode_image_to_base64(config.input_image_path, config)
             if image_base64:
                 request_data["image_url"] = image_base64
             else:
@@ -494,21 +577,9 @@ class CogVideoXEngine(VideoGenerationEngine):
             resolution = (config.width, config.height)
             logger.info(f"CogVideoX引擎接收到分辨率配置: {config.width}x{config.height}")
 
-            supported_resolutions = [
-                # 官方支持的完整分辨率列表
-                (720, 480),     # 标准清晰度
-                (1024, 1024),   # 正方形
-                (1280, 960),    # 4:3 横屏
-                (960, 1280),    # 3:4 竖屏
-                (1920, 1080),   # Full HD 横屏
-                (1080, 1920),   # Full HD 竖屏
-                (2048, 1080),   # 超宽屏
-                (3840, 2160),   # 4K
-            ]
-
-            if resolution not in supported_resolutions:
+            if resolution not in self.SUPPORTED_RESOLUTIONS:
                 # 找到最接近的支持分辨率
-                closest_resolution = self._find_closest_resolution(config.width, config.height, supported_resolutions)
+                closest_resolution = self._resolve_size(config)
                 logger.warning(f"分辨率 {config.width}x{config.height} 不被支持，使用最接近的分辨率 {closest_resolution[0]}x{closest_resolution[1]}")
                 request_data["size"] = f"{closest_resolution[0]}x{closest_resolution[1]}"
             else:
@@ -529,71 +600,13 @@ class CogVideoXEngine(VideoGenerationEngine):
 
     def _find_closest_resolution(self, width, height, supported_resolutions):
         """找到最接近的支持分辨率，优先保持宽高比"""
-        target_ratio = width / height
-
-        # 首先按照图像方向分类
-        if target_ratio > 1.2:
-            # 横屏图像 (宽 > 高)
-            candidate_resolutions = [(w, h) for w, h in supported_resolutions if w > h]
-        elif target_ratio < 0.8:
-            # 竖屏图像 (高 > 宽)
-            candidate_resolutions = [(w, h) for w, h in supported_resolutions if h > w]
-        else:
-            # 接近正方形的图像
-            candidate_resolutions = [(w, h) for w, h in supported_resolutions if 0.8 <= w/h <= 1.2]
-
-        # 如果没有找到同方向的分辨率，使用所有分辨率
-        if not candidate_resolutions:
-            candidate_resolutions = supported_resolutions
+        return find_closest_resolution(width, height, supported_resolutions)
 
-        # 在候选分辨率中找到最佳匹配
-        best_resolution = candidate_resolutions[0]
-        best_score = float('inf')
-
-        for res_width, res_height in candidate_resolutions:
-            res_ratio = res_width / res_height
-
-            # 计算比例差异（权重最高）
-            ratio_diff = abs(target_ratio - res_ratio) / max(target_ratio, res_ratio)
-
-            # 计算面积差异
-            target_area = width * height
-            res_area = res_width * res_height
-            area_diff = abs(target_area - res_area) / max(target_area, res_area)
-
-            # 综合评分（比例权重0.8，面积权重0.2）
-            score = ratio_diff * 0.8 + area_diff * 0.2
-
-            if score < best_score:
-                best_score = score
-                best_resolution = (res_width, res_height)
-
-        return best_resolution
-
-    def _encode_image_to_base64(self, image_path):
-        """将图像文件编码为base64格式"""
+    def _encode_image_to_base64(self, image_path, config: Optional[VideoGenerationConfig] = None):
+        """将图像文件编码为base64格式（同步路径，结果与异步路径共享缓存）"""
         try:
-            import base64
-            from PIL import Image
-            import io
-
-            # 读取并处理图像
-            with Image.open(image_path) as img:
-                # 转换为RGB格式（如果需要）
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                # 将图像保存到内存中的字节流
-                img_buffer = io.BytesIO()
-                img.save(img_buffer, format='JPEG', quality=95)
-                img_buffer.seek(0)
-
-                # 编码为base64
-                img_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
-
-                # 返回data URL格式
-                return f"data:image/jpeg;base64,{img_base64}"
-
+            spec = self._get_image_payload_spec(config or VideoGenerationConfig())
+            return get_image_payload_cache().prepare_sync(image_path, spec)
         except Exception as e:
             logger.error(f"图像base64编码失败: {e}")
             return None
@@ -630,146 +643,55 @@ class CogVideoXEngine(VideoGenerationEngine):
             logger.error(f"提交生成任务失败: {e}")
             raise
 
-    async def _poll_task_status(self, task_id: str, progress_callback: Optional[Callable] = None) -> str:
-        """轮询任务状态"""
-        if not self.session:
-            raise Exception("HTTP会话未初始化")
-
+    def _register_polling_provider(self):
+        """向共享轮询器注册智谱任务查询（应用重启后会恢复未完成的任务）"""
+        get_task_status_poller().register_provider(PollingProvider(
+            name=self.POLLING_PROVIDER,
+            query_one=self._query_task_status,
+            headers={
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json'
+            },
+            min_interval=5.0,
+            max_interval=30.0,
+            typical_duration=120.0,
+            max_wait=1800.0,
+            max_parallel_queries=3
+        ))
+
+    async def _query_task_status(self, session: aiohttp.ClientSession, task_id: str) -> RemoteTaskStatus:
+        """查询单个任务状态（由共享轮询器在其事件循环中调用）"""
         url = f"{self.base_url}/async-result/{task_id}"
-        max_wait_time = 1800  # 增加到30分钟最大等待时间
-        poll_interval = 15  # 增加到15秒轮询间隔，进一步减少服务器压力
-        start_time = time.time()
-        consecutive_errors = 0  # 连续错误计数
-        max_consecutive_errors = 8  # 增加最大连续错误次数
-        backoff_multiplier = 1.5  # 退避乘数
-
-        while time.time() - start_time < max_wait_time:
-            try:
-                # 🔧 修复：检查事件循环状态，避免在已关闭的循环中继续轮询
-                try:
-                    current_loop = asyncio.get_running_loop()
-                    if current_loop.is_closed():
-                        logger.warning("事件循环已关闭，停止轮询任务状态")
-                        raise asyncio.CancelledError("事件循环已关闭")
-                except RuntimeError:
-                    logger.warning("没有运行中的事件循环，停止轮询任务状态")
-                    raise asyncio.CancelledError("没有运行中的事件循环")
-
-                # 检查会话状态
-                if self.session.closed:
-                    logger.warning("HTTP会话已关闭，停止轮询任务状态")
-                    raise asyncio.CancelledError("HTTP会话已关闭")
-
-                # 创建轮询状态的timeout
-                timeout = aiohttp.ClientTimeout(total=30)  # 30秒超时
-                async with self.session.get(url, timeout=timeout) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        consecutive_errors += 1
-
-                        # 如果是504错误，记录但继续重试
-                        if response.status == 504:
-                            logger.warning(f"服务器网关超时 (504)，继续重试... (连续错误: {consecutive_errors}/{max_consecutive_errors})")
-                            if consecutive_errors >= max_consecutive_errors:
-                                raise Exception(f"连续{max_consecutive_errors}次网关超时，任务可能失败")
-                            await asyncio.sleep(poll_interval * 2)  # 网关超时时等待更长时间
-                            continue
-                        else:
-                            raise Exception(f"查询任务状态失败 (状态码: {response.status}): {error_text}")
-
-                    # 重置错误计数
-                    consecutive_errors = 0
-                    result = await response.json()
-                    status = result.get('task_status', 'PROCESSING')
-
-                    if status == 'SUCCESS':
-                        video_result = result.get('video_result', [])
-
-                        # video_result是一个列表，取第一个元素
-                        if isinstance(video_result, list) and len(video_result) > 0:
-                            video_info = video_result[0]
-                            video_url = video_info.get('url')
-                        else:
-                            video_url = None
-
-                        if not video_url:
-                            raise Exception("API响应中没有视频URL")
-                        return video_url
-
-                    elif status == 'FAIL':
-                        error_msg = result.get('error', {}).get('message', '未知错误')
-                        raise Exception(f"视频生成失败: {error_msg}")
-
-                    elif status in ['PROCESSING', 'SUBMITTED']:
-                        if progress_callback:
-                            elapsed = int(time.time() - start_time)
-                            progress_callback(f"视频生成中... ({elapsed}s)")
-                        await asyncio.sleep(poll_interval)
-
-                    else:
-                        logger.warning(f"未知任务状态: {status}")
-                        await asyncio.sleep(poll_interval)
-
-            except asyncio.CancelledError:
-                logger.warning("轮询任务状态被取消")
-                raise
-
-            except Exception as e:
-                if "查询任务状态失败" in str(e) and "504" not in str(e):
-                    raise e
+        async with session.get(url) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise TaskQueryError(response.status, f"查询任务状态失败 (状态码: {response.status}): {error_text}")
+            result = await response.json()
+
+        status = result.get('task_status', 'PROCESSING')
+        if status == 'SUCCESS':
+            # video_result是一个列表，取第一个元素
+            video_result = result.get('video_result', [])
+            video_url = None
+            if isinstance(video_result, list) and len(video_result) > 0:
+                video_url = video_result[0].get('url')
+            if not video_url:
+                return RemoteTaskStatus(state=TASK_FAILED, error="API响应中没有视频URL", raw_status=status)
+            return RemoteTaskStatus(state=TASK_SUCCEEDED, video_url=video_url, raw_status=status)
+        elif status == 'FAIL':
+            error_msg = result.get('error', {}).get('message', '未知错误')
+            return RemoteTaskStatus(state=TASK_FAILED, error=error_msg, raw_status=status)
+
+        if status not in ['PROCESSING', 'SUBMITTED']:
+            logger.warning(f"未知任务状态: {status}")
+        return RemoteTaskStatus(state=TASK_PENDING, raw_status=status)
 
-                # 🔧 修复：检查是否是事件循环相关错误
-                error_str = str(e).lower()
-                if any(keyword in error_str for keyword in ['event loop is closed', 'loop is closed', 'no running loop']):
-                    logger.warning(f"事件循环错误，停止轮询: {e}")
-                    raise asyncio.CancelledError("事件循环已关闭或不可用")
-
-                # 处理网络相关错误
-                if any(keyword in error_str for keyword in ['timeout', '超时', 'connection', 'network', '网络', '504', 'cancelled', 'disconnected', 'server']):
-                    consecutive_errors += 1
-                    logger.warning(f"网络相关错误: {e} (连续错误: {consecutive_errors}/{max_consecutive_errors})")
-
-                    if consecutive_errors >= max_consecutive_errors:
-                        raise Exception(f"连续{max_consecutive_errors}次网络错误，请检查网络连接或稍后重试")
-
-                    # 智能退避：错误越多，等待时间越长
-                    backoff_delay = poll_interval * (backoff_multiplier ** consecutive_errors)
-                    backoff_delay = min(backoff_delay, 120)  # 最大等待2分钟
-                    logger.info(f"网络错误后等待 {backoff_delay:.1f} 秒再重试...")
-
-                    # 🔧 修复：在sleep前再次检查事件循环状态
-                    try:
-                        current_loop = asyncio.get_running_loop()
-                        if current_loop.is_closed():
-                            logger.warning("事件循环已关闭，停止重试")
-                            raise asyncio.CancelledError("事件循环已关闭")
-                        await asyncio.sleep(backoff_delay)
-                    except RuntimeError:
-                        logger.warning("没有运行中的事件循环，停止重试")
-                        raise asyncio.CancelledError("没有运行中的事件循环")
-                else:
-                    logger.warning(f"查询任务状态时出错: {e}")
-                    # 🔧 修复：在sleep前检查事件循环状态
-                    try:
-                        current_loop = asyncio.get_running_loop()
-                        if current_loop.is_closed():
-                            logger.warning("事件循环已关闭，停止轮询")
-                            raise asyncio.CancelledError("事件循环已关闭")
-                        await asyncio.sleep(poll_interval)
-                    except RuntimeError:
-                        logger.warning("没有运行中的事件循环，停止轮询")
-                        raise asyncio.CancelledError("没有运行中的事件循环")
-
-        # 提供更详细的超时错误信息
-        elapsed_minutes = max_wait_time // 60
-        raise Exception(
-            f"视频生成超时 (超过 {elapsed_minutes} 分钟)。\n"
-            f"💡 建议解决方案:\n"
-            f"1. 视频生成是计算密集型任务，请耐心等待\n"
-            f"2. 检查网络连接是否稳定\n"
-            f"3. 尝试减少视频时长或降低分辨率\n"
-            f"4. 稍后重试，服务器可能正在处理大量请求\n"
-            f"5. 如果问题持续，请联系技术支持"
+    async def _poll_task_status(self, task_id: str, progress_callback: Optional[Callable] = None) -> str:
+        """等待任务完成（由共享轮询器统一调度查询）"""
+        self._register_polling_provider()
+        return await get_task_status_poller().wait_for_task(
+            self.POLLING_PROVIDER, task_id, progress_callback,
+            metadata={'engine': self.engine_type.value, 'model': self.model}
         )
 
     async def _download_video(self, video_url: str, config: VideoGenerationConfig) -> str:
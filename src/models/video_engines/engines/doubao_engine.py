@@ -9,17 +9,81 @@ import aiohttp
 import os
 import time
 import json
-import base64
 from typing import List, Dict, Optional, Callable
 from ..video_engine_base import (
     VideoGenerationEngine, VideoEngineType, VideoEngineStatus, 
     VideoGenerationConfig, VideoGenerationResult, VideoEngineInfo, ConfigConverter
 )
+from ..task_status_poller import (
+    get_task_status_poller, PollingProvider, RemoteTaskStatus, TaskQueryError,
+    TASK_PENDING, TASK_SUCCEEDED, TASK_FAILED
+)
+from ..image_payload_cache import get_image_payload_cache, ImagePayloadSpec
 from src.utils.logger import logger
 
 
+def parse_ark_task(result: Dict) -> RemoteTaskStatus:
+    """将火山方舟任务查询结果转换为统一的任务状态"""
+    status = result.get('status')
+    if status == 'succeeded':
+        # 根据实际API响应，视频URL在content字段中
+        content = result.get('content', {})
+        video_url = ((content.get('video_url') if isinstance(content, dict) else None) or
+                     result.get('video_url') or
+                     result.get('output_url') or
+                     result.get('result', {}).get('video_url') or
+                     result.get('data', {}).get('video_url'))
+        if not video_url:
+            logger.error(f"任务完成但未找到视频URL，完整响应: {result}")
+            return RemoteTaskStatus(state=TASK_FAILED, error="任务完成但未返回视频URL", raw_status=status)
+        return RemoteTaskStatus(state=TASK_SUCCEEDED, video_url=video_url, raw_status=status)
+    elif status in ('failed', 'cancelled'):
+        return RemoteTaskStatus(state=TASK_FAILED, error=str(result.get('error', '未知错误')), raw_status=status)
+
+    if status not in ('queued', 'running'):
+        logger.warning(f"未知任务状态: {status}")
+    return RemoteTaskStatus(state=TASK_PENDING, raw_status=status or '')
+
+
+async def query_ark_tasks(session: aiohttp.ClientSession, base_url: str,
+                          task_ids: List[str]) -> Dict[str, RemoteTaskStatus]:
+    """通过火山方舟任务列表接口批量查询任务状态"""
+    params = [('page_num', '1'), ('page_size', str(len(task_ids)))]
+    params.extend(('filter.task_ids', task_id) for task_id in task_ids)
+    async with session.get(f"{base_url}/contents/generations/tasks", params=params) as response:
+        if response.status != 200:
+            error_text = await response.text()
+            raise TaskQueryError(response.status, f"批量查询任务状态失败，状态码: {response.status}, 错误: {error_text}")
+        result = await response.json()
+
+    wanted = set(task_ids)
+    return {item['id']: parse_ark_task(item)
+            for item in result.get('items', []) if item.get('id') in wanted}
+
+
+
+# 豆包分辨率档位对应的输入图像短边上限
+ARK_SHORT_SIDES = {"480p": 480, "720p": 720, "1080p": 1080}
+
+
+def ark_image_payload_spec(engine: str, resolution: str = "1080p") -> ImagePayloadSpec:
+    """豆包（方舟）图生视频的输入图像要求：宽高300-6000px，宽高比0.4-2.5，小于30MB"""
+    return ImagePayloadSpec(
+        engine=engine,
+        max_short_side=ARK_SHORT_SIDES.get(resolution, 1080),
+        quality=92,
+        min_side=300,
+        max_side=6000,
+        min_ratio=0.4,
+        max_ratio=2.5,
+        max_bytes=30 * 1024 * 1024
+    )
+
+
 class DoubaoEngine(VideoGenerationEngine):
     """豆包视频生成引擎实现"""
+
+    POLLING_PROVIDER = "volcengine_ark_pro"
     
     def __init__(self, config: Optional[Dict] = None):
         super().__init__(VideoEngineType.DOUBAO_SEEDANCE_PRO)
@@ -90,6 +154,7 @@ class DoubaoEngine(VideoGenerationEngine):
             # 测试连接
             if await self.test_connection():
                 self.status = VideoEngineStatus.IDLE
+                self._register_polling_provider()
                 logger.info("豆包视频引擎初始化成功")
                 return True
             else:
@@ -247,122 +312,40 @@ class DoubaoEngine(VideoGenerationEngine):
             logger.error(f"创建HTTP会话失败: {e}")
             raise
     
-    def _encode_image_to_base64(self, image_path: str) -> str:
-        """将图像编码为base64"""
-        try:
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-                base64_data = base64.b64encode(image_data).decode('utf-8')
-                return base64_data
-        except Exception as e:
-            logger.error(f"图像编码失败: {e}")
-            raise
+    def _get_image_payload_spec(self, config: Optional[VideoGenerationConfig] = None) -> ImagePayloadSpec:
+        """输入图像按输出分辨率档位缩放，超出部分只会增加上传体积"""
+        resolution = self._determine_resolution(config.width, config.height) if config else "1080p"
+        return ark_image_payload_spec(self.engine_type.value, resolution)
 
-    def _validate_image(self, image_path: str) -> bool:
-        """验证图片是否符合豆包API要求"""
-        try:
-            from PIL import Image
-
-            # 检查文件大小 (小于30MB)
-            file_size = os.path.getsize(image_path)
-            if file_size > 30 * 1024 * 1024:  # 30MB
-                logger.error(f"豆包引擎: 图片文件过大 ({file_size / 1024 / 1024:.1f}MB > 30MB): {image_path}")
-                return False
-
-            # 检查图片格式和尺寸
-            with Image.open(image_path) as img:
-                # 检查格式
-                format_lower = img.format.lower() if img.format else ''
-                supported_formats = ['jpeg', 'jpg', 'png', 'webp', 'bmp', 'tiff', 'gif']
-                if format_lower not in supported_formats:
-                    logger.error(f"豆包引擎: 不支持的图片格式 ({img.format}): {image_path}")
-                    return False
-
-                # 检查尺寸
-                width, height = img.size
-
-                # 宽高长度：(300, 6000)
-                if width < 300 or width > 6000 or height < 300 or height > 6000:
-                    logger.error(f"豆包引擎: 图片尺寸不符合要求 ({width}x{height}，要求300-6000px): {image_path}")
-                    return False
-
-                # 宽高比：(0.4, 2.5)
-                aspect_ratio = width / height
-                if aspect_ratio <= 0.4 or aspect_ratio >= 2.5:
-                    logger.error(f"豆包引擎: 图片宽高比不符合要求 ({aspect_ratio:.2f}，要求0.4-2.5): {image_path}")
-                    return False
-
-                logger.info(f"豆包引擎: 图片验证通过 - 格式:{img.format}, 尺寸:{width}x{height}, 宽高比:{aspect_ratio:.2f}, 大小:{file_size/1024:.1f}KB")
-                return True
-
-        except Exception as e:
-            logger.error(f"豆包引擎: 图片验证失败: {e}")
-            return False
-
-    def _get_image_format(self, image_path: str) -> str:
-        """获取图片格式（小写）"""
-        try:
-            from PIL import Image
-            with Image.open(image_path) as img:
-                format_name = img.format.lower() if img.format else 'jpeg'
-                # 统一JPEG格式名称
-                if format_name == 'jpg':
-                    format_name = 'jpeg'
-                return format_name
-        except Exception as e:
-            logger.error(f"获取图片格式失败: {e}")
-            # 根据文件扩展名推断
-            ext = os.path.splitext(image_path)[1].lower()
-            format_map = {
-                '.jpg': 'jpeg',
-                '.jpeg': 'jpeg',
-                '.png': 'png',
-                '.webp': 'webp',
-                '.bmp': 'bmp',
-                '.tiff': 'tiff',
-                '.gif': 'gif'
-            }
-            return format_map.get(ext, 'jpeg')
-
-    def _prepare_image_url(self, image_path: str) -> Optional[str]:
+    def _prepare_image_url(self, image_path: str, config: Optional[VideoGenerationConfig] = None) -> Optional[str]:
         """准备图片URL - 支持网络URL和本地文件(转Base64)"""
         try:
-            # 如果已经是URL，直接返回
-            if image_path.startswith(('http://', 'https://')):
-                logger.info(f"豆包引擎: 使用网络图片URL: {image_path}")
-                return image_path
-
-            # 如果已经是Base64格式，直接返回
-            if image_path.startswith('data:image/'):
-                logger.info(f"豆包引擎: 使用Base64图片数据")
+            # 网络URL或已是Base64格式，直接使用
+            if image_path.startswith(('http://', 'https://', 'data:image/')):
                 return image_path
 
-            # 本地文件，转换为Base64格式
             if not os.path.exists(image_path):
                 logger.error(f"豆包引擎: 图片文件不存在: {image_path}")
                 return None
 
-            # 验证图片格式和大小
-            if not self._validate_image(image_path):
-                return None
+            return get_image_payload_cache().prepare_sync(image_path, self._get_image_payload_spec(config))
 
-            # 转换为Base64
-            base64_data = self._encode_image_to_base64(image_path)
-            if base64_data:
-                # 获取图片格式
-                image_format = self._get_image_format(image_path)
-                data_url = f"data:image/{image_format};base64,{base64_data}"
-                logger.info(f"豆包引擎: 本地图片转换为Base64成功: {os.path.basename(image_path)} (格式:{image_format}, 大小:{len(data_url)}字符)")
-                return data_url
-            else:
-                logger.error(f"豆包引擎: 图片Base64编码失败: {image_path}")
-                return None
+        except Exception as e:
+            logger.error(f"豆包引擎: 准备图片URL失败: {e}")
+            return None
 
+    async def _prepare_image_payload(self, config: VideoGenerationConfig) -> Optional[str]:
+        """异步准备输入图像（进程池中缩放编码，按内容缓存，重试时直接复用）"""
+        image_path = config.input_image_path
+        if image_path.startswith(('http://', 'https://', 'data:image/')):
+            return image_path
+        try:
+            return await get_image_payload_cache().prepare(image_path, self._get_image_payload_spec(config))
         except Exception as e:
             logger.error(f"豆包引擎: 准备图片URL失败: {e}")
             return None
     
-    def _prepare_request_data(self, config: VideoGenerationConfig) -> Dict:
+    def _prepare_request_data(self, config: VideoGenerationConfig, image_url: Optional[str] = None) -> Dict:
         """准备请求数据 - 根据豆包视频生成API文档格式"""
         try:
             # 豆包只支持5秒和10秒，使用用户指定的时长（必须是5或10）
@@ -383,7 +366,7 @@ class DoubaoEngine(VideoGenerationEngine):
 
             # 如果有输入图像，添加到content中
             if config.input_image_path:
-                image_url = self._prepare_image_url(config.input_image_path)
+                image_url = image_url or self._prepare_image_url(config.input_image_path, config)
                 if image_url:
                     content.append({
                         "type": "image_url",
@@ -517,60 +500,41 @@ class DoubaoEngine(VideoGenerationEngine):
             logger.error(f"提交豆包生成任务失败: {e}")
             raise
     
-    async def _poll_task_status(self, task_id: str, progress_callback: Optional[Callable] = None) -> str:
-        """轮询任务状态 - 根据豆包视频生成API格式"""
-        try:
-            # 豆包视频生成API的查询端点（根据官方文档）
-            url = f"{self.base_url}/contents/generations/tasks/{task_id}"
-            start_time = time.time()
-
-            while True:
-                # 检查超时
-                if time.time() - start_time > self.timeout:
-                    raise Exception("任务超时")
-
-                # 创建请求特定的timeout
-                timeout = aiohttp.ClientTimeout(total=30)  # 30秒超时
-                async with self.session.get(url, headers=self.headers, timeout=timeout) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        status = result.get('status')
-
-                        # 调试：打印完整的响应数据
-                        logger.info(f"豆包API响应: {json.dumps(result, indent=2, ensure_ascii=False)}")
-
-                        if status == 'succeeded':
-                            # 根据实际API响应，视频URL在content字段中
-                            video_url = (result.get('content', {}).get('video_url') or
-                                       result.get('video_url') or
-                                       result.get('output_url') or
-                                       result.get('result', {}).get('video_url') or
-                                       result.get('data', {}).get('video_url'))
-
-                            if video_url:
-                                logger.info(f"豆包视频生成完成: {video_url}")
-                                return video_url
-                            else:
-                                logger.error(f"任务完成但未找到视频URL，完整响应: {result}")
-                                raise Exception("任务完成但未返回视频URL")
-                        elif status == 'failed':
-                            error_msg = result.get('error', '未知错误')
-                            raise Exception(f"视频生成失败: {error_msg}")
-                        elif status in ['queued', 'running']:
-                            if progress_callback:
-                                progress_callback(f"豆包正在生成视频... (状态: {status})")
-                            await asyncio.sleep(5)  # 等待5秒后重试
-                        else:
-                            logger.warning(f"未知任务状态: {status}")
-                            await asyncio.sleep(5)
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"查询任务状态失败，状态码: {response.status}, 错误: {error_text}")
-                        await asyncio.sleep(5)
+    def _register_polling_provider(self):
+        """向共享轮询器注册火山方舟任务查询（应用重启后会恢复未完成的任务）"""
+        get_task_status_poller().register_provider(PollingProvider(
+            name=self.POLLING_PROVIDER,
+            query_one=self._query_task_status,
+            query_batch=self._query_task_statuses,
+            headers=self.headers,
+            min_interval=5.0,
+            max_interval=30.0,
+            typical_duration=60.0,
+            max_wait=float(self.timeout),
+            max_parallel_queries=4
+        ))
+
+    async def _query_task_status(self, session: aiohttp.ClientSession, task_id: str) -> RemoteTaskStatus:
+        """查询单个任务状态（由共享轮询器在其事件循环中调用）"""
+        url = f"{self.base_url}/contents/generations/tasks/{task_id}"
+        async with session.get(url) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise TaskQueryError(response.status, f"查询任务状态失败，状态码: {response.status}, 错误: {error_text}")
+            result = await response.json()
+        return parse_ark_task(result)
+
+    async def _query_task_statuses(self, session: aiohttp.ClientSession, task_ids: List[str]) -> Dict[str, RemoteTaskStatus]:
+        """通过任务列表接口一次查询多个任务"""
+        return await query_ark_tasks(session, self.base_url, task_ids)
 
-        except Exception as e:
-            logger.error(f"轮询豆包任务状态失败: {e}")
-            raise
+    async def _poll_task_status(self, task_id: str, progress_callback: Optional[Callable] = None) -> str:
+        """等待任务完成（由共享轮询器统一调度查询）"""
+        self._register_polling_provider()
+        return await get_task_status_poller().wait_for_task(
+            self.POLLING_PROVIDER, task_id, progress_callback,
+            metadata={'engine': self.engine_type.value, 'model': self.model}
+        )
 
     def _extract_video_url_from_content(self, content: str) -> Optional[str]:
         """从响应内容中提取视频URL"""
@@ -664,13 +628,15 @@ class DoubaoEngine(VideoGenerationEngine):
                 raise Exception("必须提供文本提示词")
 
             # 准备请求数据
-            request_data = self._prepare_request_data(config)
+            image_url = await self._prepare_image_payload(config) if config.input_image_path else None
+            request_data = self._prepare_request_data(config, image_url)
 
             if progress_callback:
                 progress_callback("发送豆包视频生成请求...")
 
             # 发送异步生成请求
             task_id = await self._submit_generation_task(request_data)
+            self._record_remote_task(config, self.POLLING_PROVIDER, task_id)
 
             if progress_callback:
                 progress_callback("等待豆包视频生成完成...")
@@ -689,6 +655,7 @@ class DoubaoEngine(VideoGenerationEngine):
 
             # 下载视频
             final_path = await self._download_video(video_url, output_path)
+            get_task_status_poller().forget_task(self.POLLING_PROVIDER, task_id)
 
             # 计算生成时间和成本
             generation_time = time.time() - start_time
@@ -741,6 +708,47 @@ class DoubaoEngine(VideoGenerationEngine):
                 if self.current_tasks == 0:
                     self.status = VideoEngineStatus.IDLE
 
+    async def resume_task(self, task_id: str, config: VideoGenerationConfig,
+                          progress_callback: Optional[Callable] = None,
+                          project_manager=None, current_project_name=None) -> VideoGenerationResult:
+        """恢复重启前提交的任务：继续轮询并下载结果"""
+        if project_manager and current_project_name:
+            self.project_manager = project_manager
+            self.current_project_name = current_project_name
+
+        start_time = time.time()
+        try:
+            await self._ensure_session_valid()
+            if progress_callback:
+                progress_callback(f"恢复豆包视频任务 {task_id}...")
+
+            video_url = await self._poll_task_status(task_id, progress_callback)
+            output_path = os.path.join(self._get_output_dir(), f"doubao_video_{int(time.time())}_{task_id[-8:]}.mp4")
+            final_path = await self._download_video(video_url, output_path)
+            get_task_status_poller().forget_task(self.POLLING_PROVIDER, task_id)
+            self.success_count += 1
+
+            return VideoGenerationResult(
+                success=True,
+                video_path=final_path,
+                generation_time=time.time() - start_time,
+                engine_type=self.engine_type,
+                duration=config.duration,
+                fps=16,
+                resolution=(config.width, config.height),
+                file_size=os.path.getsize(final_path) if os.path.exists(final_path) else 0,
+                metadata={'task_id': task_id, 'video_url': video_url, 'model': self.model, 'resumed': True}
+            )
+
+        except Exception as e:
+            logger.error(f"恢复豆包视频任务 {task_id} 失败: {e}")
+            return VideoGenerationResult(
+                success=False,
+                error_message=str(e),
+                generation_time=time.time() - start_time,
+                engine_type=self.engine_type
+            )
+
     async def shutdown(self):
         """关闭引擎"""
         try:
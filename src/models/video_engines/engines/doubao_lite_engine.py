@@ -9,16 +9,22 @@ import time
 import json
 import asyncio
 import aiohttp
-import base64
 from typing import Optional, Callable, Dict, Any, List
 from pathlib import Path
 
 from ..video_engine_base import VideoGenerationEngine, VideoGenerationConfig, VideoGenerationResult, VideoEngineStatus, VideoEngineType, VideoEngineInfo
+from ..task_status_poller import (
+    get_task_status_poller, PollingProvider, RemoteTaskStatus, TaskQueryError, TASK_SUCCEEDED
+)
+from ..image_payload_cache import get_image_payload_cache
+from .doubao_engine import parse_ark_task, query_ark_tasks, ark_image_payload_spec
 from ....utils.logger import logger
 
 
 class DoubaoLiteEngine(VideoGenerationEngine):
     """豆包视频生成引擎 - Lite版"""
+
+    POLLING_PROVIDER = "volcengine_ark_lite"
     
     def __init__(self, config: Dict[str, Any]):
         super().__init__(VideoEngineType.DOUBAO_SEEDANCE_LITE)
@@ -93,6 +99,7 @@ class DoubaoLiteEngine(VideoGenerationEngine):
             # 测试API连接
             if await self.test_connection():
                 self.status = VideoEngineStatus.IDLE
+                self._register_polling_provider()
                 logger.info("豆包Lite视频引擎初始化成功")
                 return True
             else:
@@ -267,116 +274,13 @@ class DoubaoLiteEngine(VideoGenerationEngine):
             'savings_vs_pro': savings  # 相比Pro版节省的金额
         }
 
-    def _encode_image_to_base64(self, image_path: str) -> str:
-        """将图像编码为base64"""
-        try:
-            with open(image_path, 'rb') as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                return encoded_string
-        except Exception as e:
-            logger.error(f"图像编码失败: {e}")
-            raise
-
-    def _validate_image(self, image_path: str) -> bool:
-        """验证图片是否符合豆包API要求"""
+    async def _prepare_image_payload(self, image_path: str) -> Optional[str]:
+        """异步准备输入图像（进程池中缩放编码，按内容缓存，重试时直接复用）"""
+        if image_path.startswith(('http://', 'https://', 'data:image/')):
+            return image_path
         try:
-            from PIL import Image
-
-            # 检查文件大小 (小于30MB)
-            file_size = os.path.getsize(image_path)
-            if file_size > 30 * 1024 * 1024:  # 30MB
-                logger.error(f"豆包Lite引擎: 图片文件过大 ({file_size / 1024 / 1024:.1f}MB > 30MB): {image_path}")
-                return False
-
-            # 检查图片格式和尺寸
-            with Image.open(image_path) as img:
-                # 检查格式
-                format_lower = img.format.lower() if img.format else ''
-                supported_formats = ['jpeg', 'jpg', 'png', 'webp', 'bmp', 'tiff', 'gif']
-                if format_lower not in supported_formats:
-                    logger.error(f"豆包Lite引擎: 不支持的图片格式 ({img.format}): {image_path}")
-                    return False
-
-                # 检查尺寸
-                width, height = img.size
-
-                # 宽高长度：(300, 6000)
-                if width < 300 or width > 6000 or height < 300 or height > 6000:
-                    logger.error(f"豆包Lite引擎: 图片尺寸不符合要求 ({width}x{height}，要求300-6000px): {image_path}")
-                    return False
-
-                # 宽高比：(0.4, 2.5)
-                aspect_ratio = width / height
-                if aspect_ratio <= 0.4 or aspect_ratio >= 2.5:
-                    logger.error(f"豆包Lite引擎: 图片宽高比不符合要求 ({aspect_ratio:.2f}，要求0.4-2.5): {image_path}")
-                    return False
-
-                logger.info(f"豆包Lite引擎: 图片验证通过 - 格式:{img.format}, 尺寸:{width}x{height}, 宽高比:{aspect_ratio:.2f}, 大小:{file_size/1024:.1f}KB")
-                return True
-
-        except Exception as e:
-            logger.error(f"豆包Lite引擎: 图片验证失败: {e}")
-            return False
-
-    def _get_image_format(self, image_path: str) -> str:
-        """获取图片格式（小写）"""
-        try:
-            from PIL import Image
-            with Image.open(image_path) as img:
-                format_name = img.format.lower() if img.format else 'jpeg'
-                # 统一JPEG格式名称
-                if format_name == 'jpg':
-                    format_name = 'jpeg'
-                return format_name
-        except Exception as e:
-            logger.error(f"获取图片格式失败: {e}")
-            # 根据文件扩展名推断
-            ext = os.path.splitext(image_path)[1].lower()
-            format_map = {
-                '.jpg': 'jpeg',
-                '.jpeg': 'jpeg',
-                '.png': 'png',
-                '.webp': 'webp',
-                '.bmp': 'bmp',
-                '.tiff': 'tiff',
-                '.gif': 'gif'
-            }
-            return format_map.get(ext, 'jpeg')
-
-    def _prepare_image_url(self, image_path: str) -> Optional[str]:
-        """准备图片URL - 支持网络URL和本地文件(转Base64)"""
-        try:
-            # 如果已经是URL，直接返回
-            if image_path.startswith(('http://', 'https://')):
-                logger.info(f"豆包Lite引擎: 使用网络图片URL: {image_path}")
-                return image_path
-
-            # 如果已经是Base64格式，直接返回
-            if image_path.startswith('data:image/'):
-                logger.info(f"豆包Lite引擎: 使用Base64图片数据")
-                return image_path
-
-            # 本地文件，转换为Base64格式
-            if not os.path.exists(image_path):
-                logger.error(f"豆包Lite引擎: 图片文件不存在: {image_path}")
-                return None
-
-            # 验证图片格式和大小
-            if not self._validate_image(image_path):
-                return None
-
-            # 转换为Base64
-            base64_data = self._encode_image_to_base64(image_path)
-            if base64_data:
-                # 获取图片格式
-                image_format = self._get_image_format(image_path)
-                data_url = f"data:image/{image_format};base64,{base64_data}"
-                logger.info(f"豆包Lite引擎: 本地图片转换为Base64成功: {os.path.basename(image_path)} (格式:{image_format}, 大小:{len(data_url)}字符)")
-                return data_url
-            else:
-                logger.error(f"豆包Lite引擎: 图片Base64编码失败: {image_path}")
-                return None
-
+            return await get_image_payload_cache().prepare(
+                image_path, ark_image_payload_spec(self.engine_type.value))
         except Exception as e:
             logger.error(f"豆包Lite引擎: 准备图片URL失败: {e}")
             return None
@@ -423,9 +327,10 @@ class DoubaoLiteEngine(VideoGenerationEngine):
                 progress_callback(f"开始豆包Lite视频生成... (预估: {cost_info['cost_yuan']:.4f}元, 节省33%)")
 
             # 验证输入（图像是可选的，支持纯文生视频）
+            image_url = None
             if config.input_image_path:
                 # 准备图片URL（支持本地文件转换）
-                image_url = self._prepare_image_url(config.input_image_path)
+                image_url = await self._prepare_image_payload(config.input_image_path)
                 if not image_url:
                     logger.error(f"豆包Lite引擎无法处理图片文件: {config.input_image_path}")
                     raise Exception(f"无法处理图片文件，请检查文件路径或网络连接: {config.input_image_path}")
@@ -435,9 +340,10 @@ class DoubaoLiteEngine(VideoGenerationEngine):
                 raise Exception("必须提供文本提示词")
 
             # 提交生成任务
-            task_id = await self._submit_generation_task(config, progress_callback)
+            task_id = await self._submit_generation_task(config, progress_callback, image_url)
             if not task_id:
                 raise Exception("任务提交失败")
+            self._record_remote_task(config, self.POLLING_PROVIDER, task_id)
 
             # 等待任务完成
             video_url = await self._wait_for_completion(task_id, progress_callback)
@@ -455,6 +361,8 @@ class DoubaoLiteEngine(VideoGenerationEngine):
 
             # 下载视频
             final_path = await self._download_video(video_url, output_path)
+            if final_path:
+                get_task_status_poller().forget_task(self.POLLING_PROVIDER, task_id)
 
             # 计算生成时间和成本
             generation_time = time.time() - start_time
@@ -496,7 +404,50 @@ class DoubaoLiteEngine(VideoGenerationEngine):
                 if self.current_tasks == 0:
                     self.status = VideoEngineStatus.READY
 
-    async def _submit_generation_task(self, config: VideoGenerationConfig, progress_callback: Optional[Callable] = None) -> Optional[str]:
+    async def resume_task(self, task_id: str, config: VideoGenerationConfig,
+                          progress_callback: Optional[Callable] = None,
+                          project_manager=None, current_project_name: str = None) -> VideoGenerationResult:
+        """恢复重启前提交的任务：继续轮询并下载结果"""
+        if project_manager and current_project_name:
+            self.project_manager = project_manager
+            self.current_project_name = current_project_name
+
+        start_time = time.time()
+        try:
+            await self._ensure_session_valid()
+            if progress_callback:
+                progress_callback(f"恢复豆包Lite视频任务 {task_id}...")
+
+            video_url = await self._wait_for_completion(task_id, progress_callback)
+            if not video_url:
+                raise Exception("视频生成失败")
+
+            output_path = os.path.join(self._get_output_dir(), f"doubao_lite_video_{int(time.time())}_{task_id[-8:]}.mp4")
+            final_path = await self._download_video(video_url, output_path)
+            if not final_path:
+                raise Exception("视频下载失败")
+            get_task_status_poller().forget_task(self.POLLING_PROVIDER, task_id)
+
+            return VideoGenerationResult(
+                success=True,
+                video_path=final_path,
+                generation_time=time.time() - start_time,
+                engine_type=VideoEngineType.DOUBAO_SEEDANCE_LITE,
+                metadata={'model': self.model, 'task_id': task_id, 'model_type': 'lite', 'resumed': True}
+            )
+
+        except Exception as e:
+            logger.error(f"恢复豆包Lite视频任务 {task_id} 失败: {e}")
+            return VideoGenerationResult(
+                success=False,
+                video_path="",
+                generation_time=time.time() - start_time,
+                engine_type=VideoEngineType.DOUBAO_SEEDANCE_LITE,
+                error_message=str(e)
+            )
+
+    async def _submit_generation_task(self, config: VideoGenerationConfig, progress_callback: Optional[Callable] = None,
+                                      image_url: Optional[str] = None) -> Optional[str]:
         """提交视频生成任务"""
         try:
             url = f"{self.base_url}/contents/generations/tasks"
@@ -519,7 +470,7 @@ class DoubaoLiteEngine(VideoGenerationEngine):
 
             # 如果有输入图像，添加到content中
             if config.input_image_path:
-                image_url = self._prepare_image_url(config.input_image_path)
+                image_url = image_url or await self._prepare_image_payload(config.input_image_path)
                 if image_url:
                     content.append({
                         "type": "image_url",
@@ -589,61 +540,44 @@ class DoubaoLiteEngine(VideoGenerationEngine):
 
         return f"{prompt} {' '.join(params)}"
 
+    def _register_polling_provider(self):
+        """向共享轮询器注册火山方舟任务查询（应用重启后会恢复未完成的任务）"""
+        get_task_status_poller().register_provider(PollingProvider(
+            name=self.POLLING_PROVIDER,
+            query_one=self._query_task_status,
+            query_batch=lambda session, task_ids: query_ark_tasks(session, self.base_url, task_ids),
+            headers=self.headers,
+            min_interval=5.0,
+            max_interval=30.0,
+            typical_duration=45.0,
+            max_wait=600.0,
+            max_parallel_queries=4
+        ))
+
+    async def _query_task_status(self, session: aiohttp.ClientSession, task_id: str) -> RemoteTaskStatus:
+        """查询单个任务状态（由共享轮询器在其事件循环中调用）"""
+        url = f"{self.base_url}/contents/generations/tasks/{task_id}"
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise TaskQueryError(response.status, f"豆包Lite查询任务状态失败，状态码: {response.status}")
+            result = await response.json()
+
+        task_status = parse_ark_task(result)
+        if task_status.state == TASK_SUCCEEDED and not task_status.video_url:
+            task_status.video_url = self._extract_video_url(result) or ""
+        return task_status
+
     async def _wait_for_completion(self, task_id: str, progress_callback: Optional[Callable] = None) -> Optional[str]:
-        """等待任务完成并获取视频URL"""
+        """等待任务完成并获取视频URL（由共享轮询器统一调度查询）"""
         try:
-            url = f"{self.base_url}/contents/generations/tasks/{task_id}"
-            max_wait_time = 600  # 最大等待10分钟
-            check_interval = 5   # 每5秒检查一次
-            elapsed_time = 0
-
             if progress_callback:
                 progress_callback("等待豆包Lite视频生成完成...")
 
-            while elapsed_time < max_wait_time:
-                # 创建轮询特定的timeout
-                timeout = aiohttp.ClientTimeout(total=30)  # 30秒超时
-                async with self.session.get(url, headers=self.headers, timeout=timeout) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"豆包Lite API响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
-
-                        status = result.get('status', '')
-
-                        if status == 'succeeded':
-                            # 任务完成，提取视频URL
-                            video_url = self._extract_video_url(result)
-                            if video_url:
-                                logger.info(f"豆包Lite视频生成完成: {video_url}")
-                                return video_url
-                            else:
-                                logger.error("豆包Lite任务完成但未找到视频URL")
-                                return None
-
-                        elif status == 'failed':
-                            error_msg = result.get('error', '未知错误')
-                            logger.error(f"豆包Lite视频生成失败: {error_msg}")
-                            return None
-
-                        elif status in ['queued', 'running']:
-                            if progress_callback:
-                                progress_callback(f"豆包Lite正在生成视频... (状态: {status})")
-
-                            # 继续等待
-                            await asyncio.sleep(check_interval)
-                            elapsed_time += check_interval
-                            continue
-                        else:
-                            logger.warning(f"豆包Lite未知状态: {status}")
-                            await asyncio.sleep(check_interval)
-                            elapsed_time += check_interval
-                            continue
-                    else:
-                        logger.error(f"豆包Lite查询任务状态失败，状态码: {response.status}")
-                        return None
-
-            logger.error(f"豆包Lite视频生成超时 ({max_wait_time}秒)")
-            return None
+            self._register_polling_provider()
+            return await get_task_status_poller().wait_for_task(
+                self.POLLING_PROVIDER, task_id, progress_callback,
+                metadata={'engine': self.engine_type.value, 'model': self.model}
+            )
 
         except Exception as e:
             logger.error(f"豆包Lite等待任务完成异常: {e}")
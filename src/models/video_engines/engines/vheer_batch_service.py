@@ -13,7 +13,7 @@ from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor
 
 from .vheer_engine import VheerVideoEngine
-from ..video_engine_base import VideoGenerationConfig, VideoGenerationResult
+from ..video_engine_base import VideoGenerationConfig, VideoGenerationResult, VideoEngineStatus
 from src.utils.logger import logger
 
 
@@ -51,8 +51,12 @@ class VheerBatchVideoService:
     def __init__(self, config: Dict = None):
         self.config = config or {}
         self.output_dir = self.config.get('output_dir', 'output/videos/vheer_batch')
-        self.max_concurrent = self.config.get('max_concurrent', 1)  # 默认单并发，避免被网站限制
+        # 并发数即浏览器池大小，每个并发任务占用一个预热好的浏览器
+        self.browser_pool_size = self.config.get('browser_pool_size', self.config.get('max_concurrent', 2))
+        self.browser_max_uses = self.config.get('browser_max_uses', 10)
+        self.max_concurrent = self.browser_pool_size
         self.headless = self.config.get('headless', True)
+        self.engine: Optional[VheerVideoEngine] = None
         self.retry_count = self.config.get('retry_count', 2)
         self.retry_delay = self.config.get('retry_delay', 30)  # 重试间隔30秒
         
@@ -146,9 +150,13 @@ class VheerBatchVideoService:
         if progress_callback:
             progress_callback(0.0, f"开始批量处理 {total_tasks} 个任务...")
             
+        # 整批任务共用一个引擎（及其浏览器池），启动时预热所有浏览器
+        if not await self._ensure_engine():
+            logger.warning("⚠️ 浏览器池预热失败，任务执行时将再次尝试启动浏览器")
+
         # 创建信号量控制并发
         semaphore = asyncio.Semaphore(self.max_concurrent)
-        
+
         # 创建任务协程
         async def process_single_task(task: BatchVideoTask):
             async with semaphore:
@@ -249,24 +257,14 @@ class VheerBatchVideoService:
         
         logger.info(f"🎬 开始处理任务: {task.task_id}")
         
-        # 创建引擎配置
-        engine_config = {
-            'output_dir': self.output_dir,
-            'headless': self.headless,
-            'max_wait_time': 300,  # 5分钟超时
-            'max_concurrent': 1
-        }
-        
         # 重试机制
         for attempt in range(self.retry_count + 1):
             try:
-                # 创建引擎实例
-                engine = VheerVideoEngine(engine_config)
-                
-                # 初始化引擎
-                if not await engine.initialize():
+                # 获取共享引擎（失败的浏览器由浏览器池回收重建，无需重新创建引擎）
+                engine = await self._ensure_engine()
+                if engine is None:
                     raise Exception("引擎初始化失败")
-                    
+
                 # 创建生成配置
                 config = VideoGenerationConfig(
                     input_prompt=task.prompt,
@@ -325,6 +323,25 @@ class VheerBatchVideoService:
                     
         return None
         
+    async def _ensure_engine(self) -> Optional[VheerVideoEngine]:
+        """创建并初始化共享引擎，初始化失败返回None（下次调用时重试）"""
+        if self.engine is None:
+            self.engine = VheerVideoEngine({
+                'output_dir': self.output_dir,
+                'headless': self.headless,
+                'max_wait_time': 300,  # 5分钟超时
+                'browser_pool_size': self.browser_pool_size,
+                'browser_max_uses': self.browser_max_uses
+            })
+        if self.engine.status not in (VideoEngineStatus.IDLE, VideoEngineStatus.BUSY):
+            if not await self.engine.initialize():
+                return None
+        return self.engine
+
+    async def shutdown(self):
+        """释放引擎引用（浏览器池在引擎间共享，程序退出时由 shutdown_vheer_browser_pools 统一关闭）"""
+        self.engine = None
+
     def get_status(self) -> Dict:
         """获取服务状态"""
         return {
@@ -334,7 +351,8 @@ class VheerBatchVideoService:
             'total_processed': self.total_processed,
             'total_success': self.total_success,
             'total_failed': self.total_failed,
-            'success_rate': self.total_success / self.total_processed if self.total_processed > 0 else 0.0
+            'success_rate': self.total_success / self.total_processed if self.total_processed > 0 else 0.0,
+            'browser_pool': self.engine.get_pool_status() if self.engine else None
         }
         
     def clear_completed_tasks(self):
@@ -351,7 +369,7 @@ async def batch_generate_videos_from_images(image_paths: List[str],
                                           duration: float = 5.0,
                                           width: int = 1024,
                                           height: int = 1024,
-                                          max_concurrent: int = 1,
+                                          max_concurrent: int = 2,
                                           output_dir: str = "output/videos/vheer_batch",
                                           progress_callback: Optional[Callable] = None) -> BatchVideoResult:
     """批量从图像生成视频的便捷函数"""
@@ -377,4 +395,7 @@ async def batch_generate_videos_from_images(image_paths: List[str],
     )
     
     # 处理任务
-    return await service.process_batch(progress_callback)
+    try:
+        return await service.process_batch(progress_callback)
+    finally:
+        await service.shutdown()
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Vheer 浏览器池
+维护 N 个已启动、已打开图生视频页面的无头浏览器，按任务借出；
+每个浏览器使用 K 次或出错后回收重建，归还后在后台重新加载页面预热，
+避免每个视频片段都重新付出浏览器启动和页面加载的开销
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.admission_controller import FairSemaphore
+from src.utils.logger import logger
+
+
+VHEER_APP_URL = "https://vheer.com/app/image-to-video"
+
+
+class PooledBrowser:
+    """池中的浏览器实例"""
+
+    def __init__(self, driver: Any, browser_id: int):
+        self.driver = driver
+        self.browser_id = browser_id
+        self.uses = 0
+        self.created_at = time.time()
+        self.page_ready = False  # 图生视频页面已加载且未被使用过
+
+
+class VheerBrowserPool:
+    """Vheer 浏览器池（可在多个事件循环之间共享）"""
+
+    def __init__(self, driver_factory: Callable[[], Any], size: int = 2, max_uses: int = 10,
+                 page_url: str = VHEER_APP_URL, page_load_timeout: float = 30.0):
+        """
+        Args:
+            driver_factory: 创建 WebDriver 的同步函数
+            size: 池大小（最大同时借出的浏览器数）
+            max_uses: 单个浏览器最多执行的任务数，达到后回收重建
+            page_url: 预热时打开的页面
+            page_load_timeout: 预热页面加载超时（秒）
+        """
+        self.driver_factory = driver_factory
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.page_url = page_url
+        self.page_load_timeout = page_load_timeout
+
+        self._slots = FairSemaphore(self.size, "vheer_browsers")
+        self._idle: List[PooledBrowser] = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._warming = 0  # 正在预热启动、尚未放入空闲列表的浏览器数
+        self._closed = False
+        # 浏览器启动、页面加载、退出都是阻塞调用，放在独立线程中执行
+        self._executor = ThreadPoolExecutor(max_workers=self.size + 1, thread_name_prefix="VheerBrowser")
+
+        # 统计信息
+        self.created = 0
+        self.recycled = 0
+        self.reused = 0
+
+    # ------------------------------------------------------------------
+    # 浏览器生命周期（在线程池中执行）
+    # ------------------------------------------------------------------
+
+    def _create_browser(self) -> Optional[PooledBrowser]:
+        try:
+            driver = self.driver_factory()
+        except Exception as e:
+            logger.error(f"Vheer浏览器启动失败: {e}")
+            return None
+        with self._lock:
+            self._next_id += 1
+            browser = PooledBrowser(driver, self._next_id)
+            self.created += 1
+        self._load_page(browser)
+        logger.info(f"Vheer浏览器 #{browser.browser_id} 已启动")
+        return browser
+
+    def _load_page(self, browser: PooledBrowser):
+        """打开图生视频页面并等待加载完成，使下一个任务无需再导航"""
+        try:
+            browser.driver.get(self.page_url)
+            deadline = time.time() + self.page_load_timeout
+            while time.time() < deadline:
+                if browser.driver.execute_script("return document.readyState") == "complete":
+                    browser.page_ready = True
+                    return
+                time.sleep(0.5)
+            logger.warning(f"Vheer浏览器 #{browser.browser_id} 预热页面加载超时")
+        except Exception as e:
+            logger.warning(f"Vheer浏览器 #{browser.browser_id} 预热页面失败: {e}")
+        browser.page_ready = False
+
+    def _quit_browser(self, browser: PooledBrowser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.debug(f"关闭Vheer浏览器 #{browser.browser_id} 失败: {e}")
+
+    def _recycle_or_rewarm(self, browser: PooledBrowser, failed: bool):
+        """归还后的处理：达到使用上限或出错则重建，否则重新加载页面
+
+        浏览器放回空闲列表后才释放名额，保证池中浏览器总数不超过池大小
+        """
+        try:
+            self._restore(browser, failed)
+        finally:
+            self._slots.release()
+
+    def _restore(self, browser: PooledBrowser, failed: bool):
+        if failed or browser.uses >= self.max_uses:
+            reason = "出错" if failed else f"已使用 {browser.uses} 次"
+            logger.info(f"回收Vheer浏览器 #{browser.browser_id}（{reason}）")
+            self._quit_browser(browser)
+            with self._lock:
+                self.recycled += 1
+            browser = self._create_browser() if not self._closed else None
+        else:
+            self._load_page(browser)
+
+        if browser is not None:
+            self._add_idle(browser, holds_slot=True)
+
+    def _add_idle(self, browser: PooledBrowser, holds_slot: bool = False):
+        """放回空闲列表；池已关闭或空闲与借出的浏览器已达池大小时直接关闭
+
+        Args:
+            holds_slot: 该浏览器自身仍占用一个借出名额（归还流程中尚未释放）
+        """
+        with self._lock:
+            borrowed = self._slots.in_use - (1 if holds_slot else 0)
+            if not self._closed and len(self._idle) + borrowed < self.size:
+                self._idle.append(browser)
+                return
+        self._quit_browser(browser)
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+
+    async def warm_up(self, count: Optional[int] = None) -> int:
+        """并行预先启动浏览器，返回当前空闲可用的浏览器数
+
+        借出中（含归还后正在重新预热）和其他调用正在启动的浏览器都计入池大小，
+        保证浏览器总数不超过 size
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            existing = len(self._idle) + self._slots.in_use + self._warming
+            missing = min(count or self.size, self.size) - existing
+            missing = max(0, missing)
+            self._warming += missing
+        if missing > 0:
+            try:
+                browsers = await asyncio.gather(*(loop.run_in_executor(self._executor, self._create_browser)
+                                                  for _ in range(missing)))
+            finally:
+                with self._lock:
+                    self._warming -= missing
+            for browser in browsers:
+                if browser is not None:
+                    self._add_idle(browser)
+        with self._lock:
+            return len(self._idle)
+
+    async def acquire(self, timeout: Optional[float] = None,
+                      position_callback: Optional[Callable[[int], None]] = None) -> Optional[PooledBrowser]:
+        """借出一个浏览器；池已满时排队等待，超时返回None"""
+        if self._closed:
+            return None
+        if not await self._slots.acquire(timeout, position_callback):
+            return None
+
+        try:
+            with self._lock:
+                browser = self._idle.pop() if self._idle else None
+            if browser is not None:
+                self.reused += 1
+                return browser
+
+            loop = asyncio.get_running_loop()
+            browser = await loop.run_in_executor(self._executor, self._create_browser)
+            if browser is None:
+                self._slots.release()
+            return browser
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, browser: PooledBrowser, failed: bool = False):
+        """归还浏览器；在后台线程中回收或重新预热，完成后才放回空闲列表"""
+        browser.uses += 1
+        browser.page_ready = False
+        try:
+            self._executor.submit(self._recycle_or_rewarm, browser, failed)
+        except RuntimeError:
+            # 池已关闭
+            self._quit_browser(browser)
+            self._slots.release()
+
+    def shutdown(self):
+        """关闭所有空闲浏览器（借出中的浏览器在归还时关闭）"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for browser in idle:
+            self._quit_browser(browser)
+        self._executor.shutdown(wait=False)
+        logger.info("Vheer浏览器池已关闭")
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+        return {
+            'size': self.size,
+            'max_uses': self.max_uses,
+            'idle': idle,
+            'in_use': self._slots.in_use,
+            'waiting': self._slots.waiting,
+            'created': self.created,
+            'recycled': self.recycled,
+            'reused': self.reused
+        }
+
+
+# 按配置共享的浏览器池（同一配置的多个引擎实例共用一组浏览器）
+_pools: Dict[tuple, VheerBrowserPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_vheer_browser_pool(key: tuple, driver_factory: Callable[[], Any],
+                           size: int = 2, max_uses: int = 10) -> VheerBrowserPool:
+    """获取（或创建）指定配置的浏览器池"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = VheerBrowserPool(driver_factory, size=size, max_uses=max_uses)
+            _pools[key] = pool
+        return pool
+
+
+def shutdown_vheer_browser_pools():
+    """关闭所有浏览器池（应用退出时调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
@@ -9,11 +9,13 @@ import time
 import asyncio
 import base64
 import logging
+import uuid
 from typing import Optional, Callable, Dict, List
 from pathlib import Path
 
 from ..video_engine_base import VideoGenerationEngine, VideoEngineType, VideoEngineStatus
 from ..video_engine_base import VideoGenerationConfig, VideoGenerationResult, VideoEngineInfo
+from .vheer_browser_pool import VHEER_APP_URL, VheerBrowserPool, get_vheer_browser_pool
 from src.utils.logger import logger
 
 
@@ -27,9 +29,13 @@ class VheerVideoEngine(VideoGenerationEngine):
         self.output_dir = self.config.get('output_dir', 'output/videos/vheer')
         self.headless = self.config.get('headless', True)
         self.max_wait_time = self.config.get('max_wait_time', 300)  # 5分钟超时
-        self.max_concurrent = self.config.get('max_concurrent', 1)  # 默认单并发
+        # 浏览器池：同时保持N个已打开页面的浏览器，每个浏览器使用K次后重建
+        self.browser_pool_size = self.config.get('browser_pool_size', self.config.get('max_concurrent', 2))
+        self.browser_max_uses = self.config.get('browser_max_uses', 10)
+        self.browser_acquire_timeout = self.config.get('browser_acquire_timeout', 600)
+        self.max_concurrent = self.browser_pool_size
         self.current_tasks = 0
-        
+
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -60,13 +66,15 @@ class VheerVideoEngine(VideoGenerationEngine):
                 self.last_error = "ChromeDriver不可用"
                 return False
                 
-            # 测试浏览器启动
-            if not await self._test_browser_startup():
+            # 预热浏览器池（同时验证浏览器可以启动）
+            ready = await self._get_browser_pool().warm_up()
+            if ready == 0:
                 logger.error("❌ 浏览器启动测试失败")
                 self.status = VideoEngineStatus.ERROR
                 self.last_error = "浏览器启动失败"
                 return False
-                
+            logger.info(f"✅ Vheer浏览器池已预热: {ready}/{self.browser_pool_size}")
+
             self.status = VideoEngineStatus.IDLE
             logger.info("✅ Vheer视频引擎初始化成功")
             return True
@@ -96,32 +104,6 @@ class VheerVideoEngine(VideoGenerationEngine):
             logger.error(f"检查ChromeDriver失败: {e}")
             return False
             
-    async def _test_browser_startup(self) -> bool:
-        """测试浏览器启动"""
-        try:
-            from selenium import webdriver
-            from selenium.webdriver.chrome.options import Options
-            
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            
-            driver = webdriver.Chrome(options=chrome_options)
-            
-            try:
-                driver.get("https://www.google.com")
-                title = driver.title
-                logger.info(f"✅ 浏览器测试成功，页面标题: {title}")
-                return True
-            finally:
-                driver.quit()
-                
-        except Exception as e:
-            logger.error(f"浏览器启动测试失败: {e}")
-            return False
-            
     async def test_connection(self) -> bool:
         """测试连接"""
         try:
@@ -179,6 +161,20 @@ class VheerVideoEngine(VideoGenerationEngine):
             max_concurrent_tasks=self.max_concurrent
         )
 
+    def _get_browser_pool(self) -> VheerBrowserPool:
+        """获取当前无头模式对应的共享浏览器池"""
+        headless = self.headless
+        return get_vheer_browser_pool(
+            ('vheer', headless),
+            lambda: self._create_driver(headless),
+            size=self.browser_pool_size,
+            max_uses=self.browser_max_uses
+        )
+
+    def get_pool_status(self) -> Dict:
+        """获取浏览器池状态"""
+        return self._get_browser_pool().get_status()
+
     async def _translate_prompt_to_english(self, prompt: str) -> str:
         """将提示词翻译为英文"""
         if not prompt:
@@ -238,14 +234,8 @@ class VheerVideoEngine(VideoGenerationEngine):
                            progress_callback: Optional[Callable] = None,
                            project_manager=None, current_project_name=None) -> VideoGenerationResult:
         """生成视频"""
-        
-        # 检查并发限制
-        if self.current_tasks >= self.max_concurrent:
-            return VideoGenerationResult(
-                success=False,
-                error_message=f"超过最大并发限制 ({self.max_concurrent})"
-            )
-            
+
+        # 并发由浏览器池控制：池中浏览器都被占用时排队等待
         self.current_tasks += 1
         self.status = VideoEngineStatus.BUSY
         
@@ -276,22 +266,30 @@ class VheerVideoEngine(VideoGenerationEngine):
                 english_prompt = await self._translate_prompt_to_english(config.input_prompt)
 
             if progress_callback:
-                progress_callback("初始化浏览器...")
-                
-            # 设置浏览器
-            driver = await self._setup_browser()
-            if not driver:
+                progress_callback("获取浏览器...")
+
+            # 从浏览器池借出已预热的浏览器
+            pool = self._get_browser_pool()
+
+            def on_queue_position(ahead: int):
+                if progress_callback and ahead > 0:
+                    progress_callback(f"等待空闲浏览器，前面还有 {ahead} 个任务...")
+
+            browser = await pool.acquire(self.browser_acquire_timeout, on_queue_position)
+            if not browser:
                 return VideoGenerationResult(
                     success=False,
                     error_message="浏览器设置失败"
                 )
-                
+
+            failed = True
             try:
                 # 执行视频生成流程
                 result = await self._execute_video_generation(
-                    driver, config, progress_callback
+                    browser.driver, config, progress_callback, page_ready=browser.page_ready
                 )
-                
+                failed = not result.success
+
                 if result.success:
                     self.success_count += 1
                     logger.info(f"✅ Vheer视频生成成功: {result.video_path}")
@@ -302,8 +300,9 @@ class VheerVideoEngine(VideoGenerationEngine):
                 return result
                 
             finally:
-                driver.quit()
-                
+                # 失败的浏览器页面状态不可信，归还后回收重建；成功的重新加载页面留给下一个任务
+                pool.release(browser, failed=failed)
+
         except Exception as e:
             self.error_count += 1
             logger.error(f"❌ Vheer视频生成异常: {e}")
@@ -319,57 +318,64 @@ class VheerVideoEngine(VideoGenerationEngine):
     async def _setup_browser(self):
         """设置浏览器"""
         try:
-            from selenium import webdriver
-            from selenium.webdriver.chrome.options import Options
-            
-            chrome_options = Options()
-            
-            if self.headless:
-                chrome_options.add_argument("--headless")
-                
-            # 基础设置
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1920,1080")
-            chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            
-            # 模拟真实用户
-            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-            
-            driver = webdriver.Chrome(options=chrome_options)
-            
-            # 执行反检测脚本
-            driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            
-            return driver
-            
+            return await asyncio.to_thread(self._create_driver, self.headless)
         except Exception as e:
             logger.error(f"浏览器设置失败: {e}")
             return None
 
+    def _create_driver(self, headless: bool):
+        """创建并配置Chrome浏览器（同步调用，由浏览器池在工作线程中执行）"""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+
+        if headless:
+            chrome_options.add_argument("--headless")
+
+        # 基础设置
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+
+        # 模拟真实用户
+        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+        driver = webdriver.Chrome(options=chrome_options)
+
+        # 执行反检测脚本
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
+        return driver
+
     async def _execute_video_generation(self, driver, config: VideoGenerationConfig,
-                                      progress_callback: Optional[Callable] = None) -> VideoGenerationResult:
+                                      progress_callback: Optional[Callable] = None,
+                                      page_ready: bool = False) -> VideoGenerationResult:
         """执行视频生成流程"""
         try:
             from selenium.webdriver.common.by import By
             from selenium.webdriver.support.ui import WebDriverWait
             from selenium.webdriver.support import expected_conditions as EC
 
-            # 步骤1: 访问页面
-            if progress_callback:
-                progress_callback("访问Vheer图生视频页面...")
+            # 步骤1: 访问页面（浏览器池已预先加载页面时跳过）
+            if page_ready:
+                logger.info("📖 使用已预热的Vheer图生视频页面")
+            else:
+                if progress_callback:
+                    progress_callback("访问Vheer图生视频页面...")
 
-            logger.info("📖 访问Vheer图生视频页面...")
-            driver.get("https://vheer.com/app/image-to-video")
+                logger.info("📖 访问Vheer图生视频页面...")
+                driver.get(VHEER_APP_URL)
 
-            # 等待页面加载
-            WebDriverWait(driver, 30).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            await asyncio.sleep(5)  # 额外等待JavaScript加载
+                # 等待页面加载
+                WebDriverWait(driver, 30).until(
+                    lambda d: d.execute_script("return document.readyState") == "complete"
+                )
+                await asyncio.sleep(5)  # 额外等待JavaScript加载
 
             # 检查页面是否正确加载
             try:
@@ -823,7 +829,8 @@ class VheerVideoEngine(VideoGenerationEngine):
                 # 默认使用webm，因为Vheer主要提供webm格式
                 file_ext = '.webm'
 
-            filename = f"vheer_video_{timestamp}{file_ext}"
+            # 多个浏览器并行时同一秒内可能完成多个视频，追加随机后缀避免互相覆盖
+            filename = f"vheer_video_{timestamp}_{uuid.uuid4().hex[:6]}{file_ext}"
             filepath = os.path.join(self.output_dir, filename)
 
             logger.info(f"📥 开始下载视频: {filename}")
@@ -918,14 +925,11 @@ class VheerVideoEngine(VideoGenerationEngine):
     async def _remove_watermark(self, video_path: str) -> Optional[str]:
         """去除视频左上角的水印区域"""
         try:
-            import subprocess
             from pathlib import Path
+            from src.utils.ffmpeg_runner import run_ffmpeg
 
             # 检查FFmpeg是否可用
-            try:
-                subprocess.run(['ffmpeg', '-version'],
-                             capture_output=True, timeout=5)
-            except (subprocess.TimeoutExpired, FileNotFoundError):
+            if not (await run_ffmpeg(['ffmpeg', '-version'], timeout=5)).success:
                 logger.warning("⚠️ FFmpeg未安装，跳过水印处理")
                 return None
 
@@ -945,9 +949,9 @@ class VheerVideoEngine(VideoGenerationEngine):
                 str(cleaned_path)
             ]
 
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            result = await run_ffmpeg(cmd, timeout=120)
 
-            if result.returncode == 0 and cleaned_path.exists():
+            if result.success and cleaned_path.exists():
                 # 删除原始文件，重命名清理后的文件
                 try:
                     video_path.unlink()  # 删除原文件
@@ -958,7 +962,7 @@ class VheerVideoEngine(VideoGenerationEngine):
                     logger.error(f"❌ 文件重命名失败: {e}")
                     return str(cleaned_path)
             else:
-                logger.warning(f"⚠️ 水印处理失败: {result.stderr}")
+                logger.warning(f"⚠️ 水印处理失败: {result.error_message}")
                 return None
 
         except Exception as e:
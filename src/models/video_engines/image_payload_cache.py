@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+图生视频输入图像预处理缓存
+为各视频引擎统一准备输入图像：按引擎支持的分辨率缩放、校验约束、编码为JPEG Base64，
+结果按 (文件内容哈希, 引擎, 目标尺寸/参数) 缓存在内存和磁盘中（均按LRU限制大小），
+重试和重新生成同一镜头时不再重复PIL解码与重新编码。CPU密集的处理放在进程池中执行
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.logger import logger
+
+
+def find_closest_resolution(width: int, height: int,
+                            supported_resolutions: List[Tuple[int, int]]) -> Tuple[int, int]:
+    """找到最接近的支持分辨率，优先保持宽高比"""
+    target_ratio = width / height
+
+    # 首先按照图像方向分类
+    if target_ratio > 1.2:
+        # 横屏图像 (宽 > 高)
+        candidate_resolutions = [(w, h) for w, h in supported_resolutions if w > h]
+    elif target_ratio < 0.8:
+        # 竖屏图像 (高 > 宽)
+        candidate_resolutions = [(w, h) for w, h in supported_resolutions if h > w]
+    else:
+        # 接近正方形的图像
+        candidate_resolutions = [(w, h) for w, h in supported_resolutions if 0.8 <= w / h <= 1.2]
+
+    # 如果没有找到同方向的分辨率，使用所有分辨率
+    if not candidate_resolutions:
+        candidate_resolutions = supported_resolutions
+
+    # 在候选分辨率中找到最佳匹配
+    best_resolution = candidate_resolutions[0]
+    best_score = float('inf')
+
+    for res_width, res_height in candidate_resolutions:
+        res_ratio = res_width / res_height
+
+        # 计算比例差异（权重最高）
+        ratio_diff = abs(target_ratio - res_ratio) / max(target_ratio, res_ratio)
+
+        # 计算面积差异
+        target_area = width * height
+        res_area = res_width * res_height
+        area_diff = abs(target_area - res_area) / max(target_area, res_area)
+
+        # 综合评分（比例权重0.8，面积权重0.2）
+        score = ratio_diff * 0.8 + area_diff * 0.2
+
+        if score < best_score:
+            best_score = score
+            best_resolution = (res_width, res_height)
+
+    return best_resolution
+
+
+@dataclass(frozen=True)
+class ImagePayloadSpec:
+    """引擎对输入图像的要求"""
+    engine: str
+    target_size: Optional[Tuple[int, int]] = None  # 缩放到不超过该尺寸（保持宽高比，不放大）
+    max_short_side: Optional[int] = None  # 短边上限（不放大）
+    quality: int = 90  # JPEG质量
+    min_side: int = 0  # 宽高下限（校验）
+    max_side: int = 0  # 宽高上限（校验，0表示不限）
+    min_ratio: float = 0.0  # 宽高比下限（校验，开区间）
+    max_ratio: float = 0.0  # 宽高比上限（校验，开区间，0表示不限）
+    max_bytes: int = 0  # 编码后大小上限（0表示不限）
+
+
+class ImagePayloadError(Exception):
+    """输入图像不符合引擎要求"""
+    pass
+
+
+def _encode_payload(image_path: str, spec: Dict) -> Dict:
+    """在工作进程中执行：解码、校验、缩放并编码为JPEG（须为模块级函数以便进程池序列化）"""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        source_format = img.format or ''
+        width, height = img.size
+
+        if spec['min_side'] and (width < spec['min_side'] or height < spec['min_side']):
+            return {'error': f"图片尺寸过小 ({width}x{height}，要求不小于{spec['min_side']}px)"}
+        if spec['max_side'] and (width > spec['max_side'] or height > spec['max_side']):
+            return {'error': f"图片尺寸过大 ({width}x{height}，要求不大于{spec['max_side']}px)"}
+        aspect_ratio = width / height
+        if spec['min_ratio'] and aspect_ratio <= spec['min_ratio']:
+            return {'error': f"图片宽高比不符合要求 ({aspect_ratio:.2f}，要求大于{spec['min_ratio']})"}
+        if spec['max_ratio'] and aspect_ratio >= spec['max_ratio']:
+            return {'error': f"图片宽高比不符合要求 ({aspect_ratio:.2f}，要求小于{spec['max_ratio']})"}
+
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        scale = 1.0
+        if spec['target_size']:
+            target_w, target_h = spec['target_size']
+            scale = min(scale, target_w / width, target_h / height)
+        if spec['max_short_side']:
+            scale = min(scale, spec['max_short_side'] / min(width, height))
+        if scale < 1.0:
+            new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            img = img.resize(new_size, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=spec['quality'], optimize=True)
+        data = buffer.getvalue()
+
+    if spec['max_bytes'] and len(data) > spec['max_bytes']:
+        return {'error': f"编码后图片过大 ({len(data) / 1024 / 1024:.1f}MB)"}
+
+    return {
+        'data': data,
+        'width': img.size[0],
+        'height': img.size[1],
+        'source_size': [width, height],
+        'source_format': source_format
+    }
+
+
+class ImagePayloadCache:
+    """输入图像编码结果缓存（内存LRU + 磁盘LRU）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, cache_dir: str = None, max_memory_mb: int = 128, max_disk_mb: int = 1024,
+                 max_workers: int = None):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if cache_dir is None:
+            cache_dir = os.path.join(os.getcwd(), 'temp', 'video_image_payloads')
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+
+        self._cache_lock = threading.RLock()
+        self._memory: OrderedDict = OrderedDict()  # key -> data_url
+        self._memory_bytes = 0
+        self._disk: Optional[OrderedDict] = None  # key -> 文件大小，按最近使用排序，首次访问时扫描目录
+        self._disk_bytes = 0
+        self._file_hashes: Dict[Tuple[str, float, int], str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._executor = None
+
+        # 统计信息
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # 键计算
+    # ------------------------------------------------------------------
+
+    def _file_hash(self, image_path: str) -> str:
+        """文件内容哈希，按 (路径, 修改时间, 大小) 记忆，避免重复读取"""
+        stat = os.stat(image_path)
+        memo_key = (os.path.abspath(image_path), stat.st_mtime, stat.st_size)
+        with self._cache_lock:
+            cached = self._file_hashes.get(memo_key)
+        if cached:
+            return cached
+
+        sha = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._cache_lock:
+            self._file_hashes[memo_key] = digest
+        return digest
+
+    def make_key(self, image_path: str, spec: ImagePayloadSpec) -> str:
+        payload = json.dumps({'file': self._file_hash(image_path), 'spec': asdict(spec)}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # 缓存读写
+    # ------------------------------------------------------------------
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def _load_disk_index(self):
+        """扫描磁盘缓存目录，按文件修改时间（命中时会刷新）建立LRU顺序；调用方须持有 _cache_lock"""
+        if self._disk is not None:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for sub in os.scandir(self.cache_dir):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if not entry.name.endswith('.jpg'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        entries.sort()
+        self._disk = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_bytes = sum(size for _, _, size in entries)
+
+    def _touch_disk(self, key: str):
+        """磁盘命中：移到LRU末尾并刷新修改时间，使重启后顺序仍然有效"""
+        with self._cache_lock:
+            self._load_disk_index()
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        try:
+            os.utime(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _add_disk(self, key: str, size: int):
+        """登记新写入的磁盘缓存，超过上限时删除最久未使用的文件"""
+        evicted = []
+        with self._cache_lock:
+            self._load_disk_index()
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._disk_bytes += size
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                pass
+        if evicted:
+            logger.debug(f"图像编码磁盘缓存超过上限，清理 {len(evicted)} 个最久未使用的文件")
+
+    def _remember(self, key: str, data_url: str):
+        with self._cache_lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data_url
+            self._memory_bytes += len(data_url)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._cache_lock:
+            data_url = self._memory.get(key)
+            if data_url is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data_url
+
+        disk_path = self._disk_path(key)
+        if os.path.exists(disk_path):
+            try:
+                with open(disk_path, 'rb') as f:
+                    data_url = self._to_data_url(f.read())
+                self._remember(key, data_url)
+                self._touch_disk(key)
+                self.disk_hits += 1
+                return data_url
+            except OSError as e:
+                logger.debug(f"读取图像编码缓存失败 {disk_path}: {e}")
+        return None
+
+    def _store(self, key: str, data: bytes) -> str:
+        disk_path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            tmp_path = f"{disk_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+            self._add_disk(key, len(data))
+        except OSError as e:
+            logger.debug(f"写入图像编码缓存失败 {disk_path}: {e}")
+        data_url = self._to_data_url(data)
+        self._remember(key, data_url)
+        return data_url
+
+    @staticmethod
+    def _to_data_url(data: bytes) -> str:
+        return f"data:image/jpeg;base64,{base64.b64encode(data).decode('utf-8')}"
+
+    # ------------------------------------------------------------------
+    # 编码
+    # ------------------------------------------------------------------
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._cache_lock:
+                if self._executor is None:
+                    try:
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    except (OSError, NotImplementedError) as e:
+                        logger.warning(f"无法创建图像编码进程池，改用线程池: {e}")
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                            thread_name_prefix="ImagePayload")
+        return self._executor
+
+    def _finish_encoding(self, image_path: str, spec: ImagePayloadSpec, key: str, result: Dict) -> str:
+        if 'error' in result:
+            raise ImagePayloadError(f"{spec.engine}: {result['error']}: {image_path}")
+        data_url = self._store(key, result['data'])
+        logger.info(f"{spec.engine} 输入图像已编码: {os.path.basename(image_path)} "
+                    f"{result['source_size'][0]}x{result['source_size'][1]} -> {result['width']}x{result['height']}, "
+                    f"{len(result['data']) / 1024:.0f}KB")
+        return data_url
+
+    async def prepare(self, image_path: str, spec: ImagePayloadSpec) -> str:
+        """获取引擎可直接使用的 data URL（相同图像和参数只编码一次）
+
+        Raises:
+            ImagePayloadError: 图像不符合引擎要求
+        """
+        key = self.make_key(image_path, spec)
+        data_url = self._lookup(key)
+        if data_url is not None:
+            return data_url
+
+        loop = asyncio.get_running_loop()
+        with self._cache_lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight.get_loop() is loop:
+                owner = False
+            else:
+                inflight = loop.create_future()
+                self._inflight[key] = inflight
+                owner = True
+        if not owner:
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        try:
+            try:
+                result = await loop.run_in_executor(self._get_executor(), _encode_payload, image_path, asdict(spec))
+            except BrokenProcessPool as e:
+                # 进程池损坏（如工作进程被杀）时丢弃，下次重建；本次在当前线程编码
+                logger.warning(f"图像编码进程池异常，直接编码: {e}")
+                with self._cache_lock:
+                    self._executor = None
+                result = _encode_payload(image_path, asdict(spec))
+            data_url = self._finish_encoding(image_path, spec, key, result)
+            inflight.set_result(data_url)
+            return data_url
+        except BaseException as e:
+            if not inflight.done():
+                inflight.set_exception(e)
+                inflight.exception()  # 避免无人等待时的警告
+            raise
+        finally:
+            with self._cache_lock:
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+
+    def prepare_sync(self, image_path: str, spec: ImagePayloadSpec) -> str:
+        """同步版本，供非异步调用方使用（在当前线程编码）"""
+        key = self.make_key(image_path, spec)
+        data_url = self._lookup(key)
+        if data_url is not None:
+            return data_url
+        self.misses += 1
+        return self._finish_encoding(image_path, spec, key, _encode_payload(image_path, asdict(spec)))
+
+    def clear_memory(self):
+        with self._cache_lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def shutdown(self):
+        with self._cache_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict:
+        with self._cache_lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_mb': self._memory_bytes / 1024 / 1024,
+                'disk_entries': len(self._disk) if self._disk is not None else 0,
+                'disk_mb': self._disk_bytes / 1024 / 1024,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses
+            }
+
+
+def get_image_payload_cache() -> ImagePayloadCache:
+    """获取全局输入图像编码缓存"""
+    return ImagePayloadCache()
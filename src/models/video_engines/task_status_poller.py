@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+"""
+视频生成异步任务状态轮询器
+所有引擎共享一个后台轮询调度器：按提供商批量查询任务状态，根据该提供商实测的
+典型完成时间自适应调整轮询间隔，并把进行中的任务ID持久化到磁盘，
+应用重启后可以继续轮询，避免丢失已付费的生成任务
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from src.utils.logger import logger
+
+
+# 任务状态
+TASK_PENDING = "pending"
+TASK_SUCCEEDED = "succeeded"
+TASK_FAILED = "failed"
+
+# 这些状态码说明任务不存在或无权查询，重试不会改变结果
+TERMINAL_HTTP_STATUSES = (401, 403, 404)
+# 已结束（成功/失败）的任务记录保留时间，之后从磁盘记录中清理
+FINISHED_RECORD_RETENTION = 3 * 24 * 3600
+
+
+class TaskQueryError(Exception):
+    """查询任务状态时服务端返回了错误状态码"""
+
+    def __init__(self, http_status: int, message: str):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+@dataclass
+class RemoteTaskStatus:
+    """提供商返回的任务状态（统一格式）"""
+    state: str = TASK_PENDING
+    video_url: str = ""
+    error: str = ""
+    raw_status: str = ""
+
+
+@dataclass
+class PollingProvider:
+    """提供商轮询配置
+
+    query_one: 查询单个任务，签名 (session, task_id) -> RemoteTaskStatus
+    query_batch: 可选，批量查询，签名 (session, task_ids) -> {task_id: RemoteTaskStatus}；
+                 返回中缺失的任务会回退到 query_one
+    """
+    name: str
+    query_one: Callable[[aiohttp.ClientSession, str], Awaitable[RemoteTaskStatus]]
+    query_batch: Optional[Callable[[aiohttp.ClientSession, List[str]], Awaitable[Dict[str, RemoteTaskStatus]]]] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    min_interval: float = 5.0  # 最短轮询间隔（秒）
+    max_interval: float = 60.0  # 最长轮询间隔（秒）
+    typical_duration: float = 90.0  # 没有实测数据时的典型完成时间（秒）
+    max_wait: float = 1800.0  # 单个任务最长等待时间（秒）
+    max_parallel_queries: int = 4  # 不支持批量查询时的并发查询数
+    max_consecutive_errors: int = 8
+
+
+class _TrackedTask:
+    """被轮询的任务"""
+
+    def __init__(self, provider: str, task_id: str, submitted_at: float, metadata: Dict[str, Any]):
+        self.provider = provider
+        self.task_id = task_id
+        self.submitted_at = submitted_at
+        self.metadata = metadata
+        self.next_poll_at = 0.0
+        self.consecutive_errors = 0
+        self.querying = False
+        self.waiters: List[tuple] = []  # (loop, future, progress_callback)
+
+
+class TaskStatusPoller:
+    """共享的任务状态轮询调度器（运行在独立的后台事件循环线程中）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, state_file: str = None):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if state_file is None:
+            state_file = os.path.join(os.getcwd(), 'temp', 'video_tasks', 'inflight_tasks.json')
+        self.state_file = state_file
+
+        self._providers: Dict[str, PollingProvider] = {}
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._persisted: Dict[str, Dict[str, Any]] = self._load_state()
+        self._prune_finished()
+        self._durations: Dict[str, deque] = {}
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._state_lock = threading.RLock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _key(provider: str, task_id: str) -> str:
+        return f"{provider}:{task_id}"
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"加载进行中的视频任务记录失败: {e}")
+        return {}
+
+    def _save_state(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._persisted, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.warning(f"保存进行中的视频任务记录失败: {e}")
+
+    def _prune_finished(self) -> bool:
+        """清理超过保留时间的已结束任务记录（结果未被取走的成功任务，其视频地址通常也已过期）"""
+        cutoff = time.time() - FINISHED_RECORD_RETENTION
+        expired = [key for key, record in self._persisted.items()
+                   if record.get('state') in (TASK_SUCCEEDED, TASK_FAILED) and
+                   record.get('updated_at', record.get('submitted_at', 0)) < cutoff]
+        for key in expired:
+            del self._persisted[key]
+        return bool(expired)
+
+    def _update_persisted(self, provider: str, task_id: str, **fields):
+        with self._state_lock:
+            record = self._persisted.setdefault(self._key(provider, task_id), {
+                'provider': provider,
+                'task_id': task_id,
+                'submitted_at': time.time(),
+                'state': TASK_PENDING,
+                'metadata': {}
+            })
+            record.update(fields)
+            record['updated_at'] = time.time()
+            self._prune_finished()
+            self._save_state()
+
+    def get_task_records(self, provider: Optional[str] = None, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取持久化的任务记录（可按提供商和状态过滤）"""
+        with self._state_lock:
+            return [dict(r) for r in self._persisted.values()
+                    if (provider is None or r.get('provider') == provider) and
+                    (state is None or r.get('state') == state)]
+
+    def forget_task(self, provider: str, task_id: str):
+        """结果已被取走（视频已下载），删除持久化记录"""
+        with self._state_lock:
+            if self._persisted.pop(self._key(provider, task_id), None) is not None:
+                self._save_state()
+
+    # ------------------------------------------------------------------
+    # 后台事件循环
+    # ------------------------------------------------------------------
+
+    def _ensure_running(self):
+        with self._state_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self._loop)
+                self._wakeup = asyncio.Event()
+                self._loop.create_task(self._scheduler())
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, daemon=True, name="TaskStatusPoller")
+            self._thread.start()
+            ready.wait()
+            logger.info("视频任务状态轮询器已启动")
+
+    def _wake(self):
+        if self._loop and self._wakeup:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+    async def _scheduler(self):
+        """调度主循环：找出到期任务，按提供商分组批量查询"""
+        while True:
+            now = time.time()
+            due: Dict[str, List[_TrackedTask]] = {}
+            next_wake = now + 60.0
+
+            with self._state_lock:
+                for task in self._tasks.values():
+                    if task.querying or task.provider not in self._providers:
+                        continue
+                    if task.next_poll_at <= now:
+                        task.querying = True
+                        due.setdefault(task.provider, []).append(task)
+                    else:
+                        next_wake = min(next_wake, task.next_poll_at)
+
+            for provider_name, tasks in due.items():
+                asyncio.ensure_future(self._poll_provider(self._providers[provider_name], tasks))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.5, next_wake - time.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _get_session(self, provider: PollingProvider) -> aiohttp.ClientSession:
+        session = self._sessions.get(provider.name)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=provider.max_parallel_queries, keepalive_timeout=30),
+                headers=provider.headers,
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+            self._sessions[provider.name] = session
+        return session
+
+    async def _poll_provider(self, provider: PollingProvider, tasks: List[_TrackedTask]):
+        """查询一个提供商的一批到期任务"""
+        try:
+            session = await self._get_session(provider)
+            results: Dict[str, Any] = {}
+
+            if provider.query_batch and len(tasks) > 1:
+                try:
+                    results.update(await provider.query_batch(session, [t.task_id for t in tasks]))
+                except Exception as e:
+                    logger.debug(f"{provider.name} 批量查询失败，改为逐个查询: {e}")
+
+            remaining = [t for t in tasks if t.task_id not in results]
+            if remaining:
+                semaphore = asyncio.Semaphore(provider.max_parallel_queries)
+
+                async def query(task: _TrackedTask):
+                    async with semaphore:
+                        try:
+                            return await provider.query_one(session, task.task_id)
+                        except Exception as e:
+                            return e
+
+                statuses = await asyncio.gather(*(query(t) for t in remaining))
+                for task, status in zip(remaining, statuses):
+                    results[task.task_id] = status
+
+            for task in tasks:
+                self._handle_result(provider, task, results.get(task.task_id))
+
+        except Exception as e:
+            logger.error(f"轮询 {provider.name} 任务状态异常: {e}")
+            for task in tasks:
+                self._handle_result(provider, task, e)
+        finally:
+            with self._state_lock:
+                for task in tasks:
+                    task.querying = False
+            # 让调度器按新的轮询时间重新计算下次唤醒
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # 结果处理
+    # ------------------------------------------------------------------
+
+    def _typical_duration(self, provider: PollingProvider) -> float:
+        samples = self._durations.get(provider.name)
+        if not samples:
+            return provider.typical_duration
+        ordered = sorted(samples)
+        return ordered[len(ordered) // 2]
+
+    def _next_interval(self, provider: PollingProvider, elapsed: float) -> float:
+        """自适应轮询间隔：离预计完成时间越远间隔越长，接近时按最短间隔轮询"""
+        typical = self._typical_duration(provider)
+        if elapsed < 0.7 * typical:
+            interval = 0.7 * typical - elapsed
+        elif elapsed < 1.5 * typical:
+            interval = provider.min_interval
+        else:
+            interval = provider.min_interval * (1 + (elapsed - 1.5 * typical) / typical)
+        return min(provider.max_interval, max(provider.min_interval, interval))
+
+    def _handle_result(self, provider: PollingProvider, task: _TrackedTask, status):
+        now = time.time()
+        elapsed = now - task.submitted_at
+
+        if isinstance(status, RemoteTaskStatus) and status.state == TASK_SUCCEEDED:
+            self._durations.setdefault(provider.name, deque(maxlen=20)).append(elapsed)
+            logger.info(f"{provider.name} 任务 {task.task_id} 完成，用时 {elapsed:.0f} 秒")
+            self._update_persisted(provider.name, task.task_id, state=TASK_SUCCEEDED, video_url=status.video_url)
+            self._finish(task, result=status.video_url)
+            return
+
+        if isinstance(status, RemoteTaskStatus) and status.state == TASK_FAILED:
+            self._update_persisted(provider.name, task.task_id, state=TASK_FAILED, error=status.error)
+            self._finish(task, error=Exception(f"视频生成失败: {status.error or '未知错误'}"))
+            return
+
+        http_status = getattr(status, 'http_status', None) or getattr(status, 'status', None)
+        if isinstance(status, Exception) and http_status in TERMINAL_HTTP_STATUSES:
+            error = f"查询任务状态失败 (状态码: {http_status})，任务不存在或无权访问: {status}"
+            logger.error(f"{provider.name} 任务 {task.task_id} {error}")
+            self._update_persisted(provider.name, task.task_id, state=TASK_FAILED, error=error)
+            self._finish(task, error=Exception(error))
+            return
+
+        if elapsed > provider.max_wait:
+            error = f"视频生成超时 (超过 {int(provider.max_wait // 60)} 分钟)"
+            self._update_persisted(provider.name, task.task_id, state=TASK_FAILED, error=error)
+            self._finish(task, error=Exception(error))
+            return
+
+        if isinstance(status, RemoteTaskStatus):
+            task.consecutive_errors = 0
+            interval = self._next_interval(provider, elapsed)
+            self._notify_progress(task, f"视频生成中... ({int(elapsed)}s, 状态: {status.raw_status or status.state})")
+        else:
+            # 网络/服务器错误：指数退避，连续错误过多则放弃等待（任务记录保留，可稍后恢复）
+            task.consecutive_errors += 1
+            logger.warning(f"查询 {provider.name} 任务 {task.task_id} 失败: {status} "
+                           f"(连续错误: {task.consecutive_errors}/{provider.max_consecutive_errors})")
+            if task.consecutive_errors >= provider.max_consecutive_errors:
+                self._finish(task, error=Exception(
+                    f"连续{provider.max_consecutive_errors}次查询失败，请检查网络连接或稍后重试: {status}"),
+                    keep_tracking=False)
+                return
+            interval = min(120.0, provider.min_interval * (1.5 ** task.consecutive_errors))
+
+        task.next_poll_at = now + interval
+
+    def _notify_progress(self, task: _TrackedTask, message: str):
+        for loop, future, progress_callback in task.waiters:
+            if progress_callback and not future.done():
+                try:
+                    loop.call_soon_threadsafe(progress_callback, message)
+                except RuntimeError:
+                    pass
+
+    def _finish(self, task: _TrackedTask, result: Any = None, error: Exception = None, keep_tracking: bool = False):
+        with self._state_lock:
+            if not keep_tracking:
+                self._tasks.pop(self._key(task.provider, task.task_id), None)
+            waiters, task.waiters = task.waiters, []
+
+        for loop, future, _ in waiters:
+            def resolve(fut=future):
+                if fut.done():
+                    return
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(result)
+            try:
+                loop.call_soon_threadsafe(resolve)
+            except RuntimeError:
+                pass
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+
+    def register_provider(self, provider: PollingProvider):
+        """注册（或更新）提供商，并恢复磁盘上记录的该提供商未完成任务"""
+        with self._state_lock:
+            old = self._providers.get(provider.name)
+            self._providers[provider.name] = provider
+            if old is not None and old.headers != provider.headers:
+                session = self._sessions.pop(provider.name, None)
+                if session is not None and self._loop:
+                    asyncio.run_coroutine_threadsafe(session.close(), self._loop)
+
+            resumed = 0
+            for record in self._persisted.values():
+                key = self._key(record['provider'], record['task_id'])
+                if (record.get('provider') == provider.name and
+                        record.get('state') == TASK_PENDING and key not in self._tasks):
+                    self._tasks[key] = _TrackedTask(provider.name, record['task_id'],
+                                                    record.get('submitted_at', time.time()),
+                                                    record.get('metadata', {}))
+                    resumed += 1
+
+        if resumed:
+            logger.info(f"恢复轮询 {provider.name} 的 {resumed} 个未完成任务")
+        self._ensure_running()
+        self._wake()
+
+    def track_task(self, provider: str, task_id: str, metadata: Optional[Dict[str, Any]] = None,
+                   submitted_at: Optional[float] = None) -> _TrackedTask:
+        """登记一个已提交的任务（持久化），开始轮询"""
+        key = self._key(provider, task_id)
+        with self._state_lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = _TrackedTask(provider, task_id, submitted_at or time.time(), metadata or {})
+                provider_config = self._providers.get(provider)
+                if provider_config:
+                    task.next_poll_at = task.submitted_at + self._next_interval(provider_config, 0.0)
+                self._tasks[key] = task
+                self._update_persisted(provider, task_id, submitted_at=task.submitted_at,
+                                       state=TASK_PENDING, metadata=task.metadata)
+        self._ensure_running()
+        self._wake()
+        return task
+
+    async def wait_for_task(self, provider: str, task_id: str,
+                            progress_callback: Optional[Callable] = None,
+                            metadata: Optional[Dict[str, Any]] = None,
+                            timeout: Optional[float] = None) -> str:
+        """等待任务完成并返回视频URL（可在任意事件循环中调用）
+
+        Args:
+            timeout: 最长等待时间（秒），默认取提供商的 max_wait 再留出查询余量
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # 检查已记录的结果与登记等待者在同一把锁内完成：
+        # 恢复的任务可能在两者之间结束，分开做会留下永远不会被设置结果的 future
+        with self._state_lock:
+            record = self._persisted.get(self._key(provider, task_id))
+            if record and record.get('state') == TASK_SUCCEEDED and record.get('video_url'):
+                return record['video_url']
+            if record and record.get('state') == TASK_FAILED and self._key(provider, task_id) not in self._tasks:
+                raise Exception(record.get('error') or '视频生成失败')
+            task = self.track_task(provider, task_id, metadata)
+            task.waiters.append((loop, future, progress_callback))
+
+        if timeout is None:
+            provider_config = self._providers.get(provider)
+            timeout = (provider_config.max_wait if provider_config else 1800.0) + 300.0
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._state_lock:
+                task.waiters = [w for w in task.waiters if w[1] is not future]
+            raise Exception(f"等待视频任务结果超时 ({timeout:.0f} 秒)，任务记录已保留，可稍后恢复")
+        except asyncio.CancelledError:
+            # 调用方取消时只移除等待者，任务继续在后台轮询并记录结果
+            with self._state_lock:
+                task.waiters = [w for w in task.waiters if w[1] is not future]
+            raise
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取轮询器状态"""
+        with self._state_lock:
+            per_provider: Dict[str, int] = {}
+            for task in self._tasks.values():
+                per_provider[task.provider] = per_provider.get(task.provider, 0) + 1
+            return {
+                'tracked_tasks': len(self._tasks),
+                'per_provider': per_provider,
+                'typical_durations': {
+                    name: self._typical_duration(provider) for name, provider in self._providers.items()
+                }
+            }
+
+
+def get_task_status_poller() -> TaskStatusPoller:
+    """获取全局任务状态轮询器"""
+    return TaskStatusPoller()
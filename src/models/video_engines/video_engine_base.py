@@ -10,6 +10,7 @@ from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Any, Callable
 import asyncio
 from src.utils.logger import logger
+from .video_job_journal import get_video_job_journal
 
 
 class VideoEngineType(Enum):
@@ -63,6 +64,9 @@ class VideoGenerationConfig:
     # 引擎特定参数
     engine_specific_params: Dict[str, Any] = field(default_factory=dict)
 
+    # 作业日志ID（由 VideoGenerationService 按镜头分配，用于重启后恢复远程任务）
+    job_id: str = ""
+
 
 @dataclass
 class VideoGenerationResult:
@@ -138,6 +142,25 @@ class VideoGenerationEngine(ABC):
         """获取引擎信息"""
         pass
     
+    async def resume_task(self, task_id: str, config: VideoGenerationConfig,
+                          progress_callback: Optional[Callable] = None,
+                          project_manager=None, current_project_name=None) -> VideoGenerationResult:
+        """恢复此前提交的远程任务：等待完成并下载结果（不重新提交）
+
+        只有基于异步任务ID的引擎需要实现，默认不支持
+        """
+        return VideoGenerationResult(
+            success=False,
+            error_message=f"{self.engine_type.value} 不支持恢复远程任务",
+            engine_type=self.engine_type
+        )
+
+    def _record_remote_task(self, config: VideoGenerationConfig, provider: str, task_id: str):
+        """远程任务提交成功后立即写入作业日志，保证应用退出后任务ID不会丢失"""
+        if not config.job_id:
+            return
+        get_video_job_journal().record_task(config.job_id, self.engine_type.value, provider, task_id)
+
     def get_status(self) -> VideoEngineStatus:
         """获取引擎状态"""
         return self.status
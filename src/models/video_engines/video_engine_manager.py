@@ -15,6 +15,8 @@ from .video_engine_base import (
     VideoGenerationConfig, VideoGenerationResult
 )
 from .video_engine_factory import get_video_engine_factory
+from ..engine_health import CircuitState, get_engine_health_monitor
+from src.utils.admission_controller import AdmissionController
 from src.utils.logger import logger
 
 
@@ -77,12 +79,19 @@ class VideoEngineManager:
             self.config.get('engine_preferences', ['free', 'quality'])
         ]
         
-        # 并发控制
+        # 并发控制：全局上限 + 每个引擎自身的上限，均为公平FIFO排队
         self.concurrent_limit = self.config.get('concurrent_limit', 3)
+        self.queue_timeout = self.config.get('queue_timeout')  # 排队超时（秒），None表示一直等待
+        # 用户指定的引擎全部熔断时，等待其进入半开探测的最长时间（秒）
+        self.pinned_wait_timeout = self.config.get('pinned_wait_timeout', 900.0)
+        self.admission = AdmissionController(self.concurrent_limit, name="video")
         self._active_tasks = 0
         
         # 性能统计
         self._performance_stats: Dict[VideoEngineType, VideoEnginePerformance] = {}
+
+        # 引擎健康监控（滚动延迟/错误率窗口与熔断器）
+        self.health_monitor = get_engine_health_monitor('video')
         
         # 引擎优先级（数字越小优先级越高）
         self.engine_priorities = {
@@ -105,12 +114,54 @@ class VideoEngineManager:
                            progress_callback: Optional[Callable] = None,
                            project_manager=None, current_project_name=None) -> VideoGenerationResult:
         """生成视频（主要接口）"""
-        # 🔧 修复：改进并发控制，等待而不是立即失败
-        while self._active_tasks >= self.concurrent_limit:
-            logger.debug(f"等待并发槽位释放，当前活跃任务: {self._active_tasks}/{self.concurrent_limit}")
-            await asyncio.sleep(0.1)
+        # 公平FIFO排队等待全局并发名额，排队位置通过进度回调反馈给界面
+        def report_position(ahead: int):
+            if progress_callback and ahead > 0:
+                progress_callback(f"排队等待中，前面还有 {ahead} 个任务...")
+
+        if not await self.admission.acquire_global(self.queue_timeout, report_position):
+            return VideoGenerationResult(
+                success=False,
+                error_message=f"等待视频生成并发名额超时（{self.queue_timeout} 秒）"
+            )
 
-        return await self._generate_video_internal(config, preferred_engines, progress_callback, project_manager, current_project_name)
+        try:
+            return await self._generate_video_internal(config, preferred_engines, progress_callback, project_manager, current_project_name)
+        finally:
+            self.admission.release_global()
+
+    async def resume_task(self, engine_type: VideoEngineType, task_id: str,
+                          config: VideoGenerationConfig,
+                          progress_callback: Optional[Callable] = None,
+                          project_manager=None, current_project_name=None) -> VideoGenerationResult:
+        """恢复已提交的远程任务，与新提交共用全局排队和引擎并发名额"""
+        def report_position(ahead: int):
+            if progress_callback and ahead > 0:
+                progress_callback(f"排队等待中，前面还有 {ahead} 个任务...")
+
+        if not await self.admission.acquire_global(self.queue_timeout, report_position):
+            return VideoGenerationResult(
+                success=False,
+                error_message=f"等待视频生成并发名额超时（{self.queue_timeout} 秒）",
+                engine_type=engine_type
+            )
+
+        try:
+            engine = await self._get_engine(engine_type)
+            if engine is None:
+                return VideoGenerationResult(success=False, error_message=f"引擎 {engine_type.value} 不可用",
+                                             engine_type=engine_type)
+
+            engine_key = engine_type.value
+            self.admission.set_key_limit(engine_key, getattr(engine, 'max_concurrent_tasks', self.concurrent_limit))
+            await self.admission.acquire(engine_key)
+            try:
+                return await engine.resume_task(task_id, config, progress_callback,
+                                                project_manager, current_project_name)
+            finally:
+                self.admission.release(engine_key)
+        finally:
+            self.admission.release_global()
 
     async def _generate_video_internal(self, config: VideoGenerationConfig,
                                      preferred_engines: Optional[List[VideoEngineType]] = None,
@@ -121,119 +172,136 @@ class VideoEngineManager:
         self._active_tasks += 1
 
         try:
-            # 选择最佳引擎
-            engine = await self._select_best_engine(config, preferred_engines)
-            if not engine:
+            # 按路由策略排序候选引擎（用户指定引擎时只在指定范围内切换）
+            candidates = await self._rank_engines(preferred_engines, progress_callback)
+            if not candidates:
                 return VideoGenerationResult(
                     success=False,
                     error_message="没有可用的视频生成引擎"
                 )
 
-            # 执行生成（带重试机制）
-            result = await self._generate_with_retry(engine, config, progress_callback, project_manager, current_project_name)
+            last_error = ""
+            for engine_type in candidates:
+                engine = await self._get_engine(engine_type)
+                if not engine:
+                    continue
+
+                # 等待引擎自身的并发名额，避免引擎因“并发任务已满”直接失败
+                engine_key = engine_type.value
+                self.admission.set_key_limit(engine_key, getattr(engine, 'max_concurrent_tasks', self.concurrent_limit))
+                await self.admission.acquire(engine_key)
+
+                # 执行生成（带重试机制），引擎熔断后立即切换到下一个
+                engine_start = time.time()
+                try:
+                    result = await self._generate_with_retry(engine, config, progress_callback, project_manager, current_project_name)
+                finally:
+                    self.admission.release(engine_key)
+
+                # 更新性能统计
+                self._update_performance_stats(engine.engine_type, result.success, time.time() - engine_start)
+
+                if result.success or result.error_message == "视频生成任务被取消":
+                    return result
 
-            # 更新性能统计
-            generation_time = time.time() - start_time
-            self._update_performance_stats(engine.engine_type, result.success, generation_time)
+                last_error = result.error_message
+                logger.warning(f"视频引擎 {engine_type.value} 生成失败，切换到下一个引擎")
 
-            return result
+            return VideoGenerationResult(
+                success=False,
+                error_message=f"所有可用引擎均生成失败，耗时 {time.time() - start_time:.1f} 秒。最后错误: {last_error or '没有可用的视频生成引擎'}"
+            )
 
         finally:
             self._active_tasks -= 1
-    
+
+    async def _get_engine(self, engine_type: VideoEngineType) -> Optional[VideoGenerationEngine]:
+        """获取引擎实例：优先使用已创建的实例；首次使用或实例处于ERROR状态时，
+        在熔断器允许（关闭或半开探测）的情况下创建/重新初始化"""
+        engine = self.factory.get_engine(engine_type)
+        if engine is not None and engine.status != VideoEngineStatus.ERROR:
+            return engine
+
+        if not self.health_monitor.is_available(engine_type.value):
+            return None
+
+        # 工厂会重新初始化处于ERROR状态的缓存实例，失败时重建
+        engine = await self.factory.create_engine(
+            engine_type,
+            self.config.get('engines', {}).get(engine_type.value, {})
+        )
+        if engine is None:
+            # 初始化失败（如缺少API密钥）直接熔断，冷却期内不再反复构造
+            self.health_monitor.open_circuit(engine_type.value, "引擎创建或初始化失败")
+        return engine
+
     async def _select_best_engine(self, config: VideoGenerationConfig, 
                                  preferred_engines: Optional[List[VideoEngineType]] = None) -> Optional[VideoGenerationEngine]:
         """选择最佳引擎"""
-        # 如果指定了偏好引擎，直接尝试使用，不检查available_engines
-        if preferred_engines:
-            for engine_type in preferred_engines:
-                logger.info(f"尝试使用用户指定的引擎: {engine_type.value}")
-
-                # 直接创建用户指定的引擎
-                engine = await self.factory.create_engine(
-                    engine_type,
-                    self.config.get('engines', {}).get(engine_type.value, {})
-                )
-
-                if engine:
-                    if engine.status == VideoEngineStatus.IDLE:
-                        logger.info(f"用户指定的引擎 {engine_type.value} 初始化成功")
-                        return engine
-                    elif engine.status == VideoEngineStatus.ERROR:
-                        logger.warning(f"用户指定的引擎 {engine_type.value} 初始化失败: {engine.last_error}")
-                        # 对于用户明确选择的引擎，我们仍然尝试使用它
-                        # 让具体的生成过程来处理错误
-                        logger.info(f"仍然尝试使用用户指定的引擎 {engine_type.value}")
-                        return engine
-                    else:
-                        logger.info(f"用户指定的引擎 {engine_type.value} 状态: {engine.status}")
-                        return engine
-                else:
-                    logger.error(f"无法创建用户指定的引擎: {engine_type.value}")
+        for engine_type in await self._rank_engines(preferred_engines):
+            engine = await self._get_engine(engine_type)
+            if engine:
+                return engine
+        return None
 
-            # 如果用户指定的引擎都无法使用，返回None而不是回退
-            logger.error(f"用户指定的引擎都无法使用")
-            return None
+    async def _rank_engines(self, preferred_engines: Optional[List[VideoEngineType]] = None,
+                            progress_callback: Optional[Callable] = None) -> List[VideoEngineType]:
+        """按路由策略对可用引擎排序，作为故障转移顺序"""
+        # 如果指定了偏好引擎，只在用户指定的引擎中选择，不回退到其他引擎
+        if preferred_engines:
+            return await self._wait_for_pinned_engines(preferred_engines, progress_callback)
 
-        # 只有在没有指定偏好引擎时，才获取available_engines
-        available_engines = await self._get_available_engines()
+        available_engines = self._get_available_engines()
         if not available_engines:
             logger.error("没有可用的视频生成引擎")
-            return None
-        
-        # 根据路由策略选择引擎
-        if self.routing_strategy == VideoRoutingStrategy.PRIORITY:
-            return await self._select_by_priority(available_engines)
-        elif self.routing_strategy == VideoRoutingStrategy.FREE_FIRST:
-            return await self._select_free_first(available_engines)
+            return []
+
+        # 根据路由策略排序
+        if self.routing_strategy == VideoRoutingStrategy.FREE_FIRST:
+            return await self._sort_free_first(available_engines)
         elif self.routing_strategy == VideoRoutingStrategy.FASTEST:
-            return await self._select_fastest(available_engines)
+            return self._sort_fastest(available_engines)
         elif self.routing_strategy == VideoRoutingStrategy.CHEAPEST:
-            return await self._select_cheapest(available_engines)
+            return await self._sort_cheapest(available_engines)
         elif self.routing_strategy == VideoRoutingStrategy.LOAD_BALANCE:
-            return await self._select_load_balanced(available_engines)
+            return self._sort_load_balanced(available_engines)
         else:
             # 默认按优先级选择
-            return await self._select_by_priority(available_engines)
-    
-    async def _get_available_engines(self) -> List[VideoEngineType]:
-        """获取可用引擎列表"""
+            return self._sort_by_priority(available_engines)
+
+    async def _wait_for_pinned_engines(self, preferred_engines: List[VideoEngineType],
+                                       progress_callback: Optional[Callable] = None) -> List[VideoEngineType]:
+        """用户指定的引擎全部熔断时等待冷却结束，以半开状态探测，而不是直接判定失败"""
+        deadline = time.time() + self.pinned_wait_timeout
+        while True:
+            candidates = [t for t in preferred_engines if self.health_monitor.is_available(t.value)]
+            if candidates:
+                return candidates
+
+            wait = min(self.health_monitor.get_retry_after(t.value) for t in preferred_engines)
+            if time.time() + wait > deadline:
+                logger.error(f"用户指定的引擎都处于熔断状态: {[t.value for t in preferred_engines]}")
+                return []
+            if progress_callback:
+                progress_callback(f"指定的引擎暂时熔断，{wait:.0f} 秒后重新探测...")
+            await asyncio.sleep(max(wait, 0.5))
+
+    def _get_available_engines(self) -> List[VideoEngineType]:
+        """获取可用引擎列表（只查询熔断器和已缓存实例的状态，不构造或探测引擎）"""
         available = []
-        for engine_type in self.factory.get_available_engines():
-            try:
-                engine = await self.factory.create_engine(
-                    engine_type,
-                    self.config.get('engines', {}).get(engine_type.value, {})
-                )
-                # 🔧 修复：改进引擎可用性检查，ERROR状态的引擎也可以尝试重新初始化
-                if engine:
-                    if engine.status == VideoEngineStatus.OFFLINE:
-                        # 尝试重新初始化离线引擎
-                        try:
-                            if await engine.initialize():
-                                available.append(engine_type)
-                                logger.info(f"引擎 {engine_type.value} 重新初始化成功")
-                        except Exception as init_error:
-                            logger.warning(f"引擎 {engine_type.value} 重新初始化失败: {init_error}")
-                    elif engine.status in [VideoEngineStatus.IDLE, VideoEngineStatus.ERROR, VideoEngineStatus.BUSY]:
-                        # 检查引擎是否还有并发容量
-                        has_capacity = True
-                        if hasattr(engine, 'current_tasks') and hasattr(engine, 'max_concurrent_tasks'):
-                            has_capacity = engine.current_tasks < engine.max_concurrent_tasks
-
-                        if has_capacity:
-                            available.append(engine_type)
-                            if engine.status == VideoEngineStatus.ERROR:
-                                logger.info(f"引擎 {engine_type.value} 处于ERROR状态，但仍尝试使用（可能是临时问题）")
-                            elif engine.status == VideoEngineStatus.BUSY:
-                                logger.debug(f"引擎 {engine_type.value} 忙碌但仍有并发容量 ({engine.current_tasks}/{engine.max_concurrent_tasks})")
-                        else:
-                            logger.debug(f"引擎 {engine_type.value} 并发任务已满 ({engine.current_tasks}/{engine.max_concurrent_tasks})")
-            except Exception as e:
-                logger.warning(f"检查引擎 {engine_type.value} 可用性失败: {e}")
-
+        for engine_type in self._get_allowed_engine_types():
+            engine = self.factory.get_engine(engine_type)
+            if engine is None or self._is_engine_available(engine):
+                available.append(engine_type)
+            else:
+                logger.debug(f"引擎 {engine_type.value} 暂无并发容量或已离线")
         return available
 
+    def _get_allowed_engine_types(self) -> List[VideoEngineType]:
+        """已注册且熔断器允许的引擎类型"""
+        return [t for t in self.factory.get_available_engines()
+                if self.health_monitor.is_available(t.value)]
+
     def _is_engine_available(self, engine: VideoGenerationEngine) -> bool:
         """检查引擎是否可用（考虑并发容量）"""
         if engine.status == VideoEngineStatus.OFFLINE:
@@ -247,125 +315,83 @@ class VideoEngineManager:
             return False
         return False
 
-    async def _select_by_priority(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
-        """按优先级选择引擎"""
-        # 按优先级排序
-        sorted_engines = sorted(available_engines, key=lambda x: self.engine_priorities.get(x, 999))
-        
-        for engine_type in sorted_engines:
-            engine = await self.factory.create_engine(
-                engine_type,
-                self.config.get('engines', {}).get(engine_type.value, {})
-            )
-            # 🔧 修复：检查引擎是否可用（包括BUSY但有并发容量的引擎）
-            if engine and self._is_engine_available(engine):
-                return engine
-        
-        return None
-    
-    async def _select_free_first(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
-        """优先选择免费引擎"""
+    def _sort_by_priority(self, available_engines: List[VideoEngineType]) -> List[VideoEngineType]:
+        """按优先级排序"""
+        return sorted(available_engines, key=lambda x: self.engine_priorities.get(x, 999))
+
+    async def _sort_free_first(self, available_engines: List[VideoEngineType]) -> List[VideoEngineType]:
+        """免费引擎在前，同类按优先级排序"""
         free_engines = []
         paid_engines = []
-        
+
+        for engine_type in self._sort_by_priority(available_engines):
+            engine = await self._get_engine(engine_type)
+            if not engine:
+                continue
+            if engine.get_engine_info().is_free:
+                free_engines.append(engine_type)
+            else:
+                paid_engines.append(engine_type)
+
+        return free_engines + paid_engines
+
+    def _sort_fastest(self, available_engines: List[VideoEngineType]) -> List[VideoEngineType]:
+        """按实测p50延迟排序，没有样本的引擎按优先级排在后面"""
+        def latency(engine_type: VideoEngineType) -> Tuple[float, int]:
+            p50 = self.health_monitor.get_latency(engine_type.value, 50)
+            if p50 is None:
+                stats = self._performance_stats.get(engine_type)
+                p50 = stats.avg_generation_time if stats and stats.avg_generation_time else float('inf')
+            return (p50, self.engine_priorities.get(engine_type, 999))
+
+        return sorted(available_engines, key=latency)
+
+    async def _sort_cheapest(self, available_engines: List[VideoEngineType]) -> List[VideoEngineType]:
+        """按每秒成本排序"""
+        costs = {}
         for engine_type in available_engines:
-            engine = await self.factory.create_engine(
-                engine_type,
-                self.config.get('engines', {}).get(engine_type.value, {})
-            )
+            engine = await self._get_engine(engine_type)
             if engine:
-                engine_info = engine.get_engine_info()
-                if engine_info.is_free:
-                    free_engines.append(engine_type)
-                else:
-                    paid_engines.append(engine_type)
-        
-        # 先尝试免费引擎
-        for engine_type in free_engines:
-            engine = await self.factory.create_engine(
-                engine_type,
-                self.config.get('engines', {}).get(engine_type.value, {})
-            )
-            # 🔧 修复：使用统一的引擎可用性检查
-            if engine and self._is_engine_available(engine):
-                if engine.status == VideoEngineStatus.ERROR:
-                    logger.info(f"尝试使用ERROR状态的免费引擎 {engine_type.value}（可能是临时问题）")
-                return engine
-        
-        # 再尝试付费引擎
-        for engine_type in paid_engines:
-            engine = await self.factory.create_engine(
-                engine_type,
-                self.config.get('engines', {}).get(engine_type.value, {})
-            )
-            if engine and self._is_engine_available(engine):
-                return engine
-        
-        return None
+                costs[engine_type] = engine.get_engine_info().cost_per_second
 
-    async def _select_fastest(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
-        """选择最快的引擎"""
-        fastest_engine = None
-        fastest_time = float('inf')
+        return sorted(costs, key=lambda t: (costs[t], self.engine_priorities.get(t, 999)))
 
-        for engine_type in available_engines:
+    def _sort_load_balanced(self, available_engines: List[VideoEngineType]) -> List[VideoEngineType]:
+        """负载均衡：按 (进行中请求数+1) × p95延迟 估算排队时间，再按最近使用时间排序"""
+        def load(engine_type: VideoEngineType) -> Tuple[float, float]:
+            p95 = self.health_monitor.get_latency(engine_type.value, 95) or 0.0
+            in_flight = self.health_monitor.get_in_flight(engine_type.value)
             stats = self._performance_stats.get(engine_type)
-            if stats and stats.avg_generation_time < fastest_time:
-                fastest_time = stats.avg_generation_time
-                fastest_engine = engine_type
-
-        if fastest_engine:
-            return await self.factory.create_engine(
-                fastest_engine,
-                self.config.get('engines', {}).get(fastest_engine.value, {})
-            )
+            return ((in_flight + 1) * p95, stats.last_used if stats else 0)
 
-        # 如果没有性能统计，按优先级选择
-        return await self._select_by_priority(available_engines)
+        return sorted(available_engines, key=load)
 
-    async def _select_cheapest(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
-        """选择最便宜的引擎"""
-        cheapest_engine = None
-        lowest_cost = float('inf')
+    async def _select_by_priority(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
+        """按优先级选择引擎"""
+        return await self._first_engine(self._sort_by_priority(available_engines))
 
-        for engine_type in available_engines:
-            engine = await self.factory.create_engine(
-                engine_type,
-                self.config.get('engines', {}).get(engine_type.value, {})
-            )
-            if engine:
-                engine_info = engine.get_engine_info()
-                if engine_info.cost_per_second < lowest_cost:
-                    lowest_cost = engine_info.cost_per_second
-                    cheapest_engine = engine_type
-
-        if cheapest_engine:
-            return await self.factory.create_engine(
-                cheapest_engine,
-                self.config.get('engines', {}).get(cheapest_engine.value, {})
-            )
+    async def _select_free_first(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
+        """优先选择免费引擎"""
+        return await self._first_engine(await self._sort_free_first(available_engines))
 
-        return None
+    async def _select_fastest(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
+        """选择最快的引擎"""
+        return await self._first_engine(self._sort_fastest(available_engines))
+
+    async def _select_cheapest(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
+        """选择最便宜的引擎"""
+        return await self._first_engine(await self._sort_cheapest(available_engines))
 
     async def _select_load_balanced(self, available_engines: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
         """负载均衡选择引擎"""
-        # 选择最近使用时间最早的引擎
-        least_used_engine = None
-        earliest_time = float('inf')
-
-        for engine_type in available_engines:
-            stats = self._performance_stats.get(engine_type)
-            last_used = stats.last_used if stats else 0
-            if last_used < earliest_time:
-                earliest_time = last_used
-                least_used_engine = engine_type
-
-        if least_used_engine:
-            return await self.factory.create_engine(
-                least_used_engine,
-                self.config.get('engines', {}).get(least_used_engine.value, {})
-            )
+        return await self._first_engine(self._sort_load_balanced(available_engines))
 
+    async def _first_engine(self, engine_types: List[VideoEngineType]) -> Optional[VideoGenerationEngine]:
+        """返回排序列表中第一个可用的引擎实例"""
+        for engine_type in engine_types:
+            engine = await self._get_engine(engine_type)
+            if engine and self._is_engine_available(engine):
+                return engine
         return None
 
     async def _generate_with_retry(self, engine: VideoGenerationEngine,
@@ -377,36 +403,55 @@ class VideoEngineManager:
         last_error = ""
         retry_delay = 1.0
         backoff_factor = 2.0
+        engine_name = engine.engine_type.value
+
+        # 熔断器按逻辑请求计数：同一请求的多次重试只记一次成功或失败，
+        # 避免一个有问题的提示词连续重试就让整个批次的引擎熔断
+        if not self.health_monitor.acquire(engine_name):
+            logger.warning(f"引擎 {engine_name} 熔断器已打开，跳过")
+            return VideoGenerationResult(
+                success=False,
+                error_message=f"引擎 {engine_name} 熔断中"
+            )
 
+        request_start = time.time()
         for attempt in range(max_retries + 1):
+            # 其他请求已让熔断器打开时不再重试，交给调用方立即切换
+            if attempt > 0 and self.health_monitor.get_state(engine_name) == CircuitState.OPEN:
+                logger.warning(f"引擎 {engine_name} 熔断器已打开，停止重试")
+                break
+
             try:
                 if progress_callback:
                     progress_callback(f"尝试生成视频 (第 {attempt + 1} 次)...")
-
-                # 传递项目信息给引擎的generate_video方法
+                
+                # 传递项目信息给引擎的生成方法
                 result = await engine.generate_video(config, progress_callback, project_manager, current_project_name)
-
+                
                 if result.success:
+                    self.health_monitor.record_success(engine_name, time.time() - request_start)
                     return result
                 else:
                     last_error = result.error_message
-                    logger.warning(f"引擎 {engine.engine_type.value} 生成失败 (第 {attempt + 1} 次): {last_error}")
-
+                    logger.warning(f"引擎 {engine_name} 生成失败 (第 {attempt + 1} 次): {last_error}")
+                    
             except asyncio.CancelledError:
-                logger.warning(f"引擎 {engine.engine_type.value} 任务被取消")
+                self.health_monitor.release(engine_name)
+                logger.warning(f"引擎 {engine_name} 任务被取消")
                 return VideoGenerationResult(
                     success=False,
                     error_message="视频生成任务被取消"
                 )
             except Exception as e:
                 last_error = str(e)
-                logger.error(f"引擎 {engine.engine_type.value} 生成异常 (第 {attempt + 1} 次): {e}")
-
+                logger.error(f"引擎 {engine_name} 生成异常 (第 {attempt + 1} 次): {e}")
+            
             # 如果不是最后一次尝试，等待后重试
             if attempt < max_retries:
                 await asyncio.sleep(retry_delay)
                 retry_delay *= backoff_factor
-
+        
+        self.health_monitor.record_failure(engine_name, time.time() - request_start, last_error)
         return VideoGenerationResult(
             success=False,
             error_message=f"生成失败，已重试 {max_retries} 次。最后错误: {last_error}"
@@ -436,11 +481,18 @@ class VideoEngineManager:
 
 
 
+    def set_concurrent_limit(self, limit: int):
+        """调整全局并发上限，放宽时排队中的任务会立即开始"""
+        self.concurrent_limit = limit
+        self.admission.set_global_limit(limit)
+        logger.info(f"视频生成并发上限已设置为: {limit}")
+
     def get_engine_statistics(self) -> Dict[str, Any]:
         """获取引擎统计信息"""
         stats = {
             "active_tasks": self._active_tasks,
             "concurrent_limit": self.concurrent_limit,
+            "admission": self.admission.get_status(),
             "routing_strategy": self.routing_strategy.value,
             "engine_preferences": [pref.value for pref in self.engine_preferences],
             "engines": {}
@@ -450,6 +502,9 @@ class VideoEngineManager:
         for engine_type, engine in self.factory._engines.items():
             stats["engines"][engine_type.value] = engine.get_statistics()
 
+        # 添加健康状态（熔断器、p50/p95延迟）
+        stats["health"] = self.health_monitor.get_snapshot()
+
         # 添加性能统计
         stats["performance"] = {}
         for engine_type, perf in self._performance_stats.items():
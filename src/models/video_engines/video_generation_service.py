@@ -9,6 +9,8 @@ from typing import List, Dict, Optional, Callable
 from .video_engine_manager import VideoEngineManager, VideoRoutingStrategy, VideoEnginePreference
 from .video_engine_base import VideoEngineType, VideoGenerationConfig, VideoGenerationResult
 from .video_engine_factory import get_video_engine_factory
+from .video_job_journal import get_video_job_journal, JOB_SUBMITTED
+from .task_status_poller import get_task_status_poller, TASK_PENDING
 from src.utils.logger import logger
 import os
 
@@ -20,6 +22,7 @@ class VideoGenerationService:
         self.config = config or {}
         self.manager = VideoEngineManager(self.config)
         self.factory = get_video_engine_factory()
+        self.journal = get_video_job_journal()
         
         logger.info("视频生成服务初始化完成")
     
@@ -36,8 +39,16 @@ class VideoGenerationService:
                            progress_callback: Optional[Callable] = None,
                            project_manager=None,
                            current_project_name=None,
-                           audio_hint: Optional[str] = None) -> VideoGenerationResult:
-        """生成视频（简化接口）"""
+                           audio_hint: Optional[str] = None,
+                           shot_id: Optional[str] = None,
+                           segment_index: Optional[int] = None,
+                           regenerate: bool = False) -> VideoGenerationResult:
+        """生成视频（简化接口）
+
+        传入 shot_id 时按镜头记录作业日志：已生成且文件有效的镜头直接返回，
+        上次运行中已提交但未下载的远程任务会被恢复而不是重新提交；
+        regenerate=True（用户点击“重新生成”）时跳过作业日志，总是重新提交
+        """
         
         # 创建生成配置
         config = VideoGenerationConfig(
@@ -64,12 +75,15 @@ class VideoGenerationService:
                 except ValueError:
                     logger.warning(f"未知的视频引擎: {engine_name}")
         
-        return await self.manager.generate_video(
+        return await self.generate_video_from_config(
             config=config,
             preferred_engines=preferred_engine_types,
             progress_callback=progress_callback,
             project_manager=project_manager,
-            current_project_name=current_project_name
+            current_project_name=current_project_name,
+            shot_id=shot_id,
+            segment_index=segment_index,
+            regenerate=regenerate
         )
     
     async def generate_video_from_config(self, 
@@ -77,15 +91,135 @@ class VideoGenerationService:
                                        preferred_engines: Optional[List[VideoEngineType]] = None,
                                        progress_callback: Optional[Callable] = None,
                                        project_manager=None,
-                                       current_project_name=None) -> VideoGenerationResult:
+                                       current_project_name=None,
+                                       shot_id: Optional[str] = None,
+                                       segment_index: Optional[int] = None,
+                                       regenerate: bool = False) -> VideoGenerationResult:
         """使用配置对象生成视频"""
-        return await self.manager.generate_video(
+        if not shot_id:
+            return await self.manager.generate_video(
+                config=config,
+                preferred_engines=preferred_engines,
+                progress_callback=progress_callback,
+                project_manager=project_manager,
+                current_project_name=current_project_name
+            )
+
+        job_id = self.journal.make_job_id(current_project_name, shot_id, config, segment_index)
+        config.job_id = job_id
+
+        # 已生成且输出文件有效：直接跳过（重新生成时除外）
+        existing_path = None if regenerate else self.journal.get_completed_output(job_id)
+        if existing_path:
+            logger.info(f"镜头 {shot_id} 已有有效的生成结果，跳过: {existing_path}")
+            if progress_callback:
+                progress_callback("已有生成结果，跳过重复生成")
+            job = self.journal.get_job(job_id) or {}
+            return VideoGenerationResult(
+                success=True,
+                video_path=existing_path,
+                engine_type=self._parse_engine_type(job.get('engine', '')),
+                duration=config.duration,
+                fps=config.fps,
+                resolution=(config.width, config.height),
+                file_size=os.path.getsize(existing_path),
+                metadata={'job_id': job_id, 'skipped': True}
+            )
+
+        # 上次运行已提交远程任务：恢复轮询并下载，不重新提交
+        job = None if regenerate else self.journal.get_job(job_id)
+        if job and job.get('state') == JOB_SUBMITTED and job.get('task_id'):
+            result = await self._resume_job(job, progress_callback, project_manager, current_project_name)
+            if result.success:
+                return result
+            logger.warning(f"镜头 {shot_id} 的远程任务无法恢复，重新提交: {result.error_message}")
+
+        self.journal.start_job(job_id, current_project_name, shot_id, config, segment_index,
+                               [engine_type.value for engine_type in preferred_engines or []])
+        result = await self.manager.generate_video(
             config=config,
             preferred_engines=preferred_engines,
             progress_callback=progress_callback,
             project_manager=project_manager,
             current_project_name=current_project_name
         )
+        self._record_job_result(job_id, result)
+        return result
+
+    @staticmethod
+    def _parse_engine_type(engine_name: str) -> Optional[VideoEngineType]:
+        try:
+            return VideoEngineType(engine_name)
+        except ValueError:
+            return None
+
+    def _record_job_result(self, job_id: str, result: VideoGenerationResult):
+        """把生成结果写回作业日志；远程任务仍在进行（如本地取消、网络中断）时保留以便下次恢复"""
+        if result.success:
+            self.journal.complete_job(job_id, result.video_path,
+                                      result.engine_type.value if result.engine_type else '')
+            return
+
+        job = self.journal.get_job(job_id)
+        if job and job.get('state') == JOB_SUBMITTED and job.get('provider'):
+            pending = get_task_status_poller().get_task_records(job['provider'], TASK_PENDING)
+            if any(record.get('task_id') == job.get('task_id') for record in pending):
+                logger.info(f"镜头 {job.get('shot_id')} 的远程任务仍在进行，保留以便稍后恢复")
+                return
+        self.journal.fail_job(job_id, result.error_message)
+
+    async def _resume_job(self, job: Dict, progress_callback: Optional[Callable] = None,
+                          project_manager=None, current_project_name=None) -> VideoGenerationResult:
+        """恢复作业日志中已提交的远程任务"""
+        engine_type = self._parse_engine_type(job.get('engine', ''))
+        if engine_type is None:
+            return VideoGenerationResult(success=False, error_message=f"未知的视频引擎: {job.get('engine')}")
+
+        config = VideoGenerationConfig(**job.get('config', {}))
+        config.job_id = job['job_id']
+        logger.info(f"恢复镜头 {job.get('shot_id')} 的远程任务: {engine_type.value}/{job['task_id']}")
+
+        result = await self.manager.resume_task(engine_type, job['task_id'], config, progress_callback,
+                                                project_manager, current_project_name)
+        self._record_job_result(job['job_id'], result)
+        if result.success:
+            result.metadata['job_id'] = job['job_id']
+        return result
+
+    async def resume_pending_jobs(self, project_name: Optional[str] = None,
+                                  progress_callback: Optional[Callable] = None,
+                                  project_manager=None) -> List[Dict]:
+        """恢复所有已提交但未下载结果的作业（通常在启动或打开项目时调用）
+
+        Returns:
+            每个作业的 {'job_id', 'shot_id', 'segment_index', 'project_name', 'result'}
+        """
+        jobs = self.journal.get_pending_jobs(project_name)
+        if not jobs:
+            return []
+
+        logger.info(f"发现 {len(jobs)} 个未完成的视频生成作业，开始恢复")
+        if progress_callback:
+            progress_callback(f"恢复 {len(jobs)} 个未完成的视频生成任务...")
+
+        async def resume(job: Dict) -> Dict:
+            try:
+                result = await self._resume_job(job, None, project_manager, job.get('project_name'))
+            except Exception as e:
+                logger.error(f"恢复作业 {job['job_id'][:8]} 异常: {e}")
+                result = VideoGenerationResult(success=False, error_message=str(e))
+            return {
+                'job_id': job['job_id'],
+                'shot_id': job.get('shot_id', ''),
+                'segment_index': job.get('segment_index'),
+                'project_name': job.get('project_name', ''),
+                'result': result
+            }
+
+        outcomes = await asyncio.gather(*(resume(job) for job in jobs))
+        succeeded = sum(1 for outcome in outcomes if outcome['result'].success)
+        logger.info(f"视频生成作业恢复完成: 成功 {succeeded}/{len(jobs)}")
+        return list(outcomes)
     
     async def batch_generate_videos(self,
                                   configs: List[VideoGenerationConfig],
@@ -150,7 +284,9 @@ class VideoGenerationService:
     
     def get_service_statistics(self) -> Dict:
         """获取服务统计信息"""
-        return self.manager.get_engine_statistics()
+        statistics = self.manager.get_engine_statistics()
+        statistics['job_journal'] = self.journal.get_stats()
+        return statistics
     
     async def test_engine(self, engine_name: str) -> bool:
         """测试特定引擎"""
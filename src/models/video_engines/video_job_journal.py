@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+视频生成任务日志
+以镜头为单位持久化视频生成作业：提交的远程任务ID、使用的引擎、镜头ID和状态。
+应用重启后可以据此恢复轮询并下载已完成的结果，已生成且校验通过的镜头直接跳过，
+避免整批重新提交（和重复付费）
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils.logger import logger
+
+
+# 作业状态
+JOB_GENERATING = "generating"  # 已开始，尚未拿到远程任务ID
+JOB_SUBMITTED = "submitted"  # 远程任务已提交，等待完成
+JOB_COMPLETED = "completed"  # 视频已下载到本地
+JOB_FAILED = "failed"
+
+# 不影响生成结果、不参与作业ID计算的配置字段
+_VOLATILE_FIELDS = {'job_id', 'output_dir'}
+
+
+def validate_video_output(video_path: str, min_size: int = 1024) -> bool:
+    """校验视频输出文件：存在、大小合理，MP4/MOV 需包含 ftyp 文件头"""
+    try:
+        if not video_path or not os.path.isfile(video_path):
+            return False
+        if os.path.getsize(video_path) < min_size:
+            return False
+        if os.path.splitext(video_path)[1].lower() in ('.mp4', '.mov', '.m4v'):
+            with open(video_path, 'rb') as f:
+                header = f.read(64)
+            return b'ftyp' in header
+        return True
+    except OSError:
+        return False
+
+
+class VideoJobJournal:
+    """视频生成作业日志（线程安全，原子写入）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, journal_file: str = None, retention_days: int = 14):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if journal_file is None:
+            journal_file = os.path.join(os.getcwd(), 'temp', 'video_tasks', 'job_journal.json')
+        self.journal_file = journal_file
+        self.retention_seconds = retention_days * 24 * 3600
+
+        self._journal_lock = threading.RLock()
+        self._jobs: Dict[str, Dict[str, Any]] = self._load()
+        self._prune()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"加载视频生成作业日志失败: {e}")
+        return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+            tmp_file = f"{self.journal_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._jobs, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.journal_file)
+        except Exception as e:
+            logger.warning(f"保存视频生成作业日志失败: {e}")
+
+    def _prune(self):
+        """清理超过保留期的已完成/失败作业"""
+        cutoff = time.time() - self.retention_seconds
+        with self._journal_lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job.get('updated_at', 0) < cutoff and job.get('state') in (JOB_COMPLETED, JOB_FAILED)]
+            for job_id in stale:
+                del self._jobs[job_id]
+            if stale:
+                self._save()
+
+    def _update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        with self._journal_lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            job['updated_at'] = time.time()
+            self._save()
+            return dict(job)
+
+    # ------------------------------------------------------------------
+    # 作业标识
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def make_job_id(project_name: Optional[str], shot_id: str, config,
+                    segment_index: Optional[int] = None) -> str:
+        """根据项目、镜头、片段序号和生成配置计算稳定的作业ID
+
+        配置变化（换了图像、提示词、时长等）会得到新的作业ID，旧结果不会被误用
+        """
+        data = dataclasses.asdict(config) if dataclasses.is_dataclass(config) else dict(config)
+        normalized = {k: v for k, v in data.items() if k not in _VOLATILE_FIELDS}
+        normalized['input_prompt'] = ' '.join(str(normalized.get('input_prompt') or '').split())
+        payload = json.dumps({
+            'project': project_name or '',
+            'shot_id': shot_id,
+            'segment_index': segment_index,
+            'config': normalized
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    # ------------------------------------------------------------------
+    # 作业生命周期
+    # ------------------------------------------------------------------
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._journal_lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def start_job(self, job_id: str, project_name: Optional[str], shot_id: str, config,
+                  segment_index: Optional[int] = None,
+                  preferred_engines: Optional[List[str]] = None) -> Dict[str, Any]:
+        """登记一个开始生成的作业（覆盖此前失败的同ID作业）"""
+        config_data = dataclasses.asdict(config) if dataclasses.is_dataclass(config) else dict(config)
+        now = time.time()
+        with self._journal_lock:
+            job = {
+                'job_id': job_id,
+                'project_name': project_name or '',
+                'shot_id': shot_id,
+                'segment_index': segment_index,
+                'preferred_engines': preferred_engines or [],
+                'config': config_data,
+                'state': JOB_GENERATING,
+                'engine': '',
+                'provider': '',
+                'task_id': '',
+                'video_path': '',
+                'error': '',
+                'created_at': now,
+                'updated_at': now
+            }
+            self._jobs[job_id] = job
+            self._save()
+            return dict(job)
+
+    def record_task(self, job_id: str, engine: str, provider: str, task_id: str):
+        """记录远程任务已提交（引擎拿到任务ID后立即调用）"""
+        if self._update(job_id, state=JOB_SUBMITTED, engine=engine, provider=provider,
+                        task_id=task_id, error='') is not None:
+            logger.debug(f"作业 {job_id[:8]} 已记录远程任务: {engine}/{task_id}")
+
+    def complete_job(self, job_id: str, video_path: str, engine: str = ''):
+        fields = {'state': JOB_COMPLETED, 'video_path': video_path, 'error': ''}
+        if engine:
+            fields['engine'] = engine
+        self._update(job_id, **fields)
+
+    def fail_job(self, job_id: str, error: str):
+        self._update(job_id, state=JOB_FAILED, error=error)
+
+    def remove_job(self, job_id: str):
+        with self._journal_lock:
+            if self._jobs.pop(job_id, None) is not None:
+                self._save()
+
+    def get_completed_output(self, job_id: str) -> Optional[str]:
+        """作业已完成且输出文件校验通过时返回视频路径"""
+        job = self.get_job(job_id)
+        if not job or job.get('state') != JOB_COMPLETED:
+            return None
+        video_path = job.get('video_path', '')
+        if validate_video_output(video_path):
+            return video_path
+        logger.info(f"作业 {job_id[:8]} 的输出文件缺失或损坏，需要重新生成: {video_path}")
+        return None
+
+    def get_pending_jobs(self, project_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取已提交远程任务但尚未下载结果的作业"""
+        with self._journal_lock:
+            return [dict(job) for job in self._jobs.values()
+                    if job.get('state') == JOB_SUBMITTED and job.get('task_id') and
+                    (project_name is None or job.get('project_name') == project_name)]
+
+    def get_jobs(self, project_name: Optional[str] = None, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._journal_lock:
+            return [dict(job) for job in self._jobs.values()
+                    if (project_name is None or job.get('project_name') == project_name) and
+                    (state is None or job.get('state') == state)]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._journal_lock:
+            stats: Dict[str, int] = {}
+            for job in self._jobs.values():
+                stats[job.get('state', '')] = stats.get(job.get('state', ''), 0) + 1
+            return stats
+
+
+def get_video_job_journal() -> VideoJobJournal:
+    """获取全局视频生成作业日志"""
+    return VideoJobJournal()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频时间线 - 在一个 ffmpeg 滤镜图中完成整段音频的拼装
+
+每段配音用 adelay 放到精确的开始时间，amix 混合后统一做一次响度标准化；
+背景音乐循环、淡入淡出，并通过 sidechaincompress 在有人声时自动压低（闪避）；
+最终只编码一次 AAC。各段音频都是解码后按采样点定位，
+不会像逐段编码 AAC 再拼接那样累积编码器前导静音带来的偏移。
+配音较多时滤镜图写入脚本文件、配音用 amovie 在滤镜图内读取，命令行长度与片段数无关。
+"""
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from src.utils.ass_subtitles import escape_filter_path
+
+# 混音统一使用的采样格式
+_MIX_FORMAT = "aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo"
+
+
+@dataclass
+class TimelineClip:
+    """时间线上的一段音频"""
+    path: str
+    start: float  # 在时间线上的开始时间（秒）
+    volume: float = 1.0
+    duration: Optional[float] = None  # 只取前 duration 秒，None 表示完整使用
+
+
+@dataclass
+class TimelineMusic:
+    """背景音乐"""
+    path: str
+    volume: float = 0.3
+    loop: bool = True
+    fade_in: float = 2.0  # 秒，0 表示不淡入
+    fade_out: float = 2.0  # 秒，0 表示不淡出
+    duck: bool = True  # 有人声时自动压低音乐
+
+
+class AudioTimeline:
+    """音频时间线"""
+
+    def __init__(self, total_duration: float, normalize_loudness: bool = True,
+                 loudness_target: float = -16.0):
+        """
+        Args:
+            total_duration: 时间线总时长（秒），输出音频严格为该长度
+            normalize_loudness: 是否对人声做响度标准化（EBU R128）
+            loudness_target: 目标响度（LUFS），短视频平台普遍在 -14 ~ -16
+        """
+        self.total_duration = total_duration
+        self.normalize_loudness = normalize_loudness
+        self.loudness_target = loudness_target
+        self.clips: List[TimelineClip] = []
+        self.music: Optional[TimelineMusic] = None
+
+    def add_clip(self, path: str, start: float, volume: float = 1.0,
+                 duration: Optional[float] = None) -> 'AudioTimeline':
+        self.clips.append(TimelineClip(path, max(0.0, start), volume, duration))
+        return self
+
+    def set_music(self, music: Optional[TimelineMusic]) -> 'AudioTimeline':
+        self.music = music
+        return self
+
+    def build(self, first_input_index: int = 0, movie_sources: bool = False) -> Tuple[List[str], str, str]:
+        """生成 ffmpeg 输入参数与滤镜图
+
+        Args:
+            first_input_index: 第一个音频输入在整条命令中的序号（前面通常是视频输入）
+            movie_sources: 配音用 amovie 在滤镜图内读取，不为每段配音增加 -i 输入
+
+        Returns:
+            (输入参数, filter_complex, 输出标签)
+        """
+        inputs: List[str] = []
+        filters: List[str] = []
+        total = f"{self.total_duration:.6f}"
+        index = first_input_index
+
+        # 人声：逐段定位后混合
+        voice_labels = []
+        for n, clip in enumerate(self.clips):
+            chain = [_MIX_FORMAT]
+            if clip.duration:
+                chain.append(f"atrim=0:{clip.duration:.6f}")
+            if clip.volume != 1.0:
+                chain.append(f"volume={clip.volume:.3f}")
+            delay_ms = int(round(clip.start * 1000))
+            if delay_ms > 0:
+                chain.append(f"adelay={delay_ms}|{delay_ms}")
+            if movie_sources:
+                filters.append(f"amovie='{escape_filter_path(clip.path)}',{','.join(chain)}[c{n}]")
+            else:
+                inputs += ['-i', clip.path]
+                filters.append(f"[{index}:a]{','.join(chain)}[c{n}]")
+                index += 1
+            voice_labels.append(f"[c{n}]")
+
+        if voice_labels:
+            if len(voice_labels) > 1:
+                filters.append(f"{''.join(voice_labels)}amix=inputs={len(voice_labels)}"
+                               f":duration=longest:normalize=0[vmix]")
+            else:
+                filters.append(f"{voice_labels[0]}anull[vmix]")
+            voice_chain = []
+            if self.normalize_loudness:
+                # loudnorm 内部会升采样，处理后再统一回混音格式
+                voice_chain += [f"loudnorm=I={self.loudness_target}:TP=-1.5:LRA=11", _MIX_FORMAT]
+            voice_chain += ["apad", f"atrim=0:{total}"]
+            filters.append(f"[vmix]{','.join(voice_chain)}[voice]")
+        else:
+            filters.append(f"anullsrc=r=48000:cl=stereo,atrim=0:{total}[voice]")
+
+        if not self.music:
+            return inputs, ';'.join(filters), '[voice]'
+
+        # 背景音乐：循环由输入端 -stream_loop 完成，不在内存中缓存整首音乐
+        music = self.music
+        if music.loop:
+            inputs += ['-stream_loop', '-1']
+        inputs += ['-i', music.path]
+        chain = [_MIX_FORMAT, f"volume={music.volume:.3f}", "apad", f"atrim=0:{total}"]
+        if music.fade_in > 0:
+            chain.append(f"afade=t=in:st=0:d={music.fade_in}")
+        if music.fade_out > 0:
+            chain.append(f"afade=t=out:st={max(0.0, self.total_duration - music.fade_out):.3f}:d={music.fade_out}")
+        filters.append(f"[{index}:a]{','.join(chain)}[bgm]")
+
+        if music.duck and self.clips:
+            filters.append("[voice]asplit=2[voice_main][voice_key]")
+            filters.append("[bgm][voice_key]sidechaincompress=threshold=0.03:ratio=6:attack=20:release=400[ducked]")
+            filters.append("[voice_main][ducked]amix=inputs=2:duration=first:normalize=0,alimiter=limit=0.95[mix]")
+        else:
+            filters.append("[voice][bgm]amix=inputs=2:duration=first:normalize=0,alimiter=limit=0.95[mix]")
+        return inputs, ';'.join(filters), '[mix]'
+
+    def mux_command(self, ffmpeg_path: str, video_path: str, output_path: str,
+                    audio_bitrate: str = "192k", script_path: Optional[str] = None) -> List[str]:
+        """生成把时间线音频与视频封装在一起的命令（画面流复制，音频只编码一次）
+
+        Args:
+            script_path: 滤镜图脚本文件路径；提供时滤镜图写入该文件（-filter_complex_script），
+                配音通过 amovie 读取，避免片段很多时超出 Windows 32K 命令行长度限制
+        """
+        inputs, graph, label = self.build(first_input_index=1, movie_sources=script_path is not None)
+        if script_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(script_path)), exist_ok=True)
+            with open(script_path, 'w', encoding='utf-8') as f:
+                f.write(graph)
+            graph_args = ['-filter_complex_script', script_path]
+        else:
+            graph_args = ['-filter_complex', graph]
+        return [
+            ffmpeg_path,
+            '-i', video_path,
+            *inputs,
+            *graph_args,
+            '-map', '0:v:0', '-map', label,
+            '-c:v', 'copy',
+            '-c:a', 'aac', '-b:a', audio_bitrate,
+            '-t', f"{self.total_duration:.6f}",
+            '-movflags', '+faststart',
+            '-y', output_path
+        ]
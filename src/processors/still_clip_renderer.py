@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态图像片段渲染器 - 将 (图像, 时长, 效果) 批量渲染为视频片段
+
+效果由 ffmpeg 滤镜链实现：ken_burns/parallax 使用 zoompan 推拉平移，
+vignette 使用暗角，film_grain 使用噪点，color_grade 使用色彩调整。
+图像只作为单帧输入，由 zoompan 生成全部帧，无需循环解码图像；
+多个片段并行渲染，实际并发数受 ffmpeg 运行器的全局预算限制。
+"""
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.utils.encoder_profiles import INTERMEDIATE_PROFILE, build_video_encode_args, get_encoder_profile
+from src.utils.ffmpeg_runner import find_ffmpeg, get_ffmpeg_runner, run_ffmpeg_sync
+from src.utils.logger import logger
+
+# 调色预设：eq / colorbalance 参数
+_COLOR_GRADES = {
+    'cinematic': "eq=contrast=1.08:saturation=0.9,colorbalance=rs=0.03:bs=-0.03:rh=0.02:bh=-0.02",
+    'warm': "eq=saturation=1.05,colorbalance=rs=0.06:gs=0.02:bs=-0.05",
+    'cool': "eq=saturation=0.95,colorbalance=rs=-0.04:bs=0.06",
+    'vintage': "eq=contrast=0.95:saturation=0.7,colorbalance=rs=0.05:bs=-0.06",
+}
+
+_PAN_DIRECTIONS = ['center', 'left', 'right', 'up', 'down']
+
+
+@dataclass
+class StillClipJob:
+    """单个静态片段渲染任务"""
+    image_path: str
+    output_path: str
+    duration: float
+    effects: List[Dict[str, Any]] = field(default_factory=list)
+    resolution: Tuple[int, int] = (1024, 1024)
+    fps: int = 30
+
+
+def _pan_expressions(direction: str, frames: int) -> Tuple[str, str]:
+    """zoompan 的 x/y 表达式：画面随时间向指定方向平移"""
+    progress = f"on/{frames}"
+    center_x = "iw/2-(iw/zoom/2)"
+    center_y = "ih/2-(ih/zoom/2)"
+    if direction == 'left':
+        return f"(iw-iw/zoom)*(1-{progress})", center_y
+    if direction == 'right':
+        return f"(iw-iw/zoom)*{progress}", center_y
+    if direction == 'up':
+        return center_x, f"(ih-ih/zoom)*(1-{progress})"
+    if direction == 'down':
+        return center_x, f"(ih-ih/zoom)*{progress}"
+    return center_x, center_y
+
+
+def build_still_clip_filter(job: StillClipJob) -> str:
+    """根据效果列表生成滤镜链（无动态效果时输出静止画面）"""
+    width, height = job.resolution
+    frames = max(1, round(job.duration * job.fps))
+    # 同一张图每次渲染的运动方向保持一致
+    rng = random.Random(job.image_path)
+
+    # 先在2倍分辨率下缩放补边，降低 zoompan 取整造成的抖动
+    filters = [
+        f"scale={width * 2}:{height * 2}:force_original_aspect_ratio=decrease",
+        f"pad={width * 2}:{height * 2}:(ow-iw)/2:(oh-ih)/2",
+        "setsar=1",
+    ]
+
+    zoom_expr, x_expr, y_expr = "1", "0", "0"
+    for effect in job.effects:
+        effect_type = effect.get('type')
+        if effect_type == 'ken_burns':
+            zoom_factor = max(1.0, float(effect.get('zoom_factor', 1.2)))
+            direction = effect.get('pan_direction', 'random')
+            if direction not in _PAN_DIRECTIONS:
+                direction = rng.choice(_PAN_DIRECTIONS)
+            if effect.get('zoom', rng.choice(['in', 'out'])) == 'out':
+                zoom_expr = f"{zoom_factor}-({zoom_factor}-1)*on/{frames}"
+            else:
+                zoom_expr = f"1+({zoom_factor}-1)*on/{frames}"
+            x_expr, y_expr = _pan_expressions(direction, frames)
+            break
+        if effect_type == 'parallax':
+            # 单张图像没有分层信息，用固定放大后的横向平移近似视差
+            speed = float(effect.get('speed_factor', 0.5))
+            zoom_expr = f"{1 + 0.1 * max(0.1, speed):.3f}"
+            x_expr, y_expr = _pan_expressions(rng.choice(['left', 'right']), frames)
+            break
+
+    filters.append(f"zoompan=z='{zoom_expr}':x='{x_expr}':y='{y_expr}'"
+                   f":d={frames}:s={width}x{height}:fps={job.fps}")
+
+    for effect in job.effects:
+        effect_type = effect.get('type')
+        if effect_type == 'vignette':
+            strength = float(effect.get('strength', 0.3))
+            filters.append(f"vignette=angle={min(1.5, 0.2 + strength * 1.5):.3f}")
+        elif effect_type == 'film_grain':
+            strength = float(effect.get('strength', 0.2))
+            filters.append(f"noise=alls={max(1, int(strength * 50))}:allf=t+u")
+        elif effect_type == 'color_grade':
+            grade = _COLOR_GRADES.get(effect.get('preset', 'cinematic'))
+            if grade:
+                filters.append(grade)
+        elif effect_type not in ('ken_burns', 'parallax'):
+            logger.debug(f"静态片段不支持的效果，已忽略: {effect_type}")
+
+    filters.append("format=yuv420p")
+    return ','.join(filters)
+
+
+class StillClipRenderer:
+    """静态图像片段批量渲染器"""
+
+    def __init__(self, ffmpeg_path: Optional[str] = None, encoder_profile: str = INTERMEDIATE_PROFILE):
+        """
+        Args:
+            encoder_profile: 编码档位，片段之后还会参与合成，默认使用中间文件档位
+        """
+        self.ffmpeg_path = ffmpeg_path or find_ffmpeg()
+        self.encoder_profile = get_encoder_profile(encoder_profile)
+
+    def build_command(self, job: StillClipJob) -> List[str]:
+        """构建单个片段的 ffmpeg 命令"""
+        frames = max(1, round(job.duration * job.fps))
+        return [
+            self.ffmpeg_path,
+            '-i', job.image_path,
+            '-vf', build_still_clip_filter(job),
+            '-frames:v', str(frames),
+            '-r', str(job.fps),
+            *build_video_encode_args(self.encoder_profile, ffmpeg_path=self.ffmpeg_path),
+            '-an',
+            '-y', job.output_path
+        ]
+
+    def render(self, job: StillClipJob) -> bool:
+        """渲染单个片段"""
+        if not os.path.exists(job.image_path):
+            logger.error(f"图像文件不存在: {job.image_path}")
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(job.output_path)), exist_ok=True)
+
+        result = run_ffmpeg_sync(self.build_command(job), timeout=max(60.0, job.duration * 20))
+        if result.success and os.path.exists(job.output_path):
+            logger.info(f"静态片段渲染成功: {job.output_path}")
+            return True
+        if result.timed_out:
+            logger.error(f"静态片段渲染超时: {job.output_path}")
+        else:
+            logger.error(f"静态片段渲染失败: {job.output_path}: {result.error_message}")
+        return False
+
+    def render_batch(self, jobs: List[StillClipJob],
+                     progress_callback: Optional[Callable[[int, int], None]] = None) -> List[bool]:
+        """并行渲染多个片段，返回与 jobs 顺序一致的成功标志
+
+        Args:
+            progress_callback: 进度回调，参数为 (已完成数, 总数)
+        """
+        if not jobs:
+            return []
+
+        workers = max(1, get_ffmpeg_runner().get_status()['max_concurrent'])
+        logger.info(f"开始批量渲染 {len(jobs)} 个静态片段，并发数: {workers}")
+        results = [False] * len(jobs)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="StillClip") as executor:
+            futures = {executor.submit(self.render, job): index for index, job in enumerate(jobs)}
+            for completed, future in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"静态片段渲染异常: {e}")
+                if progress_callback:
+                    progress_callback(completed, len(jobs))
+
+        logger.info(f"静态片段渲染完成: {sum(results)}/{len(jobs)} 成功")
+        return results
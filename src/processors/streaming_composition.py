@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线合成 - 配音边生成边同步画面
+
+每段配音完成后立即提交该片段的后续处理：读取时长（优先读取 .timing.json 时间记录）、
+生成字幕并烧录、按配音时长截取/循环画面；最后一段配音完成后只剩拼接与混音两步。
+同时运行的同步任务数与 ffmpeg 并发预算一致。
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.utils.ffmpeg_runner import get_ffmpeg_runner
+from src.utils.logger import logger
+
+
+class StreamingComposition:
+    """流水线合成：配音完成一段就同步一段，全部完成后拼接混音"""
+
+    # 同步画面占整体进度的比例，其余为拼接与混音（与 VideoComposer.compose_video_with_sync 一致）
+    SYNC_PROGRESS = 0.6
+
+    def __init__(self, composer, video_segments: List[Dict], background_music: str,
+                 output_path: str, config: Dict, max_workers: Optional[int] = None):
+        """
+        Args:
+            composer: VideoComposer 实例
+            video_segments: 视频片段列表，下标即 submit_audio 使用的片段序号
+            max_workers: 同时同步的片段数，默认取 ffmpeg 并发上限
+        """
+        self.composer = composer
+        self.video_segments = video_segments
+        self.background_music = background_music
+        self.output_path = output_path
+        self.config = config
+        self.context = composer.prepare_composition(video_segments, config, len(video_segments))
+
+        workers = max_workers or get_ffmpeg_runner().get_status()['max_concurrent']
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stream_sync")
+        self._futures: Dict[int, Future] = {}
+        self._failed = set()
+        self._finished_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return max(1, len(self.video_segments))
+
+    def submit_audio(self, index: int, audio_path: str, word_boundaries: Optional[List[Dict]] = None) -> bool:
+        """某段配音已就绪，提交该片段的画面同步
+
+        Args:
+            word_boundaries: 引擎返回的逐词时间，为空时从音频旁的时间记录读取
+        """
+        if self.composer.is_cancelled or not 0 <= index < len(self.video_segments):
+            return False
+        video_path = self.video_segments[index].get('video_path', '')
+        if not os.path.exists(video_path) or not audio_path or not os.path.exists(audio_path):
+            # 与顺序合成一致：文件缺失的片段跳过，不作为同步失败
+            logger.warning(f"片段 {index+1} 视频或音频文件不存在")
+            self.mark_failed(index)
+            return False
+        with self._lock:
+            if index in self._futures:
+                logger.warning(f"片段 {index+1} 已提交，忽略重复的配音")
+                return False
+            video_seg = dict(self.video_segments[index])
+            if word_boundaries:
+                video_seg['word_boundaries'] = word_boundaries
+            self._futures[index] = self._executor.submit(self._sync, index, video_seg, audio_path)
+        return True
+
+    def mark_failed(self, index: int):
+        """某段没有可用配音（生成失败或文件缺失），合成时跳过该片段"""
+        with self._lock:
+            self._failed.add(index)
+        self._advance(f"片段 {index+1} 没有配音，已跳过")
+
+    def _sync(self, index: int, video_seg: Dict, audio_path: str) -> Optional[Dict]:
+        try:
+            return self.composer.sync_segment(index, video_seg, audio_path, self.context,
+                                              message=f"同步片段 {index+1}/{self.total}...")
+        except Exception as e:
+            logger.error(f"片段 {index+1} 同步失败: {e}")
+            return None
+        finally:
+            self._advance(f"已同步片段 {index+1}")
+
+    def _advance(self, message: str):
+        with self._lock:
+            self._finished_count += 1
+            finished = self._finished_count
+        self.composer._report_progress(self.SYNC_PROGRESS * finished / self.total,
+                                       f"{message}（{finished}/{self.total}）")
+
+    def finish(self) -> bool:
+        """等待已提交的片段同步完成，按片段顺序拼接并混音"""
+        try:
+            self._executor.shutdown(wait=True)
+            if self.composer.is_cancelled:
+                logger.info("视频合成已取消")
+                return False
+
+            synced_segments = []
+            for index in sorted(self._futures):
+                synced = self._futures[index].result()
+                if synced is None:
+                    # 与顺序合成一致：画面同步失败时整体失败
+                    logger.error(f"片段 {index+1} 同步失败，停止合成")
+                    return False
+                synced_segments.append(synced)
+
+            skipped = len(self.video_segments) - len(synced_segments)
+            if skipped:
+                logger.warning(f"{skipped} 个片段没有配音，合成时跳过")
+            if not synced_segments:
+                logger.error("没有可合成的片段")
+                return False
+
+            return self.composer.finish_composition(synced_segments, self.background_music, self.output_path,
+                                                    self.config, self.context)
+        except Exception as e:
+            logger.error(f"流水线合成失败: {e}")
+            return False
+
+    def cancel(self):
+        """取消：结束正在运行的 ffmpeg 并丢弃尚未开始的片段"""
+        self.composer.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转场渲染器 - 基于 xfade 只重新编码相邻片段之间的转场窗口
+
+每个片段按关键帧切成 头部 / 中段 / 尾部：中段直接流复制，
+前一片段的尾部与后一片段的头部组成一个转场窗口，用 xfade 渲染。
+所有部分先输出为 MPEG-TS（每段自带编码参数），最后用 concat 无损拼接，
+转场耗时只与转场数量有关，与视频总时长无关。
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from src.utils.ffmpeg_runner import FFmpegResult, get_ffmpeg_runner
+from src.utils.logger import logger
+
+# 界面转场名称 / VideoProcessor.transition_effects 名称 -> xfade 转场类型（None 表示直接切换）
+XFADE_TRANSITIONS: Dict[str, Optional[str]] = {
+    '淡入淡出': 'fade',
+    '溶解': 'dissolve',
+    '左滑': 'slideleft',
+    '右滑': 'slideright',
+    '上滑': 'slideup',
+    '下滑': 'slidedown',
+    '缩放': 'zoomin',
+    '旋转': 'radial',
+    '擦除': 'wipeleft',
+    '推拉': 'smoothleft',
+    'fade': 'fade',
+    'cut': None,
+    'dissolve': 'dissolve',
+    'slide_left': 'slideleft',
+    'slide_right': 'slideright',
+    'zoom_in': 'zoomin',
+    'zoom_out': 'circleclose',  # xfade 没有缩小转场，用圆形收缩近似
+}
+
+# 时间比较容差（秒）
+_EPSILON = 0.001
+
+
+def resolve_xfade_transition(name: str) -> Optional[str]:
+    """转场名称转换为 xfade 类型，未知名称按淡入淡出处理"""
+    if name in XFADE_TRANSITIONS:
+        return XFADE_TRANSITIONS[name]
+    logger.warning(f"未知的转场类型: {name}，使用淡入淡出")
+    return 'fade'
+
+
+@dataclass
+class ClipInfo:
+    """片段探测信息"""
+    path: str
+    duration: float
+    keyframes: List[float] = field(default_factory=list)
+    width: int = 0
+    height: int = 0
+    fps: str = "30"
+    codec: str = ""  # 视频编码参数签名（编码器/profile/像素格式），中段流复制要求各片段一致
+    sample_rate: int = 44100
+    channels: int = 2
+    has_audio: bool = False
+    head_end: float = 0.0  # 头部窗口结束位置（中段起点）
+    tail_start: float = 0.0  # 尾部窗口开始位置（中段终点）
+
+
+class TransitionRenderer:
+    """xfade 转场渲染器"""
+
+    def __init__(self, ffmpeg_path: str, ffprobe_path: str, temp_dir: str,
+                 run: Callable[..., FFmpegResult], video_args: List[str],
+                 audio_bitrate: str = "192k", is_cancelled: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            run: 执行 ffmpeg 命令的函数（签名同 VideoComposer._run）
+            video_args: 转场窗口使用的视频编码参数，须与各片段编码时的参数一致，
+                中段流复制与重新编码的窗口才能无损拼接
+        """
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.temp_dir = temp_dir
+        self.run = run
+        self.video_args = video_args
+        self.audio_bitrate = audio_bitrate
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.with_audio = True  # 由 render 根据片段是否都有音轨确定
+
+    def _probe_clip(self, path: str) -> Optional[ClipInfo]:
+        """探测片段时长、画面/音频参数和关键帧位置（只读取包信息，不解码）"""
+        result = self.run([
+            self.ffprobe_path, '-v', 'error',
+            '-show_entries', 'stream=codec_type,codec_name,profile,pix_fmt,width,height,r_frame_rate,'
+                             'sample_rate,channels:format=duration',
+            '-of', 'json', path
+        ], timeout=30, capture_stdout=True)
+        if not result.success:
+            logger.warning(f"探测片段失败: {path}: {result.error_message}")
+            return None
+
+        data = json.loads(result.stdout_text or '{}')
+        info = ClipInfo(path=path, duration=float(data.get('format', {}).get('duration') or 0))
+        for stream in data.get('streams', []):
+            if stream.get('codec_type') == 'video' and not info.width:
+                info.width = int(stream.get('width') or 0)
+                info.height = int(stream.get('height') or 0)
+                info.fps = stream.get('r_frame_rate') or info.fps
+                info.codec = f"{stream.get('codec_name')}/{stream.get('profile')}/{stream.get('pix_fmt')}"
+            elif stream.get('codec_type') == 'audio' and not info.has_audio:
+                info.has_audio = True
+                info.sample_rate = int(stream.get('sample_rate') or info.sample_rate)
+                info.channels = int(stream.get('channels') or info.channels)
+
+        result = self.run([
+            self.ffprobe_path, '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path
+        ], timeout=60, capture_stdout=True)
+        if result.success:
+            for line in result.stdout_text.splitlines():
+                pts_time, _, flags = line.partition(',')
+                if 'K' in flags and pts_time not in ('', 'N/A'):
+                    info.keyframes.append(float(pts_time))
+            info.keyframes.sort()
+
+        if info.duration <= 0 or not info.width:
+            logger.warning(f"片段信息不完整: {path}")
+            return None
+        return info
+
+    @staticmethod
+    def _plan_cut_points(clip: ClipInfo, head_need: float, tail_need: float):
+        """确定中段（流复制部分）的起止位置，必须落在关键帧上"""
+        head_end = 0.0
+        if head_need > 0:
+            head_end = next((k for k in clip.keyframes if k >= head_need - _EPSILON), None)
+        tail_start = clip.duration
+        if tail_need > 0:
+            tail_start = next((k for k in reversed(clip.keyframes) if k <= clip.duration - tail_need + _EPSILON), None)
+
+        if head_end is None or tail_start is None or head_end >= tail_start - _EPSILON:
+            # 两个关键帧之间没有可复制的中段：整段都放进两侧的转场窗口里重新编码
+            if head_need <= 0:
+                split = 0.0
+            elif tail_need <= 0:
+                split = clip.duration
+            else:
+                split = head_need + (clip.duration - head_need - tail_need) / 2
+            head_end = tail_start = split
+        clip.head_end = head_end
+        clip.tail_start = tail_start
+
+    def _copy_command(self, clip: ClipInfo, output_path: str) -> List[str]:
+        """中段流复制命令"""
+        return [
+            self.ffmpeg_path,
+            '-ss', f"{clip.head_end + _EPSILON / 2:.6f}", '-i', clip.path,
+            '-t', f"{clip.tail_start - clip.head_end:.6f}",
+            '-map', '0:v:0', *(['-map', '0:a:0'] if self.with_audio else []),
+            '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+            '-f', 'mpegts', '-y', output_path
+        ]
+
+    def _window_command(self, left: ClipInfo, right: ClipInfo, transition: str, duration: float,
+                        reference: ClipInfo, output_path: str) -> List[str]:
+        """转场窗口命令：left 的尾部 + right 的头部，画面用 xfade 过渡，音频首尾相接保持同步"""
+        left_length = left.duration - left.tail_start
+        half = duration / 2
+        layout = 'mono' if reference.channels == 1 else 'stereo'
+        normalize = (f"scale={reference.width}:{reference.height},setsar=1,"
+                     f"fps={reference.fps},format=yuv420p")
+        audio_format = f"aformat=sample_rates={reference.sample_rate}:channel_layouts={layout}"
+        # 两侧各冻结半个转场时长的画面，使窗口总时长不变，音画不会错位
+        filters = [
+            f"[0:v]{normalize},tpad=stop_mode=clone:stop_duration={half:.6f}[a]",
+            f"[1:v]{normalize},tpad=start_mode=clone:start_duration={half:.6f}[b]",
+            f"[a][b]xfade=transition={transition}:duration={duration:.6f}:offset={left_length - half:.6f}[v]",
+        ]
+        audio_args = ['-an']
+        if self.with_audio:
+            filters += [
+                f"[0:a]{audio_format}[a0]",
+                f"[1:a]{audio_format}[a1]",
+                "[a0][a1]concat=n=2:v=0:a=1[aout]",
+            ]
+            audio_args = ['-map', '[aout]', '-c:a', 'aac', '-b:a', self.audio_bitrate,
+                          '-ar', str(reference.sample_rate), '-ac', str(reference.channels)]
+        return [
+            self.ffmpeg_path,
+            '-ss', f"{left.tail_start:.6f}", '-i', left.path,
+            '-t', f"{right.head_end:.6f}", '-i', right.path,
+            '-filter_complex', ';'.join(filters),
+            '-map', '[v]',
+            *self.video_args,
+            *audio_args,
+            '-f', 'mpegts', '-y', output_path
+        ]
+
+    def render(self, clip_paths: List[str], transitions: List[str], duration: float, output_path: str,
+               progress_callback: Optional[Callable[[float, str], None]] = None) -> bool:
+        """渲染带转场的视频
+
+        Args:
+            clip_paths: 片段路径
+            transitions: 相邻片段之间的转场名称（数量为片段数-1）
+            duration: 转场时长（秒），片段过短时自动缩短
+        """
+        clips = [self._probe_clip(path) for path in clip_paths]
+        if any(clip is None for clip in clips):
+            return False
+        # 中段直接流复制，各片段必须是同一套编码参数（同步步骤输出的片段满足这一点）
+        if len({(clip.codec, clip.width, clip.height, clip.fps) for clip in clips}) > 1:
+            logger.warning("片段编码参数不一致，无法使用分段转场渲染")
+            return False
+        # 全部有音轨或全部只有画面（音频由时间线最后统一混入）
+        self.with_audio = all(clip.has_audio for clip in clips)
+        if not self.with_audio and any(clip.has_audio for clip in clips):
+            logger.warning("部分片段没有音轨，无法使用分段转场渲染")
+            return False
+
+        # 每个转场的实际时长：cut 为0，且不超过相邻片段时长的一半
+        durations = []
+        xfades = []
+        for i in range(len(clips) - 1):
+            xfade = resolve_xfade_transition(transitions[i] if i < len(transitions) else '淡入淡出')
+            xfades.append(xfade)
+            durations.append(0.0 if xfade is None else
+                             max(0.0, min(duration, clips[i].duration / 2, clips[i + 1].duration / 2)))
+
+        for i, clip in enumerate(clips):
+            head_need = durations[i - 1] / 2 if i > 0 else 0.0
+            tail_need = durations[i] / 2 if i < len(clips) - 1 else 0.0
+            self._plan_cut_points(clip, head_need, tail_need)
+
+        # 按播放顺序排列各部分：中段流复制，转场窗口重新编码
+        jobs = []
+        for i, clip in enumerate(clips):
+            part_path = os.path.join(self.temp_dir, f"part_{i:03d}_body.ts")
+            if clip.tail_start - clip.head_end > _EPSILON:
+                jobs.append((part_path, self._copy_command(clip, part_path)))
+            if i < len(clips) - 1 and durations[i] > 0:
+                part_path = os.path.join(self.temp_dir, f"part_{i:03d}_xfade.ts")
+                jobs.append((part_path, self._window_command(
+                    clip, clips[i + 1], xfades[i], durations[i], clips[0], part_path)))
+
+        window_count = sum(1 for d in durations if d > 0)
+        logger.info(f"分段转场渲染: {len(clips)} 个片段，{window_count} 个转场窗口")
+
+        completed = 0
+        progress_lock = threading.Lock()
+
+        def run_job(job):
+            nonlocal completed
+            part_path, cmd = job
+            result = self.run(cmd, timeout=300)
+            with progress_lock:
+                completed += 1
+                done = completed
+            if progress_callback:
+                progress_callback(done / (len(jobs) + 1), f"渲染转场 {done}/{len(jobs)}")
+            if not result.success and not self.is_cancelled():
+                logger.error(f"转场分段渲染失败 {os.path.basename(part_path)}: {result.error_message}")
+            return result.success
+
+        workers = max(1, get_ffmpeg_runner().get_status()['max_concurrent'])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Transition") as executor:
+            results = list(executor.map(run_job, jobs))
+        if not all(results) or self.is_cancelled():
+            return False
+
+        list_file = os.path.join(self.temp_dir, "transition_parts.txt")
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for part_path, _ in jobs:
+                f.write(f"file '{part_path}'\n")
+
+        result = self.run([
+            self.ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', list_file,
+            '-c', 'copy', '-movflags', '+faststart', '-y', output_path
+        ], timeout=300)
+        if progress_callback:
+            progress_callback(1.0, "转场渲染完成")
+        if not result.success:
+            logger.error(f"转场分段拼接失败: {result.error_message}")
+        return result.success
@@ -5,101 +5,139 @@
 """
 
 import os
-import subprocess
 import json
 import tempfile
 import random
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 from pathlib import Path
 
+from src.utils.ass_subtitles import (AssStyle, ass_filter, events_from_word_boundaries, fontconfig_env,
+                                     split_subtitle_text, write_ass_file)
+from src.utils.encoder_profiles import (DEFAULT_PROFILE, INTERMEDIATE_PROFILE, build_audio_encode_args,
+                                        build_video_encode_args, encode_timeout, get_encoder_profile,
+                                        profile_name_for_quality)
+from src.utils.ffmpeg_runner import (FFmpegCancelToken, FFmpegResult, decode_output, find_ffmpeg,
+                                     ffprobe_path_for, run_ffmpeg_sync)
+from src.utils.audio_header_duration import read_audio_duration
 from src.utils.logger import logger
+from src.utils.tts_timing import load_duration, load_word_boundaries
+from .audio_timeline import AudioTimeline, TimelineMusic
+from .transition_renderer import TransitionRenderer
 
 class VideoComposer:
     """视频合成器"""
-    
-    def __init__(self):
+
+    def __init__(self, progress_callback: Optional[Callable[[float, str], None]] = None,
+                 encoder_profile: str = DEFAULT_PROFILE, prefer_hardware: bool = False):
+        """
+        Args:
+            progress_callback: 合成进度回调，参数为(0~1的比例, 说明)
+            encoder_profile: 最终输出使用的编码档位（draft/balanced/publish）
+            prefer_hardware: 是否优先使用可用的硬件编码器
+        """
         self.ffmpeg_path = self._find_ffmpeg()
+        self.ffprobe_path = ffprobe_path_for(self.ffmpeg_path)
         self.temp_dir = tempfile.mkdtemp(prefix="video_composer_")
-    
+        self.progress_callback = progress_callback
+        self.cancel_token = FFmpegCancelToken()
+        self.encoder_profile = get_encoder_profile(encoder_profile)
+        self.prefer_hardware = prefer_hardware
+        self._segment_args: Optional[List[str]] = None
+
+    def _video_encode_args(self, final: bool) -> List[str]:
+        """视频编码参数：最终输出用所选档位，之后还会再编码的中间文件用快速档位"""
+        profile = self.encoder_profile if final else get_encoder_profile(INTERMEDIATE_PROFILE)
+        return build_video_encode_args(profile, ffmpeg_path=self.ffmpeg_path,
+                                       prefer_hardware=self.prefer_hardware)
+
+    def _segment_encode_args(self) -> List[str]:
+        """同步片段与转场窗口共用的编码参数
+
+        转场中段流复制自同步片段，与重新编码的转场窗口拼接在一起，两者的编码器、
+        档位和线程参数必须完全一致，否则 SPS 不同会导致拼接后无法播放；一次合成中只计算一次
+        """
+        if self._segment_args is None:
+            self._segment_args = self._video_encode_args(final=True)
+        return list(self._segment_args)
+
+    def cancel(self):
+        """取消合成：立即结束正在运行的 ffmpeg 进程"""
+        self.cancel_token.cancel()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    def _report_progress(self, fraction: float, message: str):
+        if self.progress_callback:
+            try:
+                self.progress_callback(min(1.0, max(0.0, fraction)), message)
+            except Exception as e:
+                logger.debug(f"合成进度回调出错: {e}")
+
+    def _run(self, cmd: List[str], timeout: Optional[float] = None,
+             progress_range: Optional[Tuple[float, float]] = None, message: str = "",
+             total_duration: Optional[float] = None, capture_stdout: bool = False,
+             env: Optional[Dict[str, str]] = None) -> FFmpegResult:
+        """执行 ffmpeg/ffprobe 命令，可取消；progress_range 为该步骤在整体进度中占的区间"""
+        progress = None
+        if progress_range and self.progress_callback:
+            start, end = progress_range
+            progress = lambda fraction: self._report_progress(start + (end - start) * fraction, message)
+        return run_ffmpeg_sync(cmd, timeout=timeout, progress_callback=progress,
+                               total_duration=total_duration, cancel_token=self.cancel_token,
+                               capture_stdout=capture_stdout, env=env)
+
     def _find_ffmpeg(self) -> str:
         """查找FFmpeg可执行文件"""
-        # 常见的FFmpeg路径
-        possible_paths = [
-            "ffmpeg/bin/ffmpeg.exe",  # 本地安装目录
-            "./ffmpeg/bin/ffmpeg.exe",  # 本地目录
-            "ffmpeg",  # 系统PATH中
-            "ffmpeg.exe",  # Windows
-            "/usr/bin/ffmpeg",  # Linux
-            "/usr/local/bin/ffmpeg",  # macOS
-        ]
-        
-        for path in possible_paths:
-            try:
-                result = subprocess.run(
-                    [path, "-version"], 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=5
-                )
-                if result.returncode == 0:
-                    logger.info(f"找到FFmpeg: {path}")
-                    return path
-            except (subprocess.TimeoutExpired, FileNotFoundError):
-                continue
-        
-        logger.warning("未找到FFmpeg，某些功能可能不可用")
-        return "ffmpeg"  # 默认值
-    
+        return find_ffmpeg()
+
     def get_video_info(self, video_path: str) -> Dict:
-        """获取视频信息"""
+        """获取视频信息（ffprobe 只读取容器和流的元数据，不解码画面，不占用编码并发预算）"""
         try:
             cmd = [
-                self.ffmpeg_path, "-i", video_path,
-                "-f", "null", "-"
+                self.ffprobe_path,
+                "-v", "error",
+                "-select_streams", "v:0",
+                "-show_entries", "format=duration:stream=width,height,avg_frame_rate,r_frame_rate,duration",
+                "-of", "json",
+                video_path
             ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                timeout=30
-            )
 
-            # 处理编码问题
-            stderr = self._decode_output(result.stderr)
+            result = self._run(cmd, timeout=30, capture_stdout=True)
+            if not result.success:
+                raise RuntimeError(result.error_message)
+
+            probe_data = json.loads(result.stdout_text or '{}')
+            stream = (probe_data.get('streams') or [{}])[0]
             info = {
                 'duration': 0.0,
-                'width': 0,
-                'height': 0,
+                'width': int(stream.get('width') or 0),
+                'height': int(stream.get('height') or 0),
                 'fps': 30.0
             }
-            
-            # 解析时长
-            if "Duration:" in stderr:
-                duration_line = [line for line in stderr.split('\n') if 'Duration:' in line][0]
-                duration_str = duration_line.split('Duration:')[1].split(',')[0].strip()
-                info['duration'] = self._parse_duration(duration_str)
-            
-            # 解析分辨率和帧率
-            if "Video:" in stderr:
-                video_line = [line for line in stderr.split('\n') if 'Video:' in line][0]
-                if 'x' in video_line:
-                    resolution_part = video_line.split('x')
-                    if len(resolution_part) >= 2:
-                        try:
-                            info['width'] = int(resolution_part[0].split()[-1])
-                            info['height'] = int(resolution_part[1].split()[0])
-                        except ValueError:
-                            pass
-                
-                if 'fps' in video_line:
-                    fps_part = video_line.split('fps')[0].split()[-1]
-                    try:
-                        info['fps'] = float(fps_part)
-                    except ValueError:
-                        pass
-            
+
+            # 容器时长优先，缺失时使用视频流时长
+            for duration in (probe_data.get('format', {}).get('duration'), stream.get('duration')):
+                try:
+                    info['duration'] = float(duration)
+                    break
+                except (TypeError, ValueError):
+                    continue
+
+            # 帧率形如 "30000/1001"，平均帧率为 0/0 时退回 r_frame_rate
+            for rate in (stream.get('avg_frame_rate'), stream.get('r_frame_rate')):
+                try:
+                    num, _, den = (rate or '').partition('/')
+                    fps = float(num) / float(den or 1)
+                except (ValueError, ZeroDivisionError):
+                    continue
+                if fps > 0:
+                    info['fps'] = fps
+                    break
+
             return info
-            
+
         except Exception as e:
             logger.error(f"获取视频信息失败: {e}")
             return {'duration': 5.0, 'width': 1280, 'height': 720, 'fps': 30.0}
@@ -136,21 +174,24 @@ class VideoComposer:
             logger.error(f"创建视频列表文件失败: {e}")
             raise
     
-    def concatenate_videos(self, video_segments: List[Dict], output_path: str, transition_config: Dict = None) -> bool:
+    def concatenate_videos(self, video_segments: List[Dict], output_path: str, transition_config: Dict = None,
+                           progress_range: Optional[Tuple[float, float]] = None) -> bool:
         """连接视频片段，支持转场效果"""
         try:
             if not transition_config or len(video_segments) <= 1:
                 # 无转场效果，使用简单连接
-                return self._simple_concatenate(video_segments, output_path)
+                return self._simple_concatenate(video_segments, output_path, progress_range)
             else:
                 # 有转场效果，使用复杂滤镜连接
-                return self._concatenate_with_transitions(video_segments, output_path, transition_config)
+                return self._concatenate_with_transitions(video_segments, output_path, transition_config,
+                                                          progress_range)
 
         except Exception as e:
             logger.error(f"连接视频失败: {e}")
             return False
 
-    def _simple_concatenate(self, video_segments: List[Dict], output_path: str) -> bool:
+    def _simple_concatenate(self, video_segments: List[Dict], output_path: str,
+                            progress_range: Optional[Tuple[float, float]] = None) -> bool:
         """简单视频连接（无转场）"""
         try:
             list_file = self.create_video_list(video_segments)
@@ -165,360 +206,211 @@ class VideoComposer:
                 output_path
             ]
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                timeout=300  # 5分钟超时
-            )
+            total_duration = sum(segment.get('duration', 0) for segment in video_segments) or None
+            result = self._run(cmd, timeout=300, progress_range=progress_range,  # 5分钟超时
+                               message="连接视频片段...", total_duration=total_duration)
 
-            if result.returncode == 0:
+            if result.success:
                 logger.info(f"视频连接成功: {output_path}")
                 return True
             else:
-                stderr = self._decode_output(result.stderr)
-                logger.error(f"视频连接失败: {stderr}")
+                logger.error(f"视频连接失败: {result.error_message}")
                 return False
 
         except Exception as e:
             logger.error(f"简单连接视频失败: {e}")
             return False
 
-    def _concatenate_with_transitions(self, video_segments: List[Dict], output_path: str, transition_config: Dict) -> bool:
-        """带转场效果的视频连接"""
+    def _concatenate_with_transitions(self, video_segments: List[Dict], output_path: str, transition_config: Dict,
+                                      progress_range: Optional[Tuple[float, float]] = None) -> bool:
+        """带转场效果的视频连接（只重新编码转场窗口，其余部分流复制）"""
         try:
-            logger.info(f"开始生成带转场效果的视频，片段数量: {len(video_segments)}")
+            segments = [seg for seg in video_segments if os.path.exists(seg.get('video_path', ''))]
+            logger.info(f"开始生成带转场效果的视频，片段数量: {len(segments)}")
+            if len(segments) <= 1:
+                return self._simple_concatenate(segments, output_path, progress_range)
 
             # 生成转场效果
-            transitions = self._generate_transition_effects(video_segments, transition_config)
+            transitions = self._generate_transition_effects(segments, transition_config)
             duration = transition_config.get('duration', 0.5)
 
-            # 对于多个片段，使用简化的转场方案
-            # 为每个片段添加淡入淡出效果，然后连接
-            processed_segments = []
-
-            for i, segment in enumerate(video_segments):
-                video_path = segment.get('video_path', '')
-                if not os.path.exists(video_path):
-                    continue
-
-                # 为每个片段添加转场效果
-                transition_video = os.path.join(self.temp_dir, f"transition_{i}.mp4")
-
-                if i == 0:
-                    # 第一个片段：只添加淡出
-                    filter_str = f"fade=t=out:st={segment.get('duration', 5.0) - duration}:d={duration}"
-                elif i == len(video_segments) - 1:
-                    # 最后一个片段：只添加淡入
-                    filter_str = f"fade=t=in:st=0:d={duration}"
-                else:
-                    # 中间片段：添加淡入和淡出
-                    filter_str = f"fade=t=in:st=0:d={duration},fade=t=out:st={segment.get('duration', 5.0) - duration}:d={duration}"
-
-                cmd = [
-                    self.ffmpeg_path,
-                    "-i", video_path,
-                    "-vf", filter_str,
-                    "-c:a", "copy",
-                    "-y",
-                    transition_video
-                ]
+            progress = None
+            if progress_range:
+                start, end = progress_range
+                progress = lambda fraction, message: self._report_progress(start + (end - start) * fraction, message)
 
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-
-                if result.returncode == 0:
-                    processed_segments.append({
-                        'video_path': transition_video,
-                        'duration': segment.get('duration', 5.0)
-                    })
-                    logger.info(f"片段 {i+1} 转场处理完成")
-                else:
-                    logger.warning(f"片段 {i+1} 转场处理失败，使用原片段")
-                    processed_segments.append(segment)
-
-            # 连接处理后的片段
-            if processed_segments:
-                return self._simple_concatenate(processed_segments, output_path)
-            else:
+            renderer = TransitionRenderer(
+                self.ffmpeg_path, self.ffprobe_path, self.temp_dir, self._run,
+                video_args=self._segment_encode_args(),
+                audio_bitrate=self.encoder_profile.audio_bitrate,
+                is_cancelled=lambda: self.is_cancelled
+            )
+            if renderer.render([seg['video_path'] for seg in segments], transitions, duration,
+                               output_path, progress):
+                logger.info(f"转场视频合成成功: {output_path}")
+                return True
+            if self.is_cancelled:
                 return False
 
+            logger.warning("转场渲染失败，回退到无转场连接")
+            return self._simple_concatenate(segments, output_path, progress_range)
+
         except Exception as e:
             logger.error(f"转场视频合成失败: {e}")
             # 回退到简单连接
             return self._simple_concatenate(video_segments, output_path)
-    
+
     def add_audio_track(self, video_path: str, audio_segments: List[Dict], output_path: str) -> bool:
-        """添加音频轨道"""
+        """添加音频轨道：各段配音按顺序首尾相接放到时间线上，只编码一次"""
         try:
             logger.info(f"开始添加音频轨道，音频片段数量: {len(audio_segments)}")
 
-            # 创建音频列表
-            audio_list_file = os.path.join(self.temp_dir, "audio_list.txt")
-            valid_audio_count = 0
-
-            with open(audio_list_file, 'w', encoding='utf-8') as f:
-                for i, segment in enumerate(audio_segments):
-                    audio_path = segment.get('audio_path', '')
-                    if os.path.exists(audio_path):
-                        f.write(f"file '{audio_path}'\n")
-                        valid_audio_count += 1
-                        logger.info(f"添加音频文件 {i+1}: {audio_path}")
-                    else:
-                        logger.warning(f"音频文件不存在 {i+1}: {audio_path}")
-
-            logger.info(f"有效音频文件数量: {valid_audio_count}")
+            timeline_clips = []
+            current_time = 0.0
+            for i, segment in enumerate(audio_segments):
+                audio_path = segment.get('audio_path', '')
+                if not os.path.exists(audio_path):
+                    logger.warning(f"音频文件不存在 {i+1}: {audio_path}")
+                    continue
+                duration = self.get_audio_duration(audio_path)
+                timeline_clips.append((audio_path, current_time))
+                current_time += duration
 
-            if valid_audio_count == 0:
+            logger.info(f"有效音频文件数量: {len(timeline_clips)}")
+            if not timeline_clips:
                 logger.error("没有有效的音频文件")
                 return False
 
-            # 连接音频文件
-            combined_audio = os.path.join(self.temp_dir, "combined_audio.mp3")
-
-            audio_concat_cmd = [
-                self.ffmpeg_path,
-                "-f", "concat",
-                "-safe", "0",
-                "-i", audio_list_file,
-                "-c", "copy",
-                "-y",
-                combined_audio
-            ]
-
-            logger.info(f"执行音频连接命令: {' '.join(audio_concat_cmd)}")
-            result = subprocess.run(audio_concat_cmd, capture_output=True, text=True, timeout=120)
-
-            if result.returncode != 0:
-                logger.error(f"音频连接失败: {result.stderr}")
-                logger.error(f"音频连接命令输出: {result.stdout}")
-                return False
-
-            logger.info(f"音频连接成功: {combined_audio}")
-
-            # 检查合并后的音频文件
-            if not os.path.exists(combined_audio):
-                logger.error(f"合并后的音频文件不存在: {combined_audio}")
-                return False
-
-            # 将音频添加到视频
-            cmd = [
-                self.ffmpeg_path,
-                "-i", video_path,
-                "-i", combined_audio,
-                "-c:v", "copy",
-                "-c:a", "aac",
-                "-map", "0:v:0",
-                "-map", "1:a:0",
-                "-shortest",
-                "-y",
-                output_path
-            ]
+            video_duration = self.get_video_duration(video_path)
+            timeline = AudioTimeline(min(video_duration, current_time) if video_duration > 0 else current_time)
+            for audio_path, start in timeline_clips:
+                timeline.add_clip(audio_path, start)
 
+            cmd = timeline.mux_command(self.ffmpeg_path, video_path, output_path,
+                                       self.encoder_profile.audio_bitrate,
+                                       script_path=os.path.join(self.temp_dir, "audio_track_graph.txt"))
             logger.info(f"执行音频合并命令: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
+            result = self._run(cmd, timeout=300, total_duration=timeline.total_duration)
 
-            if result.returncode == 0:
+            if result.success:
                 logger.info(f"音频添加成功: {output_path}")
                 return True
             else:
-                stderr = self._decode_output(result.stderr)
-                stdout = self._decode_output(result.stdout)
-                logger.error(f"音频添加失败: {stderr}")
-                logger.error(f"音频添加命令输出: {stdout}")
+                logger.error(f"音频添加失败: {result.error_message}")
                 return False
-                
+
         except Exception as e:
             logger.error(f"添加音频轨道失败: {e}")
             return False
-    
-    def add_background_music(self, video_path: str, music_path: str, output_path: str, 
-                           volume: float = 0.3, loop: bool = True, 
-                           fade_in: bool = True, fade_out: bool = True) -> bool:
-        """添加背景音乐"""
+
+    def add_background_music(self, video_path: str, music_path: str, output_path: str,
+                           volume: float = 0.3, loop: bool = True,
+                           fade_in: bool = True, fade_out: bool = True,
+                           progress_range: Optional[Tuple[float, float]] = None,
+                           duck: bool = True) -> bool:
+        """添加背景音乐（有人声时自动压低音乐）"""
         try:
             if not os.path.exists(music_path):
                 logger.warning(f"背景音乐文件不存在: {music_path}")
                 return False
-            
-            # 获取视频时长
-            video_info = self.get_video_info(video_path)
-            video_duration = video_info['duration']
-            
-            # 构建音频滤镜
-            audio_filters = []
-            
-            # 音量调整
-            audio_filters.append(f"volume={volume}")
-            
-            # 循环播放
-            if loop:
-                audio_filters.append(f"aloop=loop=-1:size=2e+09")
-            
-            # 淡入淡出效果
-            if fade_in:
-                audio_filters.append("afade=t=in:ss=0:d=2")
-            
-            if fade_out:
-                fade_start = max(0, video_duration - 2)
-                audio_filters.append(f"afade=t=out:st={fade_start}:d=2")
-            
-            # 限制音频长度
-            audio_filters.append(f"atrim=duration={video_duration}")
-            
-            filter_complex = "[1:a]" + ",".join(audio_filters) + "[bg]; [0:a][bg]amix=inputs=2:duration=first[out]"
-            
-            cmd = [
-                self.ffmpeg_path,
-                "-i", video_path,
-                "-i", music_path,
-                "-filter_complex", filter_complex,
-                "-map", "0:v",
-                "-map", "[out]",
-                "-c:v", "copy",
-                "-c:a", "aac",
-                "-y",
-                output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, timeout=600)
 
-            if result.returncode == 0:
+            # 获取视频时长
+            video_duration = self.get_video_duration(video_path)
+
+            # 视频原有音轨作为人声放在时间线开头；已混好的音轨不再做响度标准化
+            timeline = AudioTimeline(video_duration, normalize_loudness=False)
+            timeline.add_clip(video_path, 0.0)
+            timeline.set_music(TimelineMusic(music_path, volume=volume, loop=loop,
+                                             fade_in=2.0 if fade_in else 0.0,
+                                             fade_out=2.0 if fade_out else 0.0, duck=duck))
+            cmd = timeline.mux_command(self.ffmpeg_path, video_path, output_path,
+                                       self.encoder_profile.audio_bitrate,
+                                       script_path=os.path.join(self.temp_dir, "background_music_graph.txt"))
+
+            result = self._run(cmd, timeout=600, progress_range=progress_range,
+                               message="添加背景音乐...", total_duration=video_duration or None)
+
+            if result.success:
                 logger.info(f"背景音乐添加成功: {output_path}")
                 return True
             else:
-                stderr = self._decode_output(result.stderr)
-                logger.error(f"背景音乐添加失败: {stderr}")
+                logger.error(f"背景音乐添加失败: {result.error_message}")
                 return False
-                
+
         except Exception as e:
             logger.error(f"添加背景音乐失败: {e}")
             return False
-    
-    def add_subtitles(self, video_path: str, subtitle_segments: List[Dict], output_path: str, subtitle_config: Dict = None) -> bool:
-        """添加字幕"""
-        try:
-            # 创建SRT字幕文件
-            srt_file = os.path.join(self.temp_dir, "subtitles.srt")
-
-            with open(srt_file, 'w', encoding='utf-8') as f:
-                current_time = 0.0
-                subtitle_index = 1
-
-                for i, segment in enumerate(subtitle_segments):
-                    text = segment.get('subtitle_text', '').strip()
-                    duration = segment.get('duration', 5.0)
-
-                    logger.info(f"处理字幕片段 {i+1}: 文本长度={len(text)}, 时长={duration:.2f}秒")
-                    if text:
-                        logger.info(f"字幕片段 {i+1} 文本预览: {text[:100]}...")
-                    else:
-                        logger.warning(f"字幕片段 {i+1} 没有文本内容")
-
-                    if text:  # 只有有文本的才添加字幕
-                        # SRT时间格式: HH:MM:SS,mmm
-                        start_time = self._seconds_to_srt_time(current_time)
-                        end_time = self._seconds_to_srt_time(current_time + duration)
-
-                        f.write(f"{subtitle_index}\n")
-                        f.write(f"{start_time} --> {end_time}\n")
-                        f.write(f"{text}\n\n")
-
-                        subtitle_index += 1
-                        logger.info(f"添加字幕 {subtitle_index-1}: {start_time} --> {end_time} | {text[:50]}...")
-
-                    current_time += duration
-
-            # 使用FFmpeg添加字幕，支持样式配置
-            # 将反斜杠转换为正斜杠，并正确转义冒号
-            srt_file_escaped = srt_file.replace('\\', '/').replace(':', '\\\\:')
-
-            # 获取字幕样式配置
-            if subtitle_config is None:
-                subtitle_config = {}
-
-            font_size = subtitle_config.get('font_size', 24)
-            font_color = subtitle_config.get('font_color', '#ffffff')
-            outline_color = subtitle_config.get('outline_color', '#000000')
-            outline_size = subtitle_config.get('outline_size', 2)
-            position = subtitle_config.get('position', '底部')
-
-            # 转换颜色格式 (#ffffff -> &Hffffff)
-            font_color_bgr = self._hex_to_bgr(font_color)
-            outline_color_bgr = self._hex_to_bgr(outline_color)
 
-            # 设置字幕位置
-            alignment = 2  # 底部居中
-            if position == "顶部":
-                alignment = 8  # 顶部居中
-            elif position == "中间":
-                alignment = 5  # 中间居中
+    def _subtitle_events(self, segment: Dict, duration: float) -> List[Tuple[float, float, str]]:
+        """单个片段的字幕行（片段内时间）：有TTS逐词时间戳时按发音断行，否则按字数比例分配"""
+        word_boundaries = segment.get('word_boundaries') or load_word_boundaries(segment.get('audio_path', ''))
+        if word_boundaries:
+            return events_from_word_boundaries(word_boundaries)
+        return split_subtitle_text(segment.get('subtitle_text', '').strip(), duration)
 
-            # 构建字幕样式
-            style = f"FontSize={font_size},PrimaryColour={font_color_bgr},OutlineColour={outline_color_bgr},Outline={outline_size},Alignment={alignment}"
+    def add_subtitles(self, video_path: str, subtitle_segments: List[Dict], output_path: str, subtitle_config: Dict = None,
+                      progress_range: Optional[Tuple[float, float]] = None) -> bool:
+        """添加字幕
 
-            cmd = [
-                self.ffmpeg_path,
-                "-i", video_path,
-                "-vf", f"subtitles={srt_file_escaped}:force_style='{style}'",
-                "-c:a", "copy",
-                "-y",
-                output_path
-            ]
+        subtitle_config['mode'] 为 'soft' 时作为独立字幕轨（mov_text）封装，不重新编码画面；
+        否则生成带样式的ASS字幕并烧录。
+        """
+        try:
+            subtitle_config = subtitle_config or {}
+
+            # 按片段顺序把各片段的字幕行平移到整段视频的时间轴上
+            events = []
+            current_time = 0.0
+            for segment in subtitle_segments:
+                duration = segment.get('duration', 5.0)
+                if segment.get('subtitle_text', '').strip():
+                    events.extend((current_time + start, current_time + end, text)
+                                  for start, end, text in self._subtitle_events(segment, duration))
+                current_time += duration
+            logger.info(f"生成字幕 {len(events)} 行，视频总时长 {current_time:.2f}秒")
+
+            ass_file = os.path.join(self.temp_dir, "subtitles.ass")
+            write_ass_file(events, ass_file, AssStyle.from_config(subtitle_config))
+
+            if subtitle_config.get('mode') == 'soft':
+                # 软字幕：画面和音频直接复制，只增加一条字幕轨
+                cmd = [
+                    self.ffmpeg_path,
+                    "-i", video_path,
+                    "-i", ass_file,
+                    "-map", "0:v", "-map", "0:a?", "-map", "1:s",
+                    "-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text",
+                    "-metadata:s:s:0", "language=chi",
+                    "-y",
+                    output_path
+                ]
+            else:
+                cmd = [
+                    self.ffmpeg_path,
+                    "-i", video_path,
+                    "-vf", ass_filter(ass_file),
+                    *self._video_encode_args(final=True),
+                    "-c:a", "copy",
+                    "-y",
+                    output_path
+                ]
 
-            result = subprocess.run(cmd, capture_output=True, timeout=300)
+            total_duration = current_time or None
+            result = self._run(cmd, timeout=300, progress_range=progress_range,
+                               message="添加字幕...", total_duration=total_duration,
+                               env=None if subtitle_config.get('mode') == 'soft' else fontconfig_env())
 
-            if result.returncode == 0:
+            if result.success:
                 logger.info(f"字幕添加成功: {output_path}")
                 return True
             else:
-                stderr = self._decode_output(result.stderr)
-                logger.error(f"字幕添加失败: {stderr}")
+                logger.error(f"字幕添加失败: {result.error_message}")
                 return False
 
         except Exception as e:
             logger.error(f"添加字幕失败: {e}")
             return False
 
-    def _seconds_to_srt_time(self, seconds: float) -> str:
-        """将秒数转换为SRT时间格式"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millisecs = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
-
-    def _hex_to_bgr(self, hex_color: str) -> str:
-        """将十六进制颜色转换为BGR格式（用于ASS字幕）"""
-        # 移除#号
-        hex_color = hex_color.lstrip('#')
-
-        # 解析RGB值
-        r = int(hex_color[0:2], 16)
-        g = int(hex_color[2:4], 16)
-        b = int(hex_color[4:6], 16)
-
-        # 转换为BGR格式并返回ASS格式
-        return f"&H{b:02x}{g:02x}{r:02x}"
-
-    def _get_transition_filter(self, transition_type: str, duration: float, intensity: int) -> str:
-        """获取转场滤镜"""
-        # 强度映射到0.1-1.0
-        intensity_value = intensity / 10.0
-
-        transition_filters = {
-            "淡入淡出": f"fade=t=in:st=0:d={duration}",
-            "左滑": f"slide=direction=left:duration={duration}",
-            "右滑": f"slide=direction=right:duration={duration}",
-            "上滑": f"slide=direction=up:duration={duration}",
-            "下滑": f"slide=direction=down:duration={duration}",
-            "缩放": f"zoompan=z='if(lte(zoom,1.0),1.5,max(1.001,zoom-0.0015))':d={int(duration*30)}:s=1920x1080",
-            "旋转": f"rotate=angle='2*PI*t/{duration}':fillcolor=black",
-            "溶解": f"fade=t=in:st=0:d={duration}:alpha=1",
-            "擦除": f"wipe=direction=right:duration={duration}",
-            "推拉": f"push=direction=left:duration={duration}"
-        }
-
-        return transition_filters.get(transition_type, transition_filters["淡入淡出"])
-
     def _get_random_transition(self) -> str:
         """获取随机转场类型"""
         transitions = [
@@ -559,6 +451,16 @@ class VideoComposer:
                 logger.warning(f"音频文件不存在: {audio_path}")
                 return 5.0
 
+            # 合成时记录的时长，无需读取音频
+            duration = load_duration(audio_path)
+            if duration:
+                return duration
+
+            # 解析文件头，不解码音频
+            duration = read_audio_duration(audio_path)
+            if duration > 0:
+                return duration
+
             # 方法1：尝试使用mutagen（最可靠）
             try:
                 from mutagen import File
@@ -581,21 +483,8 @@ class VideoComposer:
                     "-"
                 ]
 
-                # 使用bytes模式避免编码问题
-                result = subprocess.run(cmd, capture_output=True, timeout=30)
-
-                # 尝试不同的编码方式解码stderr
-                stderr_text = None
-                for encoding in ['utf-8', 'gbk', 'cp1252', 'latin1']:
-                    try:
-                        stderr_text = result.stderr.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-
-                if stderr_text is None:
-                    # 如果所有编码都失败，使用errors='ignore'
-                    stderr_text = result.stderr.decode('utf-8', errors='ignore')
+                result = self._run(cmd, timeout=30)
+                stderr_text = result.stderr
 
                 # 从stderr中解析时长信息
                 if stderr_text:
@@ -635,18 +524,7 @@ class VideoComposer:
 
     def _decode_output(self, output_bytes: bytes) -> str:
         """解码subprocess输出，处理编码问题"""
-        if not output_bytes:
-            return ""
-
-        # 尝试不同的编码方式解码
-        for encoding in ['utf-8', 'gbk', 'cp1252', 'latin1']:
-            try:
-                return output_bytes.decode(encoding)
-            except UnicodeDecodeError:
-                continue
-
-        # 如果所有编码都失败，使用errors='ignore'
-        return output_bytes.decode('utf-8', errors='ignore')
+        return decode_output(output_bytes)
 
     def compose_final_video(self, video_segments: List[Dict], audio_segments: List[Dict],
                           background_music: str, output_path: str, config: Dict) -> bool:
@@ -663,129 +541,216 @@ class VideoComposer:
             logger.error(f"合成最终视频失败: {e}")
             return False
 
+    def prepare_composition(self, video_segments: List[Dict], config: Dict, segment_count: int) -> Dict:
+        """根据合成配置确定编码档位、转场与字幕参数，返回同步各片段时共用的上下文"""
+        # 最终编码档位：优先使用显式指定的档位，否则按界面的“视频质量”选项
+        self.encoder_profile = get_encoder_profile(
+            config.get('encoder_profile') or profile_name_for_quality(config.get('quality')))
+        self.prefer_hardware = config.get('prefer_hardware_encoder', self.prefer_hardware)
+        self._segment_args = None
+        logger.info(f"编码档位: {self.encoder_profile.name}（{self.encoder_profile.description}）")
+
+        # 画面只在同步步骤编码一次：字幕在同步时烧录，转场只重新编码转场窗口，
+        # 其余步骤都是流复制，因此同步步骤直接使用最终档位
+        transition_config = config.get('transition_config', {})
+        uses_transitions = bool(transition_config) and segment_count > 1
+
+        subtitle_config = config.get('subtitle_config', {})
+        has_subtitles = any(seg.get('subtitle_text', '').strip() for seg in video_segments)
+        return {
+            'transition_config': transition_config,
+            'transition_duration': transition_config.get('duration', 0.5) if uses_transitions else 0.0,
+            'subtitle_config': subtitle_config,
+            'subtitle_style': AssStyle.from_config(subtitle_config),
+            'has_subtitles': has_subtitles,
+            'soft_subtitles': has_subtitles and subtitle_config.get('mode') == 'soft',
+        }
+
+    def sync_segment(self, index: int, video_seg: Dict, audio_path: str, context: Dict,
+                     progress_range: Optional[Tuple[float, float]] = None,
+                     message: Optional[str] = None) -> Optional[Dict]:
+        """把单个视频片段按配音时长截取/循环并烧录字幕（只生成画面）
+
+        Returns:
+            同步后的片段信息；文件缺失或失败时返回 None
+        """
+        video_path = video_seg.get('video_path', '')
+        subtitle_text = video_seg.get('subtitle_text', '')
+
+        if not os.path.exists(video_path) or not audio_path or not os.path.exists(audio_path):
+            logger.warning(f"片段 {index+1} 视频或音频文件不存在")
+            return None
+
+        # 获取音频实际时长
+        audio_duration = self.get_audio_duration(audio_path)
+        if audio_duration <= 0:
+            audio_duration = 5.0  # 默认5秒
+
+        # 获取视频实际时长和帧率（只读元数据）
+        video_info = self.get_video_info(video_path)
+        video_duration = video_info['duration']
+        if video_duration <= 0:
+            video_duration = 5.0  # 默认5秒
+
+        # 片段时长取整到帧：ffmpeg 按整帧输出，-t 非整帧时会多出不足一帧，逐段累积使配音与画面错位。
+        # 之后的转场、时间线都按取整后的时长定位各段配音
+        fps = video_info.get('fps') or 30.0
+        frame_count = max(1, round(audio_duration * fps))
+        segment_duration = frame_count / fps
+
+        logger.info(f"片段 {index+1}: 音频时长 {audio_duration:.2f}秒, 视频时长 {video_duration:.2f}秒, "
+                    f"输出 {frame_count} 帧 ({segment_duration:.3f}秒)")
+
+        # 创建同步的视频片段（调整视频时长严格匹配音频）
+        synced_video = os.path.join(self.temp_dir, f"synced_{index:03d}.mp4")
+
+        # 根据时长关系选择不同的处理策略
+        # 在转场窗口边界处插入关键帧，使片段中段可以直接流复制
+        transition_duration = context['transition_duration']
+        keyframe_times = None
+        if transition_duration > 0 and segment_duration > transition_duration:
+            keyframe_times = [transition_duration / 2, segment_duration - transition_duration / 2]
+        # 烧录字幕：每个片段写出自己的ASS字幕，在同步编码时一并渲染
+        segment = {**video_seg, 'audio_path': audio_path}
+        video_filter = None
+        if context['has_subtitles'] and not context['soft_subtitles'] and subtitle_text.strip():
+            segment_ass = os.path.join(self.temp_dir, f"subtitles_{index:03d}.ass")
+            write_ass_file(self._subtitle_events(segment, segment_duration), segment_ass, context['subtitle_style'])
+            video_filter = ass_filter(segment_ass)
+        def run_sync(video_filter: Optional[str]) -> FFmpegResult:
+            # 只生成画面：音频在最后由时间线统一混音，只编码一次
+            cmd = self._create_sync_command(video_path, audio_path, segment_duration, video_duration, synced_video,
+                                            final=True, keyframe_times=keyframe_times, video_filter=video_filter,
+                                            include_audio=False, frame_count=frame_count)
+            logger.info(f"执行同步命令: {' '.join(cmd)}")
+            # 超时随片段时长和编码档位增长（慢速档位、烧录字幕的长片段在慢机器上可能远超60秒）
+            return self._run(cmd, timeout=encode_timeout(self.encoder_profile, segment_duration),
+                             progress_range=progress_range,
+                             message=message or f"同步片段 {index+1}...", total_duration=segment_duration,
+                             env=fontconfig_env() if video_filter else None)
+
+        result = run_sync(video_filter)
+        if not result.success and video_filter and not self.is_cancelled:
+            # ffmpeg 未编译 libass 或字体配置出错时，输出不带字幕的片段，不中断整个合成
+            logger.warning(f"片段 {index+1} 烧录字幕失败，改为输出无字幕画面: {result.error_message}")
+            result = run_sync(None)
+        if not result.success:
+            if not self.is_cancelled:
+                logger.error(f"片段 {index+1} 同步失败: {result.error_message}")
+            return None
+
+        logger.info(f"片段 {index+1} 同步成功，字幕文本长度: {len(subtitle_text)}")
+        return {
+            'video_path': synced_video,
+            'audio_path': audio_path,
+            'duration': segment_duration,
+            'subtitle_text': subtitle_text,
+            'word_boundaries': video_seg.get('word_boundaries')
+        }
+
     def compose_video_with_sync(self, video_segments: List[Dict], audio_segments: List[Dict],
                                background_music: str, output_path: str, config: Dict) -> bool:
         """同步合成视频和音频"""
         try:
-            # 创建同步的视频音频片段
-            synced_segments = []
+            pair_count = min(len(video_segments), len(audio_segments))
+            segment_count = max(1, pair_count)
+            context = self.prepare_composition(video_segments, config, pair_count)
 
+            # 创建同步的视频音频片段（占整体进度的0~60%）
+            synced_segments = []
             for i, (video_seg, audio_seg) in enumerate(zip(video_segments, audio_segments)):
-                video_path = video_seg.get('video_path', '')
-                audio_path = audio_seg.get('audio_path', '')
-                subtitle_text = video_seg.get('subtitle_text', '')
+                if self.is_cancelled:
+                    logger.info("视频合成已取消")
+                    return False
 
-                if not os.path.exists(video_path) or not os.path.exists(audio_path):
+                audio_path = audio_seg.get('audio_path', '')
+                if not os.path.exists(video_seg.get('video_path', '')) or not os.path.exists(audio_path):
                     logger.warning(f"片段 {i+1} 视频或音频文件不存在")
                     continue
 
-                # 获取音频实际时长
-                audio_duration = self.get_audio_duration(audio_path)
-                if audio_duration <= 0:
-                    audio_duration = 5.0  # 默认5秒
-
-                # 获取视频实际时长
-                video_duration = self.get_video_duration(video_path)
-                if video_duration <= 0:
-                    video_duration = 5.0  # 默认5秒
-
-                logger.info(f"片段 {i+1}: 音频时长 {audio_duration:.2f}秒, 视频时长 {video_duration:.2f}秒")
-
-                # 创建同步的视频片段（调整视频时长严格匹配音频）
-                synced_video = os.path.join(self.temp_dir, f"synced_{i:03d}.mp4")
-
-                # 根据时长关系选择不同的处理策略
-                cmd = self._create_sync_command(video_path, audio_path, audio_duration, video_duration, synced_video)
-
-                logger.info(f"执行同步命令: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, timeout=60)
-
-                if result.returncode == 0:
-                    # 检查生成的文件是否有音频
-                    logger.info(f"检查同步后的文件: {synced_video}")
-                    if os.path.exists(synced_video):
-                        file_size = os.path.getsize(synced_video)
-                        logger.info(f"同步文件大小: {file_size} 字节")
-
-                        # 使用FFprobe检查音频流
-                        probe_cmd = [
-                            self.ffmpeg_path.replace('ffmpeg.exe', 'ffprobe.exe'),
-                            "-v", "quiet",
-                            "-show_streams",
-                            "-select_streams", "a",
-                            synced_video
-                        ]
-                        probe_result = subprocess.run(probe_cmd, capture_output=True, timeout=30)
-                        stdout = self._decode_output(probe_result.stdout)
-                        stderr = self._decode_output(probe_result.stderr)
-                        if probe_result.returncode == 0 and stdout.strip():
-                            logger.info(f"片段 {i+1} 音频流检测成功")
-                            # 检查音频流详细信息
-                            if "codec_name" in stdout:
-                                logger.info(f"片段 {i+1} 音频编码信息: {stdout[:100]}...")
-                        else:
-                            logger.warning(f"片段 {i+1} 音频流检测失败")
-                            logger.warning(f"FFprobe输出: {stderr}")
-
-                    synced_segments.append({
-                        'video_path': synced_video,
-                        'duration': audio_duration,
-                        'subtitle_text': subtitle_text
-                    })
-                    logger.info(f"片段 {i+1} 同步成功，字幕文本长度: {len(subtitle_text)}")
-                else:
-                    stderr = self._decode_output(result.stderr)
-                    stdout = self._decode_output(result.stdout)
-                    logger.error(f"片段 {i+1} 同步失败: {stderr}")
-                    logger.error(f"FFmpeg输出: {stdout}")
+                segment_range = (0.6 * i / segment_count, 0.6 * (i + 1) / segment_count)
+                synced = self.sync_segment(i, video_seg, audio_path, context, segment_range,
+                                           f"同步片段 {i+1}/{segment_count}...")
+                if self.is_cancelled:
+                    logger.info("视频合成已取消")
                     return False
+                if synced is None:
+                    return False
+                synced_segments.append(synced)
+
+            return self.finish_composition(synced_segments, background_music, output_path, config, context)
+
+        except Exception as e:
+            logger.error(f"合成最终视频失败: {e}")
+            return False
+
+    def finish_composition(self, synced_segments: List[Dict], background_music: str, output_path: str,
+                           config: Dict, context: Dict) -> bool:
+        """拼接已同步的片段，按时间线混音并封装软字幕（占整体进度的60%~100%）"""
+        try:
+            transition_config = context['transition_config']
+            subtitle_config = context['subtitle_config']
+            has_subtitles = context['has_subtitles']
+            soft_subtitles = context['soft_subtitles']
 
             # 连接所有同步的片段
             temp_video = os.path.join(self.temp_dir, "concatenated_synced.mp4")
-            transition_config = config.get('transition_config', {})
-            if not self.concatenate_videos(synced_segments, temp_video, transition_config):
+            if not self.concatenate_videos(synced_segments, temp_video, transition_config, progress_range=(0.6, 0.8)):
+                return False
+            if self.is_cancelled:
                 return False
 
-            # 添加字幕
-            temp_video_with_subtitles = os.path.join(self.temp_dir, "video_with_subtitles.mp4")
-            has_subtitles = any(seg.get('subtitle_text', '').strip() for seg in synced_segments)
-
-            if has_subtitles:
-                logger.info("开始添加字幕...")
-                # 获取字幕配置
-                subtitle_config = config.get('subtitle_config', {})
-                if not self.add_subtitles(temp_video, synced_segments, temp_video_with_subtitles, subtitle_config):
-                    logger.warning("字幕添加失败，使用无字幕版本")
-                    temp_video_with_subtitles = temp_video
-            else:
+            if not has_subtitles:
                 logger.info("没有字幕数据，跳过字幕添加")
-                temp_video_with_subtitles = temp_video
+            elif not soft_subtitles:
+                logger.info("字幕已在片段同步时烧录")
+
+            # 软字幕最后封装，混音步骤只输出画面和音频
+            mixed_output = os.path.join(self.temp_dir, "video_with_audio.mp4") if soft_subtitles else output_path
+
+            # 音频时间线：每段配音放在对应片段的开始时间，背景音乐在人声下自动压低，整段只编码一次
+            timeline = AudioTimeline(sum(seg['duration'] for seg in synced_segments),
+                                     normalize_loudness=config.get('normalize_loudness', True))
+            current_time = 0.0
+            for segment in synced_segments:
+                timeline.add_clip(segment['audio_path'], current_time, duration=segment['duration'])
+                current_time += segment['duration']
 
-            # 添加背景音乐
             if background_music and os.path.exists(background_music):
-                logger.info("开始添加背景音乐...")
-                volume = config.get('music_volume', 30) / 100.0
-                loop_music = config.get('loop_music', True)
-                fade_in = config.get('fade_in', True)
-                fade_out = config.get('fade_out', True)
-
-                if not self.add_background_music(
-                    temp_video_with_subtitles,
+                logger.info("混入背景音乐...")
+                timeline.set_music(TimelineMusic(
                     background_music,
-                    output_path,
-                    volume,
-                    loop_music,
-                    fade_in,
-                    fade_out
-                ):
-                    logger.warning("背景音乐添加失败，使用无背景音乐版本")
-                    import shutil
-                    shutil.copy2(temp_video_with_subtitles, output_path)
+                    volume=config.get('music_volume', 30) / 100.0,
+                    loop=config.get('loop_music', True),
+                    fade_in=2.0 if config.get('fade_in', True) else 0.0,
+                    fade_out=2.0 if config.get('fade_out', True) else 0.0,
+                    duck=config.get('duck_music', True)
+                ))
             else:
-                logger.info("没有背景音乐，直接输出视频")
-                import shutil
-                shutil.copy2(temp_video_with_subtitles, output_path)
+                logger.info("没有背景音乐")
+
+            result = self._mix_timeline(timeline, temp_video, mixed_output)
+            if not result.success and timeline.music is not None and not self.is_cancelled:
+                # 背景音乐损坏或格式不支持时不影响成片，去掉背景音乐重新混音
+                logger.warning(f"混入背景音乐失败，输出不含背景音乐的版本: {result.error_message}")
+                timeline.set_music(None)
+                result = self._mix_timeline(timeline, temp_video, mixed_output)
+            if not result.success:
+                if self.is_cancelled:
+                    return False
+                logger.error(f"音频混合失败: {result.error_message}")
+                return False
 
+            if soft_subtitles:
+                logger.info("开始封装软字幕...")
+                if not self.add_subtitles(mixed_output, synced_segments, output_path, subtitle_config):
+                    if self.is_cancelled:
+                        return False
+                    logger.warning("字幕添加失败，使用无字幕版本")
+                    import shutil
+                    shutil.copy2(mixed_output, output_path)
+
+            self._report_progress(1.0, "合成完成")
             logger.info(f"同步视频合成完成: {output_path}")
             return True
 
@@ -793,6 +758,17 @@ class VideoComposer:
             logger.error(f"合成最终视频失败: {e}")
             return False
     
+    def _mix_timeline(self, timeline: AudioTimeline, video_path: str, output_path: str,
+                      progress_range: Tuple[float, float] = (0.8, 1.0),
+                      audio_bitrate: Optional[str] = None) -> FFmpegResult:
+        """按音频时间线混音并与画面封装（滤镜图写入脚本文件，命令行长度与配音段数无关）"""
+        cmd = timeline.mux_command(self.ffmpeg_path, video_path, output_path,
+                                   audio_bitrate or self.encoder_profile.audio_bitrate,
+                                   script_path=os.path.join(self.temp_dir, "timeline_graph.txt"))
+        logger.info(f"执行混音命令: {' '.join(cmd)}")
+        return self._run(cmd, timeout=600, progress_range=progress_range, message="混合音频...",
+                         total_duration=timeline.total_duration)
+
     def cleanup(self):
         """清理临时文件"""
         try:
@@ -811,16 +787,16 @@ class VideoComposer:
 
             # 使用FFprobe获取视频时长
             cmd = [
-                self.ffmpeg_path.replace('ffmpeg.exe', 'ffprobe.exe'),
+                self.ffprobe_path,
                 "-v", "quiet",
                 "-show_entries", "format=duration",
                 "-of", "csv=p=0",
                 video_path
             ]
 
-            result = subprocess.run(cmd, capture_output=True, timeout=30)
-            if result.returncode == 0:
-                duration_str = self._decode_output(result.stdout).strip()
+            result = self._run(cmd, timeout=30, capture_stdout=True)
+            if result.success:
+                duration_str = result.stdout_text.strip()
                 if duration_str:
                     duration = float(duration_str)
                     logger.debug(f"视频时长: {duration:.2f}秒 - {video_path}")
@@ -834,8 +810,31 @@ class VideoComposer:
             return 0.0
 
     def _create_sync_command(self, video_path: str, audio_path: str,
-                           audio_duration: float, video_duration: float, output_path: str) -> List[str]:
-        """根据音视频时长关系创建同步命令"""
+                           audio_duration: float, video_duration: float, output_path: str,
+                           final: bool = False, keyframe_times: Optional[List[float]] = None,
+                           video_filter: Optional[str] = None, include_audio: bool = True,
+                           frame_count: Optional[int] = None) -> List[str]:
+        """根据音视频时长关系创建同步命令
+
+        Args:
+            include_audio: 为 False 时只输出按音频时长截取/循环的画面，音频由时间线统一混入
+            frame_count: 精确输出的帧数，避免浮点时长在边界处多出一帧
+        """
+        video_args = self._segment_encode_args() if final else self._video_encode_args(final)
+        if video_filter:
+            video_args = ["-vf", video_filter] + video_args
+        if keyframe_times:
+            video_args += ["-force_key_frames", ",".join(f"{t:.3f}" for t in keyframe_times)]
+        if frame_count:
+            video_args += ["-frames:v", str(frame_count)]
+
+        if include_audio:
+            audio_inputs = ["-i", audio_path]
+            audio_args = [*build_audio_encode_args(self.encoder_profile),
+                          "-filter:a", "volume=3.0", "-map", "0:v:0", "-map", "1:a:0"]
+        else:
+            audio_inputs = []
+            audio_args = ["-map", "0:v:0", "-an"]
 
         # 时长差异阈值（秒）
         tolerance = 0.1
@@ -846,12 +845,11 @@ class VideoComposer:
             cmd = [
                 self.ffmpeg_path,
                 "-i", video_path,
-                "-i", audio_path,
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-filter:a", "volume=3.0",
-                "-map", "0:v:0",
-                "-map", "1:a:0",
+                *audio_inputs,
+                # 只输出画面时没有音频流决定结束时间，按音频时长截取
+                *([] if include_audio else ["-t", str(audio_duration)]),
+                *video_args,
+                *audio_args,
                 "-y",
                 output_path
             ]
@@ -863,13 +861,10 @@ class VideoComposer:
                 self.ffmpeg_path,
                 "-stream_loop", "-1",  # 无限循环视频
                 "-i", video_path,
-                "-i", audio_path,
+                *audio_inputs,
                 "-t", str(audio_duration),  # 严格按音频时长截取
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-filter:a", "volume=3.0",
-                "-map", "0:v:0",  # 使用循环的视频流
-                "-map", "1:a:0",  # 使用完整的音频流
+                *video_args,
+                *audio_args,
                 "-y",
                 output_path
             ]
@@ -880,13 +875,10 @@ class VideoComposer:
             cmd = [
                 self.ffmpeg_path,
                 "-i", video_path,
-                "-i", audio_path,
+                *audio_inputs,
                 "-t", str(audio_duration),  # 严格按音频时长截取
-                "-c:v", "libx264",
-                "-c:a", "aac",
-                "-filter:a", "volume=3.0",
-                "-map", "0:v:0",  # 使用截断的视频流
-                "-map", "1:a:0",  # 使用完整的音频流
+                *video_args,
+                *audio_args,
                 "-y",
                 output_path
             ]
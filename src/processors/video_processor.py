@@ -9,11 +9,11 @@ import os
 import asyncio
 import json
 import time
-import subprocess
 from typing import Dict, List, Optional, Any, Callable, Union
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.utils.ffmpeg_runner import run_ffmpeg_sync
 from src.utils.logger import logger
 from src.core.service_manager import ServiceManager, ServiceType
 from src.core.service_base import ServiceResult
@@ -299,18 +299,29 @@ class VideoProcessor:
     
     async def render_video(self, project: VideoProject,
                          progress_callback: Optional[Callable] = None) -> str:
-        """渲染视频"""
+        """渲染视频：先按各镜头的视觉效果把静态图像批量渲染为片段，再拼接并混入音频"""
         try:
             logger.info(f"开始渲染视频: {project.output_path}")
             
             if progress_callback:
                 progress_callback(0.0, "准备渲染...")
+
+            # 按 _create_shot_effects 分配的效果（推拉、暗角、胶片颗粒等）渲染各镜头片段（占整体进度的0~50%）
+            clips_dir = Path(project.output_path).parent / "clips"
+            clip_paths = await self.render_still_clips(
+                project, str(clips_dir),
+                lambda p, msg: progress_callback(p * 0.5, msg) if progress_callback else None
+            )
+            failed = [clip.shot_id for clip, path in zip(project.clips, clip_paths) if path is None]
+            if failed:
+                raise Exception(f"镜头片段渲染失败: {', '.join(str(shot_id) for shot_id in failed)}")
             
-            # 准备渲染参数
+            # 准备渲染参数（片段已应用视觉效果，渲染服务直接使用 video_path）
             render_params = {
                 "clips": [
                     {
                         "image_path": clip.image_path,
+                        "video_path": clip_path,
                         "start_time": clip.start_time,
                         "duration": clip.duration,
                         "audio_tracks": [
@@ -326,7 +337,7 @@ class VideoProcessor:
                         ],
                         "effects": clip.effects
                     }
-                    for clip in project.clips
+                    for clip, clip_path in zip(project.clips, clip_paths)
                 ],
                 "config": {
                     "fps": project.config.fps,
@@ -342,16 +353,21 @@ class VideoProcessor:
                 "background_music": project.config.background_music,
                 "background_music_volume": project.config.background_music_volume
             }
-            
-            # 调用视频渲染服务
-            result = await self.service_manager.execute_service_method(
-                ServiceType.VIDEO,
-                "render_video",
-                **render_params
-            )
-            
-            if not result.success:
-                raise Exception(f"视频渲染失败: {result.error}")
+
+            compose_progress = lambda p, msg: progress_callback(0.5 + p * 0.5, msg) if progress_callback else None
+            if self.service_manager.get_service(ServiceType.VIDEO) is not None:
+                # 调用视频渲染服务
+                result = await self.service_manager.execute_service_method(
+                    ServiceType.VIDEO,
+                    "render_video",
+                    **render_params
+                )
+                if not result.success:
+                    raise Exception(f"视频渲染失败: {result.error}")
+            else:
+                # 未注册视频渲染服务时在本地用 ffmpeg 拼接片段并混入配音和背景音乐
+                if not await asyncio.to_thread(self._compose_rendered_clips, project, clip_paths, compose_progress):
+                    raise Exception("视频渲染失败: 片段拼接或音频混合失败")
             
             if progress_callback:
                 progress_callback(1.0, "视频渲染完成")
@@ -362,7 +378,87 @@ class VideoProcessor:
         except Exception as e:
             logger.error(f"视频渲染失败: {e}")
             raise
+
+    def _compose_rendered_clips(self, project: VideoProject, clip_paths: List[str],
+                                progress_callback: Optional[Callable] = None) -> bool:
+        """拼接已渲染的镜头片段（按项目转场设置），再把各镜头配音放到对应时间并混入背景音乐"""
+        import shutil
+        from src.processors.audio_timeline import AudioTimeline, TimelineMusic
+        from src.processors.video_composer import VideoComposer
+
+        composer = VideoComposer(progress_callback=progress_callback)
+        try:
+            config = project.config
+            transition_config = {}
+            if config.transition_type != 'cut' and config.transition_duration > 0:
+                transition_config = {'mode': '统一转场', 'uniform_type': config.transition_type,
+                                     'duration': config.transition_duration}
+
+            concat_path = os.path.join(composer.temp_dir, "rendered_concat.mp4")
+            segments = [{'video_path': path, 'duration': clip.duration}
+                        for clip, path in zip(project.clips, clip_paths)]
+            if not composer.concatenate_videos(segments, concat_path, transition_config, progress_range=(0.0, 0.7)):
+                return False
+
+            # 转场窗口保持总时长不变，各镜头仍从其 start_time 开始
+            timeline = AudioTimeline(sum(clip.duration for clip in project.clips))
+            for clip in project.clips:
+                for track in clip.audio_tracks:
+                    if os.path.exists(track.file_path):
+                        timeline.add_clip(track.file_path, clip.start_time + track.start_time,
+                                          track.volume, track.duration or None)
+            music_path = config.background_music
+            if music_path and os.path.exists(music_path):
+                timeline.set_music(TimelineMusic(music_path, volume=config.background_music_volume))
+
+            os.makedirs(os.path.dirname(os.path.abspath(project.output_path)), exist_ok=True)
+            if not timeline.clips and timeline.music is None:
+                shutil.move(concat_path, project.output_path)
+                return True
+
+            result = composer._mix_timeline(timeline, concat_path, project.output_path,
+                                            progress_range=(0.7, 1.0), audio_bitrate=config.audio_bitrate)
+            if not result.success and timeline.music is not None and timeline.clips:
+                logger.warning(f"混入背景音乐失败，输出不含背景音乐的版本: {result.error_message}")
+                timeline.set_music(None)
+                result = composer._mix_timeline(timeline, concat_path, project.output_path,
+                                                progress_range=(0.7, 1.0), audio_bitrate=config.audio_bitrate)
+            if not result.success:
+                logger.error(f"混合音频失败: {result.error_message}")
+            return result.success
+        finally:
+            composer.cleanup()
     
+    async def render_still_clips(self, project: VideoProject, output_dir: Optional[str] = None,
+                                 progress_callback: Optional[Callable] = None) -> List[Optional[str]]:
+        """将项目中的静态图像按各自的效果批量渲染为视频片段
+
+        Returns:
+            与 project.clips 顺序一致的片段路径，渲染失败的为 None
+        """
+        from src.processors.still_clip_renderer import StillClipJob, StillClipRenderer
+
+        clips_dir = Path(output_dir) if output_dir else self.output_dir / "clips"
+        clips_dir.mkdir(parents=True, exist_ok=True)
+        jobs = [
+            StillClipJob(
+                image_path=clip.image_path,
+                output_path=str(clips_dir / f"shot_{clip.shot_id}.mp4"),
+                duration=clip.duration,
+                effects=clip.effects,
+                resolution=tuple(project.config.resolution),
+                fps=project.config.fps
+            )
+            for clip in project.clips
+        ]
+
+        def on_progress(completed: int, total: int):
+            if progress_callback:
+                progress_callback(completed / total, f"渲染静态片段 {completed}/{total}")
+
+        results = await asyncio.to_thread(StillClipRenderer().render_batch, jobs, on_progress)
+        return [job.output_path if success else None for job, success in zip(jobs, results)]
+
     async def create_animated_video(self, image_results: BatchImageResult,
                                   config: Optional[VideoConfig] = None,
                                   animation_type: str = "ken_burns",
@@ -430,8 +526,12 @@ class VideoProcessor:
                                       project_manager=None,
                                       current_project_name=None,
                                       max_concurrent_tasks: int = 3,
-                                      audio_hint: Optional[str] = None) -> str:
-        """使用AI引擎从图像生成视频"""
+                                      audio_hint: Optional[str] = None,
+                                      shot_id: Optional[str] = None,
+                                      segment_index: Optional[int] = None,
+                                      regenerate: bool = False) -> str:
+        """使用AI引擎从图像生成视频（传入shot_id时按镜头记录作业，支持重启后恢复；
+        regenerate=True 时忽略已有结果重新生成）"""
         try:
             if not VIDEO_ENGINES_AVAILABLE or not self.video_generation_service:
                 raise Exception("视频生成引擎不可用，请检查配置")
@@ -457,7 +557,10 @@ class VideoProcessor:
                 progress_callback=lambda msg: progress_callback(0.5, msg) if progress_callback else None,
                 project_manager=project_manager,
                 current_project_name=current_project_name,
-                audio_hint=audio_hint  # 传递音效提示
+                audio_hint=audio_hint,  # 传递音效提示
+                shot_id=shot_id,
+                segment_index=segment_index,
+                regenerate=regenerate
             )
 
             if not result.success:
@@ -707,8 +810,11 @@ class VideoProcessor:
                 video_path
             ]
 
-            result = subprocess.run(command, capture_output=True, text=True, check=True)
-            duration = float(result.stdout.strip())
+            result = run_ffmpeg_sync(command, timeout=30, capture_stdout=True)
+            if not result.success:
+                logger.error(f"ffprobe failed: {result.error_message}")
+                return {}
+            duration = float(result.stdout_text.strip())
             
             file_size = os.path.getsize(video_path)
             
@@ -719,11 +825,8 @@ class VideoProcessor:
                 "duration": duration
             }
             
-        except FileNotFoundError:
-            logger.error("ffprobe not found. Please ensure ffmpeg is installed and in your PATH.")
-            return {}
-        except subprocess.CalledProcessError as e:
-            logger.error(f"ffprobe failed: {e.stderr}")
+        except FileNotFoundError as e:
+            logger.error(f"获取视频信息失败: {e}")
             return {}
         except Exception as e:
             logger.error(f"获取视频信息失败: {e}")
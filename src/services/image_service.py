@@ -10,6 +10,7 @@ import json
 import aiohttp
 import asyncio
 import base64
+import hashlib
 import io
 import time
 from typing import Dict, List, Optional, Any, Union
@@ -217,6 +218,20 @@ class ImageService(ServiceBase):
         except Exception as e:
             logger.error(f"清理图像服务资源失败: {e}")
     
+    @staticmethod
+    def _make_cache_key(prompt: str, style: str, provider: str, params: Dict[str, Any]) -> str:
+        """生成跨进程稳定的缓存键（内置hash()每个进程都不同）"""
+        key_data = json.dumps({
+            'prompt': ' '.join(prompt.split()),
+            'style': style,
+            'provider': provider,
+            'width': params.get('width'),
+            'height': params.get('height'),
+            'seed': params.get('seed'),
+            'model': params.get('model_name')
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+    
     def get_available_providers(self) -> List[str]:
         """获取可用的图像生成提供商"""
         if hasattr(self.api_manager, 'config_manager'):
@@ -237,7 +252,7 @@ class ImageService(ServiceBase):
                 return ServiceResult(success=False, error="提示词不能为空")
             
             # 检查缓存
-            cache_key = f"{hash(prompt)}_{style}_{api_config.provider}"
+            cache_key = self._make_cache_key(prompt, style, api_config.provider, kwargs)
             cached_image = image_memory_manager.get_image_from_cache(cache_key)
             if cached_image:
                 logger.info(f"使用缓存图像: {cache_key}")
@@ -257,6 +272,10 @@ class ImageService(ServiceBase):
             # 使用优化的请求执行
             response = await self._execute_single_request(api_config, prompt=prompt, 
                                                         negative_prompt=negative_prompt, **kwargs)
+
+            # 与上面的查找使用同一个键（实际执行请求的提供商、未加风格预设的提示词）
+            if isinstance(response, dict) and response.get('image_data'):
+                image_memory_manager.add_image_to_cache(cache_key, response['image_data'])
             
             return ServiceResult(
                 success=True,
@@ -625,11 +644,7 @@ class ImageService(ServiceBase):
                         **kwargs
                     )
                     
-                    # 检查结果中的图像数据并缓存
-                    if result.success and 'image_data' in result.data:
-                        cache_key = f"{hash(prompt)}_{style}_{provider}"
-                        image_memory_manager.add_image_to_cache(cache_key, result.data['image_data'])
-                    
+                    # 图像数据在 _execute_request 中按实际提供商写入缓存
                     return result
                     
                 except Exception as e:
@@ -132,30 +132,37 @@ class OneClickPublisher:
                                           progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
         """为各平台转换视频格式"""
         conversion_results = {}
-        total_platforms = len(platforms)
         
         # 创建任务专用输出目录
         task_output_dir = self.output_dir / task_id
         task_output_dir.mkdir(exist_ok=True)
         
-        for i, platform in enumerate(platforms):
+        # 所有平台共用一次解码，一个ffmpeg进程输出全部所需规格
+        # ffmpeg 每秒报告多次进度，数据库只在进度前进至少1%或距上次写入超过1秒时更新
+        last_saved = {'progress': -1.0, 'time': 0.0}
+
+        def on_progress(progress: float, message: str):
+            now = time.monotonic()
+            if (progress >= 1.0 or progress - last_saved['progress'] >= 0.01
+                    or now - last_saved['time'] >= 1.0):
+                last_saved['progress'] = progress
+                last_saved['time'] = now
+                self.db_service.update_task_status(task_id, 'converting', progress)
+            if progress_callback:
+                progress_callback(progress, message)
+
+        all_results = await self.video_converter.convert_for_platforms(
+            input_path=video_path,
+            platforms=platforms,
+            output_dir=str(task_output_dir),
+            progress_callback=on_progress
+        )
+
+        for platform in platforms:
             try:
-                if progress_callback:
-                    progress_callback(i / total_platforms, f"转换 {platform} 格式...")
-                    
-                # 更新任务状态
-                self.db_service.update_task_status(task_id, 'converting', (i + 0.5) / total_platforms)
-                
-                # 执行转换
-                result = await self.video_converter.convert_for_platform(
-                    input_path=video_path,
-                    platform=platform,
-                    output_dir=str(task_output_dir),
-                    progress_callback=None  # 不传递内部进度
-                )
-                
+                result = all_results[platform]
                 conversion_results[platform] = result
-                
+
                 # 记录转换结果
                 platform_spec = self.video_converter.PLATFORM_SPECS.get(platform)
                 self.db_service.create_conversion_record(task_id, platform, {
@@ -171,7 +178,8 @@ class OneClickPublisher:
                     'error_message': result.get('error')
                 })
                 
-                logger.info(f"平台 {platform} 视频转换完成")
+                if result.get('success'):
+                    logger.info(f"平台 {platform} 视频转换完成")
                 
             except Exception as e:
                 logger.error(f"平台 {platform} 视频转换失败: {e}")
@@ -6,16 +6,24 @@ TTS引擎服务层
 """
 
 import os
+import re
 import asyncio
 import json
+import base64
 import requests
 import subprocess
-from typing import Dict, Any, Optional, List, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Union, Callable
 from pathlib import Path
 from abc import ABC, abstractmethod
 
 from src.utils.logger import logger
 from src.utils.config_manager import ConfigManager
+from src.utils.async_http_pool import LoopLocalSessionPool, TokenCache
+from src.utils.tts_cache import tts_cache
+from src.utils.tts_capability_cache import (EDGE_TTS_CAPABILITIES, EDGE_TTS_ENGINE, get_edge_voices,
+                                            settings_signature, tts_capability_cache)
+from src.utils.tts_timing import cbr_duration, remove_timing, save_timing, word_from_edge_chunk
 
 # 尝试导入Edge TTS
 try:
@@ -69,14 +77,18 @@ class TTSEngineBase(ABC):
             'language': 'zh-CN'
         }
 
+    def get_capabilities(self) -> Dict[str, Any]:
+        """获取支持的输出格式与参数范围"""
+        return {}
+
+    def capability_signature(self) -> str:
+        """连接测试相关配置的摘要，配置变化后缓存的测试结果作废"""
+        return settings_signature(self.get_default_settings())
+
 
 class EdgeTTSEngine(TTSEngineBase):
     """Edge-TTS引擎"""
     
-    def __init__(self, config_manager: ConfigManager):
-        super().__init__(config_manager)
-        self.voices_cache = None
-    
     async def generate_speech(self, text: str, output_path: str, **kwargs) -> Dict[str, Any]:
         """使用Edge-TTS生成语音"""
         try:
@@ -99,23 +111,40 @@ class EdgeTTSEngine(TTSEngineBase):
             if output_dir:  # 只有当目录不为空时才创建
                 os.makedirs(output_dir, exist_ok=True)
 
-            # 🔧 修复：简化Edge-TTS调用，避免SubMaker兼容性问题
-            communicate = edge_tts.Communicate(text, voice, rate=rate_str, pitch=pitch_str)
-            
-            # 只生成音频，暂时跳过字幕生成以避免兼容性问题
+            # 直接读取 stream() 中的时间事件，不依赖各版本接口不同的 SubMaker
+            try:
+                # edge-tts 7.0+ 默认只返回句子边界，需要显式请求逐词边界
+                communicate = edge_tts.Communicate(text, voice, rate=rate_str, pitch=pitch_str,
+                                                   boundary="WordBoundary")
+            except TypeError:
+                communicate = edge_tts.Communicate(text, voice, rate=rate_str, pitch=pitch_str)
+
+            words = []
+            audio_bytes = 0
             with open(output_path, "wb") as file:
                 async for chunk in communicate.stream():
                     if chunk["type"] == "audio" and "data" in chunk:
                         file.write(chunk["data"])
+                        audio_bytes += len(chunk["data"])
+                    elif chunk["type"] in ("WordBoundary", "SentenceBoundary"):
+                        word = word_from_edge_chunk(chunk)
+                        if word:
+                            words.append(word)
             
             # 检查文件是否成功生成
             if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
                 raise Exception("音频文件生成失败或为空")
             
+            # Edge-TTS 输出固定为 48kbps 单声道 MP3，按字节数即可得到时长
+            duration = cbr_duration(audio_bytes, 48)
+            save_timing(output_path, words, duration, engine='edge_tts')
+            
             return {
                 'success': True,
                 'audio_file': output_path,
-                'subtitle_data': [],  # 暂时返回空字幕数据
+                'subtitle_data': [],
+                'word_boundaries': words,
+                'duration': duration,
                 'engine': 'edge_tts',
                 'voice': voice
             }
@@ -128,23 +157,12 @@ class EdgeTTSEngine(TTSEngineBase):
             }
     
     def get_available_voices(self) -> List[Dict[str, str]]:
-        """获取Edge-TTS可用音色"""
-        if self.voices_cache is None:
-            try:
-                # 这里可以从配置文件或API获取音色列表
-                self.voices_cache = [
-                    {'id': 'zh-CN-YunxiNeural', 'name': '云希-男声', 'language': 'zh-CN'},
-                    {'id': 'zh-CN-XiaoxiaoNeural', 'name': '晓晓-女声', 'language': 'zh-CN'},
-                    {'id': 'zh-CN-YunyangNeural', 'name': '云扬-男声', 'language': 'zh-CN'},
-                    {'id': 'zh-CN-XiaoyiNeural', 'name': '晓伊-女声', 'language': 'zh-CN'},
-                    {'id': 'en-US-AriaNeural', 'name': 'Aria-Female', 'language': 'en-US'},
-                    {'id': 'en-US-GuyNeural', 'name': 'Guy-Male', 'language': 'en-US'},
-                ]
-            except Exception as e:
-                logger.error(f"获取Edge-TTS音色列表失败: {e}")
-                self.voices_cache = []
-        
-        return self.voices_cache
+        """获取Edge-TTS可用音色（读取持久化缓存，过期时后台刷新，不阻塞界面）"""
+        return get_edge_voices()
+
+    def get_capabilities(self) -> Dict[str, Any]:
+        """获取Edge-TTS支持的输出格式与参数范围"""
+        return tts_capability_cache.get_capabilities(EDGE_TTS_ENGINE, EDGE_TTS_CAPABILITIES)
     
     def test_connection(self) -> Dict[str, Any]:
         """测试Edge-TTS连接"""
@@ -289,80 +307,162 @@ class CosyVoiceEngine(TTSEngineBase):
         }
 
 
-class AzureSpeechEngine(TTSEngineBase):
-    """Azure Cognitive Services Speech引擎"""
+_SENTENCE_END = re.compile(r'(?<=[。！？；!?;\n])')
+
+
+def split_text_for_tts(text: str, max_chars: int) -> List[str]:
+    """按句子把长文本切成不超过 max_chars 的块，过长的单句按长度硬切"""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks, current = [], ''
+    for sentence in filter(None, _SENTENCE_END.split(text)):
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if len(current) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += sentence
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+class CloudTTSEngineBase(TTSEngineBase):
+    """云端TTS引擎基类
+
+    所有请求共用按事件循环复用的 keep-alive 连接池；超过接口长度限制的文本按句切块，
+    各块并发合成后按顺序拼接（MP3帧可直接首尾相接）。
+    """
+
+    # 单次请求的最大字数
+    max_chars = 1000
+    # 同一段文本的分块并发数
+    chunk_concurrency = 3
+    # 输出MP3的固定码率（kbps），0 表示未知
+    output_bitrate_kbps = 0
 
     def __init__(self, config_manager: ConfigManager):
         super().__init__(config_manager)
-        self.api_key = self.config_manager.get_setting('azure_speech.api_key', '')
-        self.region = self.config_manager.get_setting('azure_speech.region', 'eastus')
-        self.api_url = f'https://{self.region}.tts.speech.microsoft.com/cognitiveservices/v1'
+        self.http_pool = LoopLocalSessionPool(self.__class__.__name__, headers={'User-Agent': 'VideoCreator'})
+
+    def _check_config(self) -> Optional[str]:
+        """检查配置，返回错误信息，配置完整时返回 None"""
+        return None
+
+    @abstractmethod
+    async def _synthesize_chunk(self, session, text: str, **kwargs) -> bytes:
+        """合成一块文本，返回MP3数据；失败时抛出异常"""
+        pass
 
     async def generate_speech(self, text: str, output_path: str, **kwargs) -> Dict[str, Any]:
-        """使用Azure Speech生成语音"""
+        """合成语音（长文本分块并发合成后拼接）"""
         try:
-            if not self.api_key:
-                return {
-                    'success': False,
-                    'error': 'Azure Speech API Key未配置'
-                }
+            error = self._check_config()
+            if error:
+                return {'success': False, 'error': error}
+
+            chunks = split_text_for_tts(text, self.max_chars)
+            if not chunks:
+                return {'success': False, 'error': '文本内容为空'}
 
             # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
 
-            # 构建SSML
-            voice = kwargs.get('voice', 'zh-CN-XiaoxiaoNeural')
-            speed = kwargs.get('speed', 1.0)
-            pitch = kwargs.get('pitch', 0)
-            volume = kwargs.get('volume', 1.0)
-            emotion = kwargs.get('emotion', 'neutral')
-
-            # 构建SSML文档
-            ssml = f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis"
-                       xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="zh-CN">
-                <voice name="{voice}">
-                    <mstts:express-as style="{emotion}">
-                        <prosody rate="{speed}" pitch="{pitch:+.0f}%" volume="{volume}">
-                            {text}
-                        </prosody>
-                    </mstts:express-as>
-                </voice>
-            </speak>'''
+            session = await self.http_pool.get()
+            semaphore = asyncio.Semaphore(self.chunk_concurrency)
 
-            headers = {
-                'Ocp-Apim-Subscription-Key': self.api_key,
-                'Content-Type': 'application/ssml+xml',
-                'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3',
-                'User-Agent': 'VideoCreator'
-            }
+            async def synthesize(chunk: str) -> bytes:
+                async with semaphore:
+                    return await self._synthesize_chunk(session, chunk, **kwargs)
 
-            # 发送请求
-            response = requests.post(self.api_url, data=ssml.encode('utf-8'), headers=headers, timeout=30)
+            audio_parts = await asyncio.gather(*(synthesize(chunk) for chunk in chunks))
+            audio_data = b''.join(audio_parts)
+            with open(output_path, 'wb') as f:
+                f.write(audio_data)
 
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
+            result = {
+                'success': True,
+                'audio_file': output_path,
+                'engine': self.engine_id,
+                'voice': kwargs.get('voice', self.get_default_settings().get('voice'))
+            }
+            if self.output_bitrate_kbps:
+                # REST 接口不返回逐词事件，只记录按固定码率计算的时长
+                result['duration'] = cbr_duration(len(audio_data), self.output_bitrate_kbps)
+                save_timing(output_path, [], result['duration'], engine=self.engine_id)
 
-                logger.info(f"Azure Speech语音生成成功: {output_path}")
-                return {
-                    'success': True,
-                    'audio_file': output_path,
-                    'engine': 'azure_speech',
-                    'voice': voice
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'Azure Speech API请求失败: {response.status_code} - {response.text}'
-                }
+            logger.info(f"{self.display_name}语音生成成功: {output_path}"
+                        + (f"（{len(chunks)} 块并发合成）" if len(chunks) > 1 else ""))
+            return result
 
         except Exception as e:
-            logger.error(f"Azure Speech语音生成失败: {e}")
+            logger.error(f"{self.display_name}语音生成失败: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
 
+    async def close(self):
+        """关闭当前事件循环上的连接池"""
+        await self.http_pool.close()
+
+
+class AzureSpeechEngine(CloudTTSEngineBase):
+    """Azure Cognitive Services Speech引擎"""
+
+    engine_id = 'azure_speech'
+    display_name = 'Azure Speech'
+    max_chars = 2000
+    output_bitrate_kbps = 128
+
+    def __init__(self, config_manager: ConfigManager):
+        super().__init__(config_manager)
+        self.api_key = self.config_manager.get_setting('azure_speech.api_key', '')
+        self.region = self.config_manager.get_setting('azure_speech.region', 'eastus')
+        self.api_url = f'https://{self.region}.tts.speech.microsoft.com/cognitiveservices/v1'
+
+    def _check_config(self) -> Optional[str]:
+        return None if self.api_key else 'Azure Speech API Key未配置'
+
+    async def _synthesize_chunk(self, session, text: str, **kwargs) -> bytes:
+        """调用Azure REST接口合成一块文本"""
+        voice = kwargs.get('voice', 'zh-CN-XiaoxiaoNeural')
+        speed = kwargs.get('speed', 1.0)
+        pitch = kwargs.get('pitch', 0)
+        volume = kwargs.get('volume', 1.0)
+        emotion = kwargs.get('emotion', 'neutral')
+
+        # 构建SSML文档
+        ssml = f'''<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis"
+                   xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="zh-CN">
+            <voice name="{voice}">
+                <mstts:express-as style="{emotion}">
+                    <prosody rate="{speed}" pitch="{pitch:+.0f}%" volume="{volume}">
+                        {text}
+                    </prosody>
+                </mstts:express-as>
+            </voice>
+        </speak>'''
+
+        headers = {
+            'Ocp-Apim-Subscription-Key': self.api_key,
+            'Content-Type': 'application/ssml+xml',
+            'X-Microsoft-OutputFormat': 'audio-16khz-128kbitrate-mono-mp3'
+        }
+
+        async with session.post(self.api_url, data=ssml.encode('utf-8'), headers=headers) as response:
+            if response.status != 200:
+                raise Exception(f'Azure Speech API请求失败: {response.status} - {await response.text()}')
+            return await response.read()
+
     def get_available_voices(self) -> List[Dict[str, str]]:
         """获取可用音色列表"""
         return [
@@ -445,99 +545,68 @@ class AzureSpeechEngine(TTSEngineBase):
         }
 
 
-class GoogleTTSEngine(TTSEngineBase):
+class GoogleTTSEngine(CloudTTSEngineBase):
     """Google Cloud Text-to-Speech引擎"""
 
+    engine_id = 'google_tts'
+    display_name = 'Google TTS'
+    max_chars = 1500  # 接口限制 5000 字节，中文按 UTF-8 每字 3 字节计
+
     def __init__(self, config_manager: ConfigManager):
         super().__init__(config_manager)
         self.api_key = self.config_manager.get_setting('google_tts.api_key', '')
         self.api_url = 'https://texttospeech.googleapis.com/v1/text:synthesize'
 
-    async def generate_speech(self, text: str, output_path: str, **kwargs) -> Dict[str, Any]:
-        """使用Google Cloud TTS生成语音"""
-        try:
-            if not self.api_key:
-                return {
-                    'success': False,
-                    'error': 'Google Cloud TTS API Key未配置'
-                }
-
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            # 构建请求数据
-            voice = kwargs.get('voice', 'cmn-CN-Wavenet-A')
-            speed = kwargs.get('speed', 1.0)
-            pitch = kwargs.get('pitch', 0)
-            volume = kwargs.get('volume', 1.0)
-
-            # 解析语音ID获取语言和性别
-            if 'cmn-CN' in voice:
-                language_code = 'cmn-CN'
-            elif 'zh-CN' in voice:
-                language_code = 'zh-CN'
-            elif 'en-US' in voice:
-                language_code = 'en-US'
-            else:
-                language_code = 'zh-CN'
-
-            data = {
-                'input': {
-                    'ssml': f'''<speak>
-                        <prosody rate="{speed}" pitch="{pitch:+.0f}%" volume="{volume}">
-                            {text}
-                        </prosody>
-                    </speak>'''
-                },
-                'voice': {
-                    'languageCode': language_code,
-                    'name': voice
-                },
-                'audioConfig': {
-                    'audioEncoding': 'MP3',
-                    'speakingRate': speed,
-                    'pitch': pitch,
-                    'volumeGainDb': volume * 6 - 6  # 转换为dB
-                }
-            }
-
-            headers = {
-                'Content-Type': 'application/json',
-                'X-Goog-Api-Key': self.api_key
+    def _check_config(self) -> Optional[str]:
+        return None if self.api_key else 'Google Cloud TTS API Key未配置'
+
+    async def _synthesize_chunk(self, session, text: str, **kwargs) -> bytes:
+        """调用Google TTS接口合成一块文本"""
+        voice = kwargs.get('voice', 'cmn-CN-Wavenet-A')
+        speed = kwargs.get('speed', 1.0)
+        pitch = kwargs.get('pitch', 0)
+        volume = kwargs.get('volume', 1.0)
+
+        # 解析语音ID获取语言和性别
+        if 'cmn-CN' in voice:
+            language_code = 'cmn-CN'
+        elif 'zh-CN' in voice:
+            language_code = 'zh-CN'
+        elif 'en-US' in voice:
+            language_code = 'en-US'
+        else:
+            language_code = 'zh-CN'
+
+        data = {
+            'input': {
+                'ssml': f'''<speak>
+                    <prosody rate="{speed}" pitch="{pitch:+.0f}%" volume="{volume}">
+                        {text}
+                    </prosody>
+                </speak>'''
+            },
+            'voice': {
+                'languageCode': language_code,
+                'name': voice
+            },
+            'audioConfig': {
+                'audioEncoding': 'MP3',
+                'speakingRate': speed,
+                'pitch': pitch,
+                'volumeGainDb': volume * 6 - 6  # 转换为dB
             }
+        }
 
-            # 发送请求
-            response = requests.post(self.api_url, json=data, headers=headers, timeout=30)
-
-            if response.status_code == 200:
-                result = response.json()
-
-                # 解码音频数据
-                import base64
-                audio_data = base64.b64decode(result['audioContent'])
-
-                with open(output_path, 'wb') as f:
-                    f.write(audio_data)
-
-                logger.info(f"Google TTS语音生成成功: {output_path}")
-                return {
-                    'success': True,
-                    'audio_file': output_path,
-                    'engine': 'google_tts',
-                    'voice': voice
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'Google TTS API请求失败: {response.status_code} - {response.text}'
-                }
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Goog-Api-Key': self.api_key
+        }
 
-        except Exception as e:
-            logger.error(f"Google TTS语音生成失败: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        async with session.post(self.api_url, json=data, headers=headers) as response:
+            if response.status != 200:
+                raise Exception(f'Google TTS API请求失败: {response.status} - {await response.text()}')
+            result = await response.json()
+        return base64.b64decode(result['audioContent'])
 
     def get_available_voices(self) -> List[Dict[str, str]]:
         """获取可用音色列表"""
@@ -621,139 +690,86 @@ class GoogleTTSEngine(TTSEngineBase):
         }
 
 
-class BaiduTTSEngine(TTSEngineBase):
+class BaiduTTSEngine(CloudTTSEngineBase):
     """百度智能云语音合成引擎"""
 
+    engine_id = 'baidu_tts'
+    display_name = '百度TTS'
+    max_chars = 500  # 短文本接口限制 1024 GBK 字节
+    chunk_concurrency = 2
+
     def __init__(self, config_manager: ConfigManager):
         super().__init__(config_manager)
         self.api_key = self.config_manager.get_setting('baidu_tts.api_key', '')
         self.secret_key = self.config_manager.get_setting('baidu_tts.secret_key', '')
         self.api_url = 'https://tsn.baidu.com/text2audio'
         self.token_url = 'https://aip.baidubce.com/oauth/2.0/token'
-        self.access_token = None
+        self.token_cache = TokenCache(self._fetch_access_token, refresh_margin=86400, name='baidu_tts')
+
+    async def _fetch_access_token(self):
+        """请求新的访问令牌，返回 (令牌, 有效期秒数)"""
+        params = {
+            'grant_type': 'client_credentials',
+            'client_id': self.api_key,
+            'client_secret': self.secret_key
+        }
+        session = await self.http_pool.get()
+        async with session.post(self.token_url, params=params) as response:
+            if response.status != 200:
+                logger.error(f"获取百度访问令牌失败: {response.status}")
+                return None, 0
+            result = await response.json(content_type=None)
+        # 百度令牌有效期通常为30天
+        return result.get('access_token'), float(result.get('expires_in', 2592000))
 
     async def _get_access_token(self) -> Optional[str]:
-        """获取百度API访问令牌"""
-        try:
-            if not all([self.api_key, self.secret_key]):
-                return None
-
-            params = {
-                'grant_type': 'client_credentials',
-                'client_id': self.api_key,
-                'client_secret': self.secret_key
-            }
-
-            response = requests.post(self.token_url, params=params, timeout=10)
-
-            if response.status_code == 200:
-                result = response.json()
-                self.access_token = result.get('access_token')
-                return self.access_token
-            else:
-                logger.error(f"获取百度访问令牌失败: {response.status_code}")
-                return None
-
-        except Exception as e:
-            logger.error(f"获取百度访问令牌异常: {e}")
+        """获取百度API访问令牌（缓存至过期前一天）"""
+        if not all([self.api_key, self.secret_key]):
             return None
+        return await self.token_cache.get()
+
+    def _check_config(self) -> Optional[str]:
+        return None if all([self.api_key, self.secret_key]) else '百度智能云API配置不完整'
+
+    async def _synthesize_chunk(self, session, text: str, **kwargs) -> bytes:
+        """调用百度短文本合成接口合成一块文本"""
+        access_token = await self._get_access_token()
+        if not access_token:
+            raise Exception('无法获取百度API访问令牌')
+
+        voice = kwargs.get('voice', '4')  # 默认度丫丫
+        speed = kwargs.get('speed', 1.0)
+        pitch = kwargs.get('pitch', 0)
+        volume = kwargs.get('volume', 1.0)
+
+        data = {
+            'tex': text,
+            'tok': access_token,
+            'cuid': 'video_creator',
+            'ctp': '1',
+            'lan': 'zh',
+            'per': voice,
+            'spd': int(speed * 5),  # 语速1-15
+            'pit': int(pitch + 5),  # 音调0-15
+            'vol': int(volume * 15),  # 音量0-15
+            'aue': '3'  # MP3格式
+        }
 
-    async def generate_speech(self, text: str, output_path: str, **kwargs) -> Dict[str, Any]:
-        """使用百度智能云生成语音"""
-        try:
-            if not all([self.api_key, self.secret_key]):
-                return {
-                    'success': False,
-                    'error': '百度智能云API配置不完整'
-                }
-
-            # 获取访问令牌
-            if not self.access_token:
-                self.access_token = await self._get_access_token()
-
-            if not self.access_token:
-                return {
-                    'success': False,
-                    'error': '无法获取百度API访问令牌'
-                }
-
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            # 构建请求数据
-            voice = kwargs.get('voice', '4')  # 默认度丫丫
-            speed = kwargs.get('speed', 1.0)
-            pitch = kwargs.get('pitch', 0)
-            volume = kwargs.get('volume', 1.0)
-            emotion = kwargs.get('emotion', 'neutral')
-
-            # 百度TTS参数映射
-            per_map = {
-                '0': '度小美-女声',
-                '1': '度小宇-男声',
-                '3': '度逍遥-男声',
-                '4': '度丫丫-女声',
-                '103': '度米朵-女声',
-                '106': '度博文-男声',
-                '110': '度小娇-女声',
-                '111': '度小萌-女声'
-            }
-
-            data = {
-                'tex': text,
-                'tok': self.access_token,
-                'cuid': 'video_creator',
-                'ctp': '1',
-                'lan': 'zh',
-                'per': voice,
-                'spd': int(speed * 5),  # 语速1-15
-                'pit': int(pitch + 5),  # 音调0-15
-                'vol': int(volume * 15),  # 音量0-15
-                'aue': '3'  # MP3格式
-            }
-
-            # 发送请求
-            response = requests.post(self.api_url, data=data, timeout=30)
-
-            if response.status_code == 200:
-                # 检查响应是否为音频数据
-                content_type = response.headers.get('Content-Type', '')
-                if 'audio' in content_type:
-                    with open(output_path, 'wb') as f:
-                        f.write(response.content)
-
-                    logger.info(f"百度TTS语音生成成功: {output_path}")
-                    return {
-                        'success': True,
-                        'audio_file': output_path,
-                        'engine': 'baidu_tts',
-                        'voice': voice
-                    }
-                else:
-                    # 可能是错误响应
-                    try:
-                        error_result = response.json()
-                        return {
-                            'success': False,
-                            'error': f'百度TTS错误: {error_result.get("err_msg", "未知错误")}'
-                        }
-                    except:
-                        return {
-                            'success': False,
-                            'error': '百度TTS返回非音频数据'
-                        }
-            else:
-                return {
-                    'success': False,
-                    'error': f'百度TTS API请求失败: {response.status_code}'
-                }
-
-        except Exception as e:
-            logger.error(f"百度TTS语音生成失败: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        async with session.post(self.api_url, data=data) as response:
+            if response.status != 200:
+                raise Exception(f'百度TTS API请求失败: {response.status}')
+            # 检查响应是否为音频数据
+            if 'audio' in response.headers.get('Content-Type', ''):
+                return await response.read()
+            # 可能是错误响应
+            try:
+                error_result = await response.json(content_type=None)
+            except Exception:
+                raise Exception('百度TTS返回非音频数据')
+            if error_result.get('err_no') in (502, 110, 111):
+                # 令牌无效或过期
+                self.token_cache.invalidate()
+            raise Exception(f'百度TTS错误: {error_result.get("err_msg", "未知错误")}')
 
     def get_available_voices(self) -> List[Dict[str, str]]:
         """获取可用音色列表"""
@@ -782,8 +798,13 @@ class BaiduTTSEngine(TTSEngineBase):
                 }
 
             # 测试获取访问令牌
-            import asyncio
-            token = asyncio.run(self._get_access_token())
+            async def fetch_token():
+                try:
+                    return await self._get_access_token()
+                finally:
+                    await self.close()
+
+            token = asyncio.run(fetch_token())
 
             if token:
                 return {
@@ -816,12 +837,23 @@ class BaiduTTSEngine(TTSEngineBase):
         }
 
 
+# 各引擎批量合成时的并发上限（服务端限流与本地算力不同）
+ENGINE_MAX_CONCURRENCY = {
+    'edge_tts': 6,
+    'cosyvoice': 1,  # 本地推理，并发只会互相抢占显存
+    'azure_speech': 4,
+    'google_tts': 4,
+    'baidu_tts': 2,
+}
+
+
 class TTSEngineManager:
     """TTS引擎管理器"""
 
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
         self.engines = {}
+        self.tts_cache = tts_cache
         self._init_engines()
 
     def _init_engines(self):
@@ -851,12 +883,44 @@ class TTSEngineManager:
         return {
             'name': engine_name,
             'voices': engine.get_available_voices(),
+            'capabilities': engine.get_capabilities(),
             'default_settings': engine.get_default_settings(),
-            'connection_status': engine.test_connection()
+            'connection_status': self.get_engine_health(engine_name)
         }
 
-    async def generate_speech(self, engine_name: str, text: str, output_path: str, **kwargs) -> Dict[str, Any]:
-        """使用指定引擎生成语音"""
+    def get_engine_health(self, engine_name: str, force: bool = False) -> Dict[str, Any]:
+        """引擎连接状态：有效期内且配置未变时复用上次测试结果，force=True 时重新测试"""
+        engine = self.get_engine(engine_name)
+        if not engine:
+            return {'success': False, 'error': f'引擎 {engine_name} 不存在'}
+        return tts_capability_cache.get_health(engine_name, engine.test_connection,
+                                               engine.capability_signature(), force=force)
+
+    def get_cached_health(self, engine_name: str) -> Optional[Dict[str, Any]]:
+        """最近一次连接测试结果（不发起测试），没有记录或配置已变化时返回 None"""
+        engine = self.get_engine(engine_name)
+        if not engine:
+            return None
+        return tts_capability_cache.get_cached_health(engine_name, engine.capability_signature())
+
+    async def generate_speech(self, engine_name: str, text: str, output_path: str,
+                              use_cache: bool = True, **kwargs) -> Dict[str, Any]:
+        """使用指定引擎生成语音
+
+        单次调用结束后关闭当前事件循环上的连接池（调用方通常为一次合成单独运行事件循环）；
+        多段合成请使用 generate_speech_batch 在同一事件循环中复用连接
+
+        Args:
+            use_cache: 是否使用TTS缓存，文本与音色参数未变时直接复用之前的合成结果
+        """
+        try:
+            return await self._generate_speech(engine_name, text, output_path, use_cache, **kwargs)
+        finally:
+            await self.close_sessions()
+
+    async def _generate_speech(self, engine_name: str, text: str, output_path: str,
+                               use_cache: bool = True, **kwargs) -> Dict[str, Any]:
+        """合成一段语音（先查TTS缓存），不关闭连接池"""
         engine = self.get_engine(engine_name)
         if not engine:
             return {
@@ -864,15 +928,100 @@ class TTSEngineManager:
                 'error': f'引擎 {engine_name} 不存在'
             }
 
-        return await engine.generate_speech(text, output_path, **kwargs)
+        cache_key = None
+        if use_cache:
+            # 输出格式由文件扩展名决定，也参与缓存键
+            cache_key = self.tts_cache.make_key_from_settings(
+                engine_name, text, {**kwargs, 'format': os.path.splitext(output_path)[1].lower()})
+            cached = self.tts_cache.lookup(cache_key)
+            if cached:
+                self.tts_cache.materialize(cached['path'], output_path)
+                if cached['metadata'].get('word_boundaries') or cached['metadata'].get('duration'):
+                    save_timing(output_path, cached['metadata'].get('word_boundaries') or [],
+                                cached['metadata'].get('duration'), engine=engine_name)
+                logger.info(f"TTS缓存命中: {os.path.basename(output_path)}")
+                return {
+                    **cached['metadata'],
+                    'success': True,
+                    'audio_file': output_path,
+                    'engine': engine_name,
+                    'cached': True
+                }
 
-    def test_all_engines(self) -> Dict[str, Dict[str, Any]]:
-        """测试所有引擎连接"""
-        results = {}
-        for engine_name, engine in self.engines.items():
-            results[engine_name] = engine.test_connection()
+        remove_timing(output_path)
+        result = await engine.generate_speech(text, output_path, **kwargs)
+
+        if cache_key and result.get('success') and os.path.exists(output_path):
+            metadata = {k: v for k, v in result.items()
+                        if k in ('subtitle_data', 'word_boundaries', 'duration', 'voice')}
+            self.tts_cache.put(cache_key, output_path, metadata)
+        return result
+
+    async def generate_speech_batch(self, engine_name: str, jobs: List[Dict[str, Any]],
+                                    max_concurrency: Optional[int] = None, max_retries: int = 2,
+                                    on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+                                    should_stop: Optional[Callable[[], bool]] = None,
+                                    **kwargs) -> List[Dict[str, Any]]:
+        """在同一个事件循环中并发合成多段语音
+
+        Args:
+            jobs: [{'text': 文本, 'output_path': 输出路径, ...}]，其余字段原样传给 on_result
+            max_concurrency: 并发上限，默认按引擎取 ENGINE_MAX_CONCURRENCY
+            max_retries: 单段失败后的重试次数
+            on_result: 每段完成（成功或最终失败）时回调 (job, result)，按完成顺序调用
+            should_stop: 返回 True 时不再开始新的合成
+
+        Returns:
+            与 jobs 顺序一致的结果列表
+        """
+        limit = max_concurrency or ENGINE_MAX_CONCURRENCY.get(engine_name, 2)
+        semaphore = asyncio.Semaphore(max(1, limit))
+        results: List[Dict[str, Any]] = [{} for _ in jobs]
+
+        async def run_job(index: int, job: Dict[str, Any]):
+            result = {'success': False, 'error': '已取消'}
+            async with semaphore:
+                for attempt in range(max_retries + 1):
+                    if should_stop and should_stop():
+                        result = {'success': False, 'error': '已取消', 'cancelled': True}
+                        break
+                    try:
+                        result = await self._generate_speech(engine_name, job['text'], job['output_path'], **kwargs)
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+                    if result.get('success'):
+                        break
+                    if attempt < max_retries:
+                        logger.warning(f"语音合成失败，第 {attempt + 1} 次重试: {result.get('error')}")
+                        await asyncio.sleep(0.5 * 2 ** attempt)
+            results[index] = result
+            if on_result:
+                on_result(job, result)
+
+        logger.info(f"批量合成语音: {len(jobs)} 段，引擎 {engine_name}，并发数 {limit}")
+        try:
+            await asyncio.gather(*(run_job(i, job) for i, job in enumerate(jobs)))
+        finally:
+            await self.close_sessions()
         return results
 
+    async def close_sessions(self):
+        """关闭云端引擎在当前事件循环上的连接池（事件循环结束前调用）"""
+        for engine in self.engines.values():
+            if isinstance(engine, CloudTTSEngineBase):
+                await engine.close()
+
+    def test_all_engines(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """测试所有引擎连接
+
+        Args:
+            force: 为 False 时复用有效期内的测试结果，只有缺失或过期的引擎会重新测试（并发进行）
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(self.engines))) as executor:
+            futures = {engine_name: executor.submit(self.get_engine_health, engine_name, force)
+                       for engine_name in self.engines}
+        return {engine_name: future.result() for engine_name, future in futures.items()}
+
     def get_voices_by_language(self, language: str = 'zh-CN') -> Dict[str, List[Dict[str, str]]]:
         """按语言获取所有引擎的音色"""
         voices_by_engine = {}
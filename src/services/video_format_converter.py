@@ -4,13 +4,14 @@
 支持多平台视频格式适配和批量处理
 """
 
-import asyncio
-import subprocess
 import os
 import json
+import shutil
 from typing import Dict, Any, Optional, Callable, List
 from dataclasses import dataclass
 from pathlib import Path
+from src.utils.encoder_profiles import build_audio_encode_args, build_video_encode_args, get_encoder_profile
+from src.utils.ffmpeg_runner import FFmpegCancelToken, ffprobe_path_for, run_ffmpeg, run_ffmpeg_sync
 from src.utils.logger import logger
 
 @dataclass
@@ -99,8 +100,12 @@ class VideoFormatConverter:
         )
     }
     
-    def __init__(self, ffmpeg_path: str = "ffmpeg"):
+    def __init__(self, ffmpeg_path: str = "ffmpeg", encoder_profile: str = 'publish',
+                 prefer_hardware: bool = False):
         self.ffmpeg_path = ffmpeg_path
+        # 平台导出是最终输出，默认使用发布档位
+        self.encoder_profile = get_encoder_profile(encoder_profile)
+        self.prefer_hardware = prefer_hardware
         self.temp_dir = Path("temp/video_conversion")
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         
@@ -110,12 +115,8 @@ class VideoFormatConverter:
     def _check_ffmpeg(self):
         """检查FFmpeg是否可用"""
         try:
-            result = subprocess.run(
-                [self.ffmpeg_path, '-version'],
-                capture_output=True,
-                timeout=10
-            )
-            if result.returncode == 0:
+            result = run_ffmpeg_sync([self.ffmpeg_path, '-version'], timeout=10)
+            if result.success:
                 logger.info("FFmpeg检查通过")
             else:
                 logger.warning("FFmpeg可能不可用")
@@ -158,8 +159,9 @@ class VideoFormatConverter:
                 
                 # 执行转换
                 success = await self._execute_conversion(
-                    cmd, 
-                    lambda p, msg: progress_callback(0.4 + p * 0.5, msg) if progress_callback else None
+                    cmd,
+                    lambda p, msg: progress_callback(0.4 + p * 0.5, msg) if progress_callback else None,
+                    total_duration=video_info.get('duration') or None
                 )
                 
                 if success and os.path.exists(output_path):
@@ -200,7 +202,7 @@ class VideoFormatConverter:
         """分析视频信息"""
         try:
             # 尝试使用ffprobe分析视频
-            ffprobe_path = self.ffmpeg_path.replace('ffmpeg', 'ffprobe')
+            ffprobe_path = ffprobe_path_for(self.ffmpeg_path)
             cmd = [
                 ffprobe_path,
                 '-v', 'quiet',
@@ -210,16 +212,10 @@ class VideoFormatConverter:
                 video_path
             ]
 
-            result = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-
-            stdout, stderr = await result.communicate()
+            result = await run_ffmpeg(cmd, timeout=30, capture_stdout=True)
 
-            if result.returncode == 0:
-                info = json.loads(stdout.decode())
+            if result.success:
+                info = json.loads(result.stdout.decode())
 
                 # 提取视频流信息
                 video_stream = None
@@ -295,58 +291,182 @@ class VideoFormatConverter:
             
         return False
         
-    def _build_ffmpeg_command(self, input_path: str, output_path: str, 
+    @staticmethod
+    def _video_filter(spec: PlatformSpec) -> str:
+        """缩放到平台分辨率（保持比例，不足部分补黑边）并统一帧率"""
+        width, height = spec.resolution.split('x')
+        return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={spec.fps}")
+
+    def _output_encode_args(self, spec: PlatformSpec) -> List[str]:
+        """单个平台输出的编码参数"""
+        # 画质由编码档位（CRF）控制，平台码率作为上限防止超出平台限制
+        bitrate_value = float(spec.bitrate.rstrip('MmKk'))
+        bitrate_unit = spec.bitrate[-1] if spec.bitrate[-1].isalpha() else ''
+        return [
+            *build_video_encode_args(self.encoder_profile, spec.codec, self.ffmpeg_path, self.prefer_hardware),
+            '-maxrate', spec.bitrate,
+            '-bufsize', f"{bitrate_value * 2:g}{bitrate_unit}",
+            '-aspect', spec.aspect_ratio,
+            *build_audio_encode_args(self.encoder_profile),
+            '-movflags', '+faststart',  # 优化网络播放
+        ]
+
+    def _build_ffmpeg_command(self, input_path: str, output_path: str,
                              spec: PlatformSpec, video_info: Dict) -> List[str]:
         """构建FFmpeg转换命令"""
         cmd = [
             self.ffmpeg_path,
             '-i', input_path,
-            '-c:v', spec.codec,
-            '-b:v', spec.bitrate,
-            '-r', str(spec.fps),
-            '-s', spec.resolution,
-            '-aspect', spec.aspect_ratio,
-            '-c:a', 'aac',
-            '-b:a', '128k',
-            '-movflags', '+faststart',  # 优化网络播放
+            '-vf', self._video_filter(spec),
+            *self._output_encode_args(spec),
             '-y',  # 覆盖输出文件
             output_path
         ]
-        
-        # 根据平台添加特殊参数
-        if spec.name == 'B站':
-            cmd.extend(['-preset', 'medium', '-crf', '23'])
-        elif 'shorts' in spec.name.lower() or '抖音' in spec.name:
-            cmd.extend(['-preset', 'fast', '-crf', '28'])
-            
+
         return cmd
+
+    def _build_multi_output_command(self, input_path: str, targets: List[tuple]) -> List[str]:
+        """构建一次解码、多路输出的FFmpeg命令
+
+        targets 为 (PlatformSpec, output_path) 列表，解码后的画面经 split 分成多路，
+        每一路单独缩放/补边后编码到各自的输出文件。
+        """
+        labels = [f"v{i}" for i in range(len(targets))]
+        if len(targets) == 1:
+            graph = f"[0:v]{self._video_filter(targets[0][0])}[{labels[0]}]"
+        else:
+            split_labels = ''.join(f"[s{i}]" for i in range(len(targets)))
+            branches = [f"[s{i}]{self._video_filter(spec)}[{labels[i]}]" for i, (spec, _) in enumerate(targets)]
+            graph = ';'.join([f"[0:v]split={len(targets)}{split_labels}", *branches])
+
+        cmd = [self.ffmpeg_path, '-i', input_path, '-filter_complex', graph]
+        for label, (spec, output_path) in zip(labels, targets):
+            cmd += ['-map', f"[{label}]", '-map', '0:a?', *self._output_encode_args(spec), '-y', output_path]
+        return cmd
+
+    @staticmethod
+    def _rendition_key(spec: PlatformSpec) -> tuple:
+        """输出参数完全相同的平台共用一次编码"""
+        return (spec.resolution, spec.aspect_ratio, spec.fps, spec.bitrate, spec.codec, spec.format)
+
+    async def convert_for_platforms(self,
+                                    input_path: str,
+                                    platforms: List[str],
+                                    output_dir: str,
+                                    progress_callback: Optional[Callable] = None) -> Dict[str, Dict[str, Any]]:
+        """一次解码同时为多个平台转换视频格式
+
+        已符合平台规格的跳过转换；规格相同的平台只编码一次，其余平台复制该文件。
+
+        Returns:
+            {platform: 与 convert_for_platform 相同格式的结果}
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        for platform in platforms:
+            if platform not in self.PLATFORM_SPECS:
+                results[platform] = {'success': False, 'error': f"不支持的平台: {platform}", 'platform': platform}
+
+        try:
+            if progress_callback:
+                progress_callback(0.1, "分析视频信息...")
+
+            video_info = await self._analyze_video(input_path)
+
+            if progress_callback:
+                progress_callback(0.2, "检查转换需求...")
+
+            renditions: Dict[tuple, List[str]] = {}
+            for platform in platforms:
+                if platform in results:
+                    continue
+                spec = self.PLATFORM_SPECS[platform]
+                if self._needs_conversion(video_info, spec):
+                    renditions.setdefault(self._rendition_key(spec), []).append(platform)
+                else:
+                    results[platform] = {
+                        'success': True,
+                        'output_path': input_path,
+                        'platform': platform,
+                        'conversion_needed': False
+                    }
+
+            if not renditions:
+                if progress_callback:
+                    progress_callback(1.0, "无需转换")
+                return {platform: results[platform] for platform in platforms}
+
+            stem = Path(input_path).stem
+            targets = []
+            for group in renditions.values():
+                spec = self.PLATFORM_SPECS[group[0]]
+                targets.append((spec, os.path.join(output_dir, f"{group[0]}_{stem}.{spec.format}")))
+
+            logger.info(f"一次解码输出 {len(targets)} 种规格，覆盖平台: "
+                        f"{', '.join(p for group in renditions.values() for p in group)}")
+            cmd = self._build_multi_output_command(input_path, targets)
+
+            if progress_callback:
+                progress_callback(0.3, "开始视频转换...")
+
+            success = await self._execute_conversion(
+                cmd,
+                lambda p, msg: progress_callback(0.3 + p * 0.6, msg) if progress_callback else None,
+                total_duration=video_info.get('duration') or None
+            )
+
+            original_size = os.path.getsize(input_path)
+            for group, (spec, output_path) in zip(renditions.values(), targets):
+                for platform in group:
+                    if not (success and os.path.exists(output_path)):
+                        results[platform] = {'success': False, 'error': "转换失败或输出文件不存在",
+                                             'platform': platform}
+                        continue
+                    platform_path = os.path.join(output_dir, f"{platform}_{stem}.{spec.format}")
+                    if platform_path != output_path:
+                        shutil.copyfile(output_path, platform_path)
+                    results[platform] = {
+                        'success': True,
+                        'output_path': platform_path,
+                        'platform': platform,
+                        'original_size': original_size,
+                        'converted_size': os.path.getsize(platform_path),
+                        'spec_applied': self.PLATFORM_SPECS[platform].__dict__
+                    }
+
+            if progress_callback:
+                progress_callback(1.0, "转换完成")
+
+        except Exception as e:
+            logger.error(f"多平台视频转换失败: {e}")
+            for platform in platforms:
+                results.setdefault(platform, {'success': False, 'error': str(e), 'platform': platform})
+
+        return {platform: results[platform] for platform in platforms}
         
-    async def _execute_conversion(self, cmd: List[str], 
-                                progress_callback: Optional[Callable] = None) -> bool:
-        """执行转换命令"""
+    async def _execute_conversion(self, cmd: List[str],
+                                progress_callback: Optional[Callable] = None,
+                                total_duration: Optional[float] = None,
+                                cancel_token: Optional[FFmpegCancelToken] = None) -> bool:
+        """执行转换命令（进度来自 ffmpeg -progress 输出）"""
         try:
             logger.info(f"执行转换命令: {' '.join(cmd)}")
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+
+            def on_progress(fraction: float):
+                progress_callback(fraction, f"转换进度: {int(fraction * 100)}%")
+
+            result = await run_ffmpeg(
+                cmd,
+                progress_callback=on_progress if progress_callback else None,
+                total_duration=total_duration,
+                cancel_token=cancel_token
             )
-            
-            # 模拟进度更新
-            if progress_callback:
-                for i in range(10):
-                    await asyncio.sleep(0.5)
-                    progress_callback(i / 10, f"转换进度: {i*10}%")
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
+
+            if result.success:
                 logger.info("视频转换成功")
                 return True
             else:
-                error_msg = stderr.decode() if stderr else "未知错误"
-                logger.error(f"视频转换失败: {error_msg}")
+                logger.error(f"视频转换失败: {result.error_message}")
                 return False
                 
         except Exception as e:
@@ -355,32 +475,37 @@ class VideoFormatConverter:
             
     async def batch_convert(self, tasks: List[Dict[str, Any]], 
                           progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
-        """批量转换视频"""
-        results = []
-        total_tasks = len(tasks)
-        
+        """批量转换视频（同一输入、同一输出目录的任务合并为一次解码）"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+        groups: Dict[tuple, List[int]] = {}
         for i, task in enumerate(tasks):
+            groups.setdefault((task.get('input_path'), task.get('output_dir')), []).append(i)
+        total_groups = len(groups)
+
+        for n, ((input_path, output_dir), indexes) in enumerate(groups.items()):
             try:
                 if progress_callback:
-                    progress_callback(i / total_tasks, f"处理任务 {i+1}/{total_tasks}")
-                    
-                result = await self.convert_for_platform(
-                    input_path=task['input_path'],
-                    platform=task['platform'],
-                    output_dir=task['output_dir'],
+                    progress_callback(n / total_groups, f"处理任务 {n+1}/{total_groups}")
+
+                platforms = [tasks[i]['platform'] for i in indexes]
+                converted = await self.convert_for_platforms(
+                    input_path=input_path,
+                    platforms=platforms,
+                    output_dir=output_dir,
                     progress_callback=None  # 不传递内部进度
                 )
-                
-                results.append(result)
-                
+                for i in indexes:
+                    results[i] = converted[tasks[i]['platform']]
+
             except Exception as e:
-                logger.error(f"批量转换任务 {i+1} 失败: {e}")
-                results.append({
-                    'success': False,
-                    'error': str(e),
-                    'platform': task.get('platform', 'unknown')
-                })
-                
+                logger.error(f"批量转换任务 {n+1} 失败: {e}")
+                for i in indexes:
+                    results[i] = {
+                        'success': False,
+                        'error': str(e),
+                        'platform': tasks[i].get('platform', 'unknown')
+                    }
+
         if progress_callback:
             progress_callback(1.0, "批量转换完成")
             
@@ -10,12 +10,13 @@ import aiohttp
 import asyncio
 import base64
 import io
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Callable, Dict, List, Optional, Any, Tuple, Union
 from pathlib import Path
 
 from src.utils.logger import logger
 from src.core.service_base import ServiceBase, ServiceResult
 from src.core.api_manager import APIManager, APIConfig, APIType
+from src.utils.tts_cache import tts_cache
 
 class VoiceService(ServiceBase):
     """语音服务类"""
@@ -48,6 +49,15 @@ class VoiceService(ServiceBase):
             }
         }
         
+        # 批量合成的并发上限与各提供商每秒请求数（可在语音配置中覆盖）
+        self.max_concurrency = int(self.voice_config.get('max_concurrency', 4))
+        self.provider_rate_limits = {
+            'azure': 10.0,
+            'elevenlabs': 2.0,
+            'openai': 3.0,
+            **self.voice_config.get('rate_limits', {})
+        }
+        
         # 默认参数
         self.default_tts_params = {
             'speed': 1.0,
@@ -89,6 +99,31 @@ class VoiceService(ServiceBase):
         if not text:
             return ServiceResult(success=False, error="文本不能为空")
         
+        # 相同提供商、音色、韵律参数和文本的结果直接从缓存读取，不消耗接口额度
+        cache_key = None
+        if kwargs.get('use_cache', True):
+            settings = {k: v for k, v in kwargs.items() if k not in ('text', 'task_type')}
+            cache_key = tts_cache.make_key_from_settings(api_config.provider.lower(), text, settings)
+            cached = tts_cache.lookup(cache_key)
+            if cached:
+                with open(cached['path'], 'rb') as f:
+                    audio_base64 = base64.b64encode(f.read()).decode('utf-8')
+                return ServiceResult(
+                    success=True,
+                    data={**cached['metadata'], 'audio_data': audio_base64},
+                    metadata={
+                        'provider': api_config.provider,
+                        'voice': voice,
+                        'text_length': len(text),
+                        'cached': True
+                    }
+                )
+        
+        # 按提供商限速，重试的请求同样计入
+        if api_config.provider.lower() != 'local':
+            await self.api_manager.get_rate_limiter(
+                api_config, self.provider_rate_limits.get(api_config.provider.lower())).acquire()
+        
         # 根据不同提供商调用TTS API
         if api_config.provider.lower() == 'azure':
             response = await self._call_azure_tts(api_config, text, voice, **kwargs)
@@ -101,6 +136,11 @@ class VoiceService(ServiceBase):
         else:
             return ServiceResult(success=False, error=f"不支持的TTS提供商: {api_config.provider}")
         
+        if cache_key and response.get('audio_data'):
+            tts_cache.put_bytes(cache_key, base64.b64decode(response['audio_data']),
+                                ext=response.get('format', 'mp3'),
+                                metadata={k: v for k, v in response.items() if k != 'audio_data'})
+        
         return ServiceResult(
             success=True,
             data=response,
@@ -396,34 +436,54 @@ class VoiceService(ServiceBase):
                 message="语音转文字失败"
             )
     
+    async def iter_text_to_speech(self, texts: List[str], voice: str = "中文女声",
+                                  provider: str = None, max_concurrency: Optional[int] = None,
+                                  **kwargs) -> AsyncIterator[Tuple[int, ServiceResult]]:
+        """批量文本转语音，按完成顺序逐个产出 (序号, 结果)
+
+        同时进行的请求数不超过 max_concurrency，各提供商的每秒请求数由限速器控制，
+        调用方可以在前面的段落完成后立即开始后续处理。
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrency))
+
+        async def run(index: int, text: str) -> Tuple[int, ServiceResult]:
+            async with semaphore:
+                try:
+                    result = await self.text_to_speech(text=text, voice=voice, provider=provider, **kwargs)
+                except Exception as e:
+                    result = ServiceResult(success=False, error=str(e))
+                result.metadata.setdefault('text_index', index)
+                return index, result
+
+        tasks = [asyncio.ensure_future(run(i, text)) for i, text in enumerate(texts)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 调用方提前停止迭代时取消未完成的请求
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
     async def batch_text_to_speech(self, texts: List[str], voice: str = "中文女声", 
-                                 provider: str = None, **kwargs) -> List[ServiceResult]:
-        """批量文本转语音"""
-        tasks = []
-        for text in texts:
-            task = self.text_to_speech(
-                text=text,
-                voice=voice,
-                provider=provider,
-                **kwargs
-            )
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # 处理异常
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                processed_results.append(ServiceResult(
-                    success=False,
-                    error=str(result),
-                    metadata={'text_index': i}
-                ))
-            else:
-                processed_results.append(result)
-        
-        return processed_results
+                                 provider: str = None, max_concurrency: Optional[int] = None,
+                                 on_result: Optional[Callable[[int, ServiceResult], None]] = None,
+                                 **kwargs) -> List[ServiceResult]:
+        """批量文本转语音
+
+        Args:
+            max_concurrency: 并发上限，默认取语音配置 max_concurrency
+            on_result: 每段完成时回调 (序号, 结果)，按完成顺序调用
+
+        Returns:
+            与 texts 顺序一致的结果列表
+        """
+        results: List[Optional[ServiceResult]] = [None] * len(texts)
+        async for index, result in self.iter_text_to_speech(texts, voice, provider, max_concurrency, **kwargs):
+            results[index] = result
+            if on_result:
+                on_result(index, result)
+        return results
     
     def get_available_voices(self, provider: str = None) -> Dict[str, List[str]]:
         """获取可用的音色列表"""
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步准入控制器
+提供公平的FIFO异步信号量（可跨线程、跨事件循环共享）以及“全局+按键”两级并发限制，
+支持等待超时、取消和排队位置回调；另提供按每秒请求数限速的令牌桶
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from src.utils.logger import logger
+
+
+class _Waiter:
+    """排队中的等待者"""
+
+    __slots__ = ('loop', 'future', 'granted', 'position_callback')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, position_callback: Optional[Callable[[int], None]]):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.position_callback = position_callback
+
+
+def _wake(waiter: _Waiter):
+    """在等待者自己的事件循环中唤醒它"""
+    if not waiter.future.done():
+        waiter.future.set_result(True)
+
+
+class FairSemaphore:
+    """公平FIFO信号量
+
+    与 asyncio.Semaphore 不同，它不绑定某个事件循环：状态由线程锁保护，
+    唤醒通过 call_soon_threadsafe 投递到等待者所在的循环，因此GUI中
+    各个工作线程各自的事件循环可以共享同一个限制。
+    """
+
+    def __init__(self, value: int, name: str = ""):
+        if value < 1:
+            raise ValueError("信号量初始值必须大于0")
+        self.name = name
+        self._limit = value
+        self._value = value
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        with self._lock:
+            return self._limit - self._value
+
+    @property
+    def waiting(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    def set_limit(self, value: int):
+        """调整并发上限，放宽时立即唤醒排队者"""
+        if value < 1:
+            raise ValueError("并发上限必须大于0")
+        with self._lock:
+            self._value += value - self._limit
+            self._limit = value
+            self._grant_locked()
+
+    async def acquire(self, timeout: Optional[float] = None,
+                      position_callback: Optional[Callable[[int], None]] = None) -> bool:
+        """获取一个名额
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+            position_callback: 排队位置变化回调，参数为前面等待的任务数
+
+        Returns:
+            是否获取成功；超时返回False，取消时抛出CancelledError
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return True
+            waiter = _Waiter(loop, position_callback)
+            self._waiters.append(waiter)
+            ahead = len(self._waiters) - 1
+
+        if position_callback:
+            position_callback(ahead)
+
+        try:
+            if timeout is None:
+                await waiter.future
+            else:
+                await asyncio.wait_for(waiter.future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            return False
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: _Waiter):
+        """等待者超时或被取消：若已被授予名额则归还，否则移出队列"""
+        with self._lock:
+            if waiter.granted:
+                self._value += 1
+                self._grant_locked()
+                return
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            self._notify_positions_locked()
+
+    def release(self):
+        """释放一个名额，并按FIFO顺序唤醒下一个等待者"""
+        with self._lock:
+            if self._value >= self._limit and not self._waiters:
+                logger.warning(f"信号量 {self.name} 释放次数多于获取次数")
+                return
+            self._value += 1
+            self._grant_locked()
+
+    def _grant_locked(self):
+        granted_any = False
+        while self._value > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.future.cancelled():
+                continue
+            try:
+                waiter.granted = True
+                waiter.loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # 等待者所在的事件循环已关闭
+                waiter.granted = False
+                continue
+            self._value -= 1
+            granted_any = True
+        if granted_any:
+            self._notify_positions_locked()
+
+    def _notify_positions_locked(self):
+        for ahead, waiter in enumerate(self._waiters):
+            if waiter.position_callback:
+                try:
+                    waiter.loop.call_soon_threadsafe(waiter.position_callback, ahead)
+                except RuntimeError:
+                    pass
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AdmissionController:
+    """两级准入控制：全局并发上限 + 每个键（如引擎）的并发上限"""
+
+    def __init__(self, global_limit: int, default_key_limit: Optional[int] = None, name: str = ""):
+        self.name = name
+        self.global_semaphore = FairSemaphore(global_limit, f"{name}:global")
+        self.default_key_limit = default_key_limit or global_limit
+        self._key_semaphores: Dict[str, FairSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def set_global_limit(self, value: int):
+        self.global_semaphore.set_limit(value)
+
+    def set_key_limit(self, key: str, value: int):
+        with self._lock:
+            semaphore = self._key_semaphores.get(key)
+            if semaphore is None:
+                self._key_semaphores[key] = FairSemaphore(value, f"{self.name}:{key}")
+                return
+        if semaphore.limit != value:
+            semaphore.set_limit(value)
+
+    def get_key_semaphore(self, key: str) -> FairSemaphore:
+        with self._lock:
+            semaphore = self._key_semaphores.get(key)
+            if semaphore is None:
+                semaphore = FairSemaphore(self.default_key_limit, f"{self.name}:{key}")
+                self._key_semaphores[key] = semaphore
+            return semaphore
+
+    async def acquire_global(self, timeout: Optional[float] = None,
+                             position_callback: Optional[Callable[[int], None]] = None) -> bool:
+        return await self.global_semaphore.acquire(timeout, position_callback)
+
+    def release_global(self):
+        self.global_semaphore.release()
+
+    async def acquire(self, key: str, timeout: Optional[float] = None,
+                      position_callback: Optional[Callable[[int], None]] = None) -> bool:
+        return await self.get_key_semaphore(key).acquire(timeout, position_callback)
+
+    def release(self, key: str):
+        self.get_key_semaphore(key).release()
+
+    def get_status(self) -> Dict[str, Dict[str, int]]:
+        """获取各级名额占用与排队情况"""
+        status = {
+            'global': {
+                'limit': self.global_semaphore.limit,
+                'in_use': self.global_semaphore.in_use,
+                'waiting': self.global_semaphore.waiting
+            }
+        }
+        with self._lock:
+            semaphores = dict(self._key_semaphores)
+        for key, semaphore in semaphores.items():
+            status[key] = {
+                'limit': semaphore.limit,
+                'in_use': semaphore.in_use,
+                'waiting': semaphore.waiting
+            }
+        return status
+
+
+class RateLimiter:
+    """令牌桶限速器（每秒请求数）
+
+    与 FairSemaphore 一样用线程锁保护状态，可被多个线程各自的事件循环共享；
+    每次 acquire 预约下一个可用时间点，再在调用方的循环中等待到该时间。
+    """
+
+    def __init__(self, rate: float, burst: int = 1, name: str = ""):
+        """
+        Args:
+            rate: 每秒允许的请求数
+            burst: 空闲后允许连续发出的请求数
+        """
+        if rate <= 0:
+            raise ValueError("限速值必须大于0")
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float, burst: Optional[int] = None):
+        if rate <= 0:
+            raise ValueError("限速值必须大于0")
+        with self._lock:
+            self._refill_locked()
+            self.rate = rate
+            if burst is not None:
+                self.burst = max(1, burst)
+                self._tokens = min(self._tokens, self.burst)
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            self._refill_locked()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        """等待直到允许发出下一个请求"""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
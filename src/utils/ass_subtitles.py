@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASS 字幕生成
+直接输出带样式的 ASS 字幕（不再依赖 SRT + force_style），支持按 TTS 逐词时间戳断行；
+并为 libass 准备持久化的 fontconfig 缓存，避免每次烧录字幕都重新扫描系统字体。
+"""
+
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logger import logger
+
+# (开始秒, 结束秒, 文本)
+SubtitleEvent = Tuple[float, float, str]
+
+FONTCONFIG_DIR = Path("temp/fontconfig")
+PROJECT_FONTS_DIR = Path("assets/fonts")
+
+_POSITION_ALIGNMENT = {'底部': 2, '中间': 5, '顶部': 8}
+_SENTENCE_BREAK = re.compile(r'[。！？；!?;\n]')
+_CLAUSE_BREAK = re.compile(r'[，、,：:]')
+_ASS_BACKSLASH = re.compile(r'\\(?=[Nnh{}])')
+
+_fontconfig_lock = threading.Lock()
+_fontconfig_ready = False
+_fontconfig_path: Optional[str] = None
+
+
+def hex_to_ass_color(hex_color: str, alpha: int = 0) -> str:
+    """#RRGGBB 转为 ASS 颜色 &HAABBGGRR"""
+    hex_color = (hex_color or '#ffffff').lstrip('#')
+    if len(hex_color) != 6:
+        hex_color = 'ffffff'
+    r, g, b = hex_color[0:2], hex_color[2:4], hex_color[4:6]
+    return f"&H{alpha:02X}{b}{g}{r}".upper()
+
+
+def format_ass_time(seconds: float) -> str:
+    """秒数转为 ASS 时间格式 H:MM:SS.cc"""
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def escape_ass_text(text: str) -> str:
+    """转义 ASS 文本中的特殊字符
+
+    花括号使用 libass 的 \\{ \\} 转义；ASS 没有反斜杠转义，
+    反斜杠后插入零宽连接符，避免与后面的字符组成 \\N、\\h 等控制序列
+    """
+    text = _ASS_BACKSLASH.sub('\\\\\u2060', text)
+    text = text.replace('{', '\\{').replace('}', '\\}')
+    return text.replace('\r\n', '\n').replace('\n', '\\N')
+
+
+@dataclass
+class AssStyle:
+    """ASS 默认样式"""
+    font_name: str = "Microsoft YaHei"
+    font_size: int = 24
+    primary_color: str = "#ffffff"
+    outline_color: str = "#000000"
+    outline: float = 2
+    shadow: float = 0
+    bold: bool = False
+    alignment: int = 2  # 小键盘方位：2 底部居中，5 中间，8 顶部
+    margin_v: int = 20
+    play_res: Tuple[int, int] = (384, 288)  # 与 libass 处理 SRT 时的默认画布一致，字号效果不变
+
+    @classmethod
+    def from_config(cls, subtitle_config: Optional[Dict[str, Any]] = None) -> 'AssStyle':
+        """从合成界面的字幕配置创建样式"""
+        config = subtitle_config or {}
+        style = cls(
+            font_size=int(config.get('font_size', 24)),
+            primary_color=config.get('font_color', '#ffffff'),
+            outline_color=config.get('outline_color', '#000000'),
+            outline=config.get('outline_size', 2),
+            alignment=_POSITION_ALIGNMENT.get(config.get('position', '底部'), 2),
+        )
+        if config.get('font_name'):
+            style.font_name = config['font_name']
+        return style
+
+
+def split_subtitle_text(text: str, duration: float, max_chars: int = 20) -> List[SubtitleEvent]:
+    """没有逐词时间戳时，按标点断句并按字数比例分配显示时间"""
+    pieces = []
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        # 长句按逗号等再拆，仍然过长的按固定字数切分
+        line = ''
+        for clause in filter(None, (c.strip() for c in _CLAUSE_BREAK.split(sentence))):
+            if line and len(line) + 1 + len(clause) > max_chars:
+                pieces.append(line)
+                line = ''
+            # 合并到同一行的分句之间用空格代替逗号
+            line += (' ' if line else '') + clause
+            while len(line) > max_chars:
+                pieces.append(line[:max_chars])
+                line = line[max_chars:]
+        if line:
+            pieces.append(line)
+
+    if not pieces:
+        return []
+    total_chars = sum(len(piece) for piece in pieces)
+    events = []
+    current = 0.0
+    for piece in pieces:
+        end = current + duration * len(piece) / total_chars
+        events.append((current, end, piece))
+        current = end
+    return events
+
+
+def events_from_word_boundaries(words: Sequence[Dict[str, Any]], max_chars: int = 20,
+                                max_gap: float = 0.6) -> List[SubtitleEvent]:
+    """按 TTS 逐词时间戳组成字幕行
+
+    Args:
+        words: [{'text': 词, 'start': 开始秒, 'end': 结束秒}, ...]
+        max_chars: 每行最多字数
+        max_gap: 两词间停顿超过该值（秒）时换行
+    """
+    events = []
+    line, line_start, line_end = '', 0.0, 0.0
+    for word in words:
+        text = str(word.get('text', '')).strip()
+        if not text:
+            continue
+        start, end = float(word.get('start', 0)), float(word.get('end', 0))
+        if line and (len(line) + len(text) > max_chars or start - line_end > max_gap):
+            events.append((line_start, line_end, line))
+            line = ''
+        if not line:
+            line_start = start
+        # 英文单词之间保留空格
+        if line and line[-1].isascii() and line[-1].isalnum() and text[0].isascii() and text[0].isalnum():
+            line += ' '
+        line += text
+        line_end = end
+        if _SENTENCE_BREAK.search(text[-1]):
+            events.append((line_start, line_end, line))
+            line = ''
+    if line:
+        events.append((line_start, line_end, line))
+
+    # 标点不单独显示；字幕持续到下一行开始，避免闪烁
+    cleaned = []
+    for i, (start, end, text) in enumerate(events):
+        text = text.strip().rstrip('。！？；!?;，,、')
+        if not text:
+            continue
+        if i + 1 < len(events) and events[i + 1][0] - end < max_gap:
+            end = events[i + 1][0]
+        cleaned.append((start, end, text))
+    return cleaned
+
+
+def word_boundaries_from_cues(cues: Sequence[Any]) -> List[Dict[str, Any]]:
+    """edge-tts SubMaker.cues（逐词）转换为 events_from_word_boundaries 使用的格式"""
+    return [
+        {'text': cue.content, 'start': cue.start.total_seconds(), 'end': cue.end.total_seconds()}
+        for cue in cues
+    ]
+
+
+def write_ass_file(events: Sequence[SubtitleEvent], output_path: str, style: Optional[AssStyle] = None) -> str:
+    """写出 ASS 字幕文件"""
+    style = style or AssStyle()
+    width, height = style.play_res
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{style.font_name},{style.font_size},{hex_to_ass_color(style.primary_color)},"
+        f"&H000000FF,{hex_to_ass_color(style.outline_color)},&H80000000,{-1 if style.bold else 0},0,0,0,"
+        f"100,100,0,0,1,{style.outline},{style.shadow},{style.alignment},10,10,{style.margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for start, end, text in events:
+        if end <= start or not text.strip():
+            continue
+        lines.append(f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,"
+                     f"{escape_ass_text(text.strip())}")
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return output_path
+
+
+def _system_font_dirs() -> List[str]:
+    if sys.platform.startswith('win'):
+        return [os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts'),
+                os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'Windows', 'Fonts')]
+    if sys.platform == 'darwin':
+        return ['/System/Library/Fonts', '/Library/Fonts', os.path.expanduser('~/Library/Fonts')]
+    return ['/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.fonts'),
+            os.path.expanduser('~/.local/share/fonts')]
+
+
+def ensure_fontconfig() -> Optional[str]:
+    """为 ffmpeg/libass 准备带持久缓存目录的 fontconfig 配置
+
+    Windows 版 ffmpeg 通常没有 fontconfig 配置，每次烧录字幕都要重新扫描全部字体；
+    这里生成一次配置文件并返回其路径，由 fontconfig_env 传给烧录字幕的 ffmpeg 进程，
+    不修改当前进程的环境变量。已由用户设置 FONTCONFIG_FILE 时不覆盖。
+    """
+    global _fontconfig_ready, _fontconfig_path
+    with _fontconfig_lock:
+        if os.environ.get('FONTCONFIG_FILE'):
+            return os.environ['FONTCONFIG_FILE']
+        if _fontconfig_ready:
+            return _fontconfig_path
+        _fontconfig_ready = True
+
+        try:
+            cache_dir = (FONTCONFIG_DIR / "cache").resolve()
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            font_dirs = [d for d in _system_font_dirs() if d and os.path.isdir(d)]
+            if PROJECT_FONTS_DIR.is_dir():
+                font_dirs.insert(0, str(PROJECT_FONTS_DIR.resolve()))
+
+            entries = [f"  <dir>{d}</dir>" for d in font_dirs]
+            entries.append(f"  <cachedir>{cache_dir}</cachedir>")
+            if not sys.platform.startswith('win'):
+                # 保留系统配置（字体别名、替换规则等）
+                entries.append('  <include ignore_missing="yes">/etc/fonts/fonts.conf</include>')
+            content = ('<?xml version="1.0"?>\n<!DOCTYPE fontconfig SYSTEM "fonts.dtd">\n<fontconfig>\n'
+                       + '\n'.join(entries) + '\n</fontconfig>\n')
+
+            config_path = (FONTCONFIG_DIR / "fonts.conf").resolve()
+            temp_path = config_path.with_suffix('.tmp')
+            temp_path.write_text(content, encoding='utf-8')
+            os.replace(temp_path, config_path)
+
+            _fontconfig_path = str(config_path)
+            logger.info(f"字幕字体缓存配置: {config_path}")
+            return _fontconfig_path
+        except Exception as e:
+            logger.warning(f"准备fontconfig配置失败，使用ffmpeg默认字体配置: {e}")
+            return None
+
+
+def fontconfig_env() -> Optional[Dict[str, str]]:
+    """烧录字幕的 ffmpeg 进程使用的环境变量（带 FONTCONFIG_FILE），无需修改时返回 None"""
+    if os.environ.get('FONTCONFIG_FILE'):
+        return None
+    config_path = ensure_fontconfig()
+    if not config_path:
+        return None
+    return {**os.environ, 'FONTCONFIG_FILE': config_path}
+
+
+def escape_filter_path(path: str) -> str:
+    """转义滤镜参数中的路径，结果用于单引号内（Windows 盘符冒号、反斜杠、引号）
+
+    滤镜选项层用 \\: \\' 转义；滤镜图层的单引号内不能出现单引号，
+    用 '\\'' 先结束引号、写入转义的引号再重新开始引号
+    """
+    path = path.replace('\\', '/').replace(':', '\\:')
+    return path.replace("'", "\\'\\''")
+
+
+def ass_filter(ass_path: str) -> str:
+    """生成烧录 ASS 字幕的滤镜参数（执行命令时需传入 fontconfig_env() 的环境变量）"""
+    filter_str = f"ass='{escape_filter_path(ass_path)}'"
+    if PROJECT_FONTS_DIR.is_dir():
+        filter_str += f":fontsdir='{escape_filter_path(str(PROJECT_FONTS_DIR.resolve()))}'"
+    return filter_str
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步HTTP连接池与访问令牌缓存
+aiohttp 会话只能在创建它的事件循环中使用，GUI 各工作线程又各自运行事件循环，
+这里按事件循环维护带 keep-alive 的会话；访问令牌按过期时间缓存并提前刷新，
+同一时刻只有一个刷新请求。
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+from src.utils.logger import logger
+
+
+class LoopLocalSessionPool:
+    """按事件循环复用的 aiohttp 会话"""
+
+    def __init__(self, name: str = "", limit_per_host: int = 8, timeout: float = 30,
+                 headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.headers = headers or {}
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._lock = threading.Lock()
+
+    async def get(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的会话，不存在时创建"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # 摘下已关闭事件循环上遗留的会话，在锁外关闭
+            stale = [self._sessions.pop(l) for l in list(self._sessions) if l.is_closed()]
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host, keepalive_timeout=30,
+                                                   ttl_dns_cache=300),
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                    headers=self.headers
+                )
+                self._sessions[loop] = session
+                logger.debug(f"创建HTTP会话: {self.name}")
+        for stale_session in stale:
+            await self._close_stale(stale_session)
+        return session
+
+    async def _close_stale(self, session: aiohttp.ClientSession):
+        """关闭事件循环结束前未关闭的会话；原事件循环已关闭，连接无法正常断开时尽力释放并忽略错误"""
+        if session.closed:
+            return
+        try:
+            await session.close()
+        except Exception as e:
+            logger.debug(f"关闭遗留HTTP会话失败 {self.name}: {e}")
+
+    async def close(self):
+        """关闭当前事件循环的会话（事件循环结束前调用）"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+        if session and not session.closed:
+            await session.close()
+
+
+class TokenCache:
+    """访问令牌缓存：按过期时间缓存，在到期前 refresh_margin 秒内提前刷新"""
+
+    def __init__(self, fetch: Callable[[], Awaitable[Tuple[Optional[str], float]]],
+                 refresh_margin: float = 300, name: str = ""):
+        """
+        Args:
+            fetch: 获取新令牌的协程函数，返回 (令牌, 有效期秒数)
+        """
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.name = name
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing: Dict[asyncio.AbstractEventLoop, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._token if time.time() < self._expires_at else None
+
+    def invalidate(self):
+        """令牌被服务端拒绝时作废"""
+        self._token = None
+        self._expires_at = 0.0
+
+    async def get(self) -> Optional[str]:
+        """获取有效令牌；即将过期时刷新，刷新失败但旧令牌仍有效则继续使用旧令牌"""
+        if self._token and time.time() < self._expires_at - self.refresh_margin:
+            return self._token
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            future = self._refreshing.get(loop)
+            owner = future is None
+            if owner:
+                future = loop.create_future()
+                self._refreshing[loop] = future
+        if not owner:
+            return await asyncio.shield(future)
+
+        try:
+            token, expires_in = await self.fetch()
+            if token:
+                self._token = token
+                self._expires_at = time.time() + expires_in
+                logger.debug(f"访问令牌已刷新: {self.name}，有效期 {expires_in / 3600:.1f} 小时")
+            result = self.token
+            future.set_result(result)
+            return result
+        except Exception as e:
+            logger.error(f"获取访问令牌失败 {self.name}: {e}")
+            future.set_result(self.token)
+            return self.token
+        finally:
+            with self._lock:
+                self._refreshing.pop(loop, None)
+            if not future.done():
+                # 刷新任务被取消（或因非 Exception 异常退出），把取消传给等待同一次刷新的任务，避免它们永远挂起
+                future.cancel()
+
@@ -10,6 +10,9 @@ import struct
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
+from src.utils.audio_header_duration import read_audio_duration, read_audio_durations
+from src.utils.tts_timing import load_duration
+
 logger = logging.getLogger(__name__)
 
 class AudioDurationAnalyzer:
@@ -37,6 +40,12 @@ class AudioDurationAnalyzer:
             float: 音频时长（秒）
         """
         try:
+            # 方法0：合成时记录的时长
+            duration = load_duration(audio_path)
+            if duration:
+                logger.debug(f"从TTS时间记录获取时长: {duration:.2f}秒 - {audio_path}")
+                return duration
+            
             # 方法1：直接分析音频文件
             if audio_path and os.path.exists(audio_path):
                 duration = self._analyze_audio_file(audio_path)
@@ -62,6 +71,11 @@ class AudioDurationAnalyzer:
     def _analyze_audio_file(self, audio_path: str) -> float:
         """分析音频文件获取精确时长"""
         try:
+            # 优先解析文件头，不解码音频
+            duration = read_audio_duration(audio_path)
+            if duration > 0:
+                return duration
+
             file_ext = Path(audio_path).suffix.lower()
             
             if file_ext == '.wav':
@@ -160,6 +174,9 @@ class AudioDurationAnalyzer:
             Dict[int, float]: 索引到时长的映射
         """
         results = {}
+
+        # 一次批量读取所有音频的文件头，逐个分析时直接命中缓存
+        read_audio_durations(audio_data.get('audio_path', '') for audio_data in audio_data_list)
         
         for i, audio_data in enumerate(audio_data_list):
             audio_path = audio_data.get('audio_path', '')
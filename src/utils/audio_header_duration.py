@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于文件头的音频时长读取
+不解码音频：MP3 读取 Xing/Info（含 LAME 编码延迟与填充）或 VBRI 头，固定码率文件按数据长度计算，
+没有头信息的可变码率文件用内存映射的向量化帧扫描；WAV 解析 RIFF 块；OGG 读取最后一页的粒度位置。
+结果按 (路径, 大小, 修改时间) 缓存，读取几百个配音片段的时长只需几毫秒。
+"""
+
+import os
+import mmap
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from src.utils.logger import logger
+
+# ---------------------------------------------------------------------------
+# MPEG 音频帧头
+# ---------------------------------------------------------------------------
+
+# 版本位 -> 采样率（版本位 1 为保留值）
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# (MPEG-1?, 层) -> 比特率表（kbps）
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# 查找第一帧时最多检查的字节数（ID3 标签之后）
+_SYNC_SEARCH_BYTES = 64 * 1024
+# 判断固定码率时检查的帧数
+_CBR_PROBE_FRAMES = 8
+# 确认第一帧时要求连续有效的帧数（偶然出现的同步字节很难连续通过多次校验）
+_MIN_CHAIN_FRAMES = 4
+# 帧扫描得到的帧链至少覆盖音频数据的比例，否则认为文件损坏，结果不可信
+_MIN_SCAN_COVERAGE = 0.9
+
+
+class _FrameHeader:
+    __slots__ = ('size', 'samples', 'sample_rate', 'bitrate', 'mpeg1', 'mono')
+
+    def __init__(self, size, samples, sample_rate, bitrate, mpeg1, mono):
+        self.size = size
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.bitrate = bitrate
+        self.mpeg1 = mpeg1
+        self.mono = mono
+
+
+def _parse_frame_header(header: int) -> Optional[_FrameHeader]:
+    """解析4字节帧头，不是有效帧时返回 None（不支持自由格式码率）"""
+    if (header >> 21) & 0x7FF != 0x7FF:
+        return None
+    version_bits = (header >> 19) & 0x3
+    layer_bits = (header >> 17) & 0x3
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0x3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    padding = (header >> 9) & 0x1
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index]
+    if layer == 1:
+        size, samples = (12 * bitrate * 1000 // sample_rate + padding) * 4, 384
+    elif layer == 2:
+        size, samples = 144 * bitrate * 1000 // sample_rate + padding, 1152
+    else:
+        size = (144 if mpeg1 else 72) * bitrate * 1000 // sample_rate + padding
+        samples = 1152 if mpeg1 else 576
+    return _FrameHeader(size, samples, sample_rate, bitrate, mpeg1, ((header >> 6) & 0x3) == 3)
+
+
+def _header_at(data, pos: int) -> Optional[_FrameHeader]:
+    if pos + 4 > len(data):
+        return None
+    return _parse_frame_header(int.from_bytes(data[pos:pos + 4], 'big'))
+
+
+def _id3v2_size(data) -> int:
+    """ID3v2 标签长度（含头和可选的尾），没有标签时为 0"""
+    offset = 0
+    # 个别文件带有多个连续的 ID3 标签
+    while data[offset:offset + 3] == b'ID3' and offset + 10 <= len(data):
+        size = 0
+        for byte in data[offset + 6:offset + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        offset += size + 10 + (10 if data[offset + 5] & 0x10 else 0)
+    return offset
+
+
+def _is_frame_chain(data, pos: int, frame: _FrameHeader, end: int) -> bool:
+    """从 pos 起连续 _MIN_CHAIN_FRAMES 帧首尾相接且采样率一致（或恰好在数据末尾结束）"""
+    for _ in range(_MIN_CHAIN_FRAMES - 1):
+        pos += frame.size
+        if pos == end:
+            return True
+        if pos > end:
+            return False
+        following = _header_at(data, pos)
+        if not following or following.sample_rate != frame.sample_rate:
+            return False
+        frame = following
+    return True
+
+
+def _find_first_frame(data, start: int, end: int) -> Tuple[int, Optional[_FrameHeader]]:
+    """查找第一个有效帧（要求其后连续若干帧也有效，避免把标签数据误认为帧头）"""
+    limit = min(end - 4, start + _SYNC_SEARCH_BYTES)
+    pos = data.find(b'\xff', start, limit)
+    while 0 <= pos < limit:
+        frame = _header_at(data, pos)
+        if frame and _is_frame_chain(data, pos, frame, end):
+            return pos, frame
+        pos = data.find(b'\xff', pos + 1, limit)
+    return -1, None
+
+
+def _vbr_header_duration(data, pos: int, frame: _FrameHeader) -> Optional[float]:
+    """读取 Xing/Info（含 LAME 扩展）或 VBRI 头中的总帧数"""
+    if frame.mpeg1:
+        side_info = 17 if frame.mono else 32
+    else:
+        side_info = 9 if frame.mono else 17
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+        cursor = xing + 8
+        frames = None
+        if flags & 0x1:
+            frames = int.from_bytes(data[cursor:cursor + 4], 'big')
+            cursor += 4
+        if flags & 0x2:
+            cursor += 4
+        if flags & 0x4:
+            cursor += 100
+        if flags & 0x8:
+            cursor += 4
+        if not frames:
+            return None
+        samples = frames * frame.samples
+        # LAME 扩展头：编码器在开头插入的延迟和结尾的填充不属于实际内容
+        if data[cursor:cursor + 4] in (b'LAME', b'Lavc', b'Lavf', b'L3.9'):
+            b0, b1, b2 = data[cursor + 21:cursor + 24]
+            delay, padding = (b0 << 4) | (b1 >> 4), ((b1 & 0x0F) << 8) | b2
+            if delay + padding < samples:
+                samples -= delay + padding
+        return samples / frame.sample_rate
+
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b'VBRI':
+        frames = int.from_bytes(data[vbri + 14:vbri + 18], 'big')
+        if frames:
+            return frames * frame.samples / frame.sample_rate
+    return None
+
+
+def _is_constant_bitrate(data, pos: int, frame: _FrameHeader, end: int) -> bool:
+    """检查开头若干帧的码率是否一致"""
+    for _ in range(_CBR_PROBE_FRAMES):
+        pos += frame.size
+        if pos >= end:
+            return True
+        following = _header_at(data, pos)
+        if not following:
+            return False
+        if following.bitrate != frame.bitrate:
+            return False
+    return True
+
+
+def _build_frame_tables():
+    """按 [版本位, 层位, 序号] 展开的比特率/采样率/每帧样本数表，供向量化扫描使用"""
+    bitrates = np.zeros((4, 4, 16), dtype=np.int64)
+    sample_rates = np.zeros((4, 4), dtype=np.int64)
+    samples = np.zeros((4, 4), dtype=np.int64)
+    coefficients = np.zeros((4, 4), dtype=np.int64)
+    for version_bits, rates in _SAMPLE_RATES.items():
+        mpeg1 = version_bits == 3
+        sample_rates[version_bits, :3] = rates
+        for layer_bits in (1, 2, 3):
+            layer = 4 - layer_bits
+            bitrates[version_bits, layer_bits, :15] = _BITRATES[(mpeg1, layer)]
+            if layer == 1:
+                samples[version_bits, layer_bits], coefficients[version_bits, layer_bits] = 384, 12
+            elif layer == 2:
+                samples[version_bits, layer_bits], coefficients[version_bits, layer_bits] = 1152, 144
+            else:
+                samples[version_bits, layer_bits] = 1152 if mpeg1 else 576
+                coefficients[version_bits, layer_bits] = 144 if mpeg1 else 72
+    return bitrates, sample_rates, samples, coefficients
+
+
+_FRAME_TABLES = _build_frame_tables() if np is not None else None
+
+
+def _scan_frames_vectorized(data, start: int, end: int) -> Optional[float]:
+    """向量化帧扫描：一次解析所有帧同步位置的帧头和帧长，再从第一帧（start 处）沿首尾相接的帧链累加样本数"""
+    buffer = np.frombuffer(data, dtype=np.uint8, count=end)[start:]
+    if len(buffer) < 4:
+        return None
+    candidates = np.flatnonzero((buffer[:-3] == 0xFF) & ((buffer[1:-2] & 0xE0) == 0xE0))
+    if not len(candidates):
+        return None
+
+    byte1 = buffer[candidates + 1].astype(np.int64)
+    byte2 = buffer[candidates + 2].astype(np.int64)
+    version_bits = (byte1 >> 3) & 0x3
+    layer_bits = (byte1 >> 1) & 0x3
+    bitrate_index = byte2 >> 4
+    sample_rate_index = (byte2 >> 2) & 0x3
+    padding = (byte2 >> 1) & 0x1
+    valid = ((version_bits != 1) & (layer_bits != 0) & (bitrate_index != 0) & (bitrate_index != 15)
+             & (sample_rate_index != 3))
+    candidates, version_bits, layer_bits = candidates[valid], version_bits[valid], layer_bits[valid]
+    bitrate_index, sample_rate_index, padding = bitrate_index[valid], sample_rate_index[valid], padding[valid]
+    if not len(candidates):
+        return None
+
+    bitrates, sample_rates, samples, coefficients = _FRAME_TABLES
+    bitrate = bitrates[version_bits, layer_bits, bitrate_index]
+    sample_rate = sample_rates[version_bits, sample_rate_index]
+    coefficient = coefficients[version_bits, layer_bits]
+    sizes = np.where(layer_bits == 3, (coefficient * bitrate * 1000 // sample_rate + padding) * 4,
+                     coefficient * bitrate * 1000 // sample_rate + padding)
+
+    if candidates[0] != 0:
+        return None
+
+    # 每帧的下一帧序号：-1 表示恰好在数据末尾结束，-2 表示断链（包括越过数据末尾的截断帧）
+    following = candidates + sizes
+    slot = np.minimum(np.searchsorted(candidates, following), len(candidates) - 1)
+    next_slot = np.where(candidates[slot] == following, slot, np.where(following == len(buffer), -1, -2))
+
+    # 只有从第一帧起首尾相接、采样率一致的帧才计入，数据中偶然出现的同步字节不会被当作帧
+    next_list, rates = next_slot.tolist(), sample_rate.tolist()
+    chain = [0]
+    index = next_list[0]
+    while index >= 0 and rates[index] == rates[0]:
+        chain.append(index)
+        index = next_list[index]
+    if following[chain[-1]] > len(buffer):
+        # 最后一帧被截断，不计入
+        chain.pop()
+    if not chain or not _chain_trusted(len(chain), index == -1, int(sizes[chain].sum()), len(buffer)):
+        return None
+    return float(samples[version_bits, layer_bits][chain].sum()) / rates[0]
+
+
+def _chain_trusted(frame_count: int, reached_end: bool, covered: int, total: int) -> bool:
+    """帧链足够长并覆盖了几乎全部音频数据时才采用扫描结果"""
+    if reached_end:
+        return True
+    return frame_count >= _MIN_CHAIN_FRAMES and covered >= total * _MIN_SCAN_COVERAGE
+
+
+def _scan_frames(data, start: int, end: int) -> Optional[float]:
+    """逐帧累加样本数（没有 numpy 时使用）"""
+    first, frame = _find_first_frame(data, start, end)
+    if not frame:
+        return None
+    pos, total, frame_count, sample_rate = first, 0, 0, frame.sample_rate
+    # 越过数据末尾的截断帧不计入
+    while frame and frame.sample_rate == sample_rate and pos + frame.size <= end:
+        total += frame.samples
+        frame_count += 1
+        pos += frame.size
+        frame = _header_at(data, pos) if pos + 4 <= end else None
+    if not _chain_trusted(frame_count, pos == end, pos - first, end - first):
+        return None
+    return total / sample_rate
+
+
+def _mp3_duration(data, size: int) -> Optional[float]:
+    start = _id3v2_size(data)
+    end = size - 128 if size >= 128 and data[size - 128:size - 125] == b'TAG' else size
+    pos, frame = _find_first_frame(data, start, end)
+    if not frame:
+        return None
+
+    duration = _vbr_header_duration(data, pos, frame)
+    if duration:
+        return duration
+    if _is_constant_bitrate(data, pos, frame, end):
+        return (end - pos) * 8 / (frame.bitrate * 1000)
+    if np is not None:
+        try:
+            return _scan_frames_vectorized(data, pos, end)
+        except Exception as e:
+            # 异常退出时释放对内存映射的引用，再逐帧扫描
+            logger.debug(f"向量化帧扫描失败，改为逐帧扫描: {e}")
+    return _scan_frames(data, pos, end)
+
+
+# ---------------------------------------------------------------------------
+# WAV / OGG
+# ---------------------------------------------------------------------------
+
+def _wav_duration(data, size: int) -> Optional[float]:
+    if data[:4] not in (b'RIFF', b'RF64') or data[8:12] != b'WAVE':
+        return None
+    pos = 12
+    format_tag = byte_rate = sample_rate = fact_samples = None
+    while pos + 8 <= size:
+        chunk_id = data[pos:pos + 4]
+        chunk_size = int.from_bytes(data[pos + 4:pos + 8], 'little')
+        body = pos + 8
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            format_tag, _, sample_rate, byte_rate = struct.unpack('<HHII', data[body:body + 12])
+        elif chunk_id == b'fact' and chunk_size >= 4:
+            fact_samples = int.from_bytes(data[body:body + 4], 'little')
+        elif chunk_id == b'data':
+            # 流式写出的文件 data 块长度可能未回填
+            if chunk_size == 0xFFFFFFFF or body + chunk_size > size or chunk_size == 0:
+                chunk_size = size - body
+            if fact_samples and sample_rate and format_tag not in (1, 3, 0xFFFE):
+                return fact_samples / sample_rate
+            return chunk_size / byte_rate if byte_rate else None
+        pos = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _ogg_duration(data, size: int) -> Optional[float]:
+    if data[:4] != b'OggS' or size < 28:
+        return None
+    serial = data[14:18]
+    packet_start = 27 + data[26]
+    packet = data[packet_start:packet_start + 19]
+    if packet[:7] == b'\x01vorbis':
+        sample_rate, pre_skip = int.from_bytes(packet[12:16], 'little'), 0
+    elif packet[:8] == b'OpusHead':
+        sample_rate, pre_skip = 48000, int.from_bytes(packet[10:12], 'little')
+    else:
+        return None
+    if not sample_rate:
+        return None
+
+    # 从末尾向前找同一逻辑流中粒度位置有效的最后一页
+    tail = max(0, size - 65536)
+    pos = data.rfind(b'OggS', tail)
+    while pos >= 0:
+        granule = int.from_bytes(data[pos + 6:pos + 14], 'little', signed=True)
+        if granule >= 0 and data[pos + 14:pos + 18] == serial:
+            return max(0, granule - pre_skip) / sample_rate
+        pos = data.rfind(b'OggS', tail, pos)
+    return None
+
+
+_READERS = {'.mp3': _mp3_duration, '.wav': _wav_duration, '.ogg': _ogg_duration, '.opus': _ogg_duration}
+
+
+def _select_reader(data, ext: str):
+    """按文件头魔数选择解析器（扩展名可能与实际格式不符），无法识别时按扩展名"""
+    magic = data[:4]
+    if magic in (b'RIFF', b'RF64'):
+        return _wav_duration
+    if magic == b'OggS':
+        return _ogg_duration
+    if magic[:3] == b'ID3' or (len(magic) >= 2 and magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0):
+        return _mp3_duration
+    return _READERS.get(ext)
+
+
+# ---------------------------------------------------------------------------
+# 对外接口
+# ---------------------------------------------------------------------------
+
+_cache: Dict[str, Tuple[int, int, float]] = {}
+_cache_lock = threading.Lock()
+_CACHE_LIMIT = 4096
+
+
+def _read_file(path: str) -> Optional[float]:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            reader = _select_reader(data, ext)
+            duration = reader(data, size) if reader else None
+    return duration if duration and duration > 0 else None
+
+
+def read_audio_duration(audio_path: str) -> float:
+    """读取音频时长（秒），只解析文件头，无法识别时返回 0.0"""
+    try:
+        stat = os.stat(audio_path)
+    except (OSError, TypeError):
+        return 0.0
+
+    with _cache_lock:
+        cached = _cache.get(audio_path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    try:
+        duration = _read_file(audio_path) or 0.0
+    except Exception as e:
+        logger.debug(f"读取音频头失败 {audio_path}: {e}")
+        duration = 0.0
+
+    with _cache_lock:
+        if len(_cache) >= _CACHE_LIMIT:
+            _cache.pop(next(iter(_cache)))
+        _cache[audio_path] = (stat.st_size, stat.st_mtime_ns, duration)
+    return duration
+
+
+def read_audio_durations(audio_paths: Iterable[str], max_workers: int = 8) -> Dict[str, float]:
+    """批量读取音频时长，返回 {路径: 秒}，无法识别的为 0.0"""
+    paths = list(dict.fromkeys(p for p in audio_paths if p))
+    if len(paths) <= 16 or max_workers <= 1:
+        return {path: read_audio_duration(path) for path in paths}
+    # 文件较多时并发打开，网络盘或冷缓存下可以重叠等待
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio_header") as executor:
+        return dict(zip(paths, executor.map(read_audio_duration, paths)))
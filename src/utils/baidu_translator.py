@@ -10,7 +10,7 @@ import random
 import time
 import requests
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -153,6 +153,66 @@ def translate_text(text: str, from_lang: str = 'zh', to_lang: str = 'en') -> Opt
         logger.error(f"百度翻译异常: {e}")
         return None
 
+def translate_texts(texts: List[str], from_lang: str = 'zh', to_lang: str = 'en') -> List[Optional[str]]:
+    """
+    一次请求翻译多条文本（每条一行，接口按行返回结果）
+    
+    Args:
+        texts: 待翻译的文本列表（单条文本中不应包含换行）
+        
+    Returns:
+        与texts顺序一致的翻译结果，失败的条目为None
+    """
+    lines = [' '.join((text or '').split()) for text in texts]
+    if not any(lines):
+        return [None] * len(texts)
+    
+    joined = translate_text_raw('\n'.join(lines), from_lang, to_lang)
+    if not joined:
+        return [None] * len(texts)
+    
+    results = {item.get('src', ''): item.get('dst') for item in joined}
+    return [results.get(line) if line else None for line in lines]
+
+def translate_text_raw(text: str, from_lang: str = 'zh', to_lang: str = 'en') -> Optional[List[Dict]]:
+    """
+    调用百度翻译API，返回原始的 trans_result 列表（多行文本每行一项）
+    
+    Returns:
+        [{'src': 原文, 'dst': 译文}, ...]，失败时返回None
+    """
+    app_id = BAIDU_TRANSLATE_CONFIG['app_id']
+    secret_key = BAIDU_TRANSLATE_CONFIG['secret_key']
+    api_url = BAIDU_TRANSLATE_CONFIG['api_url']
+    
+    if not app_id or not secret_key:
+        logger.error("百度翻译API配置不完整，请先调用set_baidu_config()设置")
+        return None
+    
+    try:
+        salt = str(random.randint(32768, 65536))
+        data = {
+            'q': text,
+            'from': from_lang,
+            'to': to_lang,
+            'appid': app_id,
+            'salt': salt,
+            'sign': generate_sign(text, salt, app_id, secret_key)
+        }
+        # 多行文本可能较长，使用POST提交
+        response = requests.post(api_url, data=data, timeout=15)
+        response.raise_for_status()
+        result = response.json()
+        
+        if 'error_code' in result:
+            logger.error(f"百度翻译API错误: {result['error_code']} - {result.get('error_msg', '未知错误')}")
+            return None
+        return result.get('trans_result') or None
+        
+    except Exception as e:
+        logger.error(f"百度翻译异常: {e}")
+        return None
+
 def is_configured() -> bool:
     """
     检查百度翻译API是否已配置 - 已禁用
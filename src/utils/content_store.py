@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址存储基础设施
+对象文件按内容哈希保存（相同内容只存一份），索引记录键到对象的映射，
+按引用计数维护占用总量，支持LRU与容量淘汰；索引按时间间隔合并落盘，退出时统一刷新
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import weakref
+from typing import Dict, Any, List, Optional
+
+from src.utils.logger import logger
+
+# 所有存储实例，退出时统一刷新索引
+_stores: 'weakref.WeakSet[ContentAddressedStore]' = weakref.WeakSet()
+
+
+def link_or_copy(src: str, dst: str, allow_hardlink: bool = True) -> str:
+    """优先硬链接，其次reflink，最后复制；返回使用的方式
+
+    Args:
+        allow_hardlink: 为 False 时只使用写时复制（reflink）或复制，目标文件被原地改写也不会影响源文件
+    """
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+
+    try:
+        import fcntl
+        ficlone = 0x40049409  # Linux FICLONE
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), ficlone, fsrc.fileno())
+        return 'reflink'
+    except (ImportError, OSError):
+        if os.path.exists(dst):
+            os.remove(dst)
+
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def hash_file(file_path: str) -> str:
+    """计算文件内容哈希"""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def flush_content_stores():
+    """立即持久化所有存储的索引（程序退出时调用）"""
+    for store in list(_stores):
+        store.flush()
+
+
+class ContentAddressedStore:
+    """内容寻址存储
+
+    条目格式: {'objects': [{'hash', 'ext', 'size'}], 'created', 'last_access', 'hits', 'metadata'}
+    子类负责键的计算以及查找结果的组织
+    """
+
+    def __init__(self, store_dir: str, max_size_mb: int, max_entries: int, name: str):
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, "objects")
+        self.index_file = os.path.join(store_dir, "index.json")
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.max_entries = max_entries
+        self.name = name
+        self.enabled = True
+
+        self._store_lock = threading.RLock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._object_refs: Dict[str, int] = {}  # 对象文件 -> 引用该对象的条目数
+        self._object_sizes: Dict[str, int] = {}
+        self._total_size = 0
+        self._dirty = False
+        self._last_save_time = 0.0
+        self._save_interval = 30.0
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+        _stores.add(self)
+
+    def _object_path(self, content_hash: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, content_hash[:2], f"{content_hash}{ext}")
+
+    # ------------------------------------------------------------------
+    # 索引持久化
+    # ------------------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            self._index = {}
+            try:
+                if os.path.exists(self.index_file):
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        self._index = json.load(f)
+            except Exception as e:
+                logger.warning(f"加载{self.name}索引失败，将重建: {e}")
+                self._index = {}
+            for entry in self._index.values():
+                self._ref_objects(entry)
+        return self._index
+
+    def _ref_objects(self, entry: Dict[str, Any]):
+        for obj in entry.get('objects', []):
+            name = obj['hash'] + obj['ext']
+            if name not in self._object_refs:
+                self._object_refs[name] = 0
+                self._object_sizes[name] = obj.get('size', 0)
+                self._total_size += self._object_sizes[name]
+            self._object_refs[name] += 1
+
+    def _remove_entry(self, key: str):
+        """删除条目，不再被引用的对象文件同时删除"""
+        entry = self._index.pop(key, None)
+        if not entry:
+            return
+        for obj in entry.get('objects', []):
+            name = obj['hash'] + obj['ext']
+            if name not in self._object_refs:
+                continue
+            self._object_refs[name] -= 1
+            if self._object_refs[name] <= 0:
+                del self._object_refs[name]
+                self._total_size -= self._object_sizes.pop(name, 0)
+                try:
+                    os.remove(self._object_path(obj['hash'], obj['ext']))
+                except OSError as e:
+                    logger.debug(f"删除{self.name}对象失败 {name}: {e}")
+        self._dirty = True
+
+    def _save_index(self, force: bool = False):
+        if not self._dirty and not force:
+            return
+        if not force and time.time() - self._last_save_time < self._save_interval:
+            return
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+            self._dirty = False
+            self._last_save_time = time.time()
+        except Exception as e:
+            logger.warning(f"保存{self.name}索引失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 查找与写入
+    # ------------------------------------------------------------------
+
+    def _lookup_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """精确匹配查找条目；对象丢失或被修改时作废该条目"""
+        if not self.enabled:
+            return None
+
+        with self._store_lock:
+            entry = self._load_index().get(key)
+            if not entry:
+                self.misses += 1
+                return None
+
+            objects = entry.get('objects') or [None]  # 没有对象列表的条目（旧格式）同样作废
+            for obj in objects:
+                path = obj and self._object_path(obj['hash'], obj['ext'])
+                if not path or not os.path.exists(path) or os.path.getsize(path) != obj.get('size', -1):
+                    logger.warning(f"{self.name}对象失效，移除条目: {key[:12]}")
+                    self._remove_entry(key)
+                    self._save_index()
+                    self.misses += 1
+                    return None
+
+            entry['last_access'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+            self._dirty = True
+            self._save_index()
+            self.hits += 1
+            return entry
+
+    def _entry_paths(self, entry: Dict[str, Any]) -> List[str]:
+        return [self._object_path(obj['hash'], obj['ext']) for obj in entry.get('objects', [])]
+
+    def _store_file(self, file_path: str, ext: str) -> Dict[str, Any]:
+        """把文件保存为对象（已存在相同内容时不再复制）"""
+        content_hash = hash_file(file_path)
+        obj_path = self._object_path(content_hash, ext)
+        if not os.path.exists(obj_path):
+            os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+            tmp_path = f"{obj_path}.tmp"
+            shutil.copy2(file_path, tmp_path)
+            os.replace(tmp_path, obj_path)
+        return {'hash': content_hash, 'ext': ext, 'size': os.path.getsize(obj_path)}
+
+    def _store_bytes(self, data: bytes, ext: str) -> Dict[str, Any]:
+        """把内存数据保存为对象"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        obj_path = self._object_path(content_hash, ext)
+        if not os.path.exists(obj_path):
+            os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+            tmp_path = f"{obj_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, obj_path)
+        return {'hash': content_hash, 'ext': ext, 'size': len(data)}
+
+    def _add_entry(self, key: str, objects: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]]):
+        """登记条目；索引按保存间隔合并落盘，批量写入时不会每段都重写整个索引"""
+        index = self._load_index()
+        now = time.time()
+        entry = {
+            'objects': objects,
+            'created': now,
+            'last_access': now,
+            'hits': 0,
+            'metadata': metadata or {}
+        }
+        # 先引用新对象再移除旧条目：内容未变时旧条目与新条目共用同一对象，不能被当作无引用删除
+        self._ref_objects(entry)
+        self._remove_entry(key)
+        index[key] = entry
+        self._dirty = True
+        self._evict_if_needed()
+        self._save_index()
+
+    # ------------------------------------------------------------------
+    # 淘汰
+    # ------------------------------------------------------------------
+
+    def _evict_if_needed(self):
+        """按LRU淘汰，直到满足条目数与容量限制（占用总量随写入与删除增量维护）"""
+        index = self._load_index()
+        if len(index) <= self.max_entries and self._total_size <= self.max_size_bytes:
+            return
+
+        evicted = 0
+        for key, _ in sorted(index.items(), key=lambda item: item[1].get('last_access', 0)):
+            if len(index) <= self.max_entries and self._total_size <= self.max_size_bytes:
+                break
+            self._remove_entry(key)
+            evicted += 1
+
+        logger.info(f"{self.name}淘汰 {evicted} 个条目，当前占用 {self._total_size / 1024 / 1024:.1f}MB")
+
+    def _remove_unreferenced_objects(self):
+        """删除不再被任何条目引用的对象文件（清空存储时使用）"""
+        referenced = set()
+        for entry in self._load_index().values():
+            referenced.update(self._entry_paths(entry))
+
+        if not os.path.isdir(self.objects_dir):
+            return
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if path not in referenced:
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.debug(f"删除{self.name}对象失败 {path}: {e}")
+
+    def clear(self):
+        """清空存储"""
+        with self._store_lock:
+            self._index = {}
+            self._object_refs, self._object_sizes, self._total_size = {}, {}, 0
+            self._dirty = True
+            self._remove_unreferenced_objects()
+            self._save_index(force=True)
+
+    def flush(self):
+        """立即持久化索引"""
+        with self._store_lock:
+            if self._index is not None and self._dirty:
+                self._save_index(force=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        with self._store_lock:
+            index = self._load_index()
+            total_requests = self.hits + self.misses
+            return {
+                'entries': len(index),
+                'objects': len(self._object_refs),
+                'size_mb': self._total_size / 1024 / 1024,
+                'max_size_mb': self.max_size_bytes / 1024 / 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total_requests * 100) if total_requests > 0 else 0
+            }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频编码档位
+将 "draft" / "balanced" / "publish" 等命名档位映射为具体编码器的 preset/crf/tune/线程参数。
+启动时检测 ffmpeg 可用的编码器（硬件编码器会实际试编码确认可用），
+中间临时文件统一使用快速档位，只有最终输出才使用高质量档位。
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from src.utils.ffmpeg_runner import find_ffmpeg, get_ffmpeg_runner, run_ffmpeg_sync
+from src.utils.logger import logger
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """编码档位"""
+    name: str
+    description: str
+    preset: str  # x264/x265 preset
+    crf: int  # x264 CRF，x265 在此基础上 +4 获得相近画质
+    nvenc_preset: str  # NVENC p1(最快)~p7(最好)
+    qsv_preset: str
+    videotoolbox_quality: int  # VideoToolbox -q:v，1~100，越大越好
+    tune: Optional[str] = None
+    threads: int = 0  # 0 表示由 ffmpeg 自动决定
+    audio_bitrate: str = "192k"
+    encode_time_factor: float = 4.0  # 每秒输出在慢速机器上预计的最长编码耗时（秒），用于计算超时
+
+
+ENCODER_PROFILES: Dict[str, EncoderProfile] = {
+    # 中间临时文件：后面还会再编码一次，用最快的预设配合较低的CRF，避免画质逐代损失
+    'intermediate': EncoderProfile(
+        name='intermediate', description='中间文件（最快，近无损）',
+        preset='veryfast', crf=18, nvenc_preset='p1', qsv_preset='veryfast', videotoolbox_quality=75,
+        encode_time_factor=2.0
+    ),
+    'draft': EncoderProfile(
+        name='draft', description='草稿预览（速度优先）',
+        preset='veryfast', crf=26, nvenc_preset='p2', qsv_preset='veryfast', videotoolbox_quality=50,
+        audio_bitrate='128k', encode_time_factor=2.0
+    ),
+    'balanced': EncoderProfile(
+        name='balanced', description='均衡（默认）',
+        preset='medium', crf=23, nvenc_preset='p4', qsv_preset='medium', videotoolbox_quality=60
+    ),
+    'publish': EncoderProfile(
+        name='publish', description='发布（画质优先）',
+        preset='slow', crf=20, nvenc_preset='p6', qsv_preset='slower', videotoolbox_quality=70,
+        audio_bitrate='256k', encode_time_factor=10.0
+    ),
+}
+
+DEFAULT_PROFILE = 'balanced'
+INTERMEDIATE_PROFILE = 'intermediate'
+
+# 界面上的“视频质量”选项与编码档位的对应关系
+QUALITY_LABEL_PROFILES = {
+    '高质量': 'publish',
+    '标准质量': 'balanced',
+    '压缩质量': 'draft',
+}
+
+# 各编码格式的候选编码器，按优先级排列（软件编码器画质最稳定，排在硬件编码器之前）
+_SOFTWARE_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+_HARDWARE_ENCODERS = {
+    'h264': ['h264_nvenc', 'h264_qsv', 'h264_videotoolbox', 'h264_amf'],
+    'hevc': ['hevc_nvenc', 'hevc_qsv', 'hevc_videotoolbox', 'hevc_amf'],
+}
+_CODEC_ALIASES = {'h264': 'h264', 'avc': 'h264', 'libx264': 'h264',
+                  'h265': 'hevc', 'hevc': 'hevc', 'libx265': 'hevc'}
+
+_detected: Dict[str, Set[str]] = {}
+_detect_lock = threading.Lock()
+
+
+def get_encoder_profile(name: Optional[str]) -> EncoderProfile:
+    """按名称获取编码档位，未知名称回退到默认档位"""
+    profile = ENCODER_PROFILES.get((name or DEFAULT_PROFILE).lower())
+    if profile is None:
+        logger.warning(f"未知的编码档位: {name}，使用 {DEFAULT_PROFILE}")
+        profile = ENCODER_PROFILES[DEFAULT_PROFILE]
+    return profile
+
+
+def profile_name_for_quality(label: Optional[str]) -> str:
+    """将界面质量选项（或档位名）转换为编码档位名"""
+    if label in ENCODER_PROFILES:
+        return label
+    return QUALITY_LABEL_PROFILES.get(label or '', DEFAULT_PROFILE)
+
+
+def _probe_hardware_encoder(ffmpeg_path: str, encoder: str) -> bool:
+    """硬件编码器编译进了 ffmpeg 不代表有可用的显卡/驱动，试编码几帧确认"""
+    result = run_ffmpeg_sync([
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'color=c=black:s=256x256:d=0.2',
+        '-frames:v', '3', '-c:v', encoder, '-f', 'null', '-'
+    ], timeout=15, use_budget=False)
+    return result.success
+
+
+def detect_encoders(ffmpeg_path: Optional[str] = None) -> Set[str]:
+    """检测 ffmpeg 可用的视频编码器（每个 ffmpeg 路径只检测一次）"""
+    ffmpeg_path = ffmpeg_path or find_ffmpeg()
+    with _detect_lock:
+        cached = _detected.get(ffmpeg_path)
+        if cached is not None:
+            return cached
+
+        available: Set[str] = set()
+        result = run_ffmpeg_sync([ffmpeg_path, '-hide_banner', '-encoders'], timeout=15, capture_stdout=True)
+        if result.success:
+            candidates = set(_SOFTWARE_ENCODERS.values())
+            for encoders in _HARDWARE_ENCODERS.values():
+                candidates.update(encoders)
+            listed = set()
+            for line in result.stdout_text.splitlines():
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].startswith('V') and parts[1] in candidates:
+                    listed.add(parts[1])
+            for encoder in listed:
+                if encoder in _SOFTWARE_ENCODERS.values() or _probe_hardware_encoder(ffmpeg_path, encoder):
+                    available.add(encoder)
+            logger.info(f"可用视频编码器: {', '.join(sorted(available)) or '无'}")
+        else:
+            logger.warning(f"检测ffmpeg编码器失败: {result.error_message}")
+
+        _detected[ffmpeg_path] = available
+        return available
+
+
+def select_video_encoder(codec: str = 'h264', ffmpeg_path: Optional[str] = None,
+                         prefer_hardware: bool = False) -> str:
+    """为指定编码格式选择编码器"""
+    family = _CODEC_ALIASES.get((codec or 'h264').lower(), 'h264')
+    available = detect_encoders(ffmpeg_path)
+    software = _SOFTWARE_ENCODERS[family]
+    hardware = [encoder for encoder in _HARDWARE_ENCODERS[family] if encoder in available]
+
+    if prefer_hardware and hardware:
+        return hardware[0]
+    if software in available:
+        return software
+    if hardware:
+        return hardware[0]
+    if family == 'hevc':
+        # 没有可用的 HEVC 编码器时退回 H.264
+        return select_video_encoder('h264', ffmpeg_path, prefer_hardware)
+    # 检测失败（例如 ffmpeg 版本过旧）时按常规构建处理
+    return software
+
+
+def _auto_threads(profile: EncoderProfile) -> int:
+    """多个 ffmpeg 并行时平分CPU，避免线程数超额订阅"""
+    if profile.threads:
+        return profile.threads
+    limit = get_ffmpeg_runner().get_status()['max_concurrent']
+    if limit <= 1:
+        return 0
+    return max(1, (os.cpu_count() or 2) // limit)
+
+
+def build_video_encode_args(profile: EncoderProfile, codec: str = 'h264',
+                            ffmpeg_path: Optional[str] = None,
+                            prefer_hardware: bool = False) -> List[str]:
+    """生成视频编码参数（-c:v 及其质量/速度参数，以及 yuv420p 像素格式）"""
+    encoder = select_video_encoder(codec, ffmpeg_path, prefer_hardware)
+    args = ['-c:v', encoder]
+
+    if encoder in ('libx264', 'libx265'):
+        crf = profile.crf + (4 if encoder == 'libx265' else 0)
+        args += ['-preset', profile.preset, '-crf', str(crf)]
+        if profile.tune:
+            args += ['-tune', profile.tune]
+        threads = _auto_threads(profile)
+        if threads:
+            args += ['-threads', str(threads)]
+        if encoder == 'libx265':
+            args += ['-tag:v', 'hvc1']  # 兼容 Apple 播放器
+    elif encoder.endswith('_nvenc'):
+        args += ['-preset', profile.nvenc_preset, '-rc', 'vbr', '-cq', str(profile.crf), '-b:v', '0']
+    elif encoder.endswith('_qsv'):
+        args += ['-preset', profile.qsv_preset, '-global_quality', str(profile.crf)]
+    elif encoder.endswith('_videotoolbox'):
+        args += ['-q:v', str(profile.videotoolbox_quality)]
+    elif encoder.endswith('_amf'):
+        args += ['-rc', 'cqp', '-qp_i', str(profile.crf), '-qp_p', str(profile.crf)]
+
+    args += ['-pix_fmt', 'yuv420p']
+    return args
+
+
+def encode_timeout(profile: EncoderProfile, duration: float, minimum: float = 60.0) -> float:
+    """按输出时长和档位估算编码超时：固定启动余量加上每秒输出的最长编码耗时"""
+    return max(minimum, 30.0 + max(0.0, duration) * profile.encode_time_factor)
+
+
+def build_audio_encode_args(profile: EncoderProfile) -> List[str]:
+    """生成AAC音频编码参数"""
+    return ['-c:a', 'aac', '-b:a', profile.audio_bitrate]
+
+
+def warm_up_encoder_detection(ffmpeg_path: Optional[str] = None):
+    """在后台线程中预先检测编码器，避免首次合成时等待"""
+    threading.Thread(target=detect_encoders, args=(ffmpeg_path,), daemon=True,
+                     name="EncoderDetection").start()
+
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FFmpeg/FFprobe 统一执行器
+所有 ffmpeg/ffprobe 调用都通过这里执行：
+- 提供异步和同步两套接口
+- 通过 -progress pipe:1 解析真实的百分比进度
+- stderr 只保留开头和结尾若干行，不再整体缓存在内存中
+- 支持中途取消（结束整个进程组）和超时
+- 编码类任务受全局并发预算限制，避免同时启动过多 ffmpeg 占满CPU
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.utils.admission_controller import FairSemaphore
+from src.utils.logger import logger
+
+
+# stderr 保留的行数：开头保留输入流信息（Duration、Stream等），结尾保留错误信息
+STDERR_HEAD_LINES = 64
+STDERR_TAIL_LINES = 200
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+def decode_output(output_bytes: bytes) -> str:
+    """解码子进程输出，依次尝试常见编码"""
+    if not output_bytes:
+        return ""
+    for encoding in ['utf-8', 'gbk', 'cp1252', 'latin1']:
+        try:
+            return output_bytes.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return output_bytes.decode('utf-8', errors='ignore')
+
+
+_ffmpeg_path: Optional[str] = None
+
+
+def find_ffmpeg() -> str:
+    """查找可用的 ffmpeg 可执行文件（结果缓存）"""
+    global _ffmpeg_path
+    if _ffmpeg_path:
+        return _ffmpeg_path
+
+    possible_paths = [
+        "ffmpeg/bin/ffmpeg.exe",  # 本地安装目录
+        "./ffmpeg/bin/ffmpeg.exe",  # 本地目录
+        "ffmpeg",  # 系统PATH中
+        "ffmpeg.exe",  # Windows
+        "/usr/bin/ffmpeg",  # Linux
+        "/usr/local/bin/ffmpeg",  # macOS
+    ]
+    for path in possible_paths:
+        if run_ffmpeg_sync([path, "-version"], timeout=5).success:
+            logger.info(f"找到FFmpeg: {path}")
+            _ffmpeg_path = path
+            return path
+
+    logger.warning("未找到FFmpeg，某些功能可能不可用")
+    return "ffmpeg"  # 默认值（不缓存，安装后可重新查找）
+
+
+def ffprobe_path_for(ffmpeg_path: str) -> str:
+    """根据 ffmpeg 路径推导同目录下的 ffprobe 路径"""
+    directory, name = os.path.split(ffmpeg_path)
+    probe_name = name.replace('ffmpeg', 'ffprobe') if 'ffmpeg' in name else 'ffprobe'
+    probe_path = os.path.join(directory, probe_name) if directory else probe_name
+    if directory and not os.path.exists(probe_path):
+        return shutil.which('ffprobe') or probe_path
+    return probe_path
+
+
+def _parse_time(value: str) -> Optional[float]:
+    """解析 HH:MM:SS.xx 或纯秒数"""
+    try:
+        if ':' in value:
+            hours, minutes, seconds = value.split(':')
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _output_duration_from_args(cmd: Sequence[str]) -> Optional[float]:
+    """从命令中的 -t 参数推断输出时长"""
+    for i, arg in enumerate(cmd[:-1]):
+        if arg == '-t':
+            return _parse_time(cmd[i + 1])
+    return None
+
+
+class FFmpegCancelToken:
+    """取消令牌：可以在任意线程调用 cancel()，立即结束正在运行的 ffmpeg 进程组"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"取消ffmpeg进程时出错: {e}")
+
+    def reset(self):
+        """重置为未取消状态，以便复用"""
+        self._event.clear()
+
+    def _register(self, callback: Callable[[], None]):
+        with self._lock:
+            self._callbacks.append(callback)
+            already_cancelled = self._event.is_set()
+        if already_cancelled:
+            callback()
+
+    def _unregister(self, callback: Callable[[], None]):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+
+@dataclass
+class FFmpegResult:
+    """ffmpeg/ffprobe 执行结果"""
+    returncode: int
+    stdout: bytes = b""
+    stderr_head: List[str] = field(default_factory=list)
+    stderr_tail: List[str] = field(default_factory=list)
+    stderr_dropped: int = 0
+    elapsed: float = 0.0
+    cancelled: bool = False
+    timed_out: bool = False
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.cancelled and not self.timed_out
+
+    @property
+    def stdout_text(self) -> str:
+        return decode_output(self.stdout)
+
+    @property
+    def stderr(self) -> str:
+        """保留的 stderr 文本（开头 + 结尾，中间省略部分以一行说明代替）"""
+        lines = list(self.stderr_head)
+        if self.stderr_dropped:
+            lines.append(f"... 省略 {self.stderr_dropped} 行 ...")
+        lines.extend(self.stderr_tail)
+        return '\n'.join(lines)
+
+    @property
+    def error_message(self) -> str:
+        """适合写入日志的简短错误信息"""
+        if self.cancelled:
+            return "已取消"
+        if self.timed_out:
+            return "执行超时"
+        tail = [line for line in self.stderr_tail if line.strip()] or [line for line in self.stderr_head if line.strip()]
+        return '\n'.join(tail[-10:]) or f"返回码 {self.returncode}"
+
+
+class _StderrBuffer:
+    """按行保存 stderr 的开头和结尾"""
+
+    def __init__(self):
+        self.head: List[str] = []
+        self.tail: deque = deque(maxlen=STDERR_TAIL_LINES)
+        self.total = 0
+        self.input_duration: Optional[float] = None
+        self._partial = b""
+
+    def feed(self, chunk: bytes):
+        # ffmpeg 的统计行以 \r 刷新，按 \r 和 \n 都视为换行
+        data = (self._partial + chunk).replace(b'\r', b'\n')
+        parts = data.split(b'\n')
+        self._partial = parts.pop()
+        for part in parts:
+            if part:
+                self._add(decode_output(part))
+
+    def close(self):
+        if self._partial:
+            self._add(decode_output(self._partial))
+            self._partial = b""
+
+    def _add(self, line: str):
+        self.total += 1
+        if len(self.head) < STDERR_HEAD_LINES:
+            self.head.append(line)
+            if self.input_duration is None:
+                match = _DURATION_RE.search(line)
+                if match:
+                    self.input_duration = (int(match.group(1)) * 3600 + int(match.group(2)) * 60 +
+                                           float(match.group(3)))
+        else:
+            self.tail.append(line)
+
+    @property
+    def dropped(self) -> int:
+        return max(0, self.total - len(self.head) - len(self.tail))
+
+
+class FFmpegRunner:
+    """ffmpeg 执行器（全局单例，并发预算在所有线程和事件循环之间共享）"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if max_concurrent is None:
+            # ffmpeg 编码本身是多线程的，同时运行的编码进程约为CPU核数的一半即可
+            max_concurrent = max(1, min(4, (os.cpu_count() or 2) // 2))
+        self._budget = FairSemaphore(max_concurrent, "ffmpeg")
+        self._sync_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+        # 统计信息
+        self.total_runs = 0
+        self.failed_runs = 0
+        self.cancelled_runs = 0
+
+    # ------------------------------------------------------------------
+    # 并发预算
+    # ------------------------------------------------------------------
+
+    def set_max_concurrent(self, value: int):
+        """调整同时运行的 ffmpeg 编码进程上限"""
+        self._budget.set_limit(max(1, value))
+        logger.info(f"ffmpeg 并发上限已调整为 {max(1, value)}")
+
+    @staticmethod
+    def _is_light(cmd: Sequence[str]) -> bool:
+        """ffprobe 和 -version 之类的查询命令不占用编码并发预算"""
+        executable = os.path.basename(str(cmd[0])).lower()
+        return executable.startswith('ffprobe') or '-version' in cmd or '-encoders' in cmd
+
+    # ------------------------------------------------------------------
+    # 异步接口
+    # ------------------------------------------------------------------
+
+    async def run(self, cmd: Sequence[str],
+                  timeout: Optional[float] = None,
+                  progress_callback: Optional[Callable[[float], None]] = None,
+                  total_duration: Optional[float] = None,
+                  cancel_token: Optional[FFmpegCancelToken] = None,
+                  capture_stdout: bool = False,
+                  use_budget: Optional[bool] = None,
+                  env: Optional[Dict[str, str]] = None) -> FFmpegResult:
+        """执行 ffmpeg/ffprobe 命令
+
+        Args:
+            cmd: 完整命令（第一个元素为可执行文件）
+            timeout: 超时时间（秒，不含排队等待时间），None表示不限制
+            progress_callback: 进度回调，参数为0~1之间的比例；需要能确定输出时长
+            total_duration: 输出时长（秒），未提供时从 -t 参数或输入的 Duration 推断
+            cancel_token: 取消令牌
+            capture_stdout: 是否保留标准输出（ffprobe 的 JSON 等），与进度解析互斥
+            use_budget: 是否占用全局并发预算，None表示查询命令不占用、其余占用
+            env: 子进程环境变量，None表示继承当前进程
+        """
+        cmd = [str(arg) for arg in cmd]
+        if use_budget is None:
+            use_budget = not self._is_light(cmd)
+        with_progress = progress_callback is not None and not capture_stdout
+        if with_progress:
+            cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + cmd[1:]
+        if total_duration is None:
+            total_duration = _output_duration_from_args(cmd)
+
+        if cancel_token and cancel_token.cancelled:
+            return FFmpegResult(returncode=-1, cancelled=True)
+
+        if use_budget and not await self._budget.acquire():
+            return FFmpegResult(returncode=-1, cancelled=True)
+        try:
+            return await self._run_process(cmd, timeout, progress_callback if with_progress else None,
+                                           total_duration, cancel_token, capture_stdout, env)
+        finally:
+            if use_budget:
+                self._budget.release()
+
+    async def _run_process(self, cmd: List[str], timeout: Optional[float],
+                           progress_callback: Optional[Callable[[float], None]],
+                           total_duration: Optional[float],
+                           cancel_token: Optional[FFmpegCancelToken],
+                           capture_stdout: bool,
+                           env: Optional[Dict[str, str]] = None) -> FFmpegResult:
+        start_time = time.time()
+        self.total_runs += 1
+
+        kwargs = {}
+        if sys.platform == 'win32':
+            kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP | getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        else:
+            kwargs['start_new_session'] = True
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                **kwargs
+            )
+        except (FileNotFoundError, OSError) as e:
+            # 查找可执行文件时会依次尝试多个路径，-version 探测失败不算错误
+            log = logger.debug if '-version' in cmd else logger.error
+            log(f"无法启动 {os.path.basename(cmd[0])}: {e}")
+            self.failed_runs += 1
+            return FFmpegResult(returncode=-1, stderr_tail=[str(e)], elapsed=time.time() - start_time)
+
+        stderr_buffer = _StderrBuffer()
+        stdout_chunks: List[bytes] = []
+        killed = threading.Event()
+
+        def kill():
+            killed.set()
+            _kill_process_group(process)
+
+        if cancel_token:
+            cancel_token._register(kill)
+
+        async def read_stderr():
+            while True:
+                chunk = await process.stderr.read(8192)
+                if not chunk:
+                    break
+                stderr_buffer.feed(chunk)
+            stderr_buffer.close()
+
+        async def read_stdout():
+            if progress_callback is None:
+                while True:
+                    chunk = await process.stdout.read(65536)
+                    if not chunk:
+                        break
+                    if capture_stdout:
+                        stdout_chunks.append(chunk)
+                return
+            last_reported = -1.0
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                key, _, value = decode_output(line).strip().partition('=')
+                if key in ('out_time_us', 'out_time_ms'):
+                    # 两个字段的单位实际上都是微秒
+                    duration = total_duration or stderr_buffer.input_duration
+                    try:
+                        out_seconds = int(value) / 1_000_000
+                    except ValueError:
+                        continue
+                    if duration and duration > 0:
+                        fraction = min(1.0, max(0.0, out_seconds / duration))
+                        if fraction - last_reported >= 0.01:
+                            last_reported = fraction
+                            _safe_callback(progress_callback, fraction)
+                elif key == 'progress' and value == 'end':
+                    _safe_callback(progress_callback, 1.0)
+
+        timed_out = False
+        try:
+            io_task = asyncio.gather(read_stderr(), read_stdout(), process.wait())
+            try:
+                await asyncio.wait_for(asyncio.shield(io_task), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                logger.warning(f"{os.path.basename(cmd[0])} 执行超时（{timeout}s），终止进程")
+                kill()
+                await io_task
+        except asyncio.CancelledError:
+            kill()
+            raise
+        finally:
+            if cancel_token:
+                cancel_token._unregister(kill)
+
+        result = FFmpegResult(
+            returncode=process.returncode if process.returncode is not None else -1,
+            stdout=b"".join(stdout_chunks),
+            stderr_head=stderr_buffer.head,
+            stderr_tail=list(stderr_buffer.tail),
+            stderr_dropped=stderr_buffer.dropped,
+            elapsed=time.time() - start_time,
+            cancelled=killed.is_set() and not timed_out,
+            timed_out=timed_out
+        )
+        if result.cancelled:
+            self.cancelled_runs += 1
+            logger.info(f"{os.path.basename(cmd[0])} 已取消")
+        elif not result.success:
+            self.failed_runs += 1
+        return result
+
+    # ------------------------------------------------------------------
+    # 同步接口
+    # ------------------------------------------------------------------
+
+    def run_sync(self, cmd: Sequence[str], **kwargs) -> FFmpegResult:
+        """同步执行（参数同 run），供GUI工作线程等同步代码调用"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run(cmd, **kwargs))
+
+        # 当前线程已有运行中的事件循环，不能嵌套 asyncio.run，换到辅助线程执行
+        with self._executor_lock:
+            if self._sync_executor is None:
+                self._sync_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="FFmpegSync")
+        return self._sync_executor.submit(asyncio.run, self.run(cmd, **kwargs)).result()
+
+    def get_status(self):
+        return {
+            'max_concurrent': self._budget.limit,
+            'running': self._budget.in_use,
+            'waiting': self._budget.waiting,
+            'total_runs': self.total_runs,
+            'failed_runs': self.failed_runs,
+            'cancelled_runs': self.cancelled_runs
+        }
+
+
+def _safe_callback(callback: Callable[[float], None], fraction: float):
+    try:
+        callback(fraction)
+    except Exception as e:
+        logger.debug(f"ffmpeg进度回调出错: {e}")
+
+
+def _kill_process_group(process):
+    """结束 ffmpeg 及其整个进程组"""
+    if process.returncode is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           capture_output=True, timeout=10)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except Exception as e:
+        logger.debug(f"结束ffmpeg进程组失败: {e}")
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+def get_ffmpeg_runner() -> FFmpegRunner:
+    """获取全局 ffmpeg 执行器"""
+    return FFmpegRunner()
+
+
+async def run_ffmpeg(cmd: Sequence[str], **kwargs) -> FFmpegResult:
+    """异步执行 ffmpeg/ffprobe 命令"""
+    return await get_ffmpeg_runner().run(cmd, **kwargs)
+
+
+def run_ffmpeg_sync(cmd: Sequence[str], **kwargs) -> FFmpegResult:
+    """同步执行 ffmpeg/ffprobe 命令"""
+    return get_ffmpeg_runner().run_sync(cmd, **kwargs)
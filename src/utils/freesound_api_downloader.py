@@ -14,18 +14,23 @@ from typing import List, Dict, Optional, Any
 import json
 import random
 
+from src.utils.admission_controller import RateLimiter
 from src.utils.logger import logger
 
+# Freesound API 限制每分钟60次请求，所有下载器实例共用
+_api_rate_limiter = RateLimiter(rate=1.0, burst=10, name="freesound")
+
 
 class FreesoundAPIDownloader:
     """Freesound API音效下载器"""
     
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, pool_size: int = 10):
         """
         初始化下载器
         
         Args:
             output_dir: 音效文件输出目录
+            pool_size: 连接池大小（多个线程共用同一个会话并发下载时使用）
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -48,6 +53,9 @@ class FreesoundAPIDownloader:
         # 会话对象
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # 🔧 删除简陋的映射表，改用智能翻译
         # 初始化翻译功能
@@ -94,13 +102,15 @@ class FreesoundAPIDownloader:
             self.is_baidu_configured = None
             self.llm_api = None
     
-    def search_and_download_shortest(self, query: str, filename: Optional[str] = None) -> Optional[str]:
+    def search_and_download_shortest(self, query: str, filename: Optional[str] = None,
+                                     search_query: Optional[str] = None) -> Optional[str]:
         """
         搜索并下载最短的音效
         
         Args:
             query: 搜索关键词
             filename: 自定义文件名
+            search_query: 已翻译好的英文搜索词（批量翻译时传入），为空时翻译query
             
         Returns:
             下载的文件路径，失败返回None
@@ -109,7 +119,7 @@ class FreesoundAPIDownloader:
             logger.info(f"使用Freesound API搜索音效: {query}")
             
             # 翻译中文关键词
-            search_query = self._translate_query(query)
+            search_query = search_query or self._translate_query(query)
             
             # 搜索音效
             sounds = self._search_sounds(search_query)
@@ -204,6 +214,43 @@ class FreesoundAPIDownloader:
         logger.warning(f"所有翻译方法都失败，使用原查询词: '{clean_query}'")
         return clean_query
 
+    def translate_queries(self, queries: List[str]) -> Dict[str, str]:
+        """批量翻译音效描述
+
+        先用本地中英关键词映射，剩余的中文描述合并为一次百度翻译请求；
+        仍未翻译的不出现在结果中，由 search_and_download_shortest 单独翻译
+
+        Returns:
+            {原描述: 英文搜索词}
+        """
+        from src.utils.sound_index import tokenize
+
+        translations: Dict[str, str] = {}
+        remaining = []
+        for query in queries:
+            clean_query = re.sub(r'[【】\[\]（）()]', '', query).strip()
+            if not any('\u4e00' <= char <= '\u9fff' for char in clean_query):
+                translations[query] = clean_query
+                continue
+            english = sorted(token for token in tokenize(clean_query) if token.isascii())
+            if english:
+                translations[query] = ' '.join(english[:3])
+            else:
+                remaining.append(query)
+
+        if remaining and self.is_baidu_configured and self.is_baidu_configured():
+            try:
+                from src.utils.baidu_translator import translate_texts
+
+                for query, translated in zip(remaining, translate_texts(remaining, 'zh', 'en')):
+                    if translated and translated.strip():
+                        translations[query] = self._extract_sound_keywords(translated)
+            except Exception as e:
+                logger.warning(f"批量翻译音效描述失败: {e}")
+
+        logger.info(f"批量翻译音效描述: {len(translations)}/{len(queries)} 条")
+        return translations
+
     def _extract_sound_keywords(self, text: str) -> str:
         """从翻译结果中提取音效关键词"""
         import re
@@ -244,7 +291,8 @@ class FreesoundAPIDownloader:
                 'filter': 'duration:[1 TO 15] samplerate:[22050 TO 48000]'  # 1-15秒，确保音质
             }
             
-            # 发送请求
+            # 发送请求（遵守API频率限制）
+            time.sleep(_api_rate_limiter.reserve())
             response = self.session.get(search_url, params=params, timeout=10)
             
             if response.status_code == 200:
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成图像内容寻址存储
+以规范化生成配置的稳定哈希为键持久化已生成的图像，跨运行、跨项目复用，
+并以写时复制（reflink）或复制的方式将结果放入项目目录，支持LRU与容量淘汰
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+from src.utils.logger import logger
+from src.utils.content_store import ContentAddressedStore, link_or_copy
+
+# 不影响图像内容、不参与缓存键计算的自定义参数
+_VOLATILE_PARAMS = {
+    'workflow_id', 'api_key', 'base_url', 'output_dir', 'force_regenerate',
+    'project_manager', 'current_project_name', 'shot_id', 'shot_index'
+}
+
+
+class GeneratedImageStore(ContentAddressedStore):
+    """生成图像内容寻址存储"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, store_dir: str = None, max_size_mb: int = 2048, max_entries: int = 5000):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if store_dir is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            project_root = os.path.dirname(os.path.dirname(current_dir))
+            store_dir = os.path.join(project_root, "temp", "generated_image_store")
+
+        super().__init__(store_dir, max_size_mb, max_entries, "图像存储")
+
+    # ------------------------------------------------------------------
+    # 键计算
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def is_cacheable(config) -> bool:
+        """只有固定种子的生成才可复用；种子为 -1/0/None 表示随机，每次都应得到新图像"""
+        data = config.to_dict() if hasattr(config, 'to_dict') else dict(config)
+        seed = data.get('seed')
+        try:
+            return seed is not None and int(seed) > 0
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def make_key(engine_name: str, config) -> str:
+        """根据引擎名和生成配置计算稳定的缓存键
+
+        Args:
+            engine_name: 引擎名称（如 EngineType.value）
+            config: GenerationConfig 或等价的字典
+        """
+        data = config.to_dict() if hasattr(config, 'to_dict') else dict(config)
+
+        custom_params = {
+            k: v for k, v in (data.get('custom_params') or {}).items()
+            if k not in _VOLATILE_PARAMS
+        }
+
+        normalized = {
+            'engine': engine_name,
+            'prompt': ' '.join(str(data.get('prompt') or '').split()),
+            'negative_prompt': ' '.join(str(data.get('negative_prompt') or '').split()),
+            'width': int(data.get('width') or 0),
+            'height': int(data.get('height') or 0),
+            'steps': data.get('steps'),
+            'cfg_scale': float(data.get('cfg_scale') or 0.0),
+            'seed': data.get('seed'),
+            'batch_size': int(data.get('batch_size') or 1),
+            'model': data.get('model') or 'default',
+            'style': data.get('style') or 'default',
+            'quality': data.get('quality') or 'standard',
+            'custom_params': custom_params
+        }
+
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # 查找与写入
+    # ------------------------------------------------------------------
+
+    def lookup(self, key: str) -> Optional[List[str]]:
+        """精确匹配查找，返回存储中的对象路径列表"""
+        entry = self._lookup_entry(key)
+        return self._entry_paths(entry) if entry else None
+
+    def put(self, key: str, image_paths: List[str], metadata: Dict[str, Any] = None) -> bool:
+        """将生成结果写入存储（相同内容只保存一份）"""
+        if not self.enabled or not image_paths:
+            return False
+
+        with self._store_lock:
+            try:
+                objects = []
+                for image_path in image_paths:
+                    if not image_path or not os.path.exists(image_path):
+                        return False
+                    ext = os.path.splitext(image_path)[1].lower() or '.png'
+                    objects.append(self._store_file(image_path, ext))
+                self._add_entry(key, objects, metadata)
+                return True
+
+            except Exception as e:
+                logger.warning(f"写入图像存储失败: {e}")
+                return False
+
+    def materialize(self, store_paths: List[str], target_dir: str,
+                    filenames: Optional[List[str]] = None) -> List[str]:
+        """将存储对象放入目标目录（通常是项目图像目录）
+
+        使用写时复制或普通复制而不是硬链接：引擎可能原地改写项目中的图像，
+        硬链接会把改动带进存储对象以及所有链接到它的项目
+        """
+        os.makedirs(target_dir, exist_ok=True)
+        result_paths = []
+        for i, store_path in enumerate(store_paths):
+            filename = filenames[i] if filenames and i < len(filenames) else os.path.basename(store_path)
+            target_path = os.path.join(target_dir, filename)
+
+            if os.path.exists(target_path):
+                os.remove(target_path)
+
+            method = link_or_copy(store_path, target_path, allow_hardlink=False)
+            logger.debug(f"图像存储命中，已{method}到: {target_path}")
+            result_paths.append(target_path)
+        return result_paths
+
+
+# 全局实例
+generated_image_store = GeneratedImageStore()
@@ -6,10 +6,11 @@
 """
 
 import os
+import json
 import shutil
 import hashlib
 import mimetypes
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
 import logging
 from urllib.parse import urljoin
@@ -22,17 +23,47 @@ import base64
 
 logger = logging.getLogger(__name__)
 
+# 各托管服务的URL有效期（秒），None表示服务不主动过期
+_SERVICE_TTL = {
+    'imgbb': 86400,
+    'postimages': None,
+    'imgur': None
+}
+
+
 class ImageUploadService:
-    """图片上传服务 - 提供本地图片的HTTP访问"""
+    """图片上传服务 - 提供本地图片的HTTP访问
+
+    上传结果按文件内容哈希持久化缓存（含过期时间），同一图片在多次运行之间只上传一次；
+    有过期时间的URL在临近过期前直接复用，不做HTTP校验，无过期时间的URL按较长间隔抽查
+    """
     
-    def __init__(self, upload_dir: str = "temp/uploaded_images", port: int = 8765):
+    # 本地服务器只提供这些扩展名的文件
+    SERVED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+    def __init__(self, upload_dir: str = "temp/uploaded_images", port: int = 8765,
+                 local_mode: bool = False):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        # 对外提供访问的图片单独放在子目录中，缓存索引等文件不在服务根目录下
+        self.serve_dir = self.upload_dir / "files"
+        self.serve_dir.mkdir(parents=True, exist_ok=True)
         self.port = port
         self.server = None
         self.server_thread = None
         self.base_url = f"http://localhost:{port}"
-        self._uploaded_files: Dict[str, str] = {}  # 文件路径 -> URL映射
+        # 本地模式：不上传到公共托管服务，由本机静态文件服务器提供访问（适用于本机可访问的引擎）
+        self.local_mode = local_mode
+
+        # 持久化的上传缓存：内容哈希 -> {url, service, uploaded_at, expires_at, verified_at}
+        self.cache_file = self.upload_dir / "url_cache.json"
+        self.expiry_margin = 3600  # 距过期不足该时间（秒）视为失效，重新上传
+        self.verify_interval = 24 * 3600  # 无过期时间的URL抽查间隔（秒）
+        self._cache_lock = threading.RLock()
+        self._uploaded_files: Dict[str, Dict[str, Any]] = self._load_url_cache()
+        self._hash_memo: Dict[Tuple[str, float, int], str] = {}
+        # 正在上传的内容哈希 -> [锁, 使用者数]，最后一个使用者释放时移除，避免无限增长
+        self._upload_locks: Dict[str, List[Any]] = {}
         
     def start_server(self):
         """启动HTTP服务器"""
@@ -53,11 +84,20 @@ class ImageUploadService:
                     return False
             
             # 创建HTTP服务器
-            upload_dir_abs = self.upload_dir.absolute()
+            serve_dir_abs = self.serve_dir.absolute()
+            served_extensions = self.SERVED_EXTENSIONS
 
             class CustomHandler(SimpleHTTPRequestHandler):
                 def __init__(self, *args, **kwargs):
-                    super().__init__(*args, directory=str(upload_dir_abs), **kwargs)
+                    super().__init__(*args, directory=str(serve_dir_abs), **kwargs)
+
+                def send_head(self):
+                    # 只提供图片文件，不列目录
+                    path = self.path.split('?', 1)[0].split('#', 1)[0]
+                    if path.endswith('/') or not path.lower().endswith(served_extensions):
+                        self.send_error(404, "File not found")
+                        return None
+                    return super().send_head()
                 
                 def log_message(self, format, *args):
                     # 禁用访问日志
@@ -96,6 +136,82 @@ class ImageUploadService:
         except Exception as e:
             logger.error(f"停止图片服务器失败: {e}")
     
+    def _load_url_cache(self) -> Dict[str, Dict[str, Any]]:
+        """加载持久化的上传缓存"""
+        try:
+            if self.cache_file.exists():
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.warning(f"加载图片上传缓存失败: {e}")
+        return {}
+
+    def _save_url_cache(self):
+        """原子写入上传缓存"""
+        try:
+            with self._cache_lock:
+                tmp_file = self.cache_file.with_suffix('.json.tmp')
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._uploaded_files, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"保存图片上传缓存失败: {e}")
+
+    def _get_cached_url(self, file_hash: str) -> Optional[str]:
+        """获取仍然有效的缓存URL；只有无过期时间且长时间未校验的URL才发起HTTP校验"""
+        with self._cache_lock:
+            entry = self._uploaded_files.get(file_hash)
+            if not entry:
+                return None
+            entry = dict(entry)
+
+        now = time.time()
+        expires_at = entry.get('expires_at')
+        if expires_at is not None:
+            if now < expires_at - self.expiry_margin:
+                return entry['url']
+            logger.debug(f"缓存的图片URL即将过期，重新上传: {entry['url']}")
+        elif now - entry.get('verified_at', 0) < self.verify_interval:
+            return entry['url']
+        elif self._verify_url_accessible(entry['url']):
+            with self._cache_lock:
+                if file_hash in self._uploaded_files:
+                    self._uploaded_files[file_hash]['verified_at'] = now
+            self._save_url_cache()
+            return entry['url']
+
+        with self._cache_lock:
+            self._uploaded_files.pop(file_hash, None)
+        self._save_url_cache()
+        return None
+
+    def _get_content_hash(self, image_path: str) -> str:
+        """内容哈希（按路径、修改时间和大小记忆，避免重复读文件）"""
+        stat = os.stat(image_path)
+        memo_key = (os.path.abspath(image_path), stat.st_mtime, stat.st_size)
+        with self._cache_lock:
+            cached = self._hash_memo.get(memo_key)
+        if cached is None:
+            cached = self._get_file_hash(image_path)
+            with self._cache_lock:
+                self._hash_memo[memo_key] = cached
+        return cached
+
+    def _serve_locally(self, image_path: str, file_hash: str) -> Optional[str]:
+        """本地模式：把图片以内容哈希命名放入服务目录并返回本地URL"""
+        if not self.start_server():
+            return None
+        filename = f"{file_hash}{Path(image_path).suffix.lower()}"
+        target = self.serve_dir / filename
+        if not target.exists():
+            tmp_target = self.serve_dir / f"{filename}.tmp"
+            try:
+                os.link(image_path, tmp_target)
+            except OSError:
+                shutil.copy2(image_path, tmp_target)
+            os.replace(tmp_target, target)
+        return f"{self.base_url}/{filename}"
+
     def upload_image(self, image_path: str) -> Optional[str]:
         """
         上传图片并返回可访问的URL
@@ -107,41 +223,71 @@ class ImageUploadService:
             图片的HTTP URL，失败返回None
         """
         try:
-            if not os.path.exists(image_path):
-                logger.error(f"图片文件不存在: {image_path}")
-                return None
-
             # 检查是否已经是URL
             if image_path.startswith(('http://', 'https://')):
                 return image_path
 
-            # 检查是否已经上传过
-            if image_path in self._uploaded_files:
-                url = self._uploaded_files[image_path]
-                # 验证URL是否仍然有效
-                if self._verify_url_accessible(url):
-                    return url
+            if not os.path.exists(image_path):
+                logger.error(f"图片文件不存在: {image_path}")
+                return None
 
             # 验证图片格式
             if not self._is_valid_image(image_path):
                 logger.error(f"不支持的图片格式: {image_path}")
                 return None
 
-            # 尝试上传到公共图片托管服务
-            url = self._upload_to_public_service(image_path)
+            file_hash = self._get_content_hash(image_path)
 
-            if url:
-                # 缓存映射
-                self._uploaded_files[image_path] = url
-                logger.info(f"图片上传成功: {image_path} -> {url}")
-                return url
-            else:
-                logger.error(f"图片上传失败: {image_path}")
-                return None
+            if self.local_mode:
+                return self._serve_locally(image_path, file_hash)
+
+            # 同一内容同时只上传一次，其他调用方等待后直接复用结果
+            with self._cache_lock:
+                lock_entry = self._upload_locks.setdefault(file_hash, [threading.Lock(), 0])
+                lock_entry[1] += 1
+
+            try:
+                with lock_entry[0]:
+                    return self._upload_with_cache(image_path, file_hash)
+            finally:
+                with self._cache_lock:
+                    lock_entry[1] -= 1
+                    if lock_entry[1] == 0:
+                        self._upload_locks.pop(file_hash, None)
 
         except Exception as e:
             logger.error(f"上传图片失败: {e}")
             return None
+
+    def _upload_with_cache(self, image_path: str, file_hash: str) -> Optional[str]:
+        """复用仍然有效的缓存URL，否则上传并记录（调用方须持有该内容的上传锁）"""
+        # 检查是否已经上传过（按内容哈希，跨运行有效）
+        url = self._get_cached_url(file_hash)
+        if url:
+            logger.debug(f"复用已上传的图片: {image_path} -> {url}")
+            return url
+
+        # 尝试上传到公共图片托管服务
+        url, service_name = self._upload_to_public_service(image_path)
+
+        if url:
+            now = time.time()
+            ttl = _SERVICE_TTL.get(service_name)
+            with self._cache_lock:
+                self._uploaded_files[file_hash] = {
+                    'url': url,
+                    'service': service_name,
+                    'uploaded_at': now,
+                    'verified_at': now,
+                    'expires_at': now + ttl if ttl else None,
+                    'size': os.path.getsize(image_path)
+                }
+            self._save_url_cache()
+            logger.info(f"图片上传成功: {image_path} -> {url}")
+            return url
+
+        logger.error(f"图片上传失败: {image_path}")
+        return None
     
     def cleanup_old_files(self, max_age_hours: int = 24):
         """清理旧的上传文件"""
@@ -149,22 +295,21 @@ class ImageUploadService:
             current_time = time.time()
             max_age_seconds = max_age_hours * 3600
             
-            for file_path in self.upload_dir.glob("*"):
+            for file_path in self.serve_dir.glob("*"):
                 if file_path.is_file():
                     file_age = current_time - file_path.stat().st_mtime
                     if file_age > max_age_seconds:
                         file_path.unlink()
                         logger.debug(f"清理旧文件: {file_path}")
             
-            # 清理缓存映射中的无效条目
-            invalid_keys = []
-            for key, url in self._uploaded_files.items():
-                filename = url.split('/')[-1]
-                if not (self.upload_dir / filename).exists():
-                    invalid_keys.append(key)
-            
-            for key in invalid_keys:
-                del self._uploaded_files[key]
+            # 清理上传缓存中已过期的条目
+            with self._cache_lock:
+                expired_keys = [key for key, entry in self._uploaded_files.items()
+                                if entry.get('expires_at') is not None and entry['expires_at'] <= current_time]
+                for key in expired_keys:
+                    del self._uploaded_files[key]
+            if expired_keys:
+                self._save_url_cache()
                 
         except Exception as e:
             logger.error(f"清理旧文件失败: {e}")
@@ -207,27 +352,27 @@ class ImageUploadService:
         except Exception:
             return False
 
-    def _upload_to_public_service(self, image_path: str) -> Optional[str]:
-        """上传图片到公共托管服务"""
+    def _upload_to_public_service(self, image_path: str) -> Tuple[Optional[str], str]:
+        """上传图片到公共托管服务，返回 (URL, 服务名)"""
         # 尝试多个免费图片托管服务
         services = [
-            self._upload_to_imgbb,
-            self._upload_to_postimages,
-            self._upload_to_imgur
+            ('imgbb', self._upload_to_imgbb),
+            ('postimages', self._upload_to_postimages),
+            ('imgur', self._upload_to_imgur)
         ]
 
-        for service in services:
+        for service_name, service in services:
             try:
                 url = service(image_path)
                 if url:
                     logger.info(f"图片上传成功，使用服务: {service.__name__}")
-                    return url
+                    return url, service_name
             except Exception as e:
                 logger.debug(f"服务 {service.__name__} 上传失败: {e}")
                 continue
 
         logger.error("所有图片托管服务都上传失败")
-        return None
+        return None, ''
 
     def _upload_to_imgbb(self, image_path: str) -> Optional[str]:
         """上传到ImgBB (免费图片托管)"""
@@ -242,7 +387,7 @@ class ImageUploadService:
             data = {
                 'key': '2d1f7b0e4c6c8b5a3f9d8e7c6b5a4f3d',  # 公共测试key
                 'image': image_data,
-                'expiration': 86400  # 24小时过期
+                'expiration': _SERVICE_TTL['imgbb']  # 24小时过期
             }
 
             response = requests.post(url, data=data, timeout=30)
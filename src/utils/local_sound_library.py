@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 本地音效库管理器
-管理本地音效文件，提供音效匹配和复制功能
+管理本地音效文件，提供音效匹配和复制功能；检索通过持久化的音效索引完成
 """
 
 import os
@@ -10,9 +10,9 @@ import re
 import shutil
 from pathlib import Path
 from typing import List, Dict, Optional
-import random
 
 from src.utils.logger import logger
+from src.utils.sound_index import SOUND_CATEGORY_KEYWORDS, SOUND_EXTENSIONS, SPECIFIC_MATCH_WEIGHT, sound_index
 
 
 class LocalSoundLibrary:
@@ -43,26 +43,20 @@ class LocalSoundLibrary:
         self.library_dir.mkdir(parents=True, exist_ok=True)
         
         # 音效分类映射
-        self.sound_categories = {
-            'doorbell': ['门铃', 'doorbell', 'bell', 'chime', 'ring'],
-            'footsteps': ['脚步', 'footsteps', 'walking', 'steps', 'walk'],
-            'rain': ['雨', 'rain', 'rainfall', 'water', 'drop'],
-            'phone': ['电话', 'phone', 'telephone', 'call', 'ring'],
-            'button': ['按键', 'button', 'click', 'key', 'press'],
-            'crowd': ['人群', 'crowd', 'people', 'talk', 'chatter'],
-            'ocean': ['海浪', 'ocean', 'wave', 'sea', 'water'],
-            'bird': ['鸟', 'bird', 'chirp', 'tweet', 'sing'],
-            'wind': ['风', 'wind', 'breeze', 'air', 'blow'],
-            'car': ['汽车', 'car', 'vehicle', 'engine', 'drive'],
-            'music': ['音乐', 'music', 'song', 'melody', 'tune']
-        }
-        
+        self.sound_categories = SOUND_CATEGORY_KEYWORDS
+
+        # 下载的音效保存在库中，之后的同类查询直接命中本地
+        self.downloaded_dir = self.library_dir / "downloaded"
+
         logger.info(f"本地音效库初始化完成")
         logger.info(f"输出目录: {self.sound_effects_dir}")
         logger.info(f"音效库目录: {self.library_dir}")
         
         # 创建示例音效库结构
         self._create_library_structure()
+
+        # 登记到音效索引（目录有变化时增量更新）
+        self.index = sound_index.add_root(str(self.library_dir))
     
     def _create_library_structure(self):
         """创建音效库目录结构"""
@@ -113,8 +107,8 @@ class LocalSoundLibrary:
             sound_files = self._find_matching_sounds(query)
             
             if sound_files:
-                # 随机选择一个音效文件
-                selected_file = random.choice(sound_files)
+                # 选择相关度最高的音效文件
+                selected_file = sound_files[0]
                 
                 # 生成目标文件名
                 if not filename:
@@ -124,7 +118,10 @@ class LocalSoundLibrary:
                     filename = f"{clean_query}_local{file_ext}"
                 
                 target_path = self.sound_effects_dir / filename
-                
+                if not selected_file.exists():
+                    logger.warning(f"索引中的音效文件已不存在: {selected_file}")
+                    return None
+
                 # 复制文件
                 shutil.copy2(selected_file, target_path)
                 
@@ -138,52 +135,62 @@ class LocalSoundLibrary:
             logger.error(f"搜索本地音效失败: {e}")
             return None
     
-    def _find_matching_sounds(self, query: str) -> List[Path]:
-        """查找匹配的音效文件"""
-        matching_files = []
-        
+    def _find_matching_sounds(self, query: str, limit: int = 10) -> List[Path]:
+        """查找匹配的音效文件，按相关度排序"""
         try:
-            # 清理查询词
-            clean_query = re.sub(r'[【】\[\]（）()]', '', query).lower()
-            
-            # 在所有分类中搜索
-            for category, keywords in self.sound_categories.items():
-                # 检查查询词是否匹配分类关键词
-                if any(keyword in clean_query for keyword in keywords):
-                    category_dir = self.library_dir / category
-                    if category_dir.exists():
-                        # 查找音频文件
-                        for ext in ['*.mp3', '*.wav', '*.ogg']:
-                            matching_files.extend(category_dir.glob(ext))
-            
-            # 如果没有找到分类匹配，在所有文件中搜索文件名匹配
-            if not matching_files:
-                for category_dir in self.library_dir.iterdir():
-                    if category_dir.is_dir():
-                        for audio_file in category_dir.glob('*'):
-                            if (audio_file.suffix.lower() in ['.mp3', '.wav', '.ogg'] and
-                                any(keyword in audio_file.stem.lower() for keyword in clean_query.split())):
-                                matching_files.append(audio_file)
-            
-            logger.info(f"找到 {len(matching_files)} 个匹配的音效文件")
-            return matching_files
+            # 只命中分类关键词的结果不算匹配，交给在线下载
+            results = self.index.search(query, limit=limit, min_match_weight=SPECIFIC_MATCH_WEIGHT)
+            logger.info(f"找到 {len(results)} 个匹配的音效文件")
+            return [Path(result['path']) for result in results]
             
         except Exception as e:
             logger.error(f"查找匹配音效失败: {e}")
             return []
+
+    def find_best_sound(self, query: str) -> Optional[str]:
+        """返回相关度最高且仍存在的音效文件路径"""
+        for sound_file in self._find_matching_sounds(query, limit=3):
+            if sound_file.exists():
+                return str(sound_file)
+        return None
+
+    def add_downloaded_sound(self, file_path: str, query: str) -> Optional[str]:
+        """把下载的音效收入本地库并以查询词为标签建立索引
+
+        Returns:
+            库中的文件路径，失败返回None
+        """
+        try:
+            from src.utils.content_store import link_or_copy
+
+            source = Path(file_path)
+            if not source.exists() or source.suffix.lower() not in SOUND_EXTENSIONS:
+                return None
+            clean_query = re.sub(r'[^\w\s\u4e00-\u9fff]', '', query)
+            clean_query = re.sub(r'\s+', '_', clean_query).strip('_') or source.stem
+            self.downloaded_dir.mkdir(parents=True, exist_ok=True)
+            target = self.downloaded_dir / f"{clean_query}{source.suffix.lower()}"
+            if not target.exists():
+                link_or_copy(str(source), str(target))
+            self.index.remember_query(query, str(target))
+            logger.info(f"下载的音效已收入本地库: {target}")
+            return str(target)
+
+        except Exception as e:
+            logger.warning(f"收录下载音效失败: {e}")
+            return None
     
     def list_available_sounds(self) -> Dict[str, List[str]]:
         """列出可用的音效文件"""
         available_sounds = {}
         
         try:
+            for entry in self.index.get_entries():
+                if Path(entry['path']).parent.parent != Path(os.path.abspath(self.library_dir)):
+                    continue
+                available_sounds.setdefault(entry['category'], []).append(Path(entry['path']).name)
             for category in self.sound_categories.keys():
-                category_dir = self.library_dir / category
-                if category_dir.exists():
-                    sound_files = []
-                    for ext in ['*.mp3', '*.wav', '*.ogg']:
-                        sound_files.extend([f.name for f in category_dir.glob(ext)])
-                    available_sounds[category] = sound_files
+                available_sounds.setdefault(category, [])
             
             return available_sounds
             
@@ -196,19 +203,9 @@ class LocalSoundLibrary:
         status = {}
         
         try:
-            total_files = 0
-            for category in self.sound_categories.keys():
-                category_dir = self.library_dir / category
-                if category_dir.exists():
-                    count = 0
-                    for ext in ['*.mp3', '*.wav', '*.ogg']:
-                        count += len(list(category_dir.glob(ext)))
-                    status[category] = count
-                    total_files += count
-                else:
-                    status[category] = 0
-            
-            status['total'] = total_files
+            for category, files in self.list_available_sounds().items():
+                status[category] = len(files)
+            status['total'] = sum(status.values())
             return status
             
         except Exception as e:
@@ -8,9 +8,11 @@ Pixabay音效下载器
 import os
 import re
 import time
+import shutil
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 
@@ -418,26 +420,11 @@ class PixabaySoundDownloader:
             下载的文件路径，失败返回None
         """
         try:
-            # 🔧 修复：优先使用Freesound API，然后本地音效库，最后生成音效
+            # 优先使用本地音效库（索引检索，不访问网络），然后Freesound API，最后生成音效
             logger.info(f"尝试获取音效: {query}")
 
-            # 方案1：尝试使用Freesound API下载真实音效
-            try:
-                from src.utils.freesound_api_downloader import FreesoundAPIDownloader
-
-                freesound_downloader = FreesoundAPIDownloader(str(self.output_dir))
-                freesound_path = freesound_downloader.search_and_download_shortest(query, filename)
-
-                if freesound_path:
-                    logger.info(f"成功从Freesound下载音效: {freesound_path}")
-                    return freesound_path
-                else:
-                    logger.info("Freesound API下载失败，尝试本地音效库")
-
-            except Exception as e:
-                logger.warning(f"Freesound API下载失败: {e}")
-
-            # 方案2：尝试使用本地音效库
+            # 方案1：尝试使用本地音效库
+            local_library = None
             try:
                 from src.utils.local_sound_library import LocalSoundLibrary
 
@@ -448,11 +435,30 @@ class PixabaySoundDownloader:
                     logger.info(f"成功使用本地音效: {local_path}")
                     return local_path
                 else:
-                    logger.info("本地音效库中未找到匹配音效")
+                    logger.info("本地音效库中未找到匹配音效，尝试Freesound API")
 
             except Exception as e:
                 logger.warning(f"本地音效库访问失败: {e}")
 
+            # 方案2：尝试使用Freesound API下载真实音效
+            try:
+                from src.utils.freesound_api_downloader import FreesoundAPIDownloader
+
+                freesound_downloader = FreesoundAPIDownloader(str(self.output_dir))
+                freesound_path = freesound_downloader.search_and_download_shortest(query, filename)
+
+                if freesound_path:
+                    logger.info(f"成功从Freesound下载音效: {freesound_path}")
+                    # 收入本地库，之后相同的音效描述不再访问网络
+                    if local_library:
+                        local_library.add_downloaded_sound(freesound_path, query)
+                    return freesound_path
+                else:
+                    logger.info("Freesound API下载失败")
+
+            except Exception as e:
+                logger.warning(f"Freesound API下载失败: {e}")
+
             # 方案3：生成本地音效作为备用
             logger.info("使用本地音效生成作为备用方案")
             return self._generate_local_sound_effect(query, filename)
@@ -462,6 +468,103 @@ class PixabaySoundDownloader:
             # 最后的备用方案
             return self._generate_local_sound_effect(query, filename)
 
+    def search_and_download_batch(self, cues: List[Dict], max_workers: int = 6,
+                                  on_result: Optional[Callable[[int, Dict, Optional[str]], None]] = None,
+                                  should_stop: Optional[Callable[[], bool]] = None) -> List[Optional[str]]:
+        """
+        批量获取整个分镜的音效
+
+        相同的音效描述只获取一次；之前获取过的描述和本地音效库能匹配的直接使用，
+        其余描述批量翻译后由有限大小的线程池共用一个HTTP会话并发搜索下载
+
+        Args:
+            cues: [{'query': 音效描述, 'filename': 输出文件名}, ...]
+            max_workers: 同时下载的数量
+            on_result: 每条音效就绪时回调 (序号, cue, 文件路径或None)，按完成顺序在调用线程中调用
+            should_stop: 返回True时不再开始新的下载
+
+        Returns:
+            与cues顺序一致的文件路径列表，失败的条目为None
+        """
+        from src.utils.local_sound_library import LocalSoundLibrary
+        from src.utils.sound_index import sound_index
+
+        results: List[Optional[str]] = [None] * len(cues)
+
+        # 相同描述的音效只获取一次
+        groups: Dict[str, List[int]] = {}
+        for i, cue in enumerate(cues):
+            key = sound_index.normalize_query(cue.get('query', ''))
+            if key:
+                groups.setdefault(key, []).append(i)
+            elif on_result:
+                on_result(i, cue, None)
+        logger.info(f"批量获取音效: {len(cues)} 条，去重后 {len(groups)} 条")
+
+        def deliver(indexes: List[int], source: Optional[str], fallback: bool = True):
+            for i in indexes:
+                cue = cues[i]
+                path = None
+                try:
+                    if source:
+                        target = self.sound_effects_dir / cue['filename'] if cue.get('filename') else Path(source)
+                        if Path(source) != target:
+                            shutil.copy2(source, target)
+                        path = str(target)
+                    elif fallback:
+                        path = self._generate_local_sound_effect(cue['query'], cue.get('filename'))
+                except Exception as e:
+                    logger.error(f"保存音效失败 {cue.get('filename')}: {e}")
+                results[i] = path
+                if on_result:
+                    on_result(i, cue, path)
+
+        # 之前获取过的描述与本地音效库（不访问网络）
+        library = LocalSoundLibrary(str(self.output_dir))
+        pending: Dict[str, List[int]] = {}
+        for key, indexes in groups.items():
+            query = cues[indexes[0]]['query']
+            cached = sound_index.lookup_query(query)
+            if not cached:
+                cached = library.find_best_sound(query)
+            if cached:
+                logger.info(f"使用本地音效: {query} -> {cached}")
+                deliver(indexes, cached)
+            else:
+                pending[key] = indexes
+
+        if not pending:
+            return results
+
+        from src.utils.freesound_api_downloader import FreesoundAPIDownloader
+
+        freesound = FreesoundAPIDownloader(str(self.output_dir), pool_size=max_workers)
+        queries = {key: cues[indexes[0]]['query'] for key, indexes in pending.items()}
+        translations = freesound.translate_queries(list(queries.values()))
+
+        def fetch(query: str) -> Optional[str]:
+            if should_stop and should_stop():
+                return None
+            path = freesound.search_and_download_shortest(query, search_query=translations.get(query))
+            if path:
+                # 收入本地库并记录描述，之后相同的描述不再访问网络
+                path = library.add_downloaded_sound(path, query) or path
+            return path
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="sfx_fetch") as executor:
+            futures = {executor.submit(fetch, query): key for key, query in queries.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    path = future.result()
+                except Exception as e:
+                    logger.error(f"获取音效失败 {queries[key]}: {e}")
+                    path = None
+                stopped = bool(should_stop and should_stop())
+                deliver(pending[key], path, fallback=not stopped)
+
+        return results
+
     def _generate_local_sound_effect(self, query: str, filename: Optional[str] = None) -> Optional[str]:
         """生成本地音效文件（备用方案）"""
         try:
@@ -4,10 +4,10 @@
 """
 
 import os
-import struct
 from typing import Optional
 from pathlib import Path
 
+from src.utils.audio_header_duration import read_audio_duration, read_audio_durations
 from src.utils.logger import logger
 
 
@@ -16,9 +16,9 @@ class ReliableAudioDuration:
     
     def __init__(self):
         self.methods = [
+            self._try_header,
             self._try_mutagen_mp3,
             self._try_mutagen_generic,
-            self._try_mp3_frame_analysis,
             self._try_file_size_estimation
         ]
     
@@ -79,99 +79,12 @@ class ReliableAudioDuration:
         
         raise Exception("mutagen通用方法无法获取时长信息")
     
-    def _try_mp3_frame_analysis(self, audio_path: str) -> float:
-        """尝试分析MP3帧结构"""
-        try:
-            with open(audio_path, 'rb') as f:
-                data = f.read()
-
-            # 查找MP3帧头
-            frame_count = 0
-            pos = 0
-            total_samples = 0
-            sample_rate = 0
-
-            while pos < len(data) - 4:
-                # 查找帧同步字（11位全1）
-                if data[pos] == 0xFF and (data[pos + 1] & 0xE0) == 0xE0:
-                    # 解析MP3帧头
-                    header = struct.unpack('>I', data[pos:pos+4])[0]
-
-                    # 提取版本、层、比特率、采样率等信息
-                    version = (header >> 19) & 0x3
-                    layer = (header >> 17) & 0x3
-                    bitrate_index = (header >> 12) & 0xF
-                    sample_rate_index = (header >> 10) & 0x3
-                    padding = (header >> 9) & 0x1
-
-                    # 🔧 修复：正确的版本映射
-                    # 计算采样率
-                    sample_rates = {
-                        3: [44100, 48000, 32000],  # MPEG-1
-                        2: [22050, 24000, 16000],  # MPEG-2
-                        0: [11025, 12000, 8000],   # MPEG-2.5
-                    }
-
-                    if version in sample_rates and sample_rate_index < 3:
-                        current_sample_rate = sample_rates[version][sample_rate_index]
-                        if sample_rate == 0:
-                            sample_rate = current_sample_rate
-
-                    # 🔧 修复：使用正确的比特率表
-                    # 计算比特率
-                    if version == 3 and layer == 1:  # MPEG-1 Layer III
-                        bitrates = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
-                    elif version == 2 and layer == 1:  # MPEG-2 Layer III
-                        bitrates = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
-                    else:
-                        bitrates = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
-
-                    if bitrate_index < len(bitrates):
-                        bitrate = bitrates[bitrate_index]
-
-                        # 🔧 修复：正确的帧大小计算，包含padding
-                        if layer == 1:  # Layer III (MP3)
-                            frame_size = int(144 * bitrate * 1000 / current_sample_rate) + padding
-                            samples_per_frame = 1152
-                        elif layer == 2:  # Layer II
-                            frame_size = int(144 * bitrate * 1000 / current_sample_rate) + padding
-                            samples_per_frame = 1152
-                        else:  # Layer I
-                            frame_size = int(12 * bitrate * 1000 / current_sample_rate + padding) * 4
-                            samples_per_frame = 384
-
-                        total_samples += samples_per_frame
-                        frame_count += 1
-                        pos += frame_size if frame_size > 0 else 1
-                    else:
-                        pos += 1
-                else:
-                    pos += 1
-
-                # 限制分析的帧数，避免处理过大的文件
-                if frame_count > 100:
-                    break
-
-            # 🔧 修复：使用实际分析的样本数计算时长
-            if frame_count > 0 and sample_rate > 0:
-                # 估算总帧数
-                avg_frame_size = pos / frame_count if frame_count > 0 else 288  # 默认帧大小
-                estimated_total_frames = len(data) / avg_frame_size
-
-                # 计算总样本数
-                avg_samples_per_frame = total_samples / frame_count
-                total_estimated_samples = estimated_total_frames * avg_samples_per_frame
-
-                # 计算时长
-                duration = total_estimated_samples / sample_rate
-
-                if 0.1 <= duration <= 3600:  # 合理的时长范围
-                    return duration
-
-        except Exception as e:
-            raise Exception(f"MP3帧分析失败: {e}")
-
-        raise Exception("MP3帧分析无法确定时长")
+    def _try_header(self, audio_path: str) -> float:
+        """解析文件头（MP3的Xing/VBRI头或帧扫描、WAV的RIFF块、OGG的粒度位置），不解码音频"""
+        duration = read_audio_duration(audio_path)
+        if duration > 0:
+            return duration
+        raise Exception("无法从文件头确定时长")
     
     def _try_file_size_estimation(self, audio_path: str) -> float:
         """基于文件大小的估算方法"""
@@ -223,12 +136,11 @@ def get_audio_duration_string(audio_path: str) -> str:
 
 def batch_analyze_durations(audio_paths: list) -> dict:
     """批量分析音频时长"""
-    results = {}
+    results = read_audio_durations(audio_paths)
     for path in audio_paths:
-        if path and os.path.exists(path):
-            results[path] = get_audio_duration(path)
-        else:
-            results[path] = 0.0
+        if not results.get(path):
+            # 文件头无法识别的格式逐个使用其他方法
+            results[path] = get_audio_duration(path) if path and os.path.exists(path) else 0.0
     return results
 
 
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地音效索引
+持久化的倒排索引：记录音效文件名分词、分类、时长和标签（下载时的查询词），
+中文描述通过关键词映射扩展为英文词后检索，按相关度排序返回。
+索引只在音效目录有变化时增量更新，查询结果在内存中缓存，
+同一项目内重复的音效查询不再扫描目录，也不再访问网络。
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.utils.logger import logger
+
+SOUND_EXTENSIONS = ('.mp3', '.wav', '.ogg')
+
+# 分类目录 -> 中英文关键词
+SOUND_CATEGORY_KEYWORDS = {
+    'doorbell': ['门铃', 'doorbell', 'bell', 'chime', 'ring'],
+    'footsteps': ['脚步', 'footsteps', 'walking', 'steps', 'walk'],
+    'rain': ['雨', 'rain', 'rainfall', 'water', 'drop'],
+    'phone': ['电话', 'phone', 'telephone', 'call', 'ring'],
+    'button': ['按键', 'button', 'click', 'key', 'press'],
+    'crowd': ['人群', 'crowd', 'people', 'talk', 'chatter'],
+    'ocean': ['海浪', 'ocean', 'wave', 'sea', 'water'],
+    'bird': ['鸟', 'bird', 'chirp', 'tweet', 'sing'],
+    'wind': ['风', 'wind', 'breeze', 'air', 'blow'],
+    'car': ['汽车', 'car', 'vehicle', 'engine', 'drive'],
+    'music': ['音乐', 'music', 'song', 'melody', 'tune']
+}
+
+# 常见中文音效描述 -> 英文关键词（音效文件名多为英文）
+ZH_EN_KEYWORDS = {
+    '门铃': ['doorbell', 'bell'], '敲门': ['knock', 'door'], '开门': ['door', 'open'], '关门': ['door', 'close'],
+    '门': ['door'], '脚步': ['footsteps', 'steps'], '走路': ['walking', 'footsteps'], '跑步': ['running'],
+    '雨': ['rain'], '雷': ['thunder'], '闪电': ['thunder', 'lightning'], '风': ['wind'], '水': ['water'],
+    '海浪': ['ocean', 'wave'], '海': ['sea', 'ocean'], '河': ['river', 'stream'], '滴水': ['drip', 'water'],
+    '电话': ['phone', 'telephone'], '铃声': ['ring', 'ringtone'], '手机': ['phone', 'mobile'],
+    '按键': ['button', 'click'], '按钮': ['button', 'click'], '点击': ['click'], '键盘': ['keyboard', 'typing'],
+    '打字': ['typing', 'keyboard'], '鼠标': ['mouse', 'click'],
+    '人群': ['crowd', 'people'], '掌声': ['applause', 'clap'], '鼓掌': ['applause', 'clap'], '笑': ['laugh'],
+    '哭': ['cry'], '尖叫': ['scream'], '说话': ['talk', 'voice'], '欢呼': ['cheer', 'crowd'],
+    '鸟': ['bird', 'chirp'], '狗': ['dog', 'bark'], '猫': ['cat', 'meow'], '马': ['horse'], '鸡': ['rooster', 'chicken'],
+    '虫': ['insect', 'cricket'], '蝉': ['cicada'],
+    '汽车': ['car', 'vehicle'], '车': ['car', 'vehicle'], '引擎': ['engine'], '喇叭': ['horn'], '刹车': ['brake'],
+    '火车': ['train'], '飞机': ['airplane', 'plane'],
+    '音乐': ['music'], '钢琴': ['piano'], '吉他': ['guitar'], '鼓': ['drum'],
+    '爆炸': ['explosion', 'boom'], '枪': ['gun', 'shot'], '火': ['fire'], '燃烧': ['fire', 'burning'],
+    '玻璃': ['glass'], '破碎': ['break', 'shatter'], '碎': ['break', 'shatter'], '撞击': ['hit', 'impact'],
+    '钟': ['clock', 'bell'], '时钟': ['clock', 'tick'], '滴答': ['tick', 'clock'], '心跳': ['heartbeat'],
+    '呼吸': ['breath', 'breathing'], '咳嗽': ['cough'], '叹气': ['sigh'],
+    '纸': ['paper'], '翻书': ['page', 'book'], '书': ['book'], '倒水': ['pour', 'water'], '杯子': ['cup', 'glass'],
+    '厨房': ['kitchen'], '切菜': ['chop', 'knife'], '剑': ['sword'], '刀': ['knife', 'blade'],
+    '魔法': ['magic'], '转场': ['whoosh', 'transition'], '嗖': ['whoosh', 'swoosh'], '提示音': ['notification', 'ding'],
+}
+
+# 不参与检索的英文词
+_STOP_WORDS = {'sound', 'sounds', 'effect', 'effects', 'sfx', 'audio', 'the', 'a', 'an', 'of', 'and', 'or',
+               'local', 'mp3', 'wav', 'ogg', 'free', 'hq', 'lq', 'preview'}
+# 中文描述中的虚词/泛称
+_ZH_FILLERS = ('音效', '声音', '的声音', '声', '的', '了', '着')
+
+# 相关度权重：文件名 > 标签（下载时的查询词） > 分类关键词
+_WEIGHT_NAME = 3.0
+_WEIGHT_TAG = 2.0
+_WEIGHT_CATEGORY = 1.0
+# 至少命中文件名或标签才算具体匹配；只命中分类关键词（如 ring 同时属于门铃和电话）不足以代替下载
+SPECIFIC_MATCH_WEIGHT = _WEIGHT_TAG
+
+_ALL_ZH_KEYWORDS = sorted({*ZH_EN_KEYWORDS, *(k for kws in SOUND_CATEGORY_KEYWORDS.values() for k in kws
+                                             if re.search(r'[\u4e00-\u9fff]', k))}, key=len, reverse=True)
+
+
+def tokenize(text: str) -> Set[str]:
+    """把文件名或查询词切分为检索词：英文按单词，中文按已知关键词，并扩展对应的英文关键词"""
+    text = re.sub(r'[【】\[\]（）()]', ' ', text or '')
+    # 驼峰命名的文件名按单词拆开
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text).lower()
+    tokens: Set[str] = set()
+
+    for word in re.findall(r'[a-z]+|\d+', text):
+        if len(word) < 2 or word in _STOP_WORDS or word.isdigit():
+            continue
+        tokens.add(word)
+        # 简单的复数还原：footsteps -> footstep
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            tokens.add(word[:-1])
+
+    for run in re.findall(r'[\u4e00-\u9fff]+', text):
+        # 长关键词优先匹配，匹配到的部分不再参与更短关键词的匹配（“门铃”不再匹配“门”）
+        for keyword in _ALL_ZH_KEYWORDS:
+            if keyword in run:
+                tokens.add(keyword)
+                tokens.update(ZH_EN_KEYWORDS.get(keyword, ()))
+                run = run.replace(keyword, ' ')
+        # 未收录的中文描述保留原词，可与下载时记录的标签精确匹配
+        for part in run.split():
+            for filler in _ZH_FILLERS:
+                part = part.replace(filler, '')
+            if part:
+                tokens.add(part)
+    return tokens
+
+
+def category_tokens(category: str) -> Set[str]:
+    """分类目录名及其关键词"""
+    tokens = tokenize(category)
+    for keyword in SOUND_CATEGORY_KEYWORDS.get(category, ()):
+        tokens |= tokenize(keyword)
+    return tokens
+
+
+class SoundIndex:
+    """本地音效索引"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    INDEX_VERSION = 1
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, index_dir: str = None, refresh_interval: float = 30.0):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if index_dir is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            project_root = os.path.dirname(os.path.dirname(current_dir))
+            index_dir = os.path.join(project_root, "temp", "sound_index")
+
+        self.index_dir = index_dir
+        self.index_file = os.path.join(index_dir, "index.json")
+        self.refresh_interval = refresh_interval
+
+        self._index_lock = threading.RLock()
+        self._roots: Dict[str, Dict[str, int]] = {}  # 库目录 -> {子目录: mtime_ns}
+        self._entries: Dict[str, Dict[str, Any]] = {}  # 文件路径 -> 条目
+        self._postings: Dict[str, Dict[str, float]] = {}  # 检索词 -> {文件路径: 权重}
+        self._query_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._query_files: Dict[str, str] = {}  # 规范化的音效描述 -> 已获取的音效文件（持久化）
+        self._last_check: Dict[str, float] = {}
+        self._loaded = False
+
+        # 统计信息
+        self.queries = 0
+        self.cache_hits = 0
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.INDEX_VERSION:
+                    self._roots = data.get('roots', {})
+                    self._query_files = data.get('queries', {})
+                    self._entries = data.get('entries', {})
+                    self._rebuild_postings()
+                    logger.info(f"加载音效索引: {len(self._entries)} 个音效")
+        except Exception as e:
+            logger.warning(f"加载音效索引失败，将重建: {e}")
+            self._roots, self._entries = {}, {}
+
+    def _save(self):
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.INDEX_VERSION, 'roots': self._roots, 'entries': self._entries,
+                           'queries': self._query_files}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.warning(f"保存音效索引失败: {e}")
+
+    def _rebuild_postings(self):
+        self._postings = {}
+        for path, entry in self._entries.items():
+            self._post(path, entry)
+        self._query_cache.clear()
+
+    def _post(self, path: str, entry: Dict[str, Any]):
+        for token, weight in self._entry_weights(entry).items():
+            self._postings.setdefault(token, {})[path] = weight
+
+    def _unpost(self, path: str, entry: Dict[str, Any]):
+        for token in self._entry_weights(entry):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(path, None)
+                if not postings:
+                    del self._postings[token]
+
+    @staticmethod
+    def _entry_weights(entry: Dict[str, Any]) -> Dict[str, float]:
+        """条目各检索词的权重（同一词取最高来源的权重）"""
+        weights: Dict[str, float] = {}
+        for tokens, weight in ((category_tokens(entry.get('category', '')), _WEIGHT_CATEGORY),
+                               (entry.get('tags', []), _WEIGHT_TAG),
+                               (entry.get('name_tokens', []), _WEIGHT_NAME)):
+            for token in tokens:
+                weights[token] = max(weights.get(token, 0.0), weight)
+        return weights
+
+    # ------------------------------------------------------------------
+    # 目录扫描
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _dir_signature(root: str) -> Dict[str, int]:
+        """库目录及各分类子目录的修改时间（增删文件会改变所在目录的修改时间）"""
+        signature = {}
+        if not os.path.isdir(root):
+            return signature
+        signature[root] = os.stat(root).st_mtime_ns
+        with os.scandir(root) as it:
+            for item in it:
+                if item.is_dir():
+                    signature[item.path] = item.stat().st_mtime_ns
+        return signature
+
+    def add_root(self, root: str) -> 'SoundIndex':
+        """登记音效库目录（一级子目录为分类），目录有变化时增量更新索引"""
+        root = os.path.abspath(root)
+        with self._index_lock:
+            self._load()
+            self._refresh_root(root, force=root not in self._roots)
+        return self
+
+    def _refresh_root(self, root: str, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_check.get(root, 0.0) < self.refresh_interval:
+            return
+        self._last_check[root] = now
+
+        try:
+            signature = self._dir_signature(root)
+        except OSError as e:
+            logger.warning(f"读取音效库目录失败 {root}: {e}")
+            return
+        old_signature = self._roots.get(root, {})
+        if signature == old_signature and not force:
+            return
+
+        changed_dirs = [d for d, mtime in signature.items() if old_signature.get(d) != mtime]
+        removed_dirs = [d for d in old_signature if d not in signature]
+        changed = 0
+        for directory in removed_dirs:
+            changed += self._drop_dir(directory)
+        for directory in changed_dirs:
+            changed += self._scan_dir(root, directory)
+
+        self._roots[root] = signature
+        if changed or removed_dirs or force:
+            self._rebuild_postings()
+            self._save()
+            logger.info(f"音效索引已更新: {root}，变更 {changed} 个文件，共 {len(self._entries)} 个音效")
+
+    def _drop_dir(self, directory: str) -> int:
+        stale = [p for p in self._entries if os.path.dirname(p) == directory]
+        for path in stale:
+            del self._entries[path]
+        return len(stale)
+
+    def _scan_dir(self, root: str, directory: str) -> int:
+        """重新扫描一个目录：新增或修改的文件重新建立条目，已删除的文件移除"""
+        category = '' if directory == root else os.path.basename(directory)
+        present = set()
+        changed = 0
+        with os.scandir(directory) as it:
+            for item in it:
+                if not item.is_file() or os.path.splitext(item.name)[1].lower() not in SOUND_EXTENSIONS:
+                    continue
+                present.add(item.path)
+                stat = item.stat()
+                entry = self._entries.get(item.path)
+                if entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+                    continue
+                self._entries[item.path] = self._make_entry(item.path, category, stat,
+                                                            tags=entry.get('tags', []) if entry else [])
+                changed += 1
+        for path in [p for p in self._entries if os.path.dirname(p) == directory and p not in present]:
+            del self._entries[path]
+            changed += 1
+        return changed
+
+    @staticmethod
+    def _make_entry(path: str, category: str, stat: os.stat_result, tags: Iterable[str] = (),
+                    duration: Optional[float] = None) -> Dict[str, Any]:
+        """建立条目；duration 为空时读取音频时长"""
+        if duration is None:
+            try:
+                from src.utils.reliable_audio_duration import get_audio_duration
+                duration = round(get_audio_duration(path), 3)
+            except Exception as e:
+                logger.debug(f"获取音效时长失败 {path}: {e}")
+                duration = 0.0
+        return {
+            'category': category,
+            'name_tokens': sorted(tokenize(os.path.splitext(os.path.basename(path))[0])),
+            'tags': sorted(set(tags)),
+            'duration': duration,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns
+        }
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 10, category: Optional[str] = None,
+               min_match_weight: float = 0.0) -> List[Dict[str, Any]]:
+        """按相关度检索音效
+
+        Args:
+            min_match_weight: 至少有一个检索词以不低于该权重命中才返回，
+                SPECIFIC_MATCH_WEIGHT 表示必须命中文件名或标签
+
+        Returns:
+            [{'path', 'category', 'duration', 'score'}, ...]，相关度降序，同分时时长短的在前
+        """
+        query_tokens = tokenize(query)
+        cache_key = f"{category or ''}|{' '.join(sorted(query_tokens))}|{limit}|{min_match_weight}"
+        with self._index_lock:
+            self._load()
+            for root in list(self._roots):
+                self._refresh_root(root)
+
+            self.queries += 1
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                self.cache_hits += 1
+                return [dict(item) for item in cached]
+
+            scores: Dict[str, float] = {}
+            best_weights: Dict[str, float] = {}
+            for token in query_tokens:
+                for path, weight in self._postings.get(token, {}).items():
+                    scores[path] = scores.get(path, 0.0) + weight
+                    best_weights[path] = max(best_weights.get(path, 0.0), weight)
+
+            results = []
+            for path, score in scores.items():
+                if best_weights[path] < min_match_weight:
+                    continue
+                entry = self._entries[path]
+                if category and entry.get('category') != category:
+                    continue
+                results.append({'path': path, 'category': entry.get('category', ''),
+                                'duration': entry.get('duration', 0.0), 'score': score})
+            results.sort(key=lambda r: (-r['score'], r['duration'] <= 0, r['duration'], r['path']))
+            results = results[:limit]
+            self._query_cache[cache_key] = results
+            return [dict(item) for item in results]
+
+    def add_file(self, path: str, tags: Iterable[str] = ()) -> bool:
+        """把文件加入索引，tags 为描述该音效的查询词（如下载时使用的中文描述）"""
+        path = os.path.abspath(path)
+        with self._index_lock:
+            self._load()
+            if not self._add_file(path, tags):
+                return False
+            self._save()
+        return True
+
+    def _add_file(self, path: str, tags: Iterable[str] = ()) -> bool:
+        """登记单个文件并只更新它的倒排项（不落盘）"""
+        if not os.path.isfile(path):
+            return False
+        tag_tokens = set()
+        for tag in tags:
+            tag_tokens |= tokenize(tag)
+        stat = os.stat(path)
+        old_entry = self._entries.get(path)
+        duration = None
+        if old_entry:
+            tag_tokens |= set(old_entry.get('tags', []))
+            self._unpost(path, old_entry)
+            if old_entry.get('size') == stat.st_size and old_entry.get('mtime') == stat.st_mtime_ns:
+                duration = old_entry.get('duration')
+        directory = os.path.dirname(path)
+        root = directory if directory in self._roots else os.path.dirname(directory)
+        category = os.path.basename(directory) if root != directory else ''
+        entry = self._make_entry(path, category, stat, tag_tokens, duration)
+        self._entries[path] = entry
+        self._post(path, entry)
+        self._query_cache.clear()
+        if root in self._roots:
+            # 同步目录签名，避免下一次检查时重复扫描
+            self._roots[root] = self._dir_signature(root)
+        return True
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """规范化音效描述：去掉括号并合并空白"""
+        return ' '.join(re.sub(r'[【】\[\]（）()]', ' ', query or '').lower().split())
+
+    def lookup_query(self, query: str) -> Optional[str]:
+        """查找之前为相同音效描述获取过的文件（文件已不存在时作废）"""
+        key = self.normalize_query(query)
+        with self._index_lock:
+            self._load()
+            path = self._query_files.get(key)
+            if path and path in self._entries and os.path.exists(path):
+                return path
+            if path:
+                del self._query_files[key]
+                self._save()
+            return None
+
+    def remember_query(self, query: str, path: str):
+        """记录音效描述对应的文件（描述同时作为该文件的标签），之后相同的描述直接使用"""
+        path = os.path.abspath(path)
+        with self._index_lock:
+            self._load()
+            self._add_file(path, tags=[query])
+            self._query_files[self.normalize_query(query)] = path
+            self._save()
+
+    def get_entries(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出索引中的音效"""
+        with self._index_lock:
+            self._load()
+            for root in list(self._roots):
+                self._refresh_root(root)
+            return [{'path': path, **entry} for path, entry in self._entries.items()
+                    if category is None or entry.get('category') == category]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        with self._index_lock:
+            return {
+                'roots': len(self._roots),
+                'sounds': len(self._entries),
+                'tokens': len(self._postings),
+                'queries': self.queries,
+                'cache_hits': self.cache_hits
+            }
+
+
+# 全局实例
+sound_index = SoundIndex()
@@ -1,6 +1,6 @@
 """
 字幕生成工具
-支持从配音生成字幕文件，包括SRT、VTT、JSON等格式
+支持从配音生成字幕文件，包括SRT、VTT、ASS、JSON等格式
 """
 
 import os
@@ -11,6 +11,9 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 
+from src.utils.ass_subtitles import AssStyle, events_from_word_boundaries, write_ass_file
+from src.utils.tts_timing import load_timing
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,7 +39,7 @@ class SubtitleGenerator:
         
         Args:
             voice_segment: 配音段落数据
-            subtitle_format: 字幕格式 (srt/vtt/json)
+            subtitle_format: 字幕格式 (srt/vtt/ass/json)
             
         Returns:
             字幕文件路径，失败返回None
@@ -52,12 +55,18 @@ class SubtitleGenerator:
                 logger.warning(f"配音段落 {scene_id}_{shot_id} 没有文本内容")
                 return None
             
-            # 获取音频时长
-            duration = self._get_audio_duration(audio_path) if audio_path else 3.0
-            
-            # 生成字幕数据
-            subtitle_data = self._create_subtitle_data(text, duration)
+            # 优先使用合成时记录在音频旁边的逐词时间和时长，无需再读取音频
+            timing = load_timing(audio_path) or {}
+            word_boundaries = voice_segment.get('word_boundaries') or timing.get('words')
             
+            # 生成字幕数据（有TTS逐词时间戳时按实际发音时间断行）
+            if word_boundaries:
+                subtitle_data = self._create_subtitle_data_from_words(word_boundaries)
+            else:
+                # 获取音频时长
+                duration = timing.get('duration') or (self._get_audio_duration(audio_path) if audio_path else 3.0)
+                subtitle_data = self._create_subtitle_data(text, duration)
+
             # 生成文件名
             filename = f"{scene_id}_{shot_id}_subtitle.{subtitle_format}"
             subtitle_path = self.subtitles_dir / filename
@@ -67,6 +76,8 @@ class SubtitleGenerator:
                 success = self._generate_srt_file(subtitle_data, subtitle_path)
             elif subtitle_format.lower() == "vtt":
                 success = self._generate_vtt_file(subtitle_data, subtitle_path)
+            elif subtitle_format.lower() == "ass":
+                success = self._generate_ass_file(subtitle_data, subtitle_path)
             elif subtitle_format.lower() == "json":
                 success = self._generate_json_file(subtitle_data, subtitle_path)
             else:
@@ -141,6 +152,20 @@ class SubtitleGenerator:
             logger.error(f"创建字幕数据失败: {e}")
             return []
     
+    def _create_subtitle_data_from_words(self, word_boundaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """根据TTS逐词时间戳创建字幕数据"""
+        subtitle_data = []
+        for i, (start_time, end_time, line) in enumerate(events_from_word_boundaries(word_boundaries)):
+            subtitle_data.append({
+                'index': i + 1,
+                'start_time': start_time,
+                'end_time': end_time,
+                'text': line,
+                'start_time_str': self._seconds_to_timestamp(start_time),
+                'end_time_str': self._seconds_to_timestamp(end_time)
+            })
+        return subtitle_data
+
     def _split_text_into_sentences(self, text: str) -> List[str]:
         """将文本分割成句子"""
         try:
@@ -213,6 +238,18 @@ class SubtitleGenerator:
             logger.error(f"生成VTT文件失败: {e}")
             return False
     
+    def _generate_ass_file(self, subtitle_data: List[Dict[str, Any]], output_path: Path,
+                           style: Optional[AssStyle] = None) -> bool:
+        """生成ASS格式字幕文件（样式写在文件内，烧录时无需 force_style）"""
+        try:
+            events = [(item['start_time'], item['end_time'], item['text']) for item in subtitle_data]
+            write_ass_file(events, str(output_path), style)
+            return True
+
+        except Exception as e:
+            logger.error(f"生成ASS文件失败: {e}")
+            return False
+
     def _generate_json_file(self, subtitle_data: List[Dict[str, Any]], output_path: Path) -> bool:
         """生成JSON格式字幕文件"""
         try:
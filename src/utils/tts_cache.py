@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS合成结果缓存
+以 (引擎, 音色, 语速, 音调, 音量, 规范化文本) 的稳定哈希为键持久化合成的音频及字幕/逐词时间数据，
+未修改的段落再次生成时以写时复制或复制的方式放入项目音频目录，不再调用接口，支持LRU与容量淘汰
+"""
+
+import os
+import json
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, Any, Optional
+
+from src.utils.logger import logger
+from src.utils.content_store import ContentAddressedStore, link_or_copy
+
+# 不影响合成结果、不参与缓存键计算的参数
+_VOLATILE_PARAMS = {
+    'api_key', 'secret_key', 'app_id', 'region', 'base_url', 'api_url', 'output_dir',
+    'shot_id', 'scene_id', 'segment_index', 'use_cache', 'progress_callback'
+}
+
+
+class TTSCache(ContentAddressedStore):
+    """TTS合成结果缓存"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, cache_dir: str = None, max_size_mb: int = 1024, max_entries: int = 20000):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if cache_dir is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            project_root = os.path.dirname(os.path.dirname(current_dir))
+            cache_dir = os.path.join(project_root, "temp", "tts_cache")
+
+        super().__init__(cache_dir, max_size_mb, max_entries, "TTS缓存")
+
+    # ------------------------------------------------------------------
+    # 键计算
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """规范化文本：统一Unicode组合形式并合并空白"""
+        return ' '.join(unicodedata.normalize('NFC', text or '').split())
+
+    @classmethod
+    def make_key(cls, engine_name: str, text: str, voice: Any = None, rate: Any = None,
+                 pitch: Any = None, volume: Any = None, extra: Optional[Dict[str, Any]] = None) -> str:
+        """根据引擎、音色、韵律参数和文本计算稳定的缓存键
+
+        Args:
+            extra: 其他影响合成结果的参数（情感、语言、输出格式等）
+        """
+        normalized = {
+            'engine': engine_name,
+            'text': cls.normalize_text(text),
+            'voice': voice,
+            'rate': rate,
+            'pitch': pitch,
+            'volume': volume,
+            'extra': {k: v for k, v in (extra or {}).items() if k not in _VOLATILE_PARAMS}
+        }
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def make_key_from_settings(cls, engine_name: str, text: str, settings: Dict[str, Any]) -> str:
+        """根据 TTSEngineManager.generate_speech 的参数字典计算缓存键"""
+        extra = {k: v for k, v in settings.items() if k not in ('voice', 'speed', 'rate', 'pitch', 'volume')}
+        return cls.make_key(engine_name, text, settings.get('voice'),
+                            settings.get('speed', settings.get('rate')),
+                            settings.get('pitch'), settings.get('volume'), extra)
+
+    # ------------------------------------------------------------------
+    # 查找与写入
+    # ------------------------------------------------------------------
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存，命中时返回 {'path': 缓存音频路径, 'metadata': 字幕等附加数据}"""
+        entry = self._lookup_entry(key)
+        if not entry:
+            return None
+        return {'path': self._entry_paths(entry)[0], 'metadata': entry.get('metadata', {})}
+
+    def put(self, key: str, audio_path: str, metadata: Dict[str, Any] = None) -> bool:
+        """将合成的音频文件写入缓存（相同内容只保存一份）"""
+        if not self.enabled or not audio_path or not os.path.exists(audio_path):
+            return False
+
+        with self._store_lock:
+            try:
+                ext = os.path.splitext(audio_path)[1].lower() or '.mp3'
+                self._add_entry(key, [self._store_file(audio_path, ext)], metadata)
+                return True
+            except Exception as e:
+                logger.warning(f"写入TTS缓存失败: {e}")
+                return False
+
+    def put_bytes(self, key: str, audio_data: bytes, ext: str = '.mp3', metadata: Dict[str, Any] = None) -> bool:
+        """将内存中的音频数据写入缓存"""
+        if not self.enabled or not audio_data:
+            return False
+
+        with self._store_lock:
+            try:
+                ext = ext if ext.startswith('.') else f".{ext}"
+                self._add_entry(key, [self._store_bytes(audio_data, ext)], metadata)
+                return True
+            except Exception as e:
+                logger.warning(f"写入TTS缓存失败: {e}")
+                return False
+
+    @staticmethod
+    def materialize(cache_path: str, target_path: str) -> str:
+        """将缓存音频放到目标路径（通常是 AudioFileManager 的引擎音频目录）
+
+        使用写时复制或普通复制而不是硬链接：项目中的音频可能被原地改写，
+        硬链接会把改动带进缓存对象以及所有链接到它的项目
+        """
+        target_dir = os.path.dirname(target_path)
+        if target_dir:
+            os.makedirs(target_dir, exist_ok=True)
+
+        if os.path.exists(target_path):
+            os.remove(target_path)
+
+        method = link_or_copy(cache_path, target_path, allow_hardlink=False)
+        logger.debug(f"TTS缓存命中，已{method}到: {target_path}")
+        return target_path
+
+
+# 全局实例
+tts_cache = TTSCache()
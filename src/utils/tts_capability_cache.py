@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS引擎能力缓存
+跨会话持久化各引擎的音色列表、支持的格式与参数范围，以及最近一次连接测试结果。
+读取总是立即返回（已缓存的数据或内置列表），缺失或过期的条目在后台线程刷新，
+打开配音设置和AI配音界面不再等待网络。
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
+
+from src.utils.logger import logger
+
+# 音色列表有效期（服务端音色很少变化）
+VOICES_TTL = 7 * 24 * 3600
+# 连接测试结果有效期
+HEALTH_TTL = 10 * 60
+# 后台刷新失败后，间隔多久再重试
+RETRY_INTERVAL = 10 * 60
+
+EDGE_TTS_ENGINE = 'edge_tts'
+
+# Edge-TTS 输出格式与参数范围（与 EdgeTTSEngine.generate_speech 的转换规则一致）
+EDGE_TTS_CAPABILITIES = {
+    'formats': ['audio-24khz-48kbitrate-mono-mp3'],
+    'speed_range': [0.5, 2.0],
+    'pitch_range': [-50, 50],
+    'word_boundary': True
+}
+
+# 常用中文音色的中文名
+_ZH_VOICE_NAMES = {
+    'Xiaoxiao': '晓晓', 'Xiaoyi': '晓伊', 'Xiaohan': '晓涵', 'Xiaomeng': '晓梦', 'Xiaomo': '晓墨',
+    'Xiaoqiu': '晓秋', 'Xiaorui': '晓睿', 'Xiaoshuang': '晓双', 'Xiaoxuan': '晓萱', 'Xiaoyan': '晓颜',
+    'Xiaoyou': '晓悠', 'Xiaozhen': '晓甄', 'Xiaochen': '晓辰', 'Xiaobei': '晓北', 'Xiaoni': '晓妮',
+    'Yunxi': '云希', 'Yunyang': '云扬', 'Yunjian': '云健', 'Yunxia': '云夏', 'Yunye': '云野',
+    'Yunze': '云泽', 'Yunfeng': '云枫', 'Yunhao': '云皓', 'Yunjie': '云杰',
+}
+
+
+def edge_voice_name(voice_id: str, gender: str) -> str:
+    """按界面沿用的格式生成音色显示名：中文为“云希-男声”，其他语言为“Aria-Female”"""
+    parts = voice_id.split('-')
+    base = parts[-1].replace('Neural', '') if parts else voice_id
+    if voice_id.startswith('zh-'):
+        return f"{_ZH_VOICE_NAMES.get(base, base)}-{'女声' if gender == 'Female' else '男声'}"
+    return f"{base}-{gender}" if gender else base
+
+
+def _edge_voice(voice_id: str, gender: str) -> Dict[str, str]:
+    return {'id': voice_id, 'name': edge_voice_name(voice_id, gender),
+            'language': '-'.join(voice_id.split('-')[:2]), 'gender': gender}
+
+
+# 没有缓存（首次运行或离线）时使用的内置音色
+EDGE_BUILTIN_VOICES = [_edge_voice(voice_id, gender) for voice_id, gender in [
+    ('zh-CN-YunxiNeural', 'Male'), ('zh-CN-XiaoxiaoNeural', 'Female'), ('zh-CN-YunyangNeural', 'Male'),
+    ('zh-CN-XiaoyiNeural', 'Female'), ('zh-CN-YunjianNeural', 'Male'), ('zh-CN-XiaochenNeural', 'Female'),
+    ('zh-CN-XiaohanNeural', 'Female'), ('zh-CN-XiaomengNeural', 'Female'), ('zh-CN-XiaomoNeural', 'Female'),
+    ('zh-CN-XiaoqiuNeural', 'Female'), ('zh-CN-XiaoruiNeural', 'Female'), ('zh-CN-XiaoshuangNeural', 'Female'),
+    ('zh-CN-XiaoxuanNeural', 'Female'), ('zh-CN-XiaoyanNeural', 'Female'), ('zh-CN-XiaoyouNeural', 'Female'),
+    ('zh-CN-XiaozhenNeural', 'Female'), ('zh-CN-YunfengNeural', 'Male'), ('zh-CN-YunhaoNeural', 'Male'),
+    ('zh-CN-YunjieNeural', 'Male'), ('zh-CN-YunxiaNeural', 'Male'), ('zh-CN-YunyeNeural', 'Male'),
+    ('zh-CN-YunzeNeural', 'Male'), ('en-US-AriaNeural', 'Female'), ('en-US-GuyNeural', 'Male'),
+]]
+
+
+def fetch_edge_capabilities() -> Dict[str, Any]:
+    """从Edge-TTS服务获取完整音色列表（在后台线程中调用）"""
+    if edge_tts is None:
+        raise RuntimeError('Edge-TTS未安装')
+    raw_voices = asyncio.run(edge_tts.list_voices())
+    voices = []
+    for item in raw_voices:
+        voice_id = item.get('ShortName')
+        if not voice_id:
+            continue
+        voice = _edge_voice(voice_id, item.get('Gender', ''))
+        if item.get('Locale'):
+            voice['language'] = item['Locale']
+        voices.append(voice)
+    if not voices:
+        raise RuntimeError('Edge-TTS返回的音色列表为空')
+    return {'voices': voices, 'capabilities': EDGE_TTS_CAPABILITIES}
+
+
+def settings_signature(settings: Dict[str, Any]) -> str:
+    """引擎配置摘要：密钥、区域、模型路径变化后旧的连接测试结果作废（只保存摘要，不保存密钥）"""
+    payload = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class TTSCapabilityCache:
+    """TTS引擎能力缓存"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    CACHE_VERSION = 1
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, cache_dir: str = None):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+
+        if cache_dir is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            project_root = os.path.dirname(os.path.dirname(current_dir))
+            cache_dir = os.path.join(project_root, "temp", "tts_capabilities")
+
+        self.cache_dir = cache_dir
+        self.cache_file = os.path.join(cache_dir, "capabilities.json")
+
+        self._data_lock = threading.RLock()
+        self._engines: Dict[str, Dict[str, Any]] = {}  # 引擎 -> {voices, capabilities, health, ...}
+        self._refreshing = set()
+        self._failed_at: Dict[str, float] = {}
+        self._loaded = False
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.CACHE_VERSION:
+                    self._engines = data.get('engines', {})
+        except Exception as e:
+            logger.warning(f"加载TTS引擎能力缓存失败: {e}")
+            self._engines = {}
+
+    def _save(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.CACHE_VERSION, 'engines': self._engines}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"保存TTS引擎能力缓存失败: {e}")
+
+    def _entry(self, engine: str) -> Dict[str, Any]:
+        self._load()
+        return self._engines.setdefault(engine, {})
+
+    # ------------------------------------------------------------------
+    # 音色与能力
+    # ------------------------------------------------------------------
+
+    def get_voices(self, engine: str, fetcher: Optional[Callable[[], Dict[str, Any]]] = None,
+                   default: Optional[List[Dict[str, str]]] = None, ttl: float = VOICES_TTL) -> List[Dict[str, str]]:
+        """立即返回音色列表，不访问网络
+
+        Args:
+            fetcher: 获取 {'voices': [...], 'capabilities': {...}} 的函数；缓存缺失或过期时在后台调用
+            default: 尚无缓存时返回的内置列表
+        """
+        with self._data_lock:
+            entry = self._entry(engine)
+            voices = entry.get('voices')
+            stale = time.time() - entry.get('voices_fetched_at', 0) > ttl
+        if fetcher and stale:
+            self.refresh_async(engine, fetcher)
+        return list(voices) if voices else list(default or [])
+
+    def get_capabilities(self, engine: str, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """返回缓存的格式与参数范围"""
+        with self._data_lock:
+            return dict(self._entry(engine).get('capabilities') or default or {})
+
+    def refresh(self, engine: str, fetcher: Callable[[], Dict[str, Any]]) -> bool:
+        """同步刷新音色与能力信息，失败时保留旧数据"""
+        try:
+            result = fetcher()
+        except Exception as e:
+            with self._data_lock:
+                self._failed_at[engine] = time.time()
+            logger.warning(f"刷新 {engine} 音色列表失败，继续使用缓存: {e}")
+            return False
+
+        with self._data_lock:
+            entry = self._entry(engine)
+            entry['voices'] = result.get('voices') or entry.get('voices') or []
+            if result.get('capabilities'):
+                entry['capabilities'] = result['capabilities']
+            entry['voices_fetched_at'] = time.time()
+            self._failed_at.pop(engine, None)
+            self._save()
+            count = len(entry['voices'])
+        logger.info(f"{engine} 音色列表已更新: {count} 个音色")
+        return True
+
+    def refresh_async(self, engine: str, fetcher: Callable[[], Dict[str, Any]]) -> bool:
+        """在后台线程刷新；同一引擎同时只有一个刷新任务，失败后 RETRY_INTERVAL 内不再重试"""
+        with self._data_lock:
+            if engine in self._refreshing or time.time() - self._failed_at.get(engine, 0) < RETRY_INTERVAL:
+                return False
+            self._refreshing.add(engine)
+
+        def run():
+            try:
+                self.refresh(engine, fetcher)
+            finally:
+                with self._data_lock:
+                    self._refreshing.discard(engine)
+
+        threading.Thread(target=run, name=f"tts_caps_{engine}", daemon=True).start()
+        return True
+
+    # ------------------------------------------------------------------
+    # 连接测试
+    # ------------------------------------------------------------------
+
+    def get_cached_health(self, engine: str, signature: str = '', ttl: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """返回缓存的连接测试结果；配置已变化或超过 ttl 时返回 None（ttl 为 None 时不限有效期）"""
+        with self._data_lock:
+            health = self._entry(engine).get('health')
+        if not health or health.get('signature') != signature:
+            return None
+        if ttl is not None and time.time() - health.get('checked_at', 0) > ttl:
+            return None
+        return {**health['result'], 'cached': True, 'checked_at': health.get('checked_at')}
+
+    def get_health(self, engine: str, checker: Callable[[], Dict[str, Any]], signature: str = '',
+                   force: bool = False, ttl: float = HEALTH_TTL) -> Dict[str, Any]:
+        """连接测试：有效期内且配置未变时直接返回上次结果，force=True 时重新测试"""
+        if not force:
+            cached = self.get_cached_health(engine, signature, ttl)
+            if cached is not None:
+                return cached
+
+        try:
+            result = checker()
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        with self._data_lock:
+            self._entry(engine)['health'] = {'result': result, 'signature': signature, 'checked_at': time.time()}
+            self._save()
+        return result
+
+    def invalidate(self, engine: Optional[str] = None):
+        """清除指定引擎（或全部引擎）的缓存"""
+        with self._data_lock:
+            self._load()
+            if engine is None:
+                self._engines.clear()
+            else:
+                self._engines.pop(engine, None)
+            self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._data_lock:
+            self._load()
+            return {
+                name: {
+                    'voices': len(entry.get('voices') or []),
+                    'voices_fetched_at': entry.get('voices_fetched_at'),
+                    'health_checked_at': (entry.get('health') or {}).get('checked_at')
+                }
+                for name, entry in self._engines.items()
+            }
+
+
+# 全局实例
+tts_capability_cache = TTSCapabilityCache()
+
+
+def get_edge_voices() -> List[Dict[str, str]]:
+    """Edge-TTS音色列表：立即返回缓存或内置列表，过期时后台刷新"""
+    fetcher = fetch_edge_capabilities if edge_tts is not None else None
+    return tts_capability_cache.get_voices(EDGE_TTS_ENGINE, fetcher, EDGE_BUILTIN_VOICES)
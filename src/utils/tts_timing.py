@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS逐词时间记录
+合成语音时把引擎返回的逐词时间（Edge-TTS WordBoundary 等）和音频时长写入与音频同名的
+.timing.json 文件，字幕生成、配音-图像同步和视频合成直接读取，不再解码音频或按字数估算。
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.utils.logger import logger
+
+TIMING_SUFFIX = ".timing.json"
+TIMING_VERSION = 1
+
+# Edge-TTS 的时间单位为 100 纳秒
+_EDGE_TICKS_PER_SECOND = 10_000_000
+
+
+def timing_path_for(audio_path: str) -> str:
+    """音频文件对应的时间记录路径"""
+    return os.path.splitext(audio_path)[0] + TIMING_SUFFIX
+
+
+def cbr_duration(byte_count: int, bitrate_kbps: int) -> float:
+    """固定码率音频按字节数计算时长（TTS接口的输出格式码率固定）"""
+    return byte_count * 8 / (bitrate_kbps * 1000) if bitrate_kbps > 0 else 0.0
+
+
+def word_from_edge_chunk(chunk: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Edge-TTS stream() 中的 WordBoundary/SentenceBoundary 转换为 {'text', 'start', 'end'}"""
+    text = chunk.get('text')
+    if not text or 'offset' not in chunk:
+        return None
+    start = chunk['offset'] / _EDGE_TICKS_PER_SECOND
+    return {'text': text, 'start': start, 'end': start + chunk.get('duration', 0) / _EDGE_TICKS_PER_SECOND}
+
+
+def save_timing(audio_path: str, words: Sequence[Dict[str, Any]], duration: Optional[float] = None,
+                engine: str = "") -> Optional[str]:
+    """写出时间记录
+
+    Args:
+        words: [{'text': 词, 'start': 开始秒, 'end': 结束秒}, ...]
+        duration: 音频时长（秒），未知时为 None
+    """
+    if not audio_path or not os.path.exists(audio_path):
+        return None
+    record = {
+        'version': TIMING_VERSION,
+        'engine': engine,
+        'audio_size': os.path.getsize(audio_path),  # 音频被替换后记录自动失效
+        'duration': round(duration, 3) if duration else None,
+        # 紧凑格式：[开始, 结束, 文本]
+        'words': [[round(float(w['start']), 3), round(float(w['end']), 3), str(w['text'])] for w in words],
+    }
+    path = timing_path_for(audio_path)
+    try:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+        return path
+    except Exception as e:
+        logger.warning(f"保存TTS时间记录失败 {path}: {e}")
+        return None
+
+
+def load_timing(audio_path: str) -> Optional[Dict[str, Any]]:
+    """读取时间记录，返回 {'duration': 秒或None, 'words': [{'text', 'start', 'end'}]}
+
+    记录不存在、版本不符或音频已被替换时返回 None
+    """
+    if not audio_path:
+        return None
+    path = timing_path_for(audio_path)
+    if not os.path.exists(path) or not os.path.exists(audio_path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if record.get('version') != TIMING_VERSION or record.get('audio_size') != os.path.getsize(audio_path):
+            return None
+        return {
+            'duration': record.get('duration'),
+            'words': [{'start': start, 'end': end, 'text': text} for start, end, text in record.get('words', [])],
+        }
+    except Exception as e:
+        logger.debug(f"读取TTS时间记录失败 {path}: {e}")
+        return None
+
+
+def load_word_boundaries(audio_path: str) -> List[Dict[str, Any]]:
+    """读取逐词时间，没有记录时返回空列表"""
+    timing = load_timing(audio_path)
+    return timing['words'] if timing else []
+
+
+def load_duration(audio_path: str) -> Optional[float]:
+    """读取记录中的音频时长，没有记录时返回 None"""
+    timing = load_timing(audio_path)
+    return timing['duration'] if timing and timing.get('duration') else None
+
+
+def remove_timing(audio_path: str):
+    """删除音频对应的时间记录（重新合成前调用）"""
+    path = timing_path_for(audio_path)
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        logger.debug(f"删除TTS时间记录失败 {path}: {e}")
@@ -7,11 +7,12 @@
 """
 
 import os
-import subprocess
 import json
 import logging
 from typing import Dict, Optional, Any
 
+from src.utils.ffmpeg_runner import run_ffmpeg_sync
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,16 +35,11 @@ class VideoInfoChecker:
         ]
         
         for path in possible_paths:
-            try:
-                result = subprocess.run([path, "-version"], 
-                                      capture_output=True, 
-                                      timeout=5)
-                if result.returncode == 0:
-                    logger.debug(f"找到ffprobe: {path}")
-                    return path
-            except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
-                continue
-        
+            result = run_ffmpeg_sync([path, "-version"], timeout=5)
+            if result.success:
+                logger.debug(f"找到ffprobe: {path}")
+                return path
+
         logger.warning("未找到ffprobe，某些功能可能不可用")
         return "ffprobe"
     
@@ -71,12 +67,13 @@ class VideoInfoChecker:
                 video_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, timeout=30)
-            
-            if result.returncode != 0:
-                error_msg = result.stderr.decode('utf-8', errors='ignore')
-                return {"error": f"ffprobe执行失败: {error_msg}"}
-            
+            result = run_ffmpeg_sync(cmd, timeout=30, capture_stdout=True)
+
+            if result.timed_out:
+                return {"error": "ffprobe执行超时"}
+            if not result.success:
+                return {"error": f"ffprobe执行失败: {result.error_message}"}
+
             # 解析JSON输出
             probe_data = json.loads(result.stdout.decode('utf-8'))
             
@@ -87,8 +84,6 @@ class VideoInfoChecker:
             
             return info
             
-        except subprocess.TimeoutExpired:
-            return {"error": "ffprobe执行超时"}
         except json.JSONDecodeError as e:
             return {"error": f"解析ffprobe输出失败: {e}"}
         except Exception as e: